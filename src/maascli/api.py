@@ -10,11 +10,19 @@ __all__ = [
 import argparse
 from collections import defaultdict
 from functools import partial
+from hashlib import sha256
 import http.client
 import json
 from operator import itemgetter
+import os
+from os.path import (
+    dirname,
+    expanduser,
+    join,
+)
 import re
 import sys
+from tempfile import NamedTemporaryFile
 from textwrap import (
     dedent,
     fill,
@@ -42,6 +50,7 @@ from maascli.command import (
 )
 from maascli.config import ProfileConfig
 from maascli.utils import (
+    get_command_path,
     handler_command_name,
     parse_docstring,
     safe_name,
@@ -386,25 +395,30 @@ def get_action_class_bases(handler, action):
     return (Action,)
 
 
+def register_action(profile, handler, action, parser):
+    """Register a single action of a handler."""
+    help_title, help_body = parse_docstring(action["doc"])
+    action_name = safe_name(action["name"])
+    action_bases = get_action_class_bases(handler, action)
+    action_ns = {
+        "action": action,
+        "handler": handler,
+        "profile": profile,
+        }
+    action_class = type(action_name, action_bases, action_ns)
+    action_parser = parser.subparsers.add_parser(
+        action_name, help=help_title, description=help_title,
+        epilog=help_body, add_help=False)
+    action_parser.add_argument(
+        '--help', '-h', action=ActionHelp, nargs=0,
+        help="Show this help message and exit.")
+    action_parser.set_defaults(execute=action_class(action_parser))
+
+
 def register_actions(profile, handler, parser):
     """Register a handler's actions."""
     for action in handler["actions"]:
-        help_title, help_body = parse_docstring(action["doc"])
-        action_name = safe_name(action["name"])
-        action_bases = get_action_class_bases(handler, action)
-        action_ns = {
-            "action": action,
-            "handler": handler,
-            "profile": profile,
-            }
-        action_class = type(action_name, action_bases, action_ns)
-        action_parser = parser.subparsers.add_parser(
-            action_name, help=help_title, description=help_title,
-            epilog=help_body, add_help=False)
-        action_parser.add_argument(
-            '--help', '-h', action=ActionHelp, nargs=0,
-            help="Show this help message and exit.")
-        action_parser.set_defaults(execute=action_class(action_parser))
+        register_action(profile, handler, action, parser)
 
 
 def register_handler(profile, handler, parser):
@@ -417,8 +431,8 @@ def register_handler(profile, handler, parser):
     register_actions(profile, handler, handler_parser)
 
 
-def register_resources(profile, parser):
-    """Register a profile's resources."""
+def get_handlers(profile):
+    """Yield the handler to represent each of a profile's resources."""
     anonymous = profile["credentials"] is None
     description = profile["description"]
     resources = description["resources"]
@@ -446,12 +460,129 @@ def register_resources(profile, parser):
             resource["auth"] or resource["anon"],
             name=resource["name"], actions=[])
         # Each value in the actions dict is a list of one or more action
-        # descriptions. Here we register the handler with only the first of
+        # descriptions. Here we represent the handler with only the first of
         # each of those.
         if len(actions) != 0:
             represent_as["actions"].extend(
                 value[0] for value in actions.values())
-            register_handler(profile, represent_as, parser)
+            yield represent_as
+
+
+def register_resources(profile, parser):
+    """Register a profile's resources."""
+    for handler in get_handlers(profile):
+        register_handler(profile, handler, parser)
+
+
+def get_command_index_cache_dir():
+    """Return the directory in which command indexes are cached."""
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        cache_home = expanduser("~/.cache")
+    return join(cache_home, "maascli")
+
+
+def get_command_index_key(profile):
+    """Return the key under which to cache the command index for `profile`.
+
+    This is derived from the API description's hash, as reported by the
+    region, or from its content when the region does not report one. The
+    index differs for anonymous profiles, so that is part of the key too.
+    """
+    description = profile["description"]
+    description_hash = description.get("hash")
+    if description_hash is None:
+        description_hash = sha256(json.dumps(
+            description, sort_keys=True).encode("utf-8")).hexdigest()
+    anonymous = profile["credentials"] is None
+    return "%s-%s" % (description_hash, "anon" if anonymous else "auth")
+
+
+def build_command_index(profile):
+    """Build a compact index of the commands offered by `profile`.
+
+    This maps each handler's command name to its name in the API description,
+    its help title, and the command names and help titles of its actions;
+    enough to populate `--help` listings without parsing every docstring.
+    """
+    index = {}
+    for handler in get_handlers(profile):
+        help_title, _ = parse_docstring(handler["doc"])
+        index[handler_command_name(handler["name"])] = {
+            "name": handler["name"],
+            "help": help_title,
+            "actions": [
+                [safe_name(action["name"]),
+                 parse_docstring(action["doc"])[0]]
+                for action in handler["actions"]
+            ],
+        }
+    return index
+
+
+def get_command_index(profile):
+    """Return the command index for `profile`, using the on-disk cache.
+
+    The cache is best-effort: if it cannot be read or written the index is
+    built afresh from the profile's API description.
+    """
+    path = join(
+        get_command_index_cache_dir(),
+        "%s.json" % get_command_index_key(profile))
+    try:
+        with open(path, "r", encoding="utf-8") as fd:
+            return json.load(fd)
+    except (OSError, ValueError):
+        pass
+    index = build_command_index(profile)
+    try:
+        os.makedirs(dirname(path), mode=0o700, exist_ok=True)
+        with NamedTemporaryFile(
+                "w", encoding="utf-8", dir=dirname(path),
+                delete=False) as fd:
+            json.dump(index, fd)
+        os.rename(fd.name, path)
+    except OSError:
+        pass
+    return index
+
+
+def register_placeholder(parser, name, help_title):
+    """Register a sub-command that only serves to be listed in help."""
+    parser.subparsers.add_parser(name, help=help_title, description=help_title)
+
+
+def register_resources_on_path(profile, parser, path):
+    """Register a profile's resources, building only those in `path`.
+
+    Only the handler and action named in `path` are built in full, with
+    their dynamic `Action` classes. Every other handler and action is
+    registered as a placeholder taken from the cached command index, which
+    is enough for argparse to list it in help and error messages.
+    """
+    target_handler, target_action = (list(path) + [None, None])[:2]
+    index = get_command_index(profile)
+    for name, entry in index.items():
+        if name != target_handler:
+            register_placeholder(parser, name, entry["help"])
+            continue
+        handler = next(
+            handler for handler in get_handlers(profile)
+            if handler["name"] == entry["name"])
+        help_title, help_body = parse_docstring(handler["doc"])
+        handler_parser = parser.subparsers.add_parser(
+            name, help=help_title, description=help_title,
+            epilog=help_body)
+        action_help = dict(entry["actions"])
+        for action in handler["actions"]:
+            action_name = safe_name(action["name"])
+            if action_name == target_action:
+                register_action(profile, handler, action, handler_parser)
+            else:
+                register_placeholder(
+                    handler_parser, action_name,
+                    action_help.get(action_name))
+
 
 profile_help_paragraphs = [
     """\
@@ -471,8 +602,15 @@ profile_help = '\n\n'.join(
     fill(dedent(paragraph)) for paragraph in profile_help_paragraphs)
 
 
-def register_api_commands(parser):
-    """Register all profiles as subcommands on `parser`."""
+def register_api_commands(parser, argv=None):
+    """Register all profiles as subcommands on `parser`.
+
+    :param argv: The command-line being parsed. When given, only the profile,
+        handler and action it names are built in full; see
+        `register_resources_on_path`. When not given, the full tree is built
+        for every profile.
+    """
+    path = None if argv is None else get_command_path(argv)
     try:
         with ProfileConfig.open() as config:
             for profile_name in config:
@@ -483,6 +621,10 @@ def register_api_commands(parser):
                         "Issue commands to the MAAS region controller at "
                         "%(url)s." % profile),
                     epilog=profile_help)
-                register_resources(profile, profile_parser)
+                if path is None:
+                    register_resources(profile, profile_parser)
+                elif path[:1] == [profile["name"]]:
+                    register_resources_on_path(
+                        profile, profile_parser, path[1:])
     except FileNotFoundError:
         return
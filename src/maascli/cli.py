@@ -30,6 +30,7 @@ from maascli.init import (
 )
 from maascli.utils import (
     api_url,
+    get_command_path,
     parse_docstring,
     safe_name,
 )
@@ -211,8 +212,13 @@ regiond_commands = (
 )
 
 
-def register_cli_commands(parser):
-    """Register the CLI's meta-subcommands on `parser`."""
+def register_cli_commands(parser, argv=None):
+    """Register the CLI's meta-subcommands on `parser`.
+
+    :param argv: The command-line being parsed. When given, Django is only
+        set up if a regiond command -- or no command at all, e.g. for
+        ``--help`` -- has been requested.
+    """
     for name, command in commands.items():
         help_title, help_body = parse_docstring(command)
         command_parser = parser.subparsers.add_parser(
@@ -242,6 +248,8 @@ def register_cli_commands(parser):
         command_parser.set_defaults(execute=command(command_parser))
 
     # Setup and the allowed django commands into the maascli.
+    if argv is not None and not is_regiond_command_requested(argv):
+        return
     management = get_django_management()
     if management is not None and is_maasserver_available():
         os.environ.setdefault(
@@ -251,6 +259,20 @@ def register_cli_commands(parser):
         load_regiond_commands(management, parser)
 
 
+def is_regiond_command_requested(argv):
+    """Does `argv` request a regiond command, or no command at all?
+
+    Setting up Django is slow, so only do it when the command-line needs one
+    of the `regiond_commands`, or help for the top-level command.
+    """
+    path = get_command_path(argv, depth=1)
+    if len(path) == 0:
+        return True
+    else:
+        names = {safe_name(name) for name, _, _ in regiond_commands}
+        return path[0] in names
+
+
 def get_django_management():
     """Load the Django management module."""
     try:
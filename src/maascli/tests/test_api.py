@@ -30,7 +30,10 @@ from maascli.utils import (
 )
 from maastesting.factory import factory
 from maastesting.fixtures import CaptureStandardIO
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
 from maastesting.testcase import MAASTestCase
 from testtools.matchers import (
     EndsWith,
@@ -80,6 +83,103 @@ class TestRegisterAPICommands(MAASTestCase):
                 self.assertIsInstance(options.execute, api.Action)
 
 
+class TestRegisterAPICommandsOnPath(MAASTestCase):
+    """Tests for `register_api_commands` when given the command-line."""
+
+    def setUp(self):
+        super(TestRegisterAPICommandsOnPath, self).setUp()
+        self.patch(
+            api, "get_command_index_cache_dir").return_value = self.make_dir()
+
+    def make_profiles(self, number_of_configs=2):
+        """Fake some profiles."""
+        self.patch(ProfileConfig, 'open').return_value = make_configs(
+            number_of_configs)
+        return ProfileConfig.open.return_value
+
+    def pick_command(self, profile):
+        """Return the profile, handler and action names for a command."""
+        [resource, _] = profile["description"]["resources"]
+        [action] = resource["auth"]["actions"]
+        return [
+            profile["name"], handler_command_name(resource["name"]),
+            safe_name(action["name"])]
+
+    def test_builds_requested_action(self):
+        profiles = self.make_profiles()
+        command = self.pick_command(list(profiles.values())[0])
+        parser = ArgumentParser()
+        api.register_api_commands(parser, ["maas"] + command)
+        options = parser.parse_args(command)
+        self.assertIsInstance(options.execute, api.Action)
+
+    def test_does_not_build_other_profiles(self):
+        profiles = self.make_profiles()
+        [profile, other] = profiles.values()
+        parser = ArgumentParser()
+        command = self.pick_command(profile)
+        api.register_api_commands(parser, ["maas"] + command)
+        other_parser = parser.subparsers.choices[other["name"]]
+        self.assertIsNone(other_parser._subparsers)
+
+    def test_does_not_build_other_actions(self):
+        profiles = self.make_profiles(1)
+        [profile] = profiles.values()
+        [_, resource] = profile["description"]["resources"]
+        [action] = resource["auth"]["actions"]
+        command = [
+            profile["name"], handler_command_name(resource["name"]),
+            safe_name(action["name"])]
+        build_action = self.patch(api, "register_action")
+        parser = ArgumentParser()
+        api.register_api_commands(
+            parser, ["maas", "--debug"] + command + ["-d"])
+        self.assertEqual(1, build_action.call_count)
+        self.assertEqual(action, build_action.call_args[0][2])
+
+    def test_lists_all_handlers_of_requested_profile(self):
+        profiles = self.make_profiles(1)
+        [profile] = profiles.values()
+        parser = ArgumentParser()
+        api.register_api_commands(parser, ["maas", profile["name"]])
+        profile_parser = parser.subparsers.choices[profile["name"]]
+        self.assertItemsEqual(
+            [handler_command_name(resource["name"])
+             for resource in profile["description"]["resources"]],
+            list(profile_parser.subparsers.choices))
+
+    def test_caches_command_index(self):
+        profiles = self.make_profiles(1)
+        [profile] = profiles.values()
+        command = self.pick_command(profile)
+        api.register_api_commands(ArgumentParser(), ["maas"] + command)
+        build_index = self.patch(api, "build_command_index")
+        api.register_api_commands(ArgumentParser(), ["maas"] + command)
+        self.assertThat(build_index, MockNotCalled())
+
+    def test_command_index_key_uses_description_hash(self):
+        profiles = self.make_profiles(1)
+        [profile] = profiles.values()
+        profile["description"]["hash"] = factory.make_name("hash")
+        self.assertEqual(
+            "%s-auth" % profile["description"]["hash"],
+            api.get_command_index_key(profile))
+
+    def test_command_index_key_changes_with_description(self):
+        profiles = self.make_profiles(1)
+        [profile] = profiles.values()
+        key = api.get_command_index_key(profile)
+        profile["description"]["resources"].pop()
+        self.assertNotEqual(key, api.get_command_index_key(profile))
+
+    def test_command_index_key_distinguishes_anonymous_profiles(self):
+        profiles = self.make_profiles(1)
+        [profile] = profiles.values()
+        key = api.get_command_index_key(profile)
+        profile["credentials"] = None
+        self.assertNotEqual(key, api.get_command_index_key(profile))
+
+
 class TestFunctions(MAASTestCase):
     """Test for miscellaneous functions in `maascli.api`."""
 
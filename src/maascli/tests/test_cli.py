@@ -82,6 +82,37 @@ class TestRegisterCommands(MAASTestCase):
             mock_load_regiond_commands,
             MockCalledOnceWith(sentinel.management, parser))
 
+    def test_doesnt_call_load_regiond_commands_for_other_commands(self):
+        self.patch(
+            cli, "get_django_management").return_value = sentinel.management
+        self.patch(
+            cli,
+            "is_maasserver_available").return_value = sentinel.pkg_util
+        mock_load_regiond_commands = self.patch(cli, "load_regiond_commands")
+        parser = ArgumentParser()
+        cli.register_cli_commands(parser, ["maas", "admin", "machines"])
+        self.assertThat(mock_load_regiond_commands, MockNotCalled())
+
+    def test_calls_load_regiond_commands_when_regiond_command_requested(self):
+        self.patch(
+            cli, "get_django_management").return_value = sentinel.management
+        self.patch(
+            cli,
+            "is_maasserver_available").return_value = sentinel.pkg_util
+        mock_load_regiond_commands = self.patch(cli, "load_regiond_commands")
+        parser = ArgumentParser()
+        cli.register_cli_commands(parser, ["maas", "createadmin"])
+        self.assertThat(
+            mock_load_regiond_commands,
+            MockCalledOnceWith(sentinel.management, parser))
+
+    def test_is_regiond_command_requested(self):
+        self.assertTrue(cli.is_regiond_command_requested(["maas"]))
+        self.assertTrue(cli.is_regiond_command_requested(["maas", "-h"]))
+        self.assertTrue(
+            cli.is_regiond_command_requested(["maas", "changepassword"]))
+        self.assertFalse(cli.is_regiond_command_requested(["maas", "login"]))
+
     def test_loads_all_regiond_commands(self):
         parser = ArgumentParser()
         cli.register_cli_commands(parser)
@@ -154,6 +154,22 @@ class TestFunctions(MAASTestCase):
         self.assertIsInstance(utils.ensure_trailing_slash("fred"), str)
         self.assertIsInstance(utils.ensure_trailing_slash(b"fred"), bytes)
 
+    def test_get_command_path(self):
+        self.assertEqual(
+            ["admin", "machine", "read"],
+            utils.get_command_path(
+                ["maas", "--debug", "admin", "machine", "read", "abc"]))
+
+    def test_get_command_path_skips_options(self):
+        self.assertEqual(
+            ["admin", "machines"],
+            utils.get_command_path(["maas", "admin", "-h", "machines"]))
+
+    def test_get_command_path_limits_depth(self):
+        self.assertEqual(
+            ["login"], utils.get_command_path(
+                ["maas", "login", "admin", "http://localhost/"], depth=1))
+
     def test_api_url(self):
         transformations = list({
             "http://example.com/": "http://example.com/api/2.0/",
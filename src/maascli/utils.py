@@ -6,6 +6,7 @@
 __all__ = [
     "dump_response_summary",
     "ensure_trailing_slash",
+    "get_command_path",
     "get_response_content_type",
     "handler_command_name",
     "is_response_textual",
@@ -107,6 +108,25 @@ def api_url(string):
     return url.geturl()
 
 
+def get_command_path(argv, depth=3):
+    """Return the sub-command names requested in `argv`.
+
+    This is the leading run of positional arguments (up to `depth` of them)
+    following the program name, e.g. ``["admin", "machines", "read"]`` for
+    ``maas admin machines read``. Options are skipped; they do not name
+    sub-commands.
+    """
+    path = []
+    for arg in argv[1:]:
+        if len(path) >= depth:
+            break
+        elif arg.startswith("-"):
+            continue
+        else:
+            path.append(arg)
+    return path
+
+
 def import_module(import_str):
     """Import a module."""
     __import__(import_str)
@@ -11,6 +11,7 @@ __all__ = [
 from base64 import b64decode
 from itertools import chain
 import json
+from operator import attrgetter
 
 import bson
 from django.db.models import Prefetch
@@ -51,13 +52,17 @@ from maasserver.fields import MAC_RE
 from maasserver.forms import BulkNodeSetZoneForm
 from maasserver.forms.ephemeral import TestForm
 from maasserver.models import (
+    Device,
     Filesystem,
     Interface,
     ISCSIBlockDevice,
+    Machine,
     Node,
     NUMANode,
     OwnerData,
     PhysicalBlockDevice,
+    RackController,
+    RegionController,
     VirtualBlockDevice,
 )
 from maasserver.models.nodeprobeddetails import get_single_probed_details
@@ -72,6 +77,7 @@ from metadataserver.enum import (
     SCRIPT_STATUS_CHOICES,
 )
 from metadataserver.models.scriptset import get_status_from_qs
+from piston3.handler import typemapper
 from piston3.utils import rc
 from provisioningserver.drivers.power import UNKNOWN_POWER_TYPE
 
@@ -177,6 +183,74 @@ NODES_PREFETCH = [
     'numanode_set',
 ]
 
+# Lookup prefixes of the prefetches in NODES_PREFETCH that are needed to
+# render each of these node fields. No other field needs any of them, so
+# reading only other fields skips the prefetching altogether.
+_STORAGE_PREFETCHES = ('blockdevice_set__', 'special_filesystems')
+_INTERFACE_PREFETCHES = ('boot_interface__', 'interface_set__')
+NODE_FIELD_PREFETCHES = {
+    'bcaches': _STORAGE_PREFETCHES,
+    'blockdevice_set': _STORAGE_PREFETCHES,
+    'boot_disk': _STORAGE_PREFETCHES,
+    'boot_interface': _INTERFACE_PREFETCHES,
+    'cache_sets': _STORAGE_PREFETCHES,
+    'default_gateways': _INTERFACE_PREFETCHES + ('gateway_link_',),
+    'domain': ('domain__',),
+    'fqdn': ('domain__',),
+    'hardware_info': ('nodemetadata_set',),
+    'interface_set': _INTERFACE_PREFETCHES,
+    'ip_addresses': _INTERFACE_PREFETCHES,
+    'iscsiblockdevice_set': _STORAGE_PREFETCHES,
+    'numanode_set': ('numanode_set',),
+    'owner_data': ('ownerdata_set',),
+    'physicalblockdevice_set': _STORAGE_PREFETCHES,
+    'raids': _STORAGE_PREFETCHES,
+    'special_filesystems': _STORAGE_PREFETCHES,
+    'storage': _STORAGE_PREFETCHES,
+    'tag_names': ('tags',),
+    'virtualblockdevice_set': _STORAGE_PREFETCHES,
+    'volume_groups': _STORAGE_PREFETCHES,
+}
+
+
+def get_nodes_prefetch(field_names=None):
+    """Return the prefetches from `NODES_PREFETCH` needed to render nodes.
+
+    :param field_names: The names of the node fields that will be rendered,
+        or `None` for all of them.
+    """
+    if field_names is None:
+        return NODES_PREFETCH
+    prefixes = tuple(chain.from_iterable(
+        NODE_FIELD_PREFETCHES.get(name, ()) for name in field_names))
+    return [
+        prefetch for prefetch in NODES_PREFETCH
+        if get_prefetch_lookup(prefetch).startswith(prefixes)
+    ]
+
+
+def get_prefetch_lookup(prefetch):
+    """Return the lookup of `prefetch`, a string or a `Prefetch`."""
+    if isinstance(prefetch, Prefetch):
+        return prefetch.prefetch_through
+    else:
+        return prefetch
+
+
+def get_displayed_node_fields(models):
+    """Return the fields the API displays for nodes of the given `models`.
+
+    These are the fields of the handlers that Piston renders each model with,
+    keyed by field name; a field is either a name or a (name, fields) tuple.
+    """
+    displayed = {}
+    for handler, (model, anonymous) in typemapper.items():
+        if model in models and not anonymous:
+            for field in handler.fields:
+                name = field if isinstance(field, str) else field[0]
+                displayed.setdefault(name, field)
+    return displayed
+
 
 def store_node_power_parameters(node, request):
     """Store power parameters in request.
@@ -753,6 +827,18 @@ class NodesHandler(OperationsHandler):
         @param (string) "not_pod_type": [required=false] Only nodes that don't
         belong a pod of the specified type will be returned.
 
+        @param (string) "after_id" [required=false] Only nodes with a system
+        id after this one will be returned. Pass the system id of the last
+        node of one page to get the next page; that node need not still
+        exist. When given, nodes are sorted by system id.
+
+        @param (int) "limit" [required=false] Return at most this many nodes.
+        When given, nodes are sorted by system id only, not grouped by type.
+
+        @param (string) "fields" [required=false] Only return these fields of
+        each node. This can be specified multiple times to return multiple
+        fields. Related objects are only loaded for the fields returned.
+
         @success (http-status-code) "200" 200
 
         @success (json) "success_json" A JSON object containing a list of node
@@ -762,6 +848,12 @@ class NodesHandler(OperationsHandler):
 
         """
 
+        form = ReadNodesForm(data=request.GET)
+        if not form.is_valid():
+            raise MAASAPIValidationError(form.errors)
+        field_names = form.cleaned_data.get('fields') or None
+        if field_names is not None:
+            self._check_field_names(field_names)
         if self.base_model == Node:
             # Avoid circular dependencies
             from maasserver.api.devices import DevicesHandler
@@ -770,32 +862,90 @@ class NodesHandler(OperationsHandler):
             from maasserver.api.regioncontrollers import (
                 RegionControllersHandler
             )
-            racks = RackControllersHandler().read(request).order_by("id")
+            racks = RackControllersHandler()._read_nodes(request.user, form)
+            rack_ids = {rack.id for rack in racks}
             nodes = list(chain(
-                DevicesHandler().read(request).order_by("id"),
-                MachinesHandler().read(request).order_by("id"),
+                DevicesHandler()._read_nodes(request.user, form),
+                MachinesHandler()._read_nodes(request.user, form),
                 racks,
-                RegionControllersHandler().read(request).exclude(
-                    id__in=racks).order_by("id"),
+                (
+                    region
+                    for region in RegionControllersHandler()._read_nodes(
+                        request.user, form)
+                    if region.id not in rack_ids
+                ),
             ))
+            if form.is_paged:
+                # Each handler returned up to `limit` nodes of its own type;
+                # the first `limit` of all of them make up this page.
+                limit = form.cleaned_data.get('limit')
+                nodes = sorted(nodes, key=attrgetter('system_id'))[:limit]
             return nodes
         else:
-            form = ReadNodesForm(data=request.GET)
-            if not form.is_valid():
-                raise MAASAPIValidationError(form.errors)
-            nodes = self.base_model.objects.get_nodes(
-                request.user, NodePermission.view)
-            nodes, _, _ = form.filter_nodes(nodes)
-            nodes = nodes.select_related(*NODES_SELECT_RELATED)
-            nodes = prefetch_queryset(
-                nodes, NODES_PREFETCH).order_by('id')
-            # Set related node parents so no extra queries are needed.
-            for node in nodes:
+            return self._read_nodes(request.user, form)
+
+    def _read_nodes(self, user, form):
+        """Return the nodes of `base_model` that `user` can see, filtered
+        by the valid `ReadNodesForm` `form`.
+
+        Related objects are prefetched for the fields asked for in `form`.
+        """
+        field_names = form.cleaned_data.get('fields') or None
+        prefetches = get_nodes_prefetch(field_names)
+        lookups = [get_prefetch_lookup(prefetch) for prefetch in prefetches]
+        nodes = self.base_model.objects.get_nodes(user, NodePermission.view)
+        nodes, _, _ = form.filter_nodes(nodes)
+        nodes = nodes.select_related(*NODES_SELECT_RELATED)
+        nodes = prefetch_queryset(nodes, prefetches)
+        if form.is_paged:
+            nodes = nodes.order_by('system_id')
+        else:
+            nodes = nodes.order_by('id')
+        limit = form.cleaned_data.get('limit')
+        if limit is not None:
+            nodes = nodes[:limit]
+        # Set related node parents so no extra queries are needed.
+        link_interfaces = any(
+            lookup.startswith('interface_set__') for lookup in lookups)
+        link_block_devices = any(
+            lookup.startswith('blockdevice_set__') for lookup in lookups)
+        for node in nodes:
+            if link_interfaces:
                 for interface in node.interface_set.all():
                     interface.node = node
+            if link_block_devices:
                 for block_device in node.blockdevice_set.all():
                     block_device.node = node
-            return nodes
+        return nodes
+
+    def _get_listed_models(self):
+        """Return the node models that `read` can return."""
+        if self.base_model == Node:
+            return (Device, Machine, RackController, RegionController)
+        else:
+            return (self.base_model,)
+
+    def _check_field_names(self, field_names):
+        """Raise `MAASAPIValidationError` for fields nodes do not have."""
+        displayed = get_displayed_node_fields(self._get_listed_models())
+        unknown = sorted(set(field_names).difference(displayed))
+        if unknown:
+            raise MAASAPIValidationError({
+                'fields': ["Unknown field(s): %s." % ", ".join(unknown)]})
+
+    def list_fields(self, request, *args, **kwargs):
+        """Return the fields to render when a list of nodes is returned.
+
+        Piston uses this in preference to `fields` when rendering a list. It
+        narrows the fields rendered by `read` to those asked for with the
+        `fields` parameter.
+        """
+        field_names = get_optional_list(request.GET, 'fields')
+        if field_names is None or 'op' in request.GET:
+            return self.fields
+        displayed = get_displayed_node_fields(self._get_listed_models())
+        return tuple(
+            displayed[name] for name in field_names if name in displayed)
 
     @operation(idempotent=True)
     def is_registered(self, request):
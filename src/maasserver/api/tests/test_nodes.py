@@ -30,6 +30,7 @@ from maasserver.testing.fixtures import RBACEnabled
 from maasserver.utils import ignore_unused
 from maasserver.utils.django_urls import reverse
 from maasserver.utils.orm import reload_object
+from maastesting.testcase import MAASTestCase
 
 
 class TestIsRegisteredAnonAPI(APITestCase.ForAnonymousAndUserAndAdmin):
@@ -388,6 +389,32 @@ class TestFilteredNodesListFromRequest(APITestCase.ForUser):
             extract_system_ids_from_nodes(node_list))
 
 
+class TestGetNodesPrefetch(MAASTestCase):
+
+    def test_returns_all_prefetches_without_fields(self):
+        self.assertIs(
+            nodes_module.NODES_PREFETCH, nodes_module.get_nodes_prefetch())
+
+    def test_returns_no_prefetches_for_plain_fields(self):
+        self.assertEqual(
+            [], nodes_module.get_nodes_prefetch(['hostname', 'status']))
+
+    def test_returns_prefetches_for_related_fields(self):
+        lookups = [
+            nodes_module.get_prefetch_lookup(prefetch)
+            for prefetch in nodes_module.get_nodes_prefetch(
+                ['hostname', 'tag_names', 'interface_set'])
+        ]
+        self.assertIn('tags', lookups)
+        self.assertIn('interface_set__vlan__space', lookups)
+        self.assertIn('boot_interface__node', lookups)
+        self.assertNotIn('ownerdata_set', lookups)
+        self.assertEqual([], [
+            lookup for lookup in lookups
+            if lookup.startswith('blockdevice_set__')
+        ])
+
+
 class TestNodesAPI(APITestCase.ForUser):
     """Tests for /api/2.0/nodes/."""
 
@@ -474,6 +501,61 @@ class TestNodesAPI(APITestCase.ForUser):
             response.content.decode(settings.DEFAULT_CHARSET))
         self.assertSequenceEqual(ids, extract_system_ids(parsed_result))
 
+    def test_GET_with_limit_and_after_id_pages_through_nodes(self):
+        self.become_admin()
+        ids = [
+            factory.make_Node(node_type=node_type).system_id
+            for node_type in (
+                NODE_TYPE.MACHINE, NODE_TYPE.DEVICE, NODE_TYPE.RACK_CONTROLLER,
+                NODE_TYPE.MACHINE, NODE_TYPE.REGION_AND_RACK_CONTROLLER)
+        ]
+        pages = []
+        params = {'limit': 2}
+        while True:
+            response = self.client.get(reverse('nodes_handler'), params)
+            self.assertEqual(http.client.OK, response.status_code)
+            page = extract_system_ids(json.loads(
+                response.content.decode(settings.DEFAULT_CHARSET)))
+            if not page:
+                break
+            pages.append(page)
+            params['after_id'] = page[-1]
+        ids.sort()
+        self.assertEqual([ids[0:2], ids[2:4], ids[4:5]], pages)
+
+    def test_GET_with_after_id_of_deleted_node_continues_paging(self):
+        self.become_admin()
+        nodes = [factory.make_Node() for _ in range(3)]
+        ids = sorted(node.system_id for node in nodes)
+        [deleted] = [node for node in nodes if node.system_id == ids[1]]
+        deleted.delete()
+        response = self.client.get(reverse('nodes_handler'), {
+            'limit': 2,
+            'after_id': ids[1],
+        })
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEqual([ids[2]], extract_system_ids(json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))))
+
+    def test_GET_with_fields_returns_only_those_fields(self):
+        factory.make_Node_with_Interface_on_Subnet()
+        response = self.client.get(reverse('nodes_handler'), {
+            'fields': ['hostname', 'system_id'],
+        })
+        self.assertEqual(http.client.OK, response.status_code)
+        [node] = json.loads(response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertEqual(
+            {'hostname', 'system_id', 'resource_uri'}, node.keys())
+
+    def test_GET_with_unknown_field_is_bad_request(self):
+        response = self.client.get(reverse('nodes_handler'), {
+            'fields': ['hostname', 'power_parameters'],
+        })
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
+        self.assertEqual(
+            {'fields': ["Unknown field(s): power_parameters."]},
+            json.loads(response.content.decode(settings.DEFAULT_CHARSET)))
+
     def test_GET_with_some_matching_ids_returns_matching_nodes(self):
         # If some nodes match the requested ids and some don't, only the
         # matching ones are returned.
@@ -61,6 +61,7 @@ from maasserver.models import (
     Config,
     Event,
     LargeFile,
+    RackBootImage,
 )
 from maasserver.rpc import getAllClients
 from maasserver.utils import (
@@ -1528,12 +1529,18 @@ class ImportResourcesProgressService(TimerService, object):
         """Return true if there are boot images available in the region. """
         return BootResource.objects.all().exists()
 
+    @transactional
+    def get_reported_boot_images(self, system_ids):
+        """Return the boot images reported by the given racks."""
+        return RackBootImage.objects.get_reported_images(system_ids)
+
     @asynchronous(timeout=90)
     def are_boot_images_available_in_any_rack(self):
         """Return true if there are boot images available in any rack.
 
         Only considers racks that are currently connected, and ignores
-        errors resulting from communicating with the racks.
+        errors resulting from communicating with the racks. Racks that have
+        reported their boot images to the region are not asked for them.
         """
         clients = getAllClients()
 
@@ -1547,8 +1554,6 @@ class ImportResourcesProgressService(TimerService, object):
             d.addCallback(itemgetter("images"))
             return d
 
-        d = DeferredList(map(get_images, clients), consumeErrors=True)
-
         def has_boot_images(results):
             return any(
                 len(result) > 0
@@ -1556,4 +1561,18 @@ class ImportResourcesProgressService(TimerService, object):
                 if success  # Ignore failures.
             )
 
-        return d.addCallback(has_boot_images)
+        def ask_unreported_racks(reported):
+            if any(len(images) > 0 for images in reported.values()):
+                return True
+            unreported = [
+                client for client in clients
+                if client.ident not in reported
+            ]
+            d = DeferredList(
+                map(get_images, unreported), consumeErrors=True)
+            return d.addCallback(has_boot_images)
+
+        d = deferToDatabase(
+            self.get_reported_boot_images,
+            [client.ident for client in clients])
+        return d.addCallback(ask_unreported_racks)
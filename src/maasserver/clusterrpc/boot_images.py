@@ -1,7 +1,12 @@
 # Copyright 2014-2016 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
-"""Obtain list of boot images from rack controllers."""
+"""Obtain list of boot images from rack controllers.
+
+Rack controllers report their boot images to the region when they change, so
+these are read from the database where possible. Rack controllers that have
+not reported their boot images are asked for them instead.
+"""
 
 __all__ = [
     "RackControllersImporter",
@@ -21,6 +26,7 @@ from urllib.parse import (
 
 from maasserver.models import (
     BootResource,
+    RackBootImage,
     RackController,
 )
 from maasserver.rpc import (
@@ -93,6 +99,10 @@ def get_boot_images(rack_controller):
         30 seconds.
     """
     client = getClientFor(rack_controller.system_id, timeout=1)
+    reported = RackBootImage.objects.get_reported_images(
+        [rack_controller.system_id])
+    if rack_controller.system_id in reported:
+        return reported[rack_controller.system_id]
     try:
         call = client(ListBootImagesV2)
         return call.wait(30).get("images")
@@ -106,7 +116,20 @@ def _get_available_boot_images():
     """Obtain boot images available on connected rack controllers."""
     listimages_v1 = lambda client: partial(client, ListBootImages)
     listimages_v2 = lambda client: partial(client, ListBootImagesV2)
-    clients_v2 = getAllClients()
+    clients = getAllClients()
+    reported = RackBootImage.objects.get_reported_images(
+        [client.ident for client in clients])
+    for images in reported.values():
+        # Convert each image to a frozenset of its items.
+        yield frozenset(
+            frozenset(image.items())
+            for image in images
+        )
+    # Only ask the rack controllers that have not reported their images.
+    clients_v2 = [
+        client for client in clients
+        if client.ident not in reported
+    ]
     responses_v2 = gather(map(listimages_v2, clients_v2))
     clients_v1 = []
     for i, response in enumerate(responses_v2):
@@ -0,0 +1,123 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Delete events that are past their retention period."""
+
+__all__ = [
+    "EventRetentionService",
+    "get_expired_events",
+    ]
+
+from datetime import timedelta
+from logging import INFO
+
+from maasserver.models.config import Config
+from maasserver.models.event import Event
+from maasserver.models.eventtype import EventType
+from maasserver.models.timestampedmodel import now
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from provisioningserver.events import AUDIT
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.utils.twisted import (
+    callOut,
+    pause,
+)
+from twisted.application.service import Service
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.task import LoopingCall
+
+
+log = LegacyLogger()
+
+
+@transactional
+def get_expired_events():
+    """Return the events that are past their retention period.
+
+    :return: A list of ``(type_ids, cutoff, max_id)`` tuples, as arguments
+        for `EventManager.delete_expired`.
+    """
+    configs = Config.objects.get_configs([
+        'event_retention_days', 'debug_event_retention_days',
+        'audit_event_retention_days', 'event_retention_count'])
+    audit, debug, other = [], [], []
+    for type_id, level in EventType.objects.values_list('id', 'level'):
+        if level == AUDIT:
+            audit.append(type_id)
+        elif level < INFO:
+            debug.append(type_id)
+        else:
+            other.append(type_id)
+
+    expired = []
+    for type_ids, days in (
+            (other, configs['event_retention_days']),
+            (debug, configs['debug_event_retention_days']),
+            (audit, configs['audit_event_retention_days'])):
+        if len(type_ids) != 0 and days:
+            expired.append((type_ids, now() - timedelta(days=days), None))
+    count = configs['event_retention_count']
+    if count:
+        type_ids = debug + other
+        max_id = Event.objects.get_retention_max_id(type_ids, count)
+        if max_id is not None:
+            expired.append((type_ids, None, max_id))
+    return expired
+
+
+@transactional
+def delete_expired_events(type_ids, cutoff, max_id, limit):
+    """Delete a batch of expired events in its own transaction."""
+    return Event.objects.delete_expired(
+        type_ids, cutoff=cutoff, max_id=max_id, limit=limit)
+
+
+class EventRetentionService(Service):
+    """Periodically delete events that are past their retention period.
+
+    Events are deleted `batchSize` at a time, each batch in its own
+    transaction and with a pause in between, so that a large backlog of
+    expired events does not hold locks for long or starve other work.
+    """
+
+    clock = None
+    interval = timedelta(hours=1).total_seconds()
+    batchSize = 1000
+    batchPause = 0.5
+
+    def startService(self):
+        super().startService()
+        self._loop = LoopingCall(self._tryDeleteExpiredEvents)
+        self._loop.clock = reactor if self.clock is None else self.clock
+        self._loopDone = self._loop.start(self.interval, now=False)
+        self._loopDone.addErrback(log.err, "Event retention loop failed.")
+
+    def stopService(self):
+        if self._loop.running:
+            self._loop.stop()
+        return self._loopDone.addBoth(
+            callOut, super().stopService)
+
+    def _tryDeleteExpiredEvents(self):
+        d = self._deleteExpiredEvents()
+        d.addErrback(log.err, "Failure when deleting expired events.")
+        return d
+
+    @inlineCallbacks
+    def _deleteExpiredEvents(self):
+        expired = yield deferToDatabase(get_expired_events)
+        deleted = 0
+        for type_ids, cutoff, max_id in expired:
+            # Stop early if the service is stopped part way through.
+            while self.running:
+                count = yield deferToDatabase(
+                    delete_expired_events, type_ids, cutoff, max_id,
+                    self.batchSize)
+                deleted += count
+                if count < self.batchSize:
+                    break
+                yield pause(self.batchPause, self._loop.clock)
+        if deleted != 0:
+            log.info("Deleted {count} expired events.", count=deleted)
@@ -98,6 +98,11 @@ def make_DNSPublicationGarbageService():
     return publication.DNSPublicationGarbageService()
 
 
+def make_EventRetentionService():
+    from maasserver import event_retention
+    return event_retention.EventRetentionService()
+
+
 def make_StatusMonitorService():
     from maasserver import status_monitor
     return status_monitor.StatusMonitorService()
@@ -128,14 +133,19 @@ def make_PostgresListenerService():
     return PostgresListenerService()
 
 
+def make_IPCWorkerListenerService(ipcWorker):
+    from maasserver.ipc import IPCWorkerListenerService
+    return IPCWorkerListenerService(ipcWorker)
+
+
 def make_RackControllerService(ipcWorker, postgresListener):
     from maasserver.rack_controller import RackControllerService
     return RackControllerService(ipcWorker, postgresListener)
 
 
-def make_StatusWorkerService(dbtasks):
+def make_StatusWorkerService():
     from metadataserver.api_twisted import StatusWorkerService
-    return StatusWorkerService(dbtasks)
+    return StatusWorkerService()
 
 
 def make_ServiceMonitorService():
@@ -187,9 +197,10 @@ def make_WorkersService():
     return WorkersService(reactor)
 
 
-def make_IPCMasterService(workers=None):
+def make_IPCMasterService(postgresListener=None, workers=None):
     from maasserver.ipc import IPCMasterService
-    return IPCMasterService(reactor, workers)
+    return IPCMasterService(
+        reactor, workers, postgresListener=postgresListener)
 
 
 def make_IPCWorkerService():
@@ -274,6 +285,11 @@ class RegionEventLoop:
             "factory": make_DNSPublicationGarbageService,
             "requires": [],
         },
+        "event-retention": {
+            "only_on_master": True,
+            "factory": make_EventRetentionService,
+            "requires": [],
+        },
         "status-monitor": {
             "only_on_master": True,
             "factory": make_StatusMonitorService,
@@ -308,8 +324,8 @@ class RegionEventLoop:
         },
         "postgres-listener-worker": {
             "only_on_master": False,
-            "factory": make_PostgresListenerService,
-            "requires": [],
+            "factory": make_IPCWorkerListenerService,
+            "requires": ["ipc-worker"],
         },
         "web": {
             "only_on_master": False,
@@ -329,7 +345,7 @@ class RegionEventLoop:
         "status-worker": {
             "only_on_master": False,
             "factory": make_StatusWorkerService,
-            "requires": ["database-tasks"],
+            "requires": [],
         },
         "networks-monitor": {
             "only_on_master": True,
@@ -370,7 +386,7 @@ class RegionEventLoop:
         "ipc-master": {
             "only_on_master": True,
             "factory": make_IPCMasterService,
-            "requires": [],
+            "requires": ["postgres-listener-master"],
             "optional": ["workers"],
         },
         "ipc-worker": {
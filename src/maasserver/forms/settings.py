@@ -699,6 +699,56 @@ CONFIG_ITEMS = {
             'min_value': 1,
         },
     },
+    'event_retention_days': {
+        'default': 90,
+        'form': forms.IntegerField,
+        'form_kwargs': {
+            'required': False,
+            'label': "Number of days node events are kept for",
+            'min_value': 0,
+            'help_text': (
+                "Events at INFO level or above that are older than this are "
+                "deleted, except for the most recent event of each node. Set "
+                "to 0 to keep them forever."),
+        },
+    },
+    'debug_event_retention_days': {
+        'default': 30,
+        'form': forms.IntegerField,
+        'form_kwargs': {
+            'required': False,
+            'label': "Number of days DEBUG node events are kept for",
+            'min_value': 0,
+            'help_text': (
+                "DEBUG events that are older than this are deleted. Set to 0 "
+                "to keep them forever."),
+        },
+    },
+    'audit_event_retention_days': {
+        'default': 0,
+        'form': forms.IntegerField,
+        'form_kwargs': {
+            'required': False,
+            'label': "Number of days AUDIT events are kept for",
+            'min_value': 0,
+            'help_text': (
+                "AUDIT events that are older than this are deleted. Set to 0 "
+                "to keep them forever."),
+        },
+    },
+    'event_retention_count': {
+        'default': 0,
+        'form': forms.IntegerField,
+        'form_kwargs': {
+            'required': False,
+            'label': "Maximum number of node events kept",
+            'min_value': 0,
+            'help_text': (
+                "When there are more DEBUG and higher events than this, the "
+                "oldest are deleted. AUDIT events are not counted. Set to 0 "
+                "for no limit."),
+        },
+    },
     'subnet_ip_exhaustion_threshold_count': {
         'default': 16,
         'form': forms.IntegerField,
@@ -778,6 +828,21 @@ CONFIG_ITEMS = {
                 "in minutes.")
         }
     },
+    'prometheus_subnet_stats_ttl': {
+        'default': 60,
+        'form': forms.IntegerField,
+        'form_kwargs': {
+            'label': (
+                "How long subnet statistics are reused for (default: 60 "
+                "seconds)."),
+            'required': True,
+            'min_value': 0,
+            'help_text': (
+                "Computing the utilisation of every subnet is expensive, so "
+                "it is reused by Prometheus scrapes and pushes for this many "
+                "seconds. Set to 0 to compute it every time.")
+        }
+    },
     'enlist_commissioning': {
         'default': True,
         'form': forms.BooleanField,
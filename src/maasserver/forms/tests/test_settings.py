@@ -67,6 +67,12 @@ class TestSpecificConfigSettings(MAASServerTestCase):
         input = ' '.join(ips1) + ' ' + ','.join(ips2)
         self.assertEqual(' '.join(ips1 + ips2), field.clean(input))
 
+    def test_prometheus_subnet_stats_ttl_is_required(self):
+        field = get_config_field('prometheus_subnet_stats_ttl')
+        self.assertRaises(ValidationError, field.clean, None)
+        self.assertRaises(ValidationError, field.clean, -1)
+        self.assertEqual(0, field.clean("0"))
+
 
 class TestRemoteSyslogConfigSettings(MAASServerTestCase):
 
@@ -9,6 +9,7 @@ worker regiond processes. All worker regiond process connect to the master
 socket.
 """
 
+from collections import defaultdict
 from datetime import timedelta
 from functools import partial
 import os
@@ -19,6 +20,10 @@ from maasserver import (
     workers,
 )
 from maasserver.enum import SERVICE_STATUS
+from maasserver.listener import (
+    PostgresListenerRegistrationError,
+    PostgresListenerUnregistrationError,
+)
 from maasserver.models.node import (
     RackController,
     RegionController,
@@ -39,15 +44,19 @@ from provisioningserver.utils.network import (
     get_all_interface_addresses,
     get_all_interface_source_addresses,
 )
+from provisioningserver.utils.events import EventGroup
 from provisioningserver.utils.twisted import (
     asynchronous,
     DeferredValue,
+    FOREVER,
     synchronous,
 )
 from twisted.application import service
 from twisted.internet.defer import (
     CancelledError,
+    DeferredList,
     inlineCallbacks,
+    maybeDeferred,
 )
 from twisted.internet.endpoints import (
     connectProtocol,
@@ -117,6 +126,56 @@ class RPCUnregisterConnection(amp.Command):
     errors = []
 
 
+class ListenerRegister(amp.Command):
+    """Register worker to receive notifications for a database channel."""
+
+    arguments = [
+        (b"channel", amp.Unicode()),
+    ]
+    response = []
+    errors = {
+        PostgresListenerRegistrationError: (
+            b"PostgresListenerRegistrationError"),
+    }
+
+
+class ListenerUnregister(amp.Command):
+    """Unregister worker from notifications for a database channel."""
+
+    arguments = [
+        (b"channel", amp.Unicode()),
+    ]
+    response = []
+    errors = []
+
+
+class ListenerNotify(amp.Command):
+    """Forward a database notification from the master to a worker.
+
+    For system channels `action` is not set; the handler is called with the
+    channel name instead, as `PostgresListenerService` does.
+    """
+
+    arguments = [
+        (b"channel", amp.Unicode()),
+        (b"action", amp.Unicode(optional=True)),
+        (b"payload", amp.Unicode()),
+    ]
+    requiresAnswer = False
+
+
+class ListenerEvent(amp.Command):
+    """Forward a change to the master's database connection to a worker.
+
+    `event` is either "connected" or "disconnected".
+    """
+
+    arguments = [
+        (b"event", amp.Unicode()),
+    ]
+    requiresAnswer = False
+
+
 class IPCMaster(RPCProtocol):
     """The IPC master side of the protocol."""
 
@@ -148,12 +207,28 @@ class IPCMaster(RPCProtocol):
         self.factory.service.unregisterWorkerRPCConnection(pid, connid)
         return {}
 
+    @ListenerRegister.responder
+    def listener_register(self, channel):
+        """Worker wants notifications for `channel`."""
+        self.factory.service.registerWorkerChannel(self, channel)
+        return {}
+
+    @ListenerUnregister.responder
+    def listener_unregister(self, channel):
+        """Worker no longer wants notifications for `channel`."""
+        self.factory.service.unregisterWorkerChannel(self, channel)
+        return {}
+
 
 class IPCMasterService(service.Service, object):
     """
     IPC master service.
 
     Provides the master side of the IPC communication between the workers.
+
+    When given a `postgresListener` this also forwards database notifications
+    to the workers that have registered for them, so that only the master
+    process holds a LISTEN connection to the database.
     """
 
     UPDATE_INTERVAL = 60  # 60 seconds.
@@ -163,10 +238,16 @@ class IPCMasterService(service.Service, object):
     connections = None
 
     def __init__(
-            self, reactor, workers=None, socket_path=None):
+            self, reactor, workers=None, socket_path=None,
+            postgresListener=None):
         super(IPCMasterService, self).__init__()
         self.reactor = reactor
         self.workers = workers
+        self.postgresListener = postgresListener
+        # Maps each database channel to the set of worker connections that
+        # want its notifications, and the handler that forwards them.
+        self.channels = defaultdict(set)
+        self.forwarders = {}
         self.socket_path = socket_path
         if self.socket_path is None:
             self.socket_path = get_ipc_socket_path()
@@ -206,6 +287,12 @@ class IPCMasterService(service.Service, object):
         self.starting.addCallback(start_update_loop)
         self.starting.addErrback(log_failure)
 
+        if self.postgresListener is not None:
+            self.postgresListener.events.connected.registerHandler(
+                self._forwardConnected)
+            self.postgresListener.events.disconnected.registerHandler(
+                self._forwardDisconnected)
+
         # Twisted's service framework does not track start-up progress, i.e.
         # it does not check for Deferreds returned by startService(). Here we
         # return a Deferred anyway so that direct callers (esp. those from
@@ -217,6 +304,11 @@ class IPCMasterService(service.Service, object):
     def stopService(self):
         """Stop listening."""
         self.starting.cancel()
+        if self.postgresListener is not None:
+            self.postgresListener.events.connected.unregisterHandler(
+                self._forwardConnected)
+            self.postgresListener.events.disconnected.unregisterHandler(
+                self._forwardDisconnected)
         if self.port:
             self.port, port = None, self.port
             yield port.stopListening()
@@ -296,6 +388,8 @@ class IPCMasterService(service.Service, object):
     @asynchronous
     def unregisterWorker(self, conn, reason):
         """Unregister the worker with `pid` because of `reason`."""
+        for channel in list(self.channels):
+            self.unregisterWorkerChannel(conn, channel)
         pid = self.getPIDFromConnection(conn)
         if pid:
 
@@ -319,6 +413,73 @@ class IPCMasterService(service.Service, object):
             d.addCallback(log_disconnected)
             return d
 
+    def registerWorkerChannel(self, conn, channel):
+        """Forward notifications for `channel` to the worker on `conn`.
+
+        The master's listener only listens once for each channel, however
+        many workers want it.
+        """
+        if self.postgresListener is None:
+            raise PostgresListenerRegistrationError(
+                "No database listener to forward '%s' from." % channel)
+        workers = self.channels[channel]
+        if len(workers) == 0:
+            forwarder = partial(self._forwardNotify, channel)
+            self.postgresListener.register(channel, forwarder)
+            self.forwarders[channel] = forwarder
+        workers.add(conn)
+
+    def unregisterWorkerChannel(self, conn, channel):
+        """Stop forwarding notifications for `channel` to `conn`."""
+        workers = self.channels.get(channel)
+        if workers is None or conn not in workers:
+            return
+        workers.discard(conn)
+        if len(workers) == 0:
+            del self.channels[channel]
+            forwarder = self.forwarders.pop(channel)
+            try:
+                self.postgresListener.unregister(channel, forwarder)
+            except PostgresListenerUnregistrationError:
+                # Already gone, e.g. if the listener dropped a system
+                # channel that it had no handler for.
+                pass
+
+    def _forwardNotify(self, channel, action, payload):
+        """Forward a notification on `channel` to the registered workers.
+
+        For system channels `PostgresListenerService` calls this with the
+        channel name in place of `action`; that is not forwarded.
+        """
+        if self.postgresListener.isSystemChannel(channel):
+            action = None
+        for conn in list(self.channels.get(channel, ())):
+            try:
+                conn.callRemote(
+                    ListenerNotify, channel=channel, action=action,
+                    payload=payload)
+            except Exception:
+                log.err(
+                    None, "Failed to forward notification for %s to "
+                    "worker." % channel)
+
+    def _forwardConnected(self):
+        """Tell every worker that the database listener has connected."""
+        self._forwardListenerEvent("connected")
+
+    def _forwardDisconnected(self, reason):
+        """Tell every worker that the database listener has disconnected."""
+        self._forwardListenerEvent("disconnected")
+
+    def _forwardListenerEvent(self, event):
+        for data in list(self.connections.values()):
+            try:
+                data['connection'].callRemote(ListenerEvent, event=event)
+            except Exception:
+                log.err(
+                    None, "Failed to forward database listener %s event "
+                    "to worker." % event)
+
     def _getListenAddresses(self, port):
         """Return list of tuple (address, port) for the addresses the worker
         is listening on."""
@@ -605,6 +766,22 @@ class IPCMasterService(service.Service, object):
 class IPCWorker(RPCProtocol):
     """The IPC client side of the protocol."""
 
+    @ListenerNotify.responder
+    def listener_notify(self, channel, action=None, payload=""):
+        """Master forwarded a database notification."""
+        listener = self.service.listener
+        if listener is not None:
+            listener.notify(channel, action, payload)
+        return {}
+
+    @ListenerEvent.responder
+    def listener_event(self, event):
+        """Master's database listener connected or disconnected."""
+        listener = self.service.listener
+        if listener is not None:
+            listener.listenerEvent(event)
+        return {}
+
     def connectionMade(self):
         super(IPCWorker, self).connectionMade()
 
@@ -637,6 +814,7 @@ class IPCWorkerService(service.Service, object):
         self._protocol = None
         self.protocol = DeferredValue()
         self.processId = DeferredValue()
+        self.listener = None
 
     @asynchronous
     def startService(self):
@@ -703,3 +881,132 @@ class IPCWorkerService(service.Service, object):
             lambda protocol: protocol.callRemote(
                 RPCUnregisterConnection, pid=os.getpid(), connid=connid))
         return d
+
+
+class IPCWorkerListenerService(service.Service, object):
+    """Receive database notifications from the master process.
+
+    This stands in for `PostgresListenerService` in worker processes. Instead
+    of opening its own LISTEN connection to the database, it asks the master
+    process to forward the notifications for each channel that has handlers
+    registered here.
+    """
+
+    def __init__(self, ipcWorker):
+        super(IPCWorkerListenerService, self).__init__()
+        self.ipcWorker = ipcWorker
+        self.listeners = defaultdict(list)
+        self.events = EventGroup("connected", "disconnected")
+        self._protocol = None
+
+    @asynchronous
+    def startService(self):
+        """Register the current channels with the master."""
+        super(IPCWorkerListenerService, self).startService()
+        self.ipcWorker.listener = self
+
+        def register_channels(protocol):
+            self._protocol = protocol
+            return DeferredList([
+                self._registerChannel(channel)
+                for channel in list(self.listeners)
+            ], fireOnOneErrback=True, consumeErrors=True)
+
+        def log_failure(failure):
+            if failure.check(CancelledError):
+                log.msg("IPCWorkerListenerService start-up cancelled.")
+            else:
+                log.err(failure, "IPCWorkerListenerService start-up failed.")
+
+        self.starting = self.ipcWorker.protocol.get()
+        self.starting.addCallback(register_channels)
+        self.starting.addCallback(lambda _: self.events.connected.fire())
+        self.starting.addErrback(log_failure)
+        return self.starting
+
+    @asynchronous
+    def stopService(self):
+        """Stop receiving notifications."""
+        self.starting.cancel()
+        self.ipcWorker.listener = None
+        if self._protocol is not None:
+            self._protocol = None
+            self.events.disconnected.fire(None)
+        return super(IPCWorkerListenerService, self).stopService()
+
+    def isSystemChannel(self, channel):
+        """Return True if channel is a system channel."""
+        return channel.startswith("sys_")
+
+    def listenerEvent(self, event):
+        """Fire `event` as forwarded from the master's database listener.
+
+        The master's listener registers all channels again when it
+        reconnects, so handlers here only need to resynchronise.
+        """
+        if event == "connected":
+            self.events.connected.fire()
+        elif event == "disconnected":
+            self.events.disconnected.fire(None)
+
+    def _registerChannel(self, channel):
+        return self._protocol.callRemote(ListenerRegister, channel=channel)
+
+    def _unregisterChannel(self, channel):
+        return self._protocol.callRemote(ListenerUnregister, channel=channel)
+
+    @asynchronous(timeout=FOREVER)
+    def register(self, channel, handler):
+        """Register listening for notifications from a channel.
+
+        This has the same semantics as `PostgresListenerService.register`.
+        """
+        handlers = self.listeners[channel]
+        if self.isSystemChannel(channel) and len(handlers) > 0:
+            raise PostgresListenerRegistrationError(
+                "System channel '%s' has already been registered." % channel)
+        handlers.append(handler)
+        if self._protocol is not None and len(handlers) == 1:
+            self._registerChannel(channel).addErrback(
+                log.err, "Failed to register channel %s with the master "
+                "process." % channel)
+
+    @asynchronous(timeout=FOREVER)
+    def unregister(self, channel, handler):
+        """Unregister listening for notifications from a channel.
+
+        This has the same semantics as `PostgresListenerService.unregister`.
+        """
+        if channel not in self.listeners:
+            raise PostgresListenerUnregistrationError(
+                "Channel '%s' is not registered with the listener." % channel)
+        handlers = self.listeners[channel]
+        if handler in handlers:
+            handlers.remove(handler)
+        else:
+            raise PostgresListenerUnregistrationError(
+                "Handler is not registered on that channel '%s'." % channel)
+        if len(handlers) == 0:
+            del self.listeners[channel]
+            if self._protocol is not None:
+                self._unregisterChannel(channel).addErrback(
+                    log.err, "Failed to unregister channel %s with the "
+                    "master process." % channel)
+
+    def notify(self, channel, action, payload):
+        """Dispatch a notification forwarded by the master process.
+
+        System channel handlers are called with the channel name and payload;
+        only the first handler is called, as only one can be registered.
+        Other handlers are called with the action and payload.
+        """
+        handlers = list(self.listeners.get(channel, ()))
+        if self.isSystemChannel(channel):
+            if len(handlers) > 0:
+                handlers[0](channel, payload)
+        else:
+            for handler in handlers:
+                d = maybeDeferred(handler, action, payload)
+                d.addErrback(
+                    log.err, "Failure while handling notification to "
+                    "%r: %r" % (channel, payload))
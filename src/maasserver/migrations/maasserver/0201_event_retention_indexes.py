@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import (
+    migrations,
+    models,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0200_interface_sriov_max_vf'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(
+                fields=['type', '-id'], name='maasserver__type_id_e99486_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(
+                fields=['created'], name='maasserver__created_fd4edc_idx'),
+        ),
+    ]
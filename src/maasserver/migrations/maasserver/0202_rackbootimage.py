@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import (
+    migrations,
+    models,
+)
+import django.db.models.deletion
+import maasserver.models.cleansave
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0201_event_retention_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RackBootImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False)),
+                ('updated', models.DateTimeField(editable=False)),
+                ('osystem', models.CharField(max_length=255)),
+                ('architecture', models.CharField(max_length=255)),
+                ('subarchitecture', models.CharField(max_length=255)),
+                ('release', models.CharField(max_length=255)),
+                ('label', models.CharField(max_length=255)),
+                ('purpose', models.CharField(max_length=255)),
+                ('xinstall_type', models.CharField(blank=True, max_length=255)),
+                ('xinstall_path', models.CharField(blank=True, max_length=255)),
+                ('node', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='maasserver.Node')),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=(maasserver.models.cleansave.CleanSave, models.Model, object),
+        ),
+        migrations.AddIndex(
+            model_name='rackbootimage',
+            index=models.Index(fields=['osystem', 'release', 'architecture'], name='maasserver__osystem_60868f_idx'),
+        ),
+    ]
@@ -59,6 +59,7 @@ __all__ = [
     'Pod',
     'PodHints',
     'PodStoragePool',
+    'RackBootImage',
     'RackController',
     'RAID',
     "RBACLastSync",
@@ -171,6 +172,7 @@ from maasserver.models.partitiontable import PartitionTable
 from maasserver.models.physicalblockdevice import PhysicalBlockDevice
 from maasserver.models.podhints import PodHints
 from maasserver.models.podstoragepool import PodStoragePool
+from maasserver.models.rackbootimage import RackBootImage
 from maasserver.models.rbacsync import (
     RBACLastSync,
     RBACSync,
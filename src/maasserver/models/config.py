@@ -115,6 +115,11 @@ def get_default_config():
         'max_node_commissioning_results': 10,
         'max_node_testing_results': 10,
         'max_node_installation_results': 3,
+        # Event retention.
+        'event_retention_days': 90,
+        'debug_event_retention_days': 30,
+        'audit_event_retention_days': 0,
+        'event_retention_count': 0,
         # Notifications.
         'subnet_ip_exhaustion_threshold_count': 16,
         # Authentication.
@@ -132,6 +137,7 @@ def get_default_config():
         'prometheus_enabled': False,
         'prometheus_push_gateway': None,
         'prometheus_push_interval': 60,
+        'prometheus_subnet_stats_ttl': 60,
         # Enlistment options
         'enlist_commissioning': True,
         # VMware vCenter crednetials
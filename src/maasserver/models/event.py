@@ -9,6 +9,7 @@ __all__ = [
 
 import logging
 
+from django.db import connection
 from django.db.models import (
     CharField,
     DO_NOTHING,
@@ -38,6 +39,29 @@ from provisioningserver.utils.env import get_maas_id
 maaslog = get_maas_logger('models.event')
 
 
+# Delete a batch of events that are past their retention period. An event is
+# kept while it is the most recent status event of its node -- the newest
+# event at INFO or above, as found by `Node.status_event` -- so that expiring
+# events does not blank out the status message of a quiet node.
+EXPIRED_EVENTS_SQL = """\
+DELETE FROM maasserver_event WHERE id IN (
+    SELECT event.id FROM maasserver_event AS event
+    JOIN maasserver_eventtype AS event_type ON event_type.id = event.type_id
+    WHERE event.type_id = ANY(%(type_ids)s)
+      AND {conditions}
+      AND (event.node_id IS NULL
+           OR event_type.level < %(status_level)s
+           OR EXISTS (
+               SELECT 1 FROM maasserver_event AS newer
+               JOIN maasserver_eventtype AS newer_type
+                 ON newer_type.id = newer.type_id
+               WHERE newer.node_id = event.node_id
+                 AND newer.id > event.id
+                 AND newer_type.level >= %(status_level)s))
+    LIMIT %(limit)s)
+"""
+
+
 class EventManager(Manager):
     """A utility to manage the collection of Events."""
 
@@ -91,6 +115,41 @@ class EventManager(Manager):
             system_id=get_maas_id(), event_type=event_type,
             event_description=event_description, user=user)
 
+    def get_retention_max_id(self, type_ids, count):
+        """Return the ID of the newest event beyond the `count` newest events.
+
+        Only events with one of `type_ids` are considered. Returns `None` if
+        there are no more than `count` such events.
+        """
+        ids = self.filter(type_id__in=type_ids).order_by('-id')
+        ids = ids.values_list('id', flat=True)[count:count + 1]
+        return next(iter(ids), None)
+
+    def delete_expired(self, type_ids, cutoff=None, max_id=None, limit=1000):
+        """Delete a batch of events that are past their retention period.
+
+        Events with one of `type_ids` that were created before `cutoff`, or
+        that have an ID no greater than `max_id`, are deleted; at most `limit`
+        of them at a time, so that callers can delete many events in short
+        transactions. The most recent status event of each node is kept.
+
+        :return: The number of events deleted.
+        """
+        conditions = []
+        if cutoff is not None:
+            conditions.append("event.created < %(cutoff)s")
+        if max_id is not None:
+            conditions.append("event.id <= %(max_id)s")
+        if len(conditions) == 0:
+            raise ValueError("Specify a cutoff, a maximum ID, or both.")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                EXPIRED_EVENTS_SQL.format(conditions=" AND ".join(conditions)),
+                {"type_ids": list(type_ids), "cutoff": cutoff,
+                 "max_id": max_id, "status_level": logging.INFO,
+                 "limit": limit})
+            return cursor.rowcount
+
 
 class Event(CleanSave, TimestampedModel):
     """An `Event` represents a MAAS event.
@@ -151,6 +210,11 @@ class Event(CleanSave, TimestampedModel):
             # Needed to get the latest event for each node on the
             # machine listing page.
             Index(fields=['node', '-created', '-id']),
+            # Needed to list AUDIT events, newest first, and other events
+            # by level when they are not limited to a few nodes.
+            Index(fields=['type', '-id']),
+            # Needed to find events that are past their retention period.
+            Index(fields=['created']),
         ]
 
     @property
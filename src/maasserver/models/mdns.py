@@ -8,17 +8,27 @@ __all__ = [
 ]
 
 
+from collections import (
+    Counter,
+    defaultdict,
+)
+
 from django.db.models import (
     CASCADE,
     CharField,
+    F,
     ForeignKey,
     IntegerField,
     Manager,
+    Q,
 )
 from maasserver import DefaultMeta
 from maasserver.fields import MAASIPAddressField
 from maasserver.models.cleansave import CleanSave
-from maasserver.models.timestampedmodel import TimestampedModel
+from maasserver.models.timestampedmodel import (
+    now,
+    TimestampedModel,
+)
 from maasserver.utils.orm import (
     get_one,
     UniqueViolation,
@@ -84,6 +94,109 @@ class MDNSManager(Manager):
         # a UniqueViolation so this operation can be retried.
         return get_one(query, exception_class=UniqueViolation)
 
+    def update_entries(self, interfaces, entries):
+        """Update the mDNS entries with many observations at once.
+
+        This has the same effect as calling `Interface.update_mdns_entry` for
+        each entry in turn, but the existing entries are fetched in one query
+        and the changes written with bulk statements.
+
+        :param interfaces: A dict mapping interface names to `Interface`s.
+        :param entries: A list of mDNS entry dicts, as resolved by the
+            controller on the named interface.
+        :return: A `Counter` of the entries created, updated, and deleted.
+        """
+        observations = []
+        for entry in entries:
+            interface = interfaces.get(entry['interface'])
+            if interface is None or interface.mdns_discovery_state is False:
+                continue
+            observations.append((
+                interface, str(IPAddress(entry['address'])),
+                entry['hostname']))
+        counts = Counter()
+        if len(observations) == 0:
+            return counts
+
+        # Index the existing entries by interface, then (IP, hostname).
+        bindings = defaultdict(dict)
+        existing = self.filter(
+            interface__in={interface.id for interface, _, _ in observations})
+        existing = existing.filter(
+            Q(ip__in={ip for _, ip, _ in observations}) |
+            Q(hostname__in={hostname for _, _, hostname in observations}))
+        for binding in existing:
+            bindings[binding.interface_id][binding.ip, binding.hostname] = (
+                binding)
+
+        deleted, seen, created = set(), Counter(), {}
+
+        def delete(entries, key):
+            binding = entries.pop(key)
+            if binding.id is None:
+                del created[id(binding)]
+            else:
+                deleted.add(binding.id)
+                seen.pop(binding.id, None)
+
+        for interface, ip, hostname in observations:
+            entries = bindings[interface.id]
+            replaced = False
+            version = IPAddress(ip).version
+            for other_ip, other_hostname in list(entries):
+                if other_hostname == hostname and other_ip != ip:
+                    # Don't move hostnames between address families.
+                    if IPAddress(other_ip).version == version:
+                        maaslog.info(
+                            "%s: Hostname '%s' moved from %s to %s." % (
+                                interface.get_log_string(), hostname,
+                                other_ip, ip))
+                        delete(entries, (other_ip, other_hostname))
+                        replaced = True
+            for other_ip, other_hostname in list(entries):
+                if other_ip == ip and other_hostname != hostname:
+                    maaslog.info(
+                        "%s: Hostname for %s updated from '%s' to '%s'." % (
+                            interface.get_log_string(), ip, other_hostname,
+                            hostname))
+                    delete(entries, (other_ip, other_hostname))
+                    replaced = True
+            binding = entries.get((ip, hostname))
+            if binding is None:
+                binding = entries[ip, hostname] = self.model(
+                    interface=interface, ip=ip, hostname=hostname)
+                created[id(binding)] = binding
+                # If we deleted a previous mDNS entry, then we have already
+                # generated a log statement about this mDNS entry.
+                if not replaced:
+                    maaslog.info(
+                        "%s: New mDNS entry resolved: '%s' on %s." % (
+                            interface.get_log_string(), hostname, ip))
+            elif binding.id is None:
+                binding.count += 1
+            else:
+                seen[binding.id] += 1
+
+        if len(deleted) != 0:
+            self.filter(id__in=deleted).delete()
+        # Entries seen again are updated together when they were seen the
+        # same number of times, which is usual.
+        updates = defaultdict(list)
+        for binding_id, sightings in seen.items():
+            updates[sightings].append(binding_id)
+        updated = now()
+        for sightings, ids in updates.items():
+            self.filter(id__in=ids).update(
+                count=F('count') + sightings, updated=updated)
+        if len(created) != 0:
+            for binding in created.values():
+                binding.created = binding.updated = updated
+            self.bulk_create(list(created.values()))
+        counts['created'] = len(created)
+        counts['updated'] = len(seen)
+        counts['deleted'] = len(deleted)
+        return counts
+
 
 class MDNS(CleanSave, TimestampedModel):
     """Represents data gathered from mDNS-browse for a particular IP address.
@@ -7,8 +7,14 @@ __all__ = [
     'Neighbour',
 ]
 
+from collections import (
+    Counter,
+    defaultdict,
+)
+
 from django.db.models import (
     CASCADE,
+    F,
     ForeignKey,
     IntegerField,
     Manager,
@@ -21,12 +27,20 @@ from maasserver.fields import (
 )
 from maasserver.models.cleansave import CleanSave
 from maasserver.models.interface import Interface
-from maasserver.models.timestampedmodel import TimestampedModel
+from maasserver.models.timestampedmodel import (
+    now,
+    TimestampedModel,
+)
 from maasserver.utils.orm import (
     get_one,
     MAASQueriesMixin,
     UniqueViolation,
 )
+from netaddr import (
+    EUI,
+    IPAddress,
+    mac_unix_expanded,
+)
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.utils.network import get_mac_organization
 
@@ -132,6 +146,103 @@ class NeighbourManager(Manager, NeighbourQueriesMixin):
         # a UniqueViolation so this operation can be retried.
         return get_one(query, exception_class=UniqueViolation)
 
+    def update_neighbours(self, interfaces, neighbours):
+        """Update the neighbour table with many observations at once.
+
+        This has the same effect as calling `Interface.update_neighbour` for
+        each observation in turn, but the existing bindings are fetched in
+        one query and the changes written with bulk statements.
+
+        :param interfaces: A dict mapping interface names to `Interface`s.
+        :param neighbours: A list of neighbour dicts, as observed by the
+            controller's ARP monitoring on the named interface.
+        :return: A `Counter` of the neighbours created, updated, and deleted.
+        """
+        observations = []
+        for neighbour in neighbours:
+            interface = interfaces.get(neighbour['interface'])
+            if interface is None:
+                continue
+            elif interface.neighbour_discovery_state is False:
+                continue
+            observations.append((
+                interface, str(IPAddress(neighbour['ip'])),
+                str(EUI(neighbour['mac'], dialect=mac_unix_expanded)),
+                neighbour['time'], neighbour.get('vid', None)))
+        counts = Counter()
+        if len(observations) == 0:
+            return counts
+
+        # Index the existing bindings by (interface, IP, VID), then MAC. The
+        # existing bindings are needed anyway to delete those for a MAC that
+        # the IP address moved from. An INSERT ... ON CONFLICT on the
+        # `unique_together` columns would not help here: the VID is NULL for
+        # untagged neighbours, and NULLs never conflict. A binding created
+        # concurrently makes `bulk_create` fail with a unique violation
+        # instead, and the transaction is retried.
+        bindings = defaultdict(dict)
+        existing = self.filter(
+            interface__in={interface.id for interface, *_ in observations},
+            ip__in={ip for _, ip, *_ in observations})
+        for binding in existing:
+            key = (binding.interface_id, binding.ip, binding.vid)
+            bindings[key][str(binding.mac_address)] = binding
+
+        deleted, seen, created = set(), defaultdict(int), {}
+        for interface, ip, mac, time, vid in observations:
+            macs = bindings[interface.id, ip, vid]
+            moved = False
+            for other_mac in [other for other in macs if other != mac]:
+                maaslog.info("%s: IP address %s%s moved from %s to %s" % (
+                    interface.get_log_string(), ip,
+                    self.get_vid_log_snippet(vid), other_mac, mac))
+                binding = macs.pop(other_mac)
+                if binding.id is None:
+                    del created[id(binding)]
+                else:
+                    deleted.add(binding.id)
+                    seen.pop(binding, None)
+                moved = True
+            binding = macs.get(mac)
+            if binding is None:
+                binding = macs[mac] = self.model(
+                    interface=interface, ip=ip, vid=vid, mac_address=mac,
+                    time=time)
+                created[id(binding)] = binding
+                # If we deleted a previous neighbour, then we have already
+                # generated a log statement about this neighbour.
+                if not moved:
+                    maaslog.info(
+                        "%s: New MAC, IP binding observed%s: %s, %s" % (
+                            interface.get_log_string(),
+                            self.get_vid_log_snippet(vid), mac, ip))
+            elif binding.id is None:
+                binding.time = time
+                binding.count += 1
+            else:
+                binding.time = time
+                seen[binding] += 1
+
+        if len(deleted) != 0:
+            self.filter(id__in=deleted).delete()
+        # Bindings seen again are updated together when they share the same
+        # observation time and number of sightings, which is usual.
+        updates = defaultdict(list)
+        for binding, sightings in seen.items():
+            updates[binding.time, sightings].append(binding.id)
+        updated = now()
+        for (time, sightings), ids in updates.items():
+            self.filter(id__in=ids).update(
+                time=time, count=F('count') + sightings, updated=updated)
+        if len(created) != 0:
+            for binding in created.values():
+                binding.created = binding.updated = updated
+            self.bulk_create(list(created.values()))
+        counts['created'] = len(created)
+        counts['updated'] = len(seen)
+        counts['deleted'] = len(deleted)
+        return counts
+
     def get_by_updated_with_related_nodes(self):
         """Returns a `QuerySet` of neighbours, while also selecting related
         interfaces and nodes.
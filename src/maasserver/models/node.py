@@ -208,6 +208,7 @@ from provisioningserver.logger import (
     get_maas_logger,
     LegacyLogger,
 )
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
 from provisioningserver.refresh import (
     get_sys_info,
     refresh,
@@ -5901,16 +5902,25 @@ class Controller(Node):
             Neighbour data is gathered directly from the ARP monitoring process
             running on each rack interface.
         """
+        # Circular imports
+        from maasserver.models.neighbour import Neighbour
         # Determine which interfaces' neighbours need updating.
         interface_set = {neighbour['interface'] for neighbour in neighbours}
         interfaces = Interface.objects.get_interface_dict_for_node(
             self, names=interface_set, fetch_fabric_vlan=True)
+        counts = Neighbour.objects.update_neighbours(interfaces, neighbours)
+        for action, total in counts.items():
+            PROMETHEUS_METRICS.update(
+                'maas_neighbour_bindings', 'inc', value=total,
+                labels={'action': action})
+        # Each VID only needs reporting once per interface.
+        vids = set()
         for neighbour in neighbours:
             interface = interfaces.get(neighbour['interface'], None)
-            if interface is not None:
-                interface.update_neighbour(neighbour)
-                vid = neighbour.get("vid", None)
-                if vid is not None:
+            vid = neighbour.get("vid", None)
+            if interface is not None and vid is not None:
+                if (interface.id, vid) not in vids:
+                    vids.add((interface.id, vid))
                     interface.report_vid(vid)
 
     def report_mdns_entries(self, entries):
@@ -5920,14 +5930,17 @@ class Controller(Node):
             entries. mDNS data is gathered from an `avahi-browse` process
             running on each rack interface.
         """
+        # Circular imports
+        from maasserver.models.mdns import MDNS
         # Determine which interfaces' entries need updating.
         interface_set = {entry['interface'] for entry in entries}
         interfaces = Interface.objects.get_interface_dict_for_node(
             self, names=interface_set)
-        for entry in entries:
-            interface = interfaces.get(entry['interface'], None)
-            if interface is not None:
-                interface.update_mdns_entry(entry)
+        counts = MDNS.objects.update_entries(interfaces, entries)
+        for action, total in counts.items():
+            PROMETHEUS_METRICS.update(
+                'maas_mdns_bindings', 'inc', value=total,
+                labels={'action': action})
 
     def get_discovery_state(self):
         """Returns the interface monitoring state for this Controller.
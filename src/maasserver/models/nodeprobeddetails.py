@@ -12,10 +12,10 @@ __all__ = [
     "get_single_probed_details",
     "script_output_nsmap",
 ]
-import base64
 
 from django.db import connection
 from metadataserver.enum import SCRIPT_STATUS
+from metadataserver.fields import CompressedBinaryField
 from provisioningserver.refresh.node_info_scripts import (
     LLDP_OUTPUT_NAME,
     LSHW_OUTPUT_NAME,
@@ -90,9 +90,9 @@ def get_probed_details(nodes):
             tuple(node_ids), SCRIPT_STATUS.PASSED,
             tuple(script_output_nsmap)
         ])
+        stdout_field = CompressedBinaryField()
         for node_id, script_name, stdout in cursor.fetchall():
             system_id = node_ids[node_id].system_id
             namespace = script_output_nsmap[script_name]
-            stdout_decoded = base64.b64decode(stdout)
-            ret[system_id][namespace] = stdout_decoded
+            ret[system_id][namespace] = stdout_field.to_python(stdout)
     return ret
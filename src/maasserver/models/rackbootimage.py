@@ -0,0 +1,125 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Boot images reported by rack controllers."""
+
+__all__ = [
+    'RackBootImage',
+    ]
+
+from django.db.models import (
+    CASCADE,
+    CharField,
+    ForeignKey,
+    Index,
+    Manager,
+)
+from maasserver import DefaultMeta
+from maasserver.models.cleansave import CleanSave
+from maasserver.models.nodemetadata import NodeMetadata
+from maasserver.models.timestampedmodel import (
+    now,
+    TimestampedModel,
+)
+
+# The NodeMetadata key under which the hash of the boot images that a rack
+# controller last reported is recorded.
+BOOT_IMAGES_HASH_KEY = 'boot_images_hash'
+
+# The fields of each image, as in a `ListBootImagesV2` response.
+IMAGE_FIELDS = (
+    'osystem',
+    'architecture',
+    'subarchitecture',
+    'release',
+    'label',
+    'purpose',
+    'xinstall_type',
+    'xinstall_path',
+)
+
+
+class RackBootImageManager(Manager):
+    """Manager for `RackBootImage` class."""
+
+    def get_reported_images(self, system_ids):
+        """Return the boot images reported by the given rack controllers.
+
+        :param system_ids: The system IDs of the rack controllers.
+        :return: A dict mapping the system ID of each rack controller that
+            has reported its boot images to a list of those images, in the
+            same form as a `ListBootImagesV2` response. Rack controllers that
+            have not reported their boot images are left out.
+        """
+        reported = {
+            system_id: []
+            for system_id in NodeMetadata.objects.filter(
+                node__system_id__in=system_ids,
+                key=BOOT_IMAGES_HASH_KEY).values_list(
+                    'node__system_id', flat=True)
+        }
+        if len(reported) != 0:
+            images = self.filter(
+                node__system_id__in=reported.keys()).order_by('id')
+            for values in images.values_list('node__system_id', *IMAGE_FIELDS):
+                reported[values[0]].append(dict(zip(IMAGE_FIELDS, values[1:])))
+        return reported
+
+    def has_reported(self, node, images_hash):
+        """Return whether `node` has reported the images in `images_hash`."""
+        return NodeMetadata.objects.filter(
+            node=node, key=BOOT_IMAGES_HASH_KEY, value=images_hash).exists()
+
+    def update_for(self, node, images_hash, images):
+        """Replace the boot images reported by `node`.
+
+        :param images_hash: The hash of `images`, as calculated by the rack
+            controller.
+        :param images: A list of images, in the same form as a
+            `ListBootImagesV2` response.
+        """
+        self.filter(node=node).delete()
+        created = now()
+        self.bulk_create(
+            RackBootImage(
+                node=node, created=created, updated=created, **{
+                    field: image[field] for field in IMAGE_FIELDS})
+            for image in images)
+        NodeMetadata.objects.update_or_create(
+            node=node, key=BOOT_IMAGES_HASH_KEY,
+            defaults={'value': images_hash})
+
+
+class RackBootImage(CleanSave, TimestampedModel):
+    """A boot image that a rack controller has reported it has."""
+
+    class Meta(DefaultMeta):
+        """Needed for South to recognize this model."""
+        indexes = [
+            Index(fields=['osystem', 'release', 'architecture']),
+        ]
+
+    objects = RackBootImageManager()
+
+    node = ForeignKey('Node', null=False, editable=False, on_delete=CASCADE)
+
+    osystem = CharField(max_length=255, blank=False)
+
+    architecture = CharField(max_length=255, blank=False)
+
+    subarchitecture = CharField(max_length=255, blank=False)
+
+    release = CharField(max_length=255, blank=False)
+
+    label = CharField(max_length=255, blank=False)
+
+    purpose = CharField(max_length=255, blank=False)
+
+    xinstall_type = CharField(max_length=255, blank=True)
+
+    xinstall_path = CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return "%s/%s/%s/%s" % (
+            self.osystem, self.architecture, self.subarchitecture,
+            self.release)
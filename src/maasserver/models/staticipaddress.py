@@ -132,6 +132,10 @@ def convert_leases_to_dict(leases):
 class StaticIPAddressManager(Manager):
     """A utility to manage collections of IPAddresses."""
 
+    # How many free addresses `allocate_new` will try within one transaction
+    # before requesting a retry with the `address_allocation` lock.
+    FREE_ADDRESS_ATTEMPTS = 5
+
     def _verify_alloc_type(self, alloc_type, user=None):
         """Check validity of an `alloc_type` parameter when allocating.
 
@@ -204,12 +208,9 @@ class StaticIPAddressManager(Manager):
         """Attempt to allocate `requested_address`, which is known to be free.
 
         It is known to be free *in this transaction*, so this could still
-        fail. If it does fail because of a `UNIQUE_VIOLATION` it will request
-        a retry, except while holding an addition lock. This is not perfect:
-        other threads could jump in before acquiring the lock and steal an
-        apparently free address. However, in stampede situations this appears
-        to be effective enough. Experiment by increasing the `count` parameter
-        in `test_allocate_new_works_under_extreme_concurrency`.
+        fail because another transaction has just taken it. If it does fail
+        because of a `UNIQUE_VIOLATION` this returns `None` so that the caller
+        can try another address; see `allocate_new`.
 
         This method shares a lot in common with `_attempt_allocation` so check
         out its documentation for more details.
@@ -218,8 +219,8 @@ class StaticIPAddressManager(Manager):
         :typr requested_address: IPAddress
         :param alloc_type: Allocation type.
         :param user: Optional user.
-        :return: `StaticIPAddress` if successful.
-        :raise RetryTransaction: if the address was already taken.
+        :return: `StaticIPAddress` if successful, or `None` if the address
+            was already taken.
         """
         ipaddress = StaticIPAddress(alloc_type=alloc_type, subnet=subnet)
         try:
@@ -231,12 +232,9 @@ class StaticIPAddressManager(Manager):
                 ipaddress.save()
         except IntegrityError as error:
             if orm.is_unique_violation(error):
-                # The address is taken. We could allow the transaction retry
-                # machinery to take care of this, but instead we'll ask it to
-                # retry with the `address_allocation` lock. We can't take it
-                # here because we're already in a transaction; we need to exit
-                # the transaction, take the lock, and only then try again.
-                orm.request_transaction_retry(locks.address_allocation)
+                # The address is taken. The savepoint has been rolled back so
+                # this transaction can carry on and try another address.
+                return None
             else:
                 raise
         else:
@@ -248,6 +246,33 @@ class StaticIPAddressManager(Manager):
             ipaddress.save()
             return ipaddress
 
+    def _allocate_free_address(
+            self, subnet, alloc_type, user=None, exclude_addresses=None):
+        """Allocate the next free address in `subnet`.
+
+        Concurrent allocations in the same subnet all start by picking the
+        same address, and all but one will find it taken when they try to
+        save it. Rather than retry the whole transaction straight away, the
+        taken address is excluded and the next free address is tried, up to
+        `FREE_ADDRESS_ATTEMPTS` times. Only then is a retry requested, with
+        the `address_allocation` lock held. We can't take the lock here
+        because we're already in a transaction; we need to exit the
+        transaction, take the lock, and only then try again.
+
+        :raise RetryTransaction: if every address tried was already taken.
+        """
+        exclude_addresses = (
+            [] if exclude_addresses is None else list(exclude_addresses))
+        for _ in range(self.FREE_ADDRESS_ATTEMPTS):
+            requested_address = subnet.get_next_ip_for_allocation(
+                exclude_addresses=exclude_addresses)
+            ipaddress = self._attempt_allocation_of_free_address(
+                requested_address, alloc_type, user=user, subnet=subnet)
+            if ipaddress is not None:
+                return ipaddress
+            exclude_addresses.append(requested_address)
+        orm.request_transaction_retry(locks.address_allocation)
+
     def allocate_new(
             self, subnet=None, alloc_type=IPADDRESS_TYPE.AUTO, user=None,
             requested_address=None, exclude_addresses=None):
@@ -280,10 +305,9 @@ class StaticIPAddressManager(Manager):
                     "Could not find an appropriate subnet.")
 
         if requested_address is None:
-            requested_address = subnet.get_next_ip_for_allocation(
+            return self._allocate_free_address(
+                subnet, alloc_type, user=user,
                 exclude_addresses=exclude_addresses)
-            return self._attempt_allocation_of_free_address(
-                requested_address, alloc_type, user=user, subnet=subnet)
         else:
             requested_address = IPAddress(requested_address)
             # Circular imports.
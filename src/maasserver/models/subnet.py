@@ -6,9 +6,11 @@
 __all__ = [
     'create_cidr',
     'get_allocated_ips',
+    'split_ipranges_at_boundaries',
     'Subnet',
 ]
 
+from bisect import bisect_right
 from operator import attrgetter
 from typing import (
     Iterable,
@@ -21,6 +23,7 @@ from django.core.exceptions import (
     ValidationError,
 )
 from django.core.validators import RegexValidator
+from django.db import connection
 from django.db.models import (
     BooleanField,
     CharField,
@@ -78,6 +81,67 @@ SUBNET_NAME_VALIDATOR = RegexValidator(r'^[.: \w/-]+$')
 # Typing for list of IP addresses to exclude.
 IPAddressExcludeList = Optional[Iterable[MaybeIPAddress]]
 
+# Groups the addresses allocated in a subnet into runs of consecutive
+# addresses, returning the first and last address of each run. A run starts
+# wherever an address does not directly follow the previous one; a running
+# count of those starts numbers the runs. Comparing with the previous address
+# (rather than subtracting a row number) cannot overflow at either end of the
+# address space.
+ALLOCATED_IP_RUNS_SQL = """
+    SELECT host(min(ip)), host(max(ip))
+    FROM (
+        SELECT ip, sum(run_start) OVER (ORDER BY ip) AS run
+        FROM (
+            SELECT
+                ip,
+                CASE WHEN lag(ip) OVER (ORDER BY ip) + 1 = ip
+                    THEN 0 ELSE 1 END AS run_start
+            FROM (
+                SELECT DISTINCT ip
+                FROM maasserver_staticipaddress
+                WHERE
+                    subnet_id = %s
+                    AND ip IS NOT NULL
+                    AND ip <<= %s
+                    AND NOT (alloc_type = ANY(%s))
+            ) AS allocated
+        ) AS starts
+    ) AS runs
+    GROUP BY run
+    ORDER BY min(ip)
+    """
+
+
+def split_ipranges_at_boundaries(ranges, others):
+    """Split each of `ranges` wherever one of `others` starts or ends.
+
+    A `MAASIPSet` merges overlapping ranges into one carrying all of their
+    purposes. Splitting runs of allocated addresses this way means only the
+    part of a run within, say, a dynamic range is merged with it, just as if
+    each allocated address were a range of its own.
+
+    :param ranges: An iterable of `MAASIPRange`.
+    :param others: An iterable of `MAASIPRange`.
+    :return: A set of `MAASIPRange`.
+    """
+    boundaries = sorted(
+        {other.first for other in others} |
+        {other.last + 1 for other in others})
+    pieces = set()
+    for item in ranges:
+        first = item.first
+        for boundary in boundaries[bisect_right(boundaries, first):]:
+            if boundary > item.last:
+                break
+            pieces.add(make_iprange(
+                IPAddress(first, item.version),
+                IPAddress(boundary - 1, item.version), set(item.purpose)))
+            first = boundary
+        pieces.add(make_iprange(
+            IPAddress(first, item.version),
+            IPAddress(item.last, item.version), set(item.purpose)))
+    return pieces
+
 
 def get_default_vlan():
     from maasserver.models.vlan import VLAN
@@ -504,12 +568,21 @@ class Subnet(CleanSave, TimestampedModel):
             self, ipnetwork: IPNetwork, ignore_discovered_ips: bool) -> set:
         """Returns a set of MAASIPRange objects created from the set of allocated
         StaticIPAddress objects.
+
+        Unless the allocated IPs have been cached, the database groups them
+        into runs of consecutive addresses and one range is made per run.
+        This keeps the cost of working out free addresses (e.g. for each
+        allocation) in proportion to how fragmented the subnet is rather than
+        to how many addresses it has allocated.
         """
+        ips = getattr(self, '_cached_allocated_ips', None)
+        if ips is None:
+            return self._get_ranges_for_allocated_ip_runs(
+                ipnetwork, ignore_discovered_ips)
         ranges = set()
         # We work with tuple rather than real model objects, since a
         # subnet may many IPs and creating a model object for each IP is
         # slow.
-        ips = self.get_allocated_ips()
         for ip, alloc_type in ips:
             if ip and not (ignore_discovered_ips and (
                     alloc_type == IPADDRESS_TYPE.DISCOVERED)):
@@ -518,6 +591,22 @@ class Subnet(CleanSave, TimestampedModel):
                     ranges.add(make_iprange(ip, purpose="assigned-ip"))
         return ranges
 
+    def _get_ranges_for_allocated_ip_runs(
+            self, ipnetwork: IPNetwork, ignore_discovered_ips: bool) -> set:
+        """Returns a set of MAASIPRange objects, one for each run of
+        consecutive addresses allocated in this subnet.
+        """
+        excluded_types = (
+            [IPADDRESS_TYPE.DISCOVERED] if ignore_discovered_ips else [])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                ALLOCATED_IP_RUNS_SQL,
+                [self.id, str(ipnetwork), excluded_types])
+            return {
+                make_iprange(first, last, purpose="assigned-ip")
+                for first, last in cursor.fetchall()
+            }
+
     def get_ipranges_in_use(
             self, exclude_addresses: IPAddressExcludeList = None,
             ranges_only: bool = False, include_reserved: bool = True,
@@ -581,7 +670,7 @@ class Subnet(CleanSave, TimestampedModel):
                 ranges |= {
                     make_iprange(
                         static_route.gateway_ip, purpose="gateway-ip")}
-            ranges |= self._get_ranges_for_allocated_ips(
+            allocated = self._get_ranges_for_allocated_ips(
                 network, ignore_discovered_ips)
             ranges |= set(
                 make_iprange(address, purpose="excluded")
@@ -595,6 +684,8 @@ class Subnet(CleanSave, TimestampedModel):
             exclude_ip_ranges=exclude_ip_ranges)
         if with_neighbours:
             ranges |= self.get_maasipset_for_neighbours()
+        if not ranges_only:
+            ranges |= split_ipranges_at_boundaries(allocated, ranges)
         return MAASIPSet(ranges)
 
     def get_ipranges_available_for_reserved_range(
@@ -5,6 +5,7 @@
 
 __all__ = []
 
+from datetime import timedelta
 import logging
 import random
 
@@ -14,6 +15,7 @@ from maasserver.models import (
     event as event_module,
     EventType,
 )
+from maasserver.models.timestampedmodel import now
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
 from provisioningserver.events import EVENT_TYPES
@@ -160,3 +162,77 @@ class EventTest(MAASServerTestCase):
         event_type = EventType.objects.get(name=type_name)
         self.assertIsNotNone(event_type)
         self.assertEqual(2, Event.objects.filter(node=node).count())
+
+
+class TestEventManagerRetention(MAASServerTestCase):
+
+    def make_Event(self, days_old, **kwargs):
+        event = factory.make_Event(**kwargs)
+        event.created = now() - timedelta(days=days_old)
+        Event.objects.filter(id=event.id).update(created=event.created)
+        return event
+
+    def test_get_retention_max_id_returns_none_when_few_events(self):
+        event_type = factory.make_EventType()
+        factory.make_Event(type=event_type)
+        self.assertIsNone(
+            Event.objects.get_retention_max_id([event_type.id], 1))
+
+    def test_get_retention_max_id_returns_newest_event_beyond_count(self):
+        event_type = factory.make_EventType()
+        events = [factory.make_Event(type=event_type) for _ in range(4)]
+        factory.make_Event()  # Of another type.
+        self.assertEqual(
+            events[1].id,
+            Event.objects.get_retention_max_id([event_type.id], 2))
+
+    def test_delete_expired_requires_cutoff_or_max_id(self):
+        self.assertRaises(ValueError, Event.objects.delete_expired, [1])
+
+    def test_delete_expired_deletes_events_before_cutoff(self):
+        event_type = factory.make_EventType(level=logging.DEBUG)
+        node = factory.make_Node()
+        old = self.make_Event(10, type=event_type, node=node)
+        new = self.make_Event(1, type=event_type, node=node)
+        other = self.make_Event(10, node=node)
+        deleted = Event.objects.delete_expired(
+            [event_type.id], cutoff=now() - timedelta(days=5))
+        self.assertEqual(1, deleted)
+        self.assertItemsEqual(
+            [new.id, other.id], Event.objects.values_list('id', flat=True))
+        self.assertFalse(Event.objects.filter(id=old.id).exists())
+
+    def test_delete_expired_deletes_events_up_to_max_id(self):
+        event_type = factory.make_EventType(level=logging.DEBUG)
+        node = factory.make_Node()
+        events = [factory.make_Event(type=event_type, node=node)
+                  for _ in range(3)]
+        deleted = Event.objects.delete_expired(
+            [event_type.id], max_id=events[1].id)
+        self.assertEqual(2, deleted)
+        self.assertItemsEqual(
+            [events[2].id], Event.objects.values_list('id', flat=True))
+
+    def test_delete_expired_deletes_at_most_limit(self):
+        event_type = factory.make_EventType(level=logging.DEBUG)
+        node = factory.make_Node()
+        for _ in range(3):
+            self.make_Event(10, type=event_type, node=node)
+        deleted = Event.objects.delete_expired(
+            [event_type.id], cutoff=now(), limit=2)
+        self.assertEqual(2, deleted)
+        self.assertEqual(1, Event.objects.count())
+
+    def test_delete_expired_keeps_latest_status_event_of_node(self):
+        info = factory.make_EventType(level=logging.INFO)
+        debug = factory.make_EventType(level=logging.DEBUG)
+        node = factory.make_Node()
+        older = self.make_Event(10, type=info, node=node)
+        latest = self.make_Event(9, type=info, node=node)
+        self.make_Event(8, type=debug, node=node)
+        deleted = Event.objects.delete_expired(
+            [info.id, debug.id], cutoff=now())
+        self.assertEqual(2, deleted)
+        self.assertItemsEqual(
+            [latest.id], Event.objects.values_list('id', flat=True))
+        self.assertFalse(Event.objects.filter(id=older.id).exists())
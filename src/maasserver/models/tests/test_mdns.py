@@ -5,8 +5,11 @@
 
 __all__ = []
 
+from maasserver.models import MDNS
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.orm import reload_object
+from maastesting.djangotestcase import count_queries
 from testtools.matchers import Equals
 
 
@@ -16,3 +19,101 @@ class TestMDNSModel(MAASServerTestCase):
         mdns = factory.make_MDNS(hostname="Living room")
         # Expect no exception.
         self.assertThat(mdns.hostname, Equals("Living room"))
+
+
+class TestMDNSManagerUpdateEntries(MAASServerTestCase):
+    """Tests for `MDNSManager.update_entries`."""
+
+    def make_interface(self, name='eth0', mdns_discovery_state=True):
+        rack = factory.make_RackController()
+        interface = factory.make_Interface(node=rack, name=name)
+        interface.mdns_discovery_state = mdns_discovery_state
+        return interface
+
+    def make_entry_json(self, interface='eth0', ip=None, hostname=None):
+        if ip is None:
+            ip = factory.make_ipv4_address()
+        if hostname is None:
+            hostname = factory.make_hostname()
+        return {
+            'interface': interface,
+            'address': ip,
+            'hostname': hostname,
+        }
+
+    def test__creates_new_entries(self):
+        interface = self.make_interface()
+        entries = [self.make_entry_json() for _ in range(3)]
+        counts = MDNS.objects.update_entries({'eth0': interface}, entries)
+        self.assertThat(counts['created'], Equals(3))
+        self.assertItemsEqual(
+            [(entry['address'], entry['hostname'], 1) for entry in entries],
+            [(binding.ip, binding.hostname, binding.count)
+             for binding in MDNS.objects.filter(interface=interface)])
+
+    def test__updates_existing_entries(self):
+        interface = self.make_interface()
+        binding = factory.make_MDNS(
+            interface=interface, ip=factory.make_ipv4_address())
+        entry = self.make_entry_json(ip=binding.ip, hostname=binding.hostname)
+        counts = MDNS.objects.update_entries(
+            {'eth0': interface}, [entry, entry])
+        self.assertThat(counts['updated'], Equals(1))
+        self.assertThat(counts['created'], Equals(0))
+        self.assertThat(reload_object(binding).count, Equals(3))
+
+    def test__replaces_moved_hostname(self):
+        interface = self.make_interface()
+        binding = factory.make_MDNS(
+            interface=interface, ip=factory.make_ipv4_address())
+        entry = self.make_entry_json(hostname=binding.hostname)
+        counts = MDNS.objects.update_entries({'eth0': interface}, [entry])
+        self.assertThat(counts['deleted'], Equals(1))
+        self.assertIsNone(reload_object(binding))
+        [replacement] = MDNS.objects.filter(interface=interface)
+        self.assertThat(replacement.ip, Equals(entry['address']))
+
+    def test__does_not_move_hostname_between_address_families(self):
+        interface = self.make_interface()
+        binding = factory.make_MDNS(
+            interface=interface, ip=factory.make_ipv4_address())
+        entry = self.make_entry_json(
+            ip=factory.make_ipv6_address(), hostname=binding.hostname)
+        counts = MDNS.objects.update_entries({'eth0': interface}, [entry])
+        self.assertThat(counts['deleted'], Equals(0))
+        self.assertIsNotNone(reload_object(binding))
+        self.assertThat(
+            MDNS.objects.filter(interface=interface).count(), Equals(2))
+
+    def test__replaces_renamed_address(self):
+        interface = self.make_interface()
+        binding = factory.make_MDNS(
+            interface=interface, ip=factory.make_ipv4_address())
+        entry = self.make_entry_json(ip=binding.ip)
+        counts = MDNS.objects.update_entries({'eth0': interface}, [entry])
+        self.assertThat(counts['deleted'], Equals(1))
+        [replacement] = MDNS.objects.filter(interface=interface)
+        self.assertThat(replacement.hostname, Equals(entry['hostname']))
+
+    def test__ignores_interfaces_without_mdns_discovery(self):
+        interface = self.make_interface(mdns_discovery_state=False)
+        MDNS.objects.update_entries(
+            {'eth0': interface}, [self.make_entry_json()])
+        self.assertThat(MDNS.objects.count(), Equals(0))
+
+    def test__query_count_does_not_depend_on_number_of_entries(self):
+        interface = self.make_interface()
+        bindings = [
+            factory.make_MDNS(
+                interface=interface, ip=factory.make_ipv4_address())
+            for _ in range(5)
+        ]
+        entries = [
+            self.make_entry_json(ip=binding.ip, hostname=binding.hostname)
+            for binding in bindings
+        ] + [self.make_entry_json() for _ in range(5)]
+        count, _ = count_queries(
+            MDNS.objects.update_entries, {'eth0': interface}, entries)
+        # One query to fetch the existing entries, one to update them, and
+        # one to create the new ones.
+        self.assertThat(count, Equals(3))
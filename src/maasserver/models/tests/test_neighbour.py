@@ -5,9 +5,15 @@
 
 __all__ = []
 
+import random
+
+from maasserver.models import Neighbour
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.orm import reload_object
+from maastesting.djangotestcase import count_queries
 from maastesting.matchers import IsNonEmptyString
+from testtools.matchers import Equals
 
 
 class TestNeighbourModel(MAASServerTestCase):
@@ -15,3 +21,114 @@ class TestNeighbourModel(MAASServerTestCase):
     def test_mac_organization(self):
         neighbour = factory.make_Neighbour(mac_address="48:51:b7:00:00:00")
         self.assertThat(neighbour.mac_organization, IsNonEmptyString)
+
+
+class TestNeighbourManagerUpdateNeighbours(MAASServerTestCase):
+    """Tests for `NeighbourManager.update_neighbours`."""
+
+    def make_interface(self, name='eth0', neighbour_discovery_state=True):
+        rack = factory.make_RackController()
+        interface = factory.make_Interface(node=rack, name=name)
+        interface.neighbour_discovery_state = neighbour_discovery_state
+        return interface
+
+    def make_neighbour_json(
+            self, interface='eth0', ip=None, mac=None, time=None, vid=None):
+        if ip is None:
+            ip = factory.make_ipv4_address()
+        if mac is None:
+            mac = factory.make_mac_address()
+        if time is None:
+            time = random.randint(0, 200000000)
+        return {
+            'interface': interface,
+            'ip': ip,
+            'mac': mac,
+            'time': time,
+            'vid': vid,
+        }
+
+    def test__creates_new_neighbours(self):
+        interface = self.make_interface()
+        neighbours = [self.make_neighbour_json(vid=10) for _ in range(3)]
+        counts = Neighbour.objects.update_neighbours(
+            {'eth0': interface}, neighbours)
+        self.assertThat(counts['created'], Equals(3))
+        self.assertItemsEqual(
+            [(neighbour['ip'], neighbour['mac'], neighbour['time'], 10, 1)
+             for neighbour in neighbours],
+            [(binding.ip, str(binding.mac_address), binding.time,
+              binding.vid, binding.count)
+             for binding in Neighbour.objects.filter(interface=interface)])
+
+    def test__updates_existing_neighbours(self):
+        interface = self.make_interface()
+        binding = factory.make_Neighbour(interface=interface, count=5)
+        neighbour = self.make_neighbour_json(
+            ip=binding.ip, mac=str(binding.mac_address), vid=binding.vid,
+            time=binding.time + 10)
+        counts = Neighbour.objects.update_neighbours(
+            {'eth0': interface}, [neighbour, neighbour])
+        self.assertThat(counts['updated'], Equals(1))
+        self.assertThat(counts['created'], Equals(0))
+        binding = reload_object(binding)
+        self.assertThat(binding.count, Equals(7))
+        self.assertThat(binding.time, Equals(neighbour['time']))
+
+    def test__replaces_obsolete_neighbours(self):
+        interface = self.make_interface()
+        binding = factory.make_Neighbour(interface=interface)
+        neighbour = self.make_neighbour_json(
+            ip=binding.ip, vid=binding.vid)
+        counts = Neighbour.objects.update_neighbours(
+            {'eth0': interface}, [neighbour])
+        self.assertThat(counts['deleted'], Equals(1))
+        self.assertThat(counts['created'], Equals(1))
+        self.assertIsNone(reload_object(binding))
+        [replacement] = Neighbour.objects.filter(interface=interface)
+        self.assertThat(
+            str(replacement.mac_address), Equals(neighbour['mac']))
+        self.assertThat(replacement.count, Equals(1))
+
+    def test__replaces_neighbour_moved_within_report(self):
+        interface = self.make_interface()
+        first = self.make_neighbour_json()
+        second = self.make_neighbour_json(ip=first['ip'])
+        counts = Neighbour.objects.update_neighbours(
+            {'eth0': interface}, [first, second])
+        self.assertThat(counts['created'], Equals(1))
+        self.assertThat(counts['deleted'], Equals(0))
+        [binding] = Neighbour.objects.filter(interface=interface)
+        self.assertThat(str(binding.mac_address), Equals(second['mac']))
+
+    def test__ignores_interfaces_without_neighbour_discovery(self):
+        interface = self.make_interface(neighbour_discovery_state=False)
+        counts = Neighbour.objects.update_neighbours(
+            {'eth0': interface}, [self.make_neighbour_json()])
+        self.assertThat(sum(counts.values()), Equals(0))
+        self.assertThat(Neighbour.objects.count(), Equals(0))
+
+    def test__ignores_unknown_interfaces(self):
+        interface = self.make_interface()
+        Neighbour.objects.update_neighbours(
+            {'eth0': interface}, [self.make_neighbour_json(interface='eth1')])
+        self.assertThat(Neighbour.objects.count(), Equals(0))
+
+    def test__query_count_does_not_depend_on_number_of_neighbours(self):
+        interface = self.make_interface()
+        bindings = [
+            factory.make_Neighbour(interface=interface, time=1000)
+            for _ in range(5)
+        ]
+        neighbours = [
+            self.make_neighbour_json(
+                ip=binding.ip, mac=str(binding.mac_address), vid=binding.vid,
+                time=2000)
+            for binding in bindings
+        ] + [self.make_neighbour_json() for _ in range(5)]
+        count, _ = count_queries(
+            Neighbour.objects.update_neighbours,
+            {'eth0': interface}, neighbours)
+        # One query to fetch the existing bindings, one to update them, and
+        # one to create the new ones.
+        self.assertThat(count, Equals(3))
@@ -6,6 +6,7 @@
 __all__ = []
 
 import base64
+from collections import Counter
 from copy import deepcopy
 from datetime import (
     datetime,
@@ -91,6 +92,8 @@ from maasserver.models import (
     Interface,
     LicenseKey,
     Machine,
+    MDNS,
+    Neighbour,
     Node,
     node as node_module,
     OwnerData,
@@ -8426,27 +8429,49 @@ class TestControllerUpdateDiscoveryState(MAASServerTestCase):
 class TestReportNeighbours(MAASServerTestCase):
     """Tests for `Controller.report_neighbours()."""
 
-    def test__calls_update_neighbour_for_each_neighbour(self):
+    def test__updates_neighbours_in_bulk(self):
         rack = factory.make_RackController()
-        factory.make_Interface(name='eth0', node=rack)
-        factory.make_Interface(name='eth1', node=rack)
-        update_neighbour = self.patch(
-            interface_module.Interface, 'update_neighbour')
+        eth0 = factory.make_Interface(name='eth0', node=rack)
+        eth1 = factory.make_Interface(name='eth1', node=rack)
+        update_neighbours = self.patch(
+            Neighbour.objects, 'update_neighbours')
+        update_neighbours.return_value = Counter()
         neighbours = [
             {'interface': 'eth0', 'mac': factory.make_mac_address()},
             {'interface': 'eth1', 'mac': factory.make_mac_address()},
         ]
         rack.report_neighbours(neighbours)
-        self.assertThat(update_neighbour, MockCallsMatch(
-            *[call(neighbour) for neighbour in neighbours]
-        ))
+        self.assertThat(update_neighbours, MockCalledOnceWith(
+            {'eth0': eth0, 'eth1': eth1}, neighbours))
+
+    def test__records_neighbours(self):
+        rack = factory.make_RackController()
+        interface = factory.make_Interface(name='eth0', node=rack)
+        Interface.objects.filter(id=interface.id).update(
+            neighbour_discovery_state=True)
+        neighbours = [
+            {
+                'interface': 'eth0',
+                'ip': factory.make_ipv4_address(),
+                'mac': factory.make_mac_address(),
+                'time': 1000,
+                'vid': None,
+            }
+            for _ in range(3)
+        ]
+        rack.report_neighbours(neighbours)
+        self.assertItemsEqual(
+            [neighbour['ip'] for neighbour in neighbours],
+            Neighbour.objects.filter(
+                interface=interface).values_list('ip', flat=True))
 
     def test__calls_report_vid_for_each_vid(self):
         rack = factory.make_RackController()
         factory.make_Interface(name='eth0', node=rack)
         factory.make_Interface(name='eth1', node=rack)
         # Just make this a no-op for simplicity.
-        self.patch(interface_module.Interface, 'update_neighbour')
+        self.patch(
+            Neighbour.objects, 'update_neighbours').return_value = Counter()
         report_vid = self.patch(
             interface_module.Interface, 'report_vid')
         neighbours = [
@@ -8456,24 +8481,56 @@ class TestReportNeighbours(MAASServerTestCase):
         rack.report_neighbours(neighbours)
         self.assertThat(report_vid, MockCallsMatch(call(3), call(7)))
 
+    def test__calls_report_vid_once_per_interface_and_vid(self):
+        rack = factory.make_RackController()
+        factory.make_Interface(name='eth0', node=rack)
+        self.patch(
+            Neighbour.objects, 'update_neighbours').return_value = Counter()
+        report_vid = self.patch(
+            interface_module.Interface, 'report_vid')
+        neighbours = [
+            {'interface': 'eth0', 'mac': factory.make_mac_address(), 'vid': 3}
+            for _ in range(5)
+        ]
+        rack.report_neighbours(neighbours)
+        self.assertThat(report_vid, MockCalledOnceWith(3))
+
 
 class TestReportMDNSEntries(MAASServerTestCase):
     """Tests for `Controller.report_mdns_entries()."""
 
-    def test__calls_update_mdns_entry_for_each_entry(self):
+    def test__updates_mdns_entries_in_bulk(self):
         rack = factory.make_RackController()
-        factory.make_Interface(name='eth0', node=rack)
-        factory.make_Interface(name='eth1', node=rack)
-        update_mdns_entry = self.patch(
-            interface_module.Interface, 'update_mdns_entry')
+        eth0 = factory.make_Interface(name='eth0', node=rack)
+        eth1 = factory.make_Interface(name='eth1', node=rack)
+        update_entries = self.patch(MDNS.objects, 'update_entries')
+        update_entries.return_value = Counter()
         entries = [
             {'interface': 'eth0', 'hostname': factory.make_name('eth0')},
             {'interface': 'eth1', 'hostname': factory.make_name('eth1')},
         ]
         rack.report_mdns_entries(entries)
-        self.assertThat(update_mdns_entry, MockCallsMatch(
-            *[call(entry) for entry in entries]
-        ))
+        self.assertThat(update_entries, MockCalledOnceWith(
+            {'eth0': eth0, 'eth1': eth1}, entries))
+
+    def test__records_mdns_entries(self):
+        rack = factory.make_RackController()
+        interface = factory.make_Interface(name='eth0', node=rack)
+        Interface.objects.filter(id=interface.id).update(
+            mdns_discovery_state=True)
+        entries = [
+            {
+                'interface': 'eth0',
+                'address': factory.make_ipv4_address(),
+                'hostname': factory.make_name('host'),
+            }
+            for _ in range(3)
+        ]
+        rack.report_mdns_entries(entries)
+        self.assertItemsEqual(
+            [entry['hostname'] for entry in entries],
+            MDNS.objects.filter(
+                interface=interface).values_list('hostname', flat=True))
 
 
 class UpdateInterfacesMixin:
@@ -0,0 +1,51 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Test maasserver RackBootImage model."""
+
+__all__ = []
+
+from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
+from maasserver.models import RackBootImage
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.orm import reload_object
+
+
+class TestRackBootImageManager(MAASServerTestCase):
+
+    def test_get_reported_images_leaves_out_unreported_racks(self):
+        rack = factory.make_RackController()
+        self.assertEqual(
+            {}, RackBootImage.objects.get_reported_images([rack.system_id]))
+
+    def test_get_reported_images_includes_racks_without_images(self):
+        rack = factory.make_RackController()
+        RackBootImage.objects.update_for(rack, "hash", [])
+        self.assertEqual(
+            {rack.system_id: []},
+            RackBootImage.objects.get_reported_images([rack.system_id]))
+
+    def test_get_reported_images_returns_images_by_rack(self):
+        racks = [factory.make_RackController() for _ in range(2)]
+        images = {}
+        for rack in racks:
+            images[rack.system_id] = [make_rpc_boot_image() for _ in range(2)]
+            RackBootImage.objects.update_for(
+                rack, factory.make_name("hash"), images[rack.system_id])
+        self.assertEqual(
+            images, RackBootImage.objects.get_reported_images(images.keys()))
+
+    def test_update_for_replaces_images_and_hash(self):
+        rack = factory.make_RackController()
+        old = RackBootImage.objects.create(
+            node=rack, **make_rpc_boot_image())
+        RackBootImage.objects.update_for(rack, "old", [])
+        new_images = [make_rpc_boot_image()]
+        RackBootImage.objects.update_for(rack, "new", new_images)
+        self.assertIsNone(reload_object(old))
+        self.assertEqual(
+            {rack.system_id: new_images},
+            RackBootImage.objects.get_reported_images([rack.system_id]))
+        self.assertTrue(RackBootImage.objects.has_reported(rack, "new"))
+        self.assertFalse(RackBootImage.objects.has_reported(rack, "old"))
@@ -299,6 +299,28 @@ class TestStaticIPAddressManager(MAASServerTestCase):
                 list(orm.retry_context.stack._cm_pending),
                 Equals([locks.address_allocation]))
 
+    def test_allocate_new_tries_next_address_when_free_address_taken(self):
+        subnet = factory.make_managed_Subnet()
+        set_ip_address = StaticIPAddress.set_ip_address
+        tried = []
+
+        def set_ip_address_taken_once(self, ipaddr, *args, **kwargs):
+            tried.append(ipaddr)
+            if len(tried) == 1:
+                raise orm.make_unique_violation()
+            return set_ip_address(self, ipaddr, *args, **kwargs)
+
+        self.patch(
+            StaticIPAddress, "set_ip_address", set_ip_address_taken_once)
+        with orm.retry_context:
+            sip = StaticIPAddress.objects.allocate_new(subnet=subnet)
+            # No retry has been requested.
+            self.assertThat(
+                orm.retry_context.stack._cm_pending, HasLength(0))
+        self.assertThat(tried, HasLength(2))
+        self.assertEqual(tried[1], sip.ip)
+        self.assertNotEqual(tried[0], sip.ip)
+
     def test_allocate_new_propagates_other_integrity_errors(self):
         set_ip_address = self.patch(StaticIPAddress, "set_ip_address")
         set_ip_address.side_effect = orm.make_unique_violation()
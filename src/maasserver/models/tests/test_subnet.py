@@ -35,6 +35,7 @@ from maasserver.models import (
 from maasserver.models.subnet import (
     create_cidr,
     get_allocated_ips,
+    split_ipranges_at_boundaries,
     Subnet,
 )
 from maasserver.models.timestampedmodel import now
@@ -55,6 +56,7 @@ from maastesting.djangotestcase import (
     CountQueries,
 )
 from maastesting.matchers import DocTestMatches
+from maastesting.testcase import MAASTestCase
 from netaddr import (
     AddrFormatError,
     IPAddress,
@@ -62,6 +64,7 @@ from netaddr import (
 )
 from provisioningserver.utils.network import (
     inet_ntop,
+    make_iprange,
     MAASIPRange,
 )
 from testtools import ExpectedException
@@ -831,6 +834,73 @@ class SubnetIPRangeTest(MAASServerTestCase):
         self.assertThat(s, Contains(static_range_low))
         self.assertThat(s, Contains(static_range_high))
 
+    def test__get_ipranges_in_use_groups_consecutive_allocated_ips(self):
+        subnet = factory.make_Subnet(
+            gateway_ip='', dns_servers=[], host_bits=8, version=4)
+        net = subnet.get_ipnetwork()
+        for offset in (10, 11, 12, 20):
+            factory.make_StaticIPAddress(
+                ip=inet_ntop(net.first + offset),
+                alloc_type=IPADDRESS_TYPE.USER_RESERVED)
+        factory.make_StaticIPAddress(
+            ip=inet_ntop(net.first + 13), alloc_type=IPADDRESS_TYPE.DISCOVERED)
+
+        def assigned(ipset):
+            return [
+                (item.first - net.first, item.last - net.first)
+                for item in ipset.ranges
+                if item.purpose == {"assigned-ip"}
+            ]
+
+        self.assertEqual(
+            [(10, 13), (20, 20)], assigned(subnet.get_ipranges_in_use()))
+        self.assertEqual(
+            [(10, 12), (20, 20)],
+            assigned(subnet.get_ipranges_in_use(ignore_discovered_ips=True)))
+
+    def test__get_ipranges_in_use_same_with_cached_allocated_ips(self):
+        subnet = factory.make_Subnet(
+            gateway_ip='', dns_servers=[], host_bits=8)
+        net = subnet.get_ipnetwork()
+        for offset in random.sample(range(1, 40), 20):
+            factory.make_StaticIPAddress(
+                ip=inet_ntop(net.first + offset),
+                alloc_type=IPADDRESS_TYPE.USER_RESERVED)
+        expected = subnet.get_ipranges_in_use()
+        [(_, ips)] = get_allocated_ips([subnet])
+        subnet.cache_allocated_ips(ips)
+        self.assertEqual(
+            expected.ranges, subnet.get_ipranges_in_use().ranges)
+
+    def test__get_ipranges_in_use_merges_only_overlap_of_run_and_range(self):
+        subnet = factory.make_Subnet(
+            gateway_ip='', dns_servers=[], host_bits=8, version=4)
+        net = subnet.get_ipnetwork()
+        factory.make_IPRange(
+            subnet=subnet, start_ip=inet_ntop(net.first + 100),
+            end_ip=inet_ntop(net.first + 200),
+            alloc_type=IPRANGE_TYPE.DYNAMIC)
+        for offset in range(99, 106):
+            factory.make_StaticIPAddress(
+                ip=inet_ntop(net.first + offset),
+                alloc_type=IPADDRESS_TYPE.STICKY, subnet=subnet)
+
+        def usage(ipset):
+            return [
+                (item.first - net.first, item.last - net.first, item.purpose)
+                for item in ipset.ranges
+            ]
+
+        expected = [
+            (99, 99, {"assigned-ip"}),
+            (100, 200, {"assigned-ip", "dynamic"}),
+        ]
+        self.assertEqual(expected, usage(subnet.get_ipranges_in_use()))
+        # The same as when each address is a range of its own.
+        [(_, ips)] = get_allocated_ips([subnet])
+        subnet.cache_allocated_ips(ips)
+        self.assertEqual(expected, usage(subnet.get_ipranges_in_use()))
+
     def test__get_iprange_usage_includes_used_and_unused_ips(self):
         subnet = factory.make_Subnet(
             gateway_ip='', dns_servers=[], host_bits=8)
@@ -1591,3 +1661,30 @@ class TestGetAllocatedIps(MAASServerTestCase):
         self.assertEqual([(ip1.ip, ip1.alloc_type),
                           (ip2.ip, ip2.alloc_type)], ips)
         self.assertEqual(0, queries)
+
+
+class TestSplitIPRangesAtBoundaries(MAASTestCase):
+
+    def test__splits_where_others_start_and_end(self):
+        pieces = split_ipranges_at_boundaries(
+            [make_iprange("10.0.0.5", "10.0.0.20", purpose="assigned-ip")],
+            [make_iprange("10.0.0.10", "10.0.0.12", purpose="dynamic"),
+             make_iprange("10.0.0.30", "10.0.0.40", purpose="reserved")])
+        self.assertEqual([
+            ("10.0.0.5", "10.0.0.9"),
+            ("10.0.0.10", "10.0.0.12"),
+            ("10.0.0.13", "10.0.0.20"),
+        ], [
+            (str(IPAddress(item.first)), str(IPAddress(item.last)))
+            for item in sorted(pieces)
+        ])
+        self.assertThat(
+            {frozenset(item.purpose) for item in pieces},
+            Equals({frozenset({"assigned-ip"})}))
+
+    def test__keeps_ipv6_addresses(self):
+        [piece, _] = sorted(split_ipranges_at_boundaries(
+            [make_iprange("::5", "::9", purpose="assigned-ip")],
+            [make_iprange("::8", "::9", purpose="reserved")]))
+        self.assertEqual(6, piece.version)
+        self.assertEqual((5, 7), (piece.first, piece.last))
@@ -1173,8 +1173,44 @@ class ReadNodesForm(FilterNodeForm):
         label="Only includes nodes with the specified status",
         choices=NODE_STATUS_SHORT_LABEL_CHOICES, required=False)
 
+    after_id = forms.CharField(
+        label="Only include nodes after the node with this system ID",
+        required=False)
+
+    limit = forms.IntegerField(
+        label="The maximum number of nodes to return", min_value=1,
+        required=False)
+
+    # Renamed to `fields` in __init__, which would otherwise clash with the
+    # form's own `fields`. Nodes are not filtered by this; it is up to the
+    # API handler to render only the requested fields.
+    node_fields = UnconstrainedMultipleChoiceField(
+        label="Node fields to return", required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rename_field('node_fields', 'fields')
+
+    def clean_after_id(self):
+        system_id = self.cleaned_data[self.get_field_name('after_id')]
+        if not system_id:
+            return None
+        return system_id
+
+    @property
+    def is_paged(self):
+        """Whether nodes are to be read a page at a time.
+
+        Pages are ordered by system ID, so that `after_id` need not be the
+        system ID of a node that still exists.
+        """
+        return (
+            self.cleaned_data.get(self.get_field_name('limit')) is not None or
+            self.cleaned_data.get(self.get_field_name('after_id')) is not None)
+
     def _apply_filters(self, nodes):
         nodes = super()._apply_filters(nodes)
+        nodes = self.filter_by_after_id(nodes)
         nodes = self.filter_by_ids(nodes)
         nodes = self.filter_by_hostnames(nodes)
         nodes = self.filter_by_mac_addresses(nodes)
@@ -1183,6 +1219,12 @@ class ReadNodesForm(FilterNodeForm):
         nodes = self.filter_by_status(nodes)
         return nodes
 
+    def filter_by_after_id(self, filtered_nodes):
+        system_id = self.cleaned_data.get(self.get_field_name('after_id'))
+        if system_id is not None:
+            filtered_nodes = filtered_nodes.filter(system_id__gt=system_id)
+        return filtered_nodes
+
     def filter_by_ids(self, filtered_nodes):
         ids = self.cleaned_data.get(self.get_field_name('id'))
         if ids:
@@ -170,7 +170,9 @@ def update_prometheus_stats(metrics: PrometheusMetrics):
                 labels={'arches': arch})
 
     # Update metrics for subnets
-    for cidr, stats in get_subnets_utilisation_stats().items():
+    subnet_stats_ttl = Config.objects.get_config('prometheus_subnet_stats_ttl')
+    for cidr, stats in get_subnets_utilisation_stats(
+            max_age=subnet_stats_ttl).items():
         for status in ('available', 'unavailable'):
             metrics.update(
                 'maas_net_subnet_ip_count', 'set',
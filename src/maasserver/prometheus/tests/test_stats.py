@@ -10,6 +10,7 @@ import json
 from unittest import mock
 
 from django.db import transaction
+from maasserver import stats as maas_stats
 from maasserver.enum import (
     IPADDRESS_TYPE,
     IPRANGE_TYPE,
@@ -108,6 +109,10 @@ class TestPrometheusHandler(MAASServerTestCase):
 
 class TestPrometheus(MAASServerTestCase):
 
+    def setUp(self):
+        super().setUp()
+        self.patch(maas_stats, '_subnets_utilisation_stats', (None, None))
+
     def test_update_prometheus_stats(self):
         self.patch(stats, 'prom_cli')
         # general values
@@ -176,6 +181,7 @@ class TestPrometheus(MAASServerTestCase):
         mock_subnet_stats = self.patch(
             stats, "get_subnets_utilisation_stats")
         mock_subnet_stats.return_value = subnet_stats
+        Config.objects.set_config('prometheus_subnet_stats_ttl', 30)
         metrics = create_metrics(
             STATS_DEFINITIONS, registry=prometheus_client.CollectorRegistry())
         update_prometheus_stats(metrics)
@@ -186,7 +192,7 @@ class TestPrometheus(MAASServerTestCase):
         self.assertThat(
             mock_pods, MockCalledOnce())
         self.assertThat(
-            mock_subnet_stats, MockCalledOnce())
+            mock_subnet_stats, MockCalledOnceWith(max_age=30))
 
     def test_push_stats_to_prometheus(self):
         factory.make_RegionRackController()
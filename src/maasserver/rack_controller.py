@@ -30,6 +30,13 @@ DHCP:
     for messages on 'sys_dhcp_{id}' channel and set that rack controller as
     needing an update. Any time a message is received on this queue that rack
     controller is marked as needing an update.
+
+External services:
+    Each regiond process also listens on the 'config' channel. Any change to
+    the configuration marks every watched rack controller as needing to
+    refresh its external services (NTP, DNS, proxy, and syslog). The rack
+    controller then fetches the versioned configuration, which is cheap when
+    nothing it uses has changed.
 """
 
 __all__ = [
@@ -42,9 +49,11 @@ import os
 from maasserver import dhcp
 from maasserver.listener import PostgresListenerUnregistrationError
 from maasserver.models.node import RackController
+from maasserver.rpc import getClientFor
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
 from provisioningserver.logger import LegacyLogger
+from provisioningserver.rpc.cluster import RefreshExternalServices
 from provisioningserver.rpc.exceptions import NoConnectionsAvailable
 from provisioningserver.utils.twisted import (
     asynchronous,
@@ -58,6 +67,7 @@ from twisted.internet.defer import (
     maybeDeferred,
 )
 from twisted.internet.task import LoopingCall
+from twisted.protocols.amp import UnhandledCommand
 
 
 log = LegacyLogger()
@@ -86,6 +96,7 @@ class RackControllerService(Service):
         self.processingDone = None
         self.watching = set()
         self.needsDHCPUpdate = set()
+        self.needsExternalServicesUpdate = set()
         self.ipcWorker = ipcWorker
         self.postgresListener = postgresListener
 
@@ -99,6 +110,7 @@ class RackControllerService(Service):
             self.processId = processId
             self.postgresListener.register(
                 "sys_core_%d" % self.processId, self.coreHandler)
+            self.postgresListener.register("config", self.configHandler)
             return self.processId
 
         @transactional
@@ -149,6 +161,12 @@ class RackControllerService(Service):
             except PostgresListenerUnregistrationError:
                 # Error is acceptable as it might not have been called yet.
                 pass
+            try:
+                self.postgresListener.unregister(
+                    "config", self.configHandler)
+            except PostgresListenerUnregistrationError:
+                # Error is acceptable as it might not have been called yet.
+                pass
 
             # Unregister all DHCP handling.
             for rack_id in self.watching:
@@ -161,6 +179,7 @@ class RackControllerService(Service):
 
             self.watching = set()
             self.needsDHCPUpdate = set()
+            self.needsExternalServicesUpdate = set()
             self.starting = None
             if self.processing.running:
                 self.processing.stop()
@@ -191,6 +210,7 @@ class RackControllerService(Service):
                     "[pid:{pid()}] recieved unwatched when not watching "
                     "for rack: {rack_id}", pid=os.getpid, rack_id=rack_id)
             self.needsDHCPUpdate.discard(rack_id)
+            self.needsExternalServicesUpdate.discard(rack_id)
             self.watching.discard(rack_id)
         elif action == "watch":
             if rack_id not in self.watching:
@@ -232,6 +252,18 @@ class RackControllerService(Service):
                 "[pid:{pid()}] recieved DHCP push notify when not watching "
                 "for rack: {rack_id}", pid=os.getpid, rack_id=rack_id)
 
+    def configHandler(self, action, obj_id):
+        """Called when the configuration is changed."""
+        if len(self.watching) != 0:
+            self.needsExternalServicesUpdate.update(self.watching)
+            self.startProcessing()
+
+            log.debug(
+                "[pid:{pid()}] racks requiring external services refresh: "
+                "{racks()}", pid=os.getpid, racks=lambda: ', '.join(
+                    [str(rack_id)
+                     for rack_id in self.needsExternalServicesUpdate]))
+
     def startProcessing(self):
         """Start the process looping call."""
         if not self.processing.running:
@@ -242,10 +274,7 @@ class RackControllerService(Service):
         if not self.running:
             # We're shutting down.
             self.processing.stop()
-        elif len(self.needsDHCPUpdate) == 0:
-            # Nothing more to do.
-            self.processing.stop()
-        else:
+        elif len(self.needsDHCPUpdate) != 0:
             def _retryOnFailure(failure, rack_id):
                 self.needsDHCPUpdate.add(rack_id)
                 return failure
@@ -259,6 +288,20 @@ class RackControllerService(Service):
                 "Failed configuring DHCP on rack controller 'id:%d'." % (
                     rack_id))
             return d
+        elif len(self.needsExternalServicesUpdate) != 0:
+            # No retry on failure; the rack controller also polls for its
+            # external services configuration.
+            rack_id = self.needsExternalServicesUpdate.pop()
+            d = maybeDeferred(self.processExternalServices, rack_id)
+            d.addErrback(lambda f: f.trap(NoConnectionsAvailable))
+            d.addErrback(
+                log.err,
+                "Failed refreshing external services on rack controller "
+                "'id:%d'." % rack_id)
+            return d
+        else:
+            # Nothing more to do.
+            self.processing.stop()
 
     def processDHCP(self, rack_id):
         """Process DHCP for the rack controller."""
@@ -270,3 +313,21 @@ class RackControllerService(Service):
             transactional(RackController.objects.get), id=rack_id)
         d.addCallback(dhcp.configure_dhcp)
         return d
+
+    def processExternalServices(self, rack_id):
+        """Ask the rack controller to refresh its external services."""
+        log.debug(
+            "[pid:{pid()}] refreshing external services on rack: {rack_id}",
+            pid=os.getpid, rack_id=rack_id)
+
+        def refresh(client):
+            d = client(RefreshExternalServices)
+            # Older rack controllers only poll for the configuration.
+            d.addErrback(lambda f: f.trap(UnhandledCommand))
+            return d
+
+        d = deferToDatabase(
+            transactional(RackController.objects.get), id=rack_id)
+        d.addCallback(lambda rack: getClientFor(rack.system_id))
+        d.addCallback(refresh)
+        return d
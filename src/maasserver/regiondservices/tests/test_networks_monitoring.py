@@ -53,7 +53,7 @@ class TestRegionNetworksMonitoringService(MAASTransactionServerTestCase):
         }
 
         service = RegionNetworksMonitoringService(
-            reactor, enable_beaconing=False)
+            reactor, enable_beaconing=False, enable_netlink=False)
         service.getInterfaces = lambda: succeed(interfaces)
 
         with FakeLogger("maas") as logger:
@@ -81,7 +81,8 @@ class TestRegionNetworksMonitoringService(MAASTransactionServerTestCase):
     @wait_for(30)
     @inlineCallbacks
     def test_logs_error_when_running_region_controller_cannot_be_found(self):
-        service = RegionNetworksMonitoringService(reactor)
+        service = RegionNetworksMonitoringService(
+            reactor, enable_netlink=False)
 
         with TwistedLoggerFixture() as logger:
             service.startService()
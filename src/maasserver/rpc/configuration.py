@@ -4,12 +4,23 @@
 """RPC helpers relating to configuration settings."""
 
 __all__ = [
+    "get_external_services_configuration",
     "get_proxies",
+    "get_proxy_configuration",
+    "get_syslog_configuration",
 ]
 
+from hashlib import sha256
+import json
 from urllib.parse import urlparse
 
+from maasserver.dns.config import get_trusted_networks
 from maasserver.models.config import Config
+from maasserver.models.subnet import Subnet
+from maasserver.rpc.nodes import (
+    get_controller_type,
+    get_time_configuration,
+)
 from maasserver.utils.orm import transactional
 from provisioningserver.utils.twisted import synchronous
 
@@ -29,3 +40,71 @@ def get_proxies():
     else:
         http_proxy = None
     return {"http": http_proxy, "https": http_proxy}
+
+
+@synchronous
+@transactional
+def get_proxy_configuration():
+    """Obtain the settings to use for configuring the proxy on racks.
+
+    :return: See `GetProxyConfiguration`.
+    """
+    allowed_subnets = Subnet.objects.filter(allow_proxy=True)
+    cidrs = [subnet.cidr for subnet in allowed_subnets]
+    configs = Config.objects.get_configs([
+        'maas_proxy_port', 'prefer_v4_proxy', 'enable_http_proxy'])
+    return {
+        'enabled': configs['enable_http_proxy'],
+        'port': configs['maas_proxy_port'],
+        'allowed_cidrs': cidrs,
+        'prefer_v4_proxy': configs['prefer_v4_proxy'],
+    }
+
+
+@synchronous
+@transactional
+def get_syslog_configuration():
+    """Obtain the settings to use for configuring syslog on racks.
+
+    :return: See `GetSyslogConfiguration`.
+    """
+    return {
+        'port': Config.objects.get_config('maas_syslog_port'),
+    }
+
+
+@synchronous
+@transactional
+def get_external_services_configuration(system_id, version=None):
+    """Obtain the settings for every external service run by a rack.
+
+    The version of the configuration is a digest of its contents, so it
+    changes only when the configuration does.
+
+    :param system_id: system_id of the rack controller.
+    :param version: The version of the configuration the rack already has.
+        If it is current, the configuration is not returned again.
+    :return: See `GetExternalServicesConfiguration`.
+    """
+    controller_type = get_controller_type(system_id)
+    time_configuration = get_time_configuration(system_id)
+    proxy_configuration = get_proxy_configuration()
+    proxy_configuration["allowed_cidrs"].sort()
+    configuration = {
+        "controller_type": controller_type,
+        "time_configuration": {
+            "servers": sorted(time_configuration["servers"]),
+            "peers": sorted(time_configuration["peers"]),
+        },
+        "dns_configuration": {
+            "trusted_networks": sorted(get_trusted_networks()),
+        },
+        "proxy_configuration": proxy_configuration,
+        "syslog_configuration": get_syslog_configuration(),
+    }
+    current_version = sha256(
+        json.dumps(configuration, sort_keys=True).encode("ascii")).hexdigest()
+    if current_version == version:
+        return {"version": current_version}
+    else:
+        return {"version": current_version, "configuration": configuration}
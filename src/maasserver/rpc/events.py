@@ -4,9 +4,11 @@
 """RPC helpers relating to events."""
 
 __all__ = [
+    "check_event_types",
     "register_event_type",
     "send_event",
     "send_event_mac_address",
+    "send_events",
 ]
 
 from maasserver.enum import INTERFACE_TYPE
@@ -17,6 +19,10 @@ from maasserver.models import (
     Node,
 )
 from maasserver.utils.orm import transactional
+from netaddr import (
+    AddrFormatError,
+    EUI,
+)
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc.exceptions import NoSuchEventType
 from provisioningserver.utils.twisted import synchronous
@@ -122,3 +128,139 @@ def send_event_ip_address(ip_address, type_name, description, timestamp):
         Event.objects.create(
             node=node, type=event_type, description=description,
             created=timestamp)
+
+
+def _get_node_ids_by_system_id(system_ids):
+    """Map each of `system_ids` that is known to its node's ID."""
+    return dict(
+        Node.objects.filter(system_id__in=system_ids).values_list(
+            "system_id", "id"))
+
+
+def _get_node_ids_by_mac_address(mac_addresses):
+    """Map each of `mac_addresses` that is known to its node's ID.
+
+    The keys are `EUI`s, so MAC addresses can be looked up regardless of how
+    they are formatted.
+    """
+    interfaces = Interface.objects.filter(
+        type=INTERFACE_TYPE.PHYSICAL, mac_address__in=mac_addresses)
+    return {
+        EUI(mac_address.raw): node_id
+        for mac_address, node_id in interfaces.values_list(
+            "mac_address", "node_id")
+    }
+
+
+def _get_node_ids_by_ip_address(ip_addresses):
+    """Map each of `ip_addresses` that is known to its node's ID.
+
+    Like `send_event_ip_address`, the node with the lowest ID wins when an
+    address is shared by more than one node.
+    """
+    nodes = Node.objects.filter(
+        interface__ip_addresses__ip__in=ip_addresses).order_by("-id")
+    return dict(nodes.values_list("interface__ip_addresses__ip", "id"))
+
+
+def _parse_mac_address(mac_address):
+    """Return `mac_address` as an `EUI`, or `None` if it is not valid."""
+    try:
+        return EUI(mac_address)
+    except (AddrFormatError, TypeError, ValueError):
+        return None
+
+
+@synchronous
+@transactional
+def check_event_types(events):
+    """Check that the types of all `events` are registered.
+
+    for :py:class:`~provisioningserver.rpc.region.SendEvents`.
+
+    :raises NoSuchEventType: If an event's type is not registered, so that
+        the rack controller registers it again.
+    """
+    type_names = {event["type_name"] for event in events}
+    type_names.difference_update(
+        EventType.objects.filter(
+            name__in=type_names).values_list("name", flat=True))
+    if len(type_names) != 0:
+        raise NoSuchEventType.from_name(min(type_names))
+
+
+@synchronous
+@transactional
+def send_events(events, timestamp):
+    """Send a batch of events.
+
+    for :py:class:`~provisioningserver.rpc.region.SendEvents`.
+
+    The event types and nodes for the whole batch are looked up together and
+    the events are saved with a single insert. Events of an unknown type, or
+    for a node that isn't known (yet), are logged and dropped; they do not
+    cause the rest of the batch to be lost.
+    """
+    event_types = {
+        event_type.name: event_type
+        for event_type in EventType.objects.filter(
+            name__in={event["type_name"] for event in events})
+    }
+    node_ids_by_system_id = _get_node_ids_by_system_id({
+        event["system_id"] for event in events
+        if event.get("system_id") is not None
+    })
+    mac_addresses = {
+        event["mac_address"]: _parse_mac_address(event["mac_address"])
+        for event in events
+        if event.get("mac_address") is not None
+    }
+    node_ids_by_mac_address = _get_node_ids_by_mac_address({
+        str(mac_address) for mac_address in mac_addresses.values()
+        if mac_address is not None
+    })
+    node_ids_by_ip_address = _get_node_ids_by_ip_address({
+        event["ip_address"] for event in events
+        if event.get("ip_address") is not None
+    })
+
+    new_events = []
+    for event in events:
+        type_name = event["type_name"]
+        description = event["description"]
+        event_type = event_types.get(type_name)
+        if event_type is None:
+            log.warn(
+                "Event '{type}: {description}' sent with an unregistered "
+                "event type; dropping it.", type=type_name,
+                description=description)
+            continue
+        if event.get("system_id") is not None:
+            node_id = node_ids_by_system_id.get(event["system_id"])
+        elif event.get("mac_address") is not None:
+            node_id = node_ids_by_mac_address.get(
+                mac_addresses[event["mac_address"]])
+        elif event.get("ip_address") is not None:
+            node_id = node_ids_by_ip_address.get(event["ip_address"])
+        else:
+            node_id = None
+        if node_id is None:
+            # As in `send_event`, this is not an error: the cluster may be
+            # sending events for a node that is still enlisting.
+            log.debug(
+                "Event '{type}: {description}' sent for non-existent "
+                "node {node}.", type=type_name, description=description,
+                node=_describe_node(event))
+            continue
+        new_events.append(Event(
+            node_id=node_id, type=event_type, description=description,
+            created=timestamp, updated=timestamp))
+    Event.objects.bulk_create(new_events)
+
+
+def _describe_node(event):
+    """Describe how `event` identifies its node, for logging."""
+    for key in ("system_id", "mac_address", "ip_address"):
+        if event.get(key) is not None:
+            return "with %s '%s'" % (key.replace("_", " "), event[key])
+    return "(none given)"
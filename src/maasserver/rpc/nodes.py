@@ -147,6 +147,8 @@ def list_cluster_nodes_power_parameters(system_id, limit=10):
         raise NoSuchCluster.from_uuid(system_id)
 
     # Generate all the the power queries that will fit into the response.
+    # Chunked responses are not used here: rack controllers from before
+    # they were added cannot decode them, and would stop polling power.
     nodes = rack.get_bmc_accessible_nodes()
     details = _gen_cluster_nodes_power_parameters(nodes, limit)
     details = _gen_up_to_json_limit(details, 60 * (2 ** 10))  # 60kiB
@@ -6,6 +6,7 @@
 __all__ = [
     "handle_upgrade",
     "register",
+    "report_boot_images",
     "update_interfaces",
     "update_last_image_sync",
 ]
@@ -23,6 +24,7 @@ from maasserver.models import (
     Domain,
     Node,
     NodeGroupToRackController,
+    RackBootImage,
     RackController,
     RegionController,
     StaticIPAddress,
@@ -264,3 +266,27 @@ def update_last_image_sync(system_id):
     """
     RackController.objects.filter(
         system_id=system_id).update(last_image_sync=now())
+
+
+@synchronous
+@transactional
+def report_boot_images(system_id, images_hash, images=None):
+    """Record the boot images that a rack controller has.
+
+    for :py:class:`~provisioningserver.rpc.region.ReportBootImagesV2`.
+
+    :param images: The rack controller's boot images, or `None` if it only
+        sent `images_hash`.
+    :return: Whether the region has the images with `images_hash`.
+    """
+    try:
+        rack_controller = RackController.objects.get(system_id=system_id)
+    except RackController.DoesNotExist:
+        raise NoSuchNode.from_system_id(system_id)
+    if images is None:
+        return RackBootImage.objects.has_reported(
+            rack_controller, images_hash)
+    else:
+        RackBootImage.objects.update_for(
+            rack_controller, images_hash, images)
+        return True
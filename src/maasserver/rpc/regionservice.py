@@ -21,9 +21,7 @@ import uuid
 from maasserver import eventloop
 from maasserver.bootresources import get_simplestream_endpoint
 from maasserver.dns.config import get_trusted_networks
-from maasserver.models.config import Config
 from maasserver.models.node import RackController
-from maasserver.models.subnet import Subnet
 from maasserver.rpc import (
     boot,
     configuration,
@@ -33,6 +31,10 @@ from maasserver.rpc import (
     packagerepository,
     rackcontrollers,
 )
+from maasserver.rpc.events import (
+    check_event_types,
+    send_events,
+)
 from maasserver.rpc.nodes import (
     commission_node,
     create_node,
@@ -40,7 +42,6 @@ from maasserver.rpc.nodes import (
 )
 from maasserver.rpc.services import update_services
 from maasserver.security import get_shared_secret
-from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
 from netaddr import (
     AddrConversionError,
@@ -57,7 +58,10 @@ from provisioningserver.rpc import (
     exceptions,
     region,
 )
-from provisioningserver.rpc.common import RPCProtocol
+from provisioningserver.rpc.common import (
+    RPCProtocol,
+    select_connection,
+)
 from provisioningserver.rpc.exceptions import NoSuchCluster
 from provisioningserver.rpc.interfaces import IConnection
 from provisioningserver.security import calculate_digest
@@ -262,6 +266,18 @@ class Region(RPCProtocol):
         d.addCallback(lambda nodes: {"nodes": nodes})
         return d
 
+    @region.ReportBootImagesV2.responder
+    def report_boot_images_v2(self, system_id, hash, images=None):
+        """report_boot_images_v2(system_id, hash, images)
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.region.ReportBootImagesV2`.
+        """
+        d = deferToDatabase(
+            rackcontrollers.report_boot_images, system_id, hash, images)
+        d.addCallback(lambda known: {"known": known})
+        return d
+
     @region.UpdateLastImageSync.responder
     def update_last_image_sync(self, system_id):
         """update_last_image_sync()
@@ -343,6 +359,27 @@ class Region(RPCProtocol):
         # Don't wait for the record to be written.
         return succeed({})
 
+    @region.SendEvents.responder
+    def send_events(self, events):
+        """send_events()
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.region.SendEvents`.
+        """
+        timestamp = datetime.now()
+
+        def queue_events(_):
+            dbtasks = eventloop.services.getServiceNamed("database-tasks")
+            dbtasks.addTask(send_events, events, timestamp)
+            # Don't wait for the records to be written.
+            return {}
+
+        # Report unknown event types before queueing the batch; the rack
+        # then registers them again and resends it.
+        d = deferToDatabase(check_event_types, events)
+        d.addCallback(queue_events)
+        return d
+
     @region.ReportForeignDHCPServer.responder
     def report_foreign_dhcp_server(
             self, system_id, interface_name, dhcp_ip=None):
@@ -521,21 +558,7 @@ class Region(RPCProtocol):
         """
         # For consistency `system_id` is passed, but at the moment it is not
         # used to customise the proxy configuration.
-
-        @transactional
-        def get_from_db():
-            allowed_subnets = Subnet.objects.filter(allow_proxy=True)
-            cidrs = [subnet.cidr for subnet in allowed_subnets]
-            configs = Config.objects.get_configs([
-                'maas_proxy_port', 'prefer_v4_proxy', 'enable_http_proxy'])
-            return {
-                'enabled': configs['enable_http_proxy'],
-                'port': configs['maas_proxy_port'],
-                'allowed_cidrs': cidrs,
-                'prefer_v4_proxy': configs['prefer_v4_proxy'],
-            }
-
-        return deferToDatabase(get_from_db)
+        return deferToDatabase(configuration.get_proxy_configuration)
 
     @region.GetSyslogConfiguration.responder
     def get_syslog_configuration(self, system_id):
@@ -546,15 +569,18 @@ class Region(RPCProtocol):
         """
         # For consistency `system_id` is passed, but at the moment it is not
         # used to customise the syslog configuration.
+        return deferToDatabase(configuration.get_syslog_configuration)
 
-        @transactional
-        def get_from_db():
-            port = Config.objects.get_config('maas_syslog_port')
-            return {
-                'port': port,
-            }
+    @region.GetExternalServicesConfiguration.responder
+    def get_external_services_configuration(self, system_id, version=None):
+        """Get settings to use for configuring all external services.
 
-        return deferToDatabase(get_from_db)
+        Implementation of
+        :py:class:`~provisioningserver.rpc.region.GetExternalServicesConfiguration`.
+        """
+        return deferToDatabase(
+            configuration.get_external_services_configuration,
+            system_id, version=version)
 
 
 @inlineCallbacks
@@ -873,15 +899,16 @@ class RegionService(service.Service, object):
             waiters.add(d)
             return d
         else:
-            connection = random.choice(conns)
+            connection = select_connection(conns)
             return defer.succeed(connection)
 
     def _getConnectionFromIdentifiers(self, identifiers, timeout):
         """Wait up to `timeout` seconds for at least one connection from
         `identifiers`.
 
-        Returns a `Deferred` which will fire with a list of random connections
-        to each client. Only one connection per client will be returned.
+        Returns a `Deferred` which will fire with a list of the least loaded
+        connections to each client. Only one connection per client will be
+        returned.
 
         The public interface to this method is `getClientFromIdentifiers`.
         """
@@ -889,7 +916,7 @@ class RegionService(service.Service, object):
         for ident in identifiers:
             conns = list(self.connections[ident])
             if len(conns) > 0:
-                matched_connections.append(random.choice(conns))
+                matched_connections.append(select_connection(conns))
         if len(matched_connections) > 0:
             return defer.succeed(matched_connections)
         else:
@@ -1048,7 +1075,7 @@ class RegionService(service.Service, object):
 
         If more than one connection exists to that rack controller - implying
         that there are multiple rack controllers for the particular
-        cluster, for HA - one of them will be returned at random.
+        cluster, for HA - the least loaded of them will be returned.
 
         :param system_id: The system_id - as a string - of the rack controller
             that a connection is wanted for.
@@ -1076,7 +1103,7 @@ class RegionService(service.Service, object):
         identifiers.
 
         If more than one connection exists to that given `identifiers`, then
-        one of them will be returned at random.
+        the least loaded of them will be returned.
 
         :param identifiers: List of system_id's of the rack controller
             that a connection is wanted for.
@@ -1094,7 +1121,7 @@ class RegionService(service.Service, object):
                 "available." % ','.join(identifiers))
 
         def cb_client(conns):
-            connection = random.choice(conns)
+            connection = select_connection(conns)
             return RackClient(connection, self.connectionsCache[connection])
 
         return d.addCallbacks(cb_client, cancelled)
@@ -1107,7 +1134,7 @@ class RegionService(service.Service, object):
             return RackClient(connection, self.connectionsCache[connection])
 
         return [
-            _client(random.choice(list(connections)))
+            _client(select_connection(connections))
             for connections in self.connections.values()
             if len(connections) > 0
         ]
@@ -1125,5 +1152,5 @@ class RegionService(service.Service, object):
             # The connection object is a set of RegionServer objects.
             # Make sure a sane set was returned.
             assert len(connection) > 0, "Connection set empty."
-            connection = random.choice(list(connection))
+            connection = select_connection(connection)
             return RackClient(connection, self.connectionsCache[connection])
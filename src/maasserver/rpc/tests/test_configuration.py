@@ -9,9 +9,18 @@ from urllib.parse import urlparse
 
 from maasserver.models.config import Config
 from maasserver.models.signals import bootsources
-from maasserver.rpc.configuration import get_proxies
+from maasserver.rpc.configuration import (
+    get_external_services_configuration,
+    get_proxies,
+)
+from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
-from maastesting.factory import factory
+from provisioningserver.rpc.exceptions import NoSuchNode
+from testtools.matchers import (
+    ContainsAll,
+    Equals,
+    Not,
+)
 
 
 class TestGetProxies(MAASServerTestCase):
@@ -44,3 +53,48 @@ class TestGetProxies(MAASServerTestCase):
         self.assertEqual(
             {"http": None, "https": None},
             get_proxies())
+
+
+class TestGetExternalServicesConfiguration(MAASServerTestCase):
+
+    def test_returns_configuration_and_version(self):
+        rack = factory.make_RackController()
+        subnet = factory.make_Subnet(allow_proxy=True)
+        Config.objects.set_config("maas_syslog_port", 5555)
+        response = get_external_services_configuration(rack.system_id)
+        self.assertThat(response["version"], Not(Equals("")))
+        configuration = response["configuration"]
+        self.assertThat(configuration, ContainsAll([
+            "controller_type", "time_configuration", "dns_configuration",
+            "proxy_configuration", "syslog_configuration"]))
+        self.assertEqual(
+            {"is_region": False, "is_rack": True},
+            configuration["controller_type"])
+        self.assertEqual(
+            [subnet.cidr],
+            configuration["proxy_configuration"]["allowed_cidrs"])
+        self.assertEqual({"port": 5555}, configuration["syslog_configuration"])
+
+    def test_returns_only_version_when_not_modified(self):
+        rack = factory.make_RackController()
+        version = get_external_services_configuration(
+            rack.system_id)["version"]
+        self.assertEqual(
+            {"version": version},
+            get_external_services_configuration(rack.system_id, version))
+
+    def test_version_changes_with_configuration(self):
+        rack = factory.make_RackController()
+        version = get_external_services_configuration(
+            rack.system_id)["version"]
+        Config.objects.set_config("maas_syslog_port", 5555)
+        response = get_external_services_configuration(
+            rack.system_id, version)
+        self.assertNotEqual(version, response["version"])
+        self.assertEqual(
+            {"port": 5555}, response["configuration"]["syslog_configuration"])
+
+    def test_raises_NoSuchNode_for_unknown_node(self):
+        self.assertRaises(
+            NoSuchNode, get_external_services_configuration,
+            factory.make_name("system_id"))
@@ -147,3 +147,71 @@ class TestSendEventIPAddress(MAASServerTestCase):
         Event.objects.get(
             node=node, type=event_type, description=description,
             created=timestamp)
+
+
+class TestCheckEventTypes(MAASServerTestCase):
+
+    def test__accepts_registered_event_types(self):
+        event_type = factory.make_EventType()
+        self.assertIsNone(events.check_event_types([
+            {"type_name": event_type.name},
+            {"type_name": event_type.name},
+        ]))
+
+    def test__raises_for_unregistered_event_type(self):
+        event_type = factory.make_EventType()
+        self.assertRaises(
+            NoSuchEventType, events.check_event_types, [
+                {"type_name": event_type.name},
+                {"type_name": factory.make_name('type')},
+            ])
+
+
+class TestSendEvents(MAASServerTestCase):
+
+    def make_event(self, event_type, **node):
+        event = {
+            "system_id": None, "mac_address": None, "ip_address": None,
+            "type_name": event_type.name,
+            "description": factory.make_name('description'),
+        }
+        event.update(node)
+        return event
+
+    def test__creates_events_for_nodes(self):
+        event_type = factory.make_EventType()
+        node = factory.make_Node(interface=True)
+        interface = node.interface_set.first()
+        ip = factory.make_StaticIPAddress(interface=interface)
+        timestamp = datetime.datetime.utcnow()
+        batch = [
+            self.make_event(event_type, system_id=node.system_id),
+            self.make_event(
+                event_type, mac_address=interface.mac_address.raw.upper()),
+            self.make_event(event_type, ip_address=ip.ip),
+        ]
+        events.send_events(batch, timestamp)
+        self.assertItemsEqual(
+            [(node.id, event_type.id, event["description"], timestamp)
+             for event in batch],
+            Event.objects.values_list(
+                "node_id", "type_id", "description", "created"))
+
+    def test__skips_unknown_nodes_and_event_types(self):
+        event_type = factory.make_EventType()
+        node = factory.make_Node()
+        timestamp = datetime.datetime.utcnow()
+        known = self.make_event(event_type, system_id=node.system_id)
+        events.send_events([
+            self.make_event(
+                event_type, system_id=factory.make_name('system_id')),
+            self.make_event(
+                event_type, mac_address=factory.make_mac_address()),
+            self.make_event(
+                event_type, ip_address=factory.make_ip_address()),
+            dict(known, type_name=factory.make_name('type')),
+            known,
+        ], timestamp)
+        self.assertItemsEqual(
+            [(node.id, known["description"])],
+            Event.objects.values_list("node_id", "description"))
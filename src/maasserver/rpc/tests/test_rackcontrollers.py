@@ -19,9 +19,11 @@ from maasserver.enum import (
     IPADDRESS_TYPE,
     NODE_TYPE,
 )
+from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
 from maasserver.models import (
     Node,
     NodeGroupToRackController,
+    RackBootImage,
     RackController,
     RegionController,
 )
@@ -31,6 +33,7 @@ from maasserver.rpc import rackcontrollers
 from maasserver.rpc.rackcontrollers import (
     handle_upgrade,
     register,
+    report_boot_images,
     report_neighbours,
     update_foreign_dhcp,
     update_interfaces,
@@ -43,6 +46,7 @@ from maastesting.matchers import (
     DocTestMatches,
     MockCalledOnceWith,
 )
+from provisioningserver.rpc.exceptions import NoSuchNode
 from testtools.matchers import (
     IsInstance,
     MatchesAll,
@@ -509,3 +513,26 @@ class TestUpdateLastImageSync(MAASServerTestCase):
 
         self.assertNotEqual(
             previous_sync, reload_object(rack).last_image_sync)
+
+
+class TestReportBootImages(MAASServerTestCase):
+
+    def test__stores_images(self):
+        rack = factory.make_RackController()
+        images = [make_rpc_boot_image() for _ in range(3)]
+        self.assertTrue(report_boot_images(rack.system_id, "hash", images))
+        self.assertEqual(
+            {rack.system_id: images},
+            RackBootImage.objects.get_reported_images([rack.system_id]))
+
+    def test__returns_whether_hash_is_known(self):
+        rack = factory.make_RackController()
+        self.assertFalse(report_boot_images(rack.system_id, "hash"))
+        report_boot_images(rack.system_id, "hash", [make_rpc_boot_image()])
+        self.assertTrue(report_boot_images(rack.system_id, "hash"))
+        self.assertFalse(report_boot_images(rack.system_id, "other"))
+
+    def test__raises_NoSuchNode_for_unknown_rack(self):
+        self.assertRaises(
+            NoSuchNode, report_boot_images, factory.make_name("system_id"),
+            "hash")
@@ -926,6 +926,21 @@ class TestRegionService(MAASTestCase):
 
         return service.getClientFor(uuid).addCallback(check)
 
+    @wait_for_reactor
+    def test_getClientFor_returns_least_loaded_connection(self):
+        slow, fast = DummyConnection(), DummyConnection()
+        slow.inFlight, slow.latency = 1, 2.0
+        fast.inFlight, fast.latency = 3, 0.1
+
+        service = RegionService(sentinel.ipcWorker)
+        uuid = factory.make_UUID()
+        service.connections[uuid].update({slow, fast})
+
+        def check(client):
+            self.assertThat(client, Equals(RackClient(fast, {})))
+
+        return service.getClientFor(uuid).addCallback(check)
+
     @wait_for_reactor
     def test_getAllClients_empty(self):
         service = RegionService(sentinel.ipcWorker)
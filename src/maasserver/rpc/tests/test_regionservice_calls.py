@@ -23,6 +23,7 @@ from urllib.parse import urlparse
 from crochet import wait_for
 from maasserver import eventloop
 from maasserver.bootresources import get_simplestream_endpoint
+from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
 from maasserver.dns.config import get_trusted_networks
 from maasserver.enum import (
     INTERFACE_TYPE,
@@ -35,6 +36,7 @@ from maasserver.models import (
     EventType,
     Node,
     PackageRepository,
+    RackBootImage,
 )
 from maasserver.models.interface import PhysicalInterface
 from maasserver.models.signals import bootsources
@@ -70,6 +72,7 @@ from maastesting.testcase import MAASTestCase
 from maastesting.twisted import TwistedLoggerFixture
 from provisioningserver.rpc.exceptions import (
     NoSuchCluster,
+    NoSuchEventType,
     NoSuchNode,
 )
 from provisioningserver.rpc.region import (
@@ -91,12 +94,14 @@ from provisioningserver.rpc.region import (
     MarkNodeFailed,
     RegisterEventType,
     ReportBootImages,
+    ReportBootImagesV2,
     ReportForeignDHCPServer,
     ReportNeighbours,
     RequestNodeInfoByMACAddress,
     RequestRackRefresh,
     SendEvent,
     SendEventMACAddress,
+    SendEvents,
     UpdateInterfaces,
     UpdateLease,
     UpdateNodePowerState,
@@ -264,6 +269,40 @@ class TestRegionProtocol_ReportBootImages(MAASTestCase):
         return d.addCallback(check)
 
 
+class TestRegionProtocol_ReportBootImagesV2(MAASTransactionServerTestCase):
+
+    def test_report_boot_images_v2_is_registered(self):
+        protocol = Region()
+        responder = protocol.locateResponder(ReportBootImagesV2.commandName)
+        self.assertIsNotNone(responder)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__stores_images_and_recognises_hash(self):
+        rack = yield deferToDatabase(factory.make_RackController)
+        images = [make_rpc_boot_image()]
+
+        response = yield call_responder(Region(), ReportBootImagesV2, {
+            "system_id": rack.system_id, "hash": "hash", "images": images,
+        })
+        self.assertEqual({"known": True}, response)
+
+        response = yield call_responder(Region(), ReportBootImagesV2, {
+            "system_id": rack.system_id, "hash": "hash",
+        })
+        self.assertEqual({"known": True}, response)
+
+        response = yield call_responder(Region(), ReportBootImagesV2, {
+            "system_id": rack.system_id, "hash": "other",
+        })
+        self.assertEqual({"known": False}, response)
+
+        reported = yield deferToDatabase(
+            transactional(RackBootImage.objects.get_reported_images),
+            [rack.system_id])
+        self.assertEqual({rack.system_id: images}, reported)
+
+
 class TestRegionProtocol_UpdateLease(MAASTransactionServerTestCase):
 
     def setUp(self):
@@ -1005,6 +1044,87 @@ class TestRegionProtocol_SendEventMACAddress(MAASTransactionServerTestCase):
                 type=name, description=event_description, mac=mac_address))
 
 
+class TestRegionProtocol_SendEvents(MAASTransactionServerTestCase):
+
+    def setUp(self):
+        super(TestRegionProtocol_SendEvents, self).setUp()
+        self.useFixture(RegionEventLoopFixture("database-tasks"))
+
+    def test_send_events_is_registered(self):
+        protocol = Region()
+        responder = protocol.locateResponder(SendEvents.commandName)
+        self.assertIsNotNone(responder)
+
+    @transactional
+    def get_events(self):
+        return list(Event.objects.values_list(
+            "node__system_id", "type__name", "description", "created"))
+
+    @transactional
+    def create_event_type(self):
+        return factory.make_EventType().name
+
+    @transactional
+    def create_node(self):
+        return factory.make_Node().system_id
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_send_events_stores_events_with_timestamp_received(self):
+        timestamp = datetime.now() - timedelta(seconds=randint(99, 99999))
+        self.patch(regionservice, "datetime").now.return_value = timestamp
+
+        event_type = yield deferToDatabase(self.create_event_type)
+        system_ids = []
+        for _ in range(3):
+            system_id = yield deferToDatabase(self.create_node)
+            system_ids.append(system_id)
+        descriptions = [factory.make_name('description') for _ in system_ids]
+
+        yield eventloop.start()
+        try:
+            response = yield call_responder(
+                Region(), SendEvents, {
+                    'events': [
+                        {'system_id': system_id, 'type_name': event_type,
+                         'description': description}
+                        for system_id, description in zip(
+                            system_ids, descriptions)
+                    ],
+                })
+        finally:
+            yield eventloop.reset()
+
+        self.assertEqual({}, response)
+        events = yield deferToDatabase(self.get_events)
+        self.assertItemsEqual([
+            (system_id, event_type, description, timestamp)
+            for system_id, description in zip(system_ids, descriptions)
+        ], events)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_send_events_raises_if_event_type_unknown(self):
+        system_id = yield deferToDatabase(self.create_node)
+
+        yield eventloop.start()
+        try:
+            d = call_responder(
+                Region(), SendEvents, {
+                    'events': [
+                        {'system_id': system_id,
+                         'type_name': factory.make_name('type'),
+                         'description': factory.make_name('description')},
+                    ],
+                })
+            yield assert_fails_with(d, NoSuchEventType)
+        finally:
+            yield eventloop.reset()
+
+        events = yield deferToDatabase(self.get_events)
+        self.assertEqual([], events)
+
+
 class TestRegionProtocol_UpdateServices(MAASTransactionServerTestCase):
 
     def setUp(self):
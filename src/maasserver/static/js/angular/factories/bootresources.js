@@ -4,14 +4,15 @@
  * MAAS BootResource Manager
  *
  * Manager for the boot resources. This manager is unique from all the other
- * managers because it uses polling instead of having the region push the
- * information.
+ * managers because the region pushes the whole status of the boot resources,
+ * instead of the objects that changed, and it also polls.
  *
  * Why is it polling?
  * The boot resource information is split between the region controller and
- * all rack controllers. The region controller does not cache any information
- * about a rack controllers images it contacts the rack as its source of truth.
- * This means that the client needs to use polling so the region controller
+ * all rack controllers. The region controller pushes the status when the
+ * boot resources in the database change, but it is not told when the images
+ * on a rack controller change; it contacts the rack as its source of truth.
+ * This means that the client also needs to poll so the region controller
  * can ask each rack controller what is the status of your images.
  */
 
@@ -40,8 +41,20 @@ function BootResourcesManager($q, $timeout, RegionConnection, ErrorService) {
     // Amount of time in milliseconds the manager should wait to poll
     // for new data when the retrieved data is empty.
     this._pollEmptyTimeout = 3000;
+
+    // Listen for the status pushed by the region.
+    var self = this;
+    RegionConnection.registerNotifier("bootresource", function(action, data) {
+      self.onNotify(action, data);
+    });
   }
 
+  // Called when the region pushes the status of the boot resources.
+  BootResourcesManager.prototype.onNotify = function(action, data) {
+    angular.copy(angular.fromJson(data), this._data);
+    this._loaded = true;
+  };
+
   // Return the data.
   BootResourcesManager.prototype.getData = function() {
     return this._data;
@@ -40,6 +40,24 @@ describe("BootResourcesManager", function() {
     expect(BootResourcesManager._pollEmptyTimeout).toBe(3000);
   });
 
+  describe("onNotify", function() {
+    it("sets _data from pushed status", function() {
+      var newData = { testing: makeName("data") };
+      BootResourcesManager.onNotify("update", angular.toJson(newData));
+      expect(BootResourcesManager._data).toEqual(newData);
+      expect(BootResourcesManager._loaded).toBe(true);
+    });
+
+    it("is registered as the bootresource notifier", function() {
+      var newData = { testing: makeName("data") };
+      var notifiers = RegionConnection.notifiers.bootresource;
+      notifiers.forEach(function(func) {
+        func("update", angular.toJson(newData));
+      });
+      expect(BootResourcesManager._data).toEqual(newData);
+    });
+  });
+
   describe("getData", function() {
     it("returns _data", function() {
       expect(BootResourcesManager.getData()).toBe(BootResourcesManager._data);
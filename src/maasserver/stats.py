@@ -11,9 +11,9 @@ __all__ = [
 
 from collections import defaultdict
 from datetime import timedelta
+import time
 
 from django.db.models import (
-    Count,
     Sum,
     Value,
 )
@@ -22,8 +22,11 @@ from maasserver.enum import IPRANGE_TYPE
 from maasserver.models import Config
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
+from netaddr import (
+    IPAddress,
+    IPNetwork,
+)
 from provisioningserver.logger import LegacyLogger
-from provisioningserver.utils.network import IPRangeStatistics
 from twisted.application.internet import TimerService
 
 
@@ -43,9 +46,11 @@ from maasserver.models import (
     Machine,
     Node,
     Fabric,
+    IPRange,
     VLAN,
     Space,
     StaticIPAddress,
+    StaticRoute,
     Subnet,
     BMC,
     Pod,
@@ -152,54 +157,152 @@ def get_subnets_stats():
         }
 
 
-def get_subnets_utilisation_stats():
-    """Return a dict mapping subnet CIDRs to their utilisation details."""
-    ips_count = _get_subnets_ipaddress_count()
+# The statistics most recently computed by `get_subnets_utilisation_stats`,
+# and when they were computed, as (time, stats).
+_subnets_utilisation_stats = None, None
+
+
+def get_subnets_utilisation_stats(max_age=0):
+    """Return a dict mapping subnet CIDRs to their utilisation details.
+
+    :param max_age: Return the statistics computed by an earlier call if they
+        are younger than this, in seconds.
+    """
+    global _subnets_utilisation_stats
+    computed, stats = _subnets_utilisation_stats
+    now = time.monotonic()
+    if computed is None or now - computed >= max_age:
+        stats = _compute_subnets_utilisation_stats()
+        _subnets_utilisation_stats = now, stats
+    return stats
+
+
+def _compute_subnets_utilisation_stats():
+    """Compute the utilisation details of every subnet.
+
+    This works out the same as `Subnet.get_iprange_usage` for each subnet,
+    but loads the ranges and addresses of all subnets in a few queries.
+    """
+    networks, used = _get_subnets_used_ranges()
+    ips_count = defaultdict(lambda: defaultdict(int))
+    for subnet_id, ip, alloc_type in StaticIPAddress.objects.filter(
+            ip__isnull=False, subnet__isnull=False).values_list(
+            'subnet_id', 'ip', 'alloc_type'):
+        ips_count[subnet_id][alloc_type] += 1
+        if ip:
+            ip = IPAddress(ip)
+            if ip in networks[subnet_id]:
+                used[subnet_id].append((ip.value, ip.value, 'assigned-ip'))
 
     stats = {}
-    for subnet in Subnet.objects.all():
-        full_range = subnet.get_iprange_usage()
-        range_stats = IPRangeStatistics(subnet.get_iprange_usage())
-        static = 0
-        reserved_available = 0
-        reserved_used = 0
-        dynamic_available = 0
-        dynamic_used = 0
-        for rng in full_range.ranges:
-            if IPRANGE_TYPE.DYNAMIC in rng.purpose:
-                dynamic_available += rng.num_addresses
-            elif IPRANGE_TYPE.RESERVED in rng.purpose:
-                reserved_available += rng.num_addresses
-            elif 'assigned-ip' in rng.purpose:
-                static += rng.num_addresses
+    for subnet_id, network in networks.items():
+        subnet_stats = _get_subnet_utilisation_stats(
+            network, used[subnet_id])
         # allocated IPs
-        subnet_ips = ips_count[subnet.id]
-        reserved_used += subnet_ips[IPADDRESS_TYPE.USER_RESERVED]
-        reserved_available -= reserved_used
-        dynamic_used += (
+        subnet_ips = ips_count[subnet_id]
+        reserved_used = subnet_ips[IPADDRESS_TYPE.USER_RESERVED]
+        subnet_stats['reserved_used'] = reserved_used
+        subnet_stats['reserved_available'] -= reserved_used
+        dynamic_used = (
             subnet_ips[IPADDRESS_TYPE.AUTO] +
             subnet_ips[IPADDRESS_TYPE.DHCP] +
             subnet_ips[IPADDRESS_TYPE.DISCOVERED])
-        dynamic_available -= dynamic_used
-        stats[subnet.cidr] = {
-            'available': range_stats.num_available,
-            'unavailable': range_stats.num_unavailable,
-            'dynamic_available': dynamic_available,
-            'dynamic_used': dynamic_used,
-            'static': static,
-            'reserved_available': reserved_available,
-            'reserved_used': reserved_used
-        }
+        subnet_stats['dynamic_used'] = dynamic_used
+        subnet_stats['dynamic_available'] -= dynamic_used
+        stats[str(network.cidr)] = subnet_stats
     return stats
 
 
-def _get_subnets_ipaddress_count():
-    counts = defaultdict(lambda: defaultdict(int))
-    rows = StaticIPAddress.objects.values('subnet_id', 'alloc_type').filter(
-        ip__isnull=False).annotate(count=Count('ip'))
-    for row in rows:
-        counts[row['subnet_id']][row['alloc_type']] = row['count']
-    return counts
+def _get_subnets_used_ranges():
+    """Return the network of each subnet, and the ranges used in it.
+
+    The ranges are those of `Subnet.get_ipranges_in_use` apart from the
+    allocated addresses, as (first, last, purpose) tuples.
+    """
+    networks = {}
+    used = defaultdict(list)
+    for subnet_id, cidr, gateway_ip, dns_servers in (
+            Subnet.objects.values_list(
+                'id', 'cidr', 'gateway_ip', 'dns_servers')):
+        network = networks[subnet_id] = IPNetwork(cidr)
+        ranges = used[subnet_id]
+        if network.version == 6:
+            if network.prefixlen == 64:
+                ranges.append((
+                    network.first + 1, network.first + 0xFFFFFFFF,
+                    IPRANGE_TYPE.RESERVED))
+            if network.prefixlen < 127:
+                ranges.append((
+                    network.first, network.first, 'rfc-4291-2.6.1'))
+        if gateway_ip and gateway_ip in network:
+            ip = IPAddress(gateway_ip).value
+            ranges.append((ip, ip, 'gateway-ip'))
+        for server in dns_servers or []:
+            if server in network:
+                ip = IPAddress(server).value
+                ranges.append((ip, ip, 'dns-server'))
+    for subnet_id, gateway_ip in StaticRoute.objects.values_list(
+            'source_id', 'gateway_ip'):
+        ip = IPAddress(gateway_ip).value
+        used[subnet_id].append((ip, ip, 'gateway-ip'))
+    for subnet_id, purpose, start_ip, end_ip in IPRange.objects.filter(
+            type__in=[IPRANGE_TYPE.DYNAMIC, IPRANGE_TYPE.RESERVED]
+            ).values_list('subnet_id', 'type', 'start_ip', 'end_ip'):
+        used[subnet_id].append((
+            IPAddress(start_ip).value, IPAddress(end_ip).value, purpose))
+    return networks, used
+
+
+def _get_subnet_utilisation_stats(network, used):
+    """Return the utilisation of `network` given the `used` ranges in it.
+
+    The ranges are swept in order, merging those that overlap, the same way
+    as `MAASIPSet`; the gaps between them are available.
+    """
+    merged = []
+    for first, last, purpose in sorted(used):
+        if len(merged) != 0 and first <= merged[-1][1]:
+            previous_first, previous_last, purposes = merged[-1]
+            purposes.add(purpose)
+            merged[-1] = previous_first, max(last, previous_last), purposes
+        else:
+            merged.append((first, last, {purpose}))
+
+    # Skip the network address and the IPv4 broadcast address, as
+    # `MAASIPSet.get_unused_ranges` does.
+    prefixlen = network.prefixlen
+    if network.version == 4:
+        single = prefixlen in (31, 32)
+        start = network.first if single else network.first + 1
+        end = network.last if single else network.last - 1
+    else:
+        single = prefixlen in (127, 128)
+        start = network.first if single else network.first + 1
+        end = network.last
+
+    stats = {
+        'available': 0,
+        'unavailable': 0,
+        'dynamic_available': 0,
+        'reserved_available': 0,
+        'static': 0,
+    }
+    candidate_start = start
+    for first, last, purposes in merged:
+        if first > candidate_start:
+            stats['available'] += first - candidate_start
+        candidate_start = last + 1
+        num_addresses = last - first + 1
+        stats['unavailable'] += num_addresses
+        if IPRANGE_TYPE.DYNAMIC in purposes:
+            stats['dynamic_available'] += num_addresses
+        elif IPRANGE_TYPE.RESERVED in purposes:
+            stats['reserved_available'] += num_addresses
+        elif 'assigned-ip' in purposes:
+            stats['static'] += num_addresses
+    if end >= candidate_start:
+        stats['available'] += end - candidate_start + 1
+    return stats
 
 
 def get_maas_stats():
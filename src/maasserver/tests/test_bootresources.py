@@ -69,6 +69,7 @@ from maasserver.models import (
     BootSource,
     Config,
     LargeFile,
+    RackBootImage,
     signals,
 )
 from maasserver.models.signals.testing import SignalsDisabled
@@ -2232,6 +2233,31 @@ class TestImportResourcesProgressServiceAsync(MAASTransactionServerTestCase):
         cluster_rpc.ListBootImages.return_value = succeed(response)
         self.assertTrue(service.are_boot_images_available_in_any_rack())
 
+    def test__are_boot_images_available_in_any_rack_reported(self):
+        # Import the websocket handlers now: merely defining DeviceHandler,
+        # e.g., causes a database access, which will crash if it happens
+        # inside the reactor thread where database access is forbidden and
+        # prevented. My own opinion is that a class definition should not
+        # cause a database access and we ought to fix that.
+        import maasserver.websockets.handlers  # noqa
+
+        rack_controller = factory.make_RackController()
+        service = bootresources.ImportResourcesProgressService()
+
+        self.useFixture(RegionEventLoopFixture("rpc"))
+        self.useFixture(RunningEventLoopFixture())
+        region_rpc = MockLiveRegionToClusterRPCFixture()
+        self.useFixture(region_rpc)
+        cluster_rpc = region_rpc.makeCluster(rack_controller, ListBootImagesV2)
+
+        # A rack controller that has reported its boot images to the region
+        # is not asked for them.
+        RackBootImage.objects.update_for(
+            rack_controller, factory.make_name("hash"),
+            [make_rpc_boot_image()])
+        self.assertTrue(service.are_boot_images_available_in_any_rack())
+        self.assertThat(cluster_rpc.ListBootImagesV2, MockNotCalled())
+
 
 class TestBootResourceRepoWriter(MAASServerTestCase):
     """Tests for `BootResourceRepoWriter`."""
@@ -0,0 +1,148 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.event_retention`."""
+
+__all__ = []
+
+from datetime import timedelta
+import logging
+from unittest.mock import (
+    call,
+    sentinel,
+)
+
+from maasserver import event_retention
+from maasserver.models import Config
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.matchers import (
+    DocTestMatches,
+    MockCallsMatch,
+    MockNotCalled,
+)
+from maastesting.runtest import MAASCrochetRunTest
+from maastesting.testcase import MAASTestCase
+from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.events import AUDIT
+from twisted.internet.defer import (
+    fail,
+    succeed,
+)
+from twisted.internet.task import Clock
+
+
+class TestEventRetentionService(MAASTestCase):
+    """Tests for `EventRetentionService`."""
+
+    run_tests_with = MAASCrochetRunTest
+
+    def test_deletes_expired_events_in_batches(self):
+        deferToDatabase = self.patch(event_retention, "deferToDatabase")
+        service = event_retention.EventRetentionService()
+        service.clock = clock = Clock()
+        service.batchSize = 2
+        expired = [
+            ([sentinel.debug], sentinel.cutoff, None),
+            ([sentinel.info], None, sentinel.max_id),
+        ]
+        deferToDatabase.side_effect = [
+            succeed(expired), succeed(2), succeed(1), succeed(0)]
+
+        service.startService()
+        self.assertThat(deferToDatabase, MockNotCalled())
+        clock.advance(service.interval)
+        # The first batch was full so the service pauses before the next.
+        self.assertEqual(2, deferToDatabase.call_count)
+        clock.advance(service.batchPause)
+        service.stopService()
+
+        delete = event_retention.delete_expired_events
+        self.assertThat(deferToDatabase, MockCallsMatch(
+            call(event_retention.get_expired_events),
+            call(delete, [sentinel.debug], sentinel.cutoff, None, 2),
+            call(delete, [sentinel.debug], sentinel.cutoff, None, 2),
+            call(delete, [sentinel.info], None, sentinel.max_id, 2),
+        ))
+        self.assertFalse(service.running)
+
+    def test_failures_are_logged(self):
+        deferToDatabase = self.patch(event_retention, "deferToDatabase")
+        deferToDatabase.return_value = fail(factory.make_exception())
+        service = event_retention.EventRetentionService()
+        service.clock = clock = Clock()
+
+        with TwistedLoggerFixture() as logger:
+            service.startService()
+            clock.advance(service.interval)
+            service.stopService()
+
+        self.assertThat(logger.output, DocTestMatches(
+            """\
+            Failure when deleting expired events.
+            Traceback (most recent call last):...
+            Failure: maastesting.factory.TestException#...
+            """))
+        self.assertFalse(service.running)
+
+
+class TestGetExpiredEvents(MAASServerTestCase):
+    """Tests for `get_expired_events`."""
+
+    def test_returns_cutoff_for_each_class_of_event(self):
+        Config.objects.set_config('event_retention_days', 20)
+        Config.objects.set_config('debug_event_retention_days', 10)
+        Config.objects.set_config('audit_event_retention_days', 300)
+        info = factory.make_EventType(level=logging.INFO)
+        error = factory.make_EventType(level=logging.ERROR)
+        debug = factory.make_EventType(level=logging.DEBUG)
+        audit = factory.make_EventType(level=AUDIT)
+        now = self.patch(event_retention, "now")
+        now.return_value = factory.make_date()
+
+        expired = {
+            cutoff: set(type_ids) for type_ids, cutoff, _ in (
+                event_retention.get_expired_events())
+        }
+
+        self.assertEqual(3, len(expired))
+        self.assertTrue(
+            expired[now.return_value - timedelta(days=20)].issuperset(
+                {info.id, error.id}))
+        self.assertIn(
+            debug.id, expired[now.return_value - timedelta(days=10)])
+        self.assertIn(
+            audit.id, expired[now.return_value - timedelta(days=300)])
+
+    def test_keeps_events_forever_by_setting_zero_days(self):
+        for name in (
+                'event_retention_days', 'debug_event_retention_days',
+                'audit_event_retention_days'):
+            Config.objects.set_config(name, 0)
+        factory.make_EventType(level=logging.INFO)
+        factory.make_EventType(level=logging.DEBUG)
+        factory.make_EventType(level=AUDIT)
+        self.assertEqual([], event_retention.get_expired_events())
+
+    def test_returns_max_id_for_count_excluding_audit_events(self):
+        for name in (
+                'event_retention_days', 'debug_event_retention_days',
+                'audit_event_retention_days'):
+            Config.objects.set_config(name, 0)
+        Config.objects.set_config('event_retention_count', 1)
+        info = factory.make_EventType(level=logging.INFO)
+        debug = factory.make_EventType(level=logging.DEBUG)
+        audit = factory.make_EventType(level=AUDIT)
+        older = factory.make_Event(type=debug)
+        factory.make_Event(type=info)
+        factory.make_Event(type=audit)
+
+        expired = event_retention.get_expired_events()
+
+        self.assertEqual(1, len(expired))
+        [(type_ids, cutoff, max_id)] = expired
+        self.assertIn(info.id, type_ids)
+        self.assertIn(debug.id, type_ids)
+        self.assertNotIn(audit.id, type_ids)
+        self.assertIsNone(cutoff)
+        self.assertEqual(older.id, max_id)
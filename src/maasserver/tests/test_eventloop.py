@@ -16,6 +16,7 @@ from crochet import wait_for
 from django.db import connections
 from maasserver import (
     bootresources,
+    event_retention,
     eventloop,
     ipc,
     nonces_cleanup,
@@ -367,6 +368,17 @@ class TestFactories(MAASServerTestCase):
         self.assertTrue(
             eventloop.loop.factories["nonce-cleanup"]["only_on_master"])
 
+    def test_make_EventRetentionService(self):
+        service = eventloop.make_EventRetentionService()
+        self.assertThat(service, IsInstance(
+            event_retention.EventRetentionService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_EventRetentionService,
+            eventloop.loop.factories["event-retention"]["factory"])
+        self.assertTrue(
+            eventloop.loop.factories["event-retention"]["only_on_master"])
+
     def test_make_StatusMonitorService(self):
         service = eventloop.make_StatusMonitorService()
         self.assertThat(service, IsInstance(
@@ -475,18 +487,16 @@ class TestFactories(MAASServerTestCase):
             eventloop.loop.factories["service-monitor"]["only_on_master"])
 
     def test_make_StatusWorkerService(self):
-        service = eventloop.make_StatusWorkerService(
-            sentinel.dbtasks)
+        service = eventloop.make_StatusWorkerService()
         self.assertThat(service, IsInstance(
             api_twisted.StatusWorkerService))
         # It is registered as a factory in RegionEventLoop.
         self.assertIs(
             eventloop.make_StatusWorkerService,
             eventloop.loop.factories["status-worker"]["factory"])
-        # Has a dependency of database-tasks.
+        # Has no dependencies.
         self.assertEquals(
-            ["database-tasks"],
-            eventloop.loop.factories["status-worker"]["requires"])
+            [], eventloop.loop.factories["status-worker"]["requires"])
         self.assertFalse(
             eventloop.loop.factories["status-worker"]["only_on_master"])
 
@@ -538,16 +548,17 @@ class TestFactories(MAASServerTestCase):
             eventloop.loop.factories["workers"]["not_all_in_one"])
 
     def test_make_IPCMasterService(self):
-        service = eventloop.make_IPCMasterService()
+        service = eventloop.make_IPCMasterService(sentinel.listener)
         self.assertThat(service, IsInstance(
             ipc.IPCMasterService))
+        self.assertIs(sentinel.listener, service.postgresListener)
         # It is registered as a factory in RegionEventLoop.
         self.assertIs(
             eventloop.make_IPCMasterService,
             eventloop.loop.factories["ipc-master"]["factory"])
-        # Has a no dependencies.
+        # Has a dependency of postgres-listener.
         self.assertEquals(
-            [],
+            ["postgres-listener-master"],
             eventloop.loop.factories["ipc-master"]["requires"])
         # Has an optional dependency on workers.
         self.assertEquals(
@@ -571,6 +582,23 @@ class TestFactories(MAASServerTestCase):
         self.assertFalse(
             eventloop.loop.factories["ipc-worker"]["only_on_master"])
 
+    def test_make_IPCWorkerListenerService(self):
+        service = eventloop.make_IPCWorkerListenerService(sentinel.ipcWorker)
+        self.assertThat(service, IsInstance(
+            ipc.IPCWorkerListenerService))
+        self.assertIs(sentinel.ipcWorker, service.ipcWorker)
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_IPCWorkerListenerService,
+            eventloop.loop.factories["postgres-listener-worker"]["factory"])
+        # Has a dependency of ipc-worker.
+        self.assertEquals(
+            ["ipc-worker"],
+            eventloop.loop.factories["postgres-listener-worker"]["requires"])
+        self.assertFalse(
+            eventloop.loop.factories[
+                "postgres-listener-worker"]["only_on_master"])
+
     def test_make_PrometheusExporterService(self):
         service = eventloop.make_PrometheusExporterService()
         self.assertIsInstance(service, StreamServerEndpointService)
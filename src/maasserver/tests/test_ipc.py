@@ -8,7 +8,11 @@ __all__ = []
 from datetime import timedelta
 import os
 import random
-from unittest.mock import MagicMock
+from unittest.mock import (
+    call,
+    MagicMock,
+    sentinel,
+)
 import uuid
 
 from crochet import wait_for
@@ -18,7 +22,17 @@ from maasserver.enum import SERVICE_STATUS
 from maasserver.ipc import (
     get_ipc_socket_path,
     IPCMasterService,
+    IPCWorkerListenerService,
+    IPCWorker,
     IPCWorkerService,
+    ListenerEvent,
+    ListenerNotify,
+    ListenerRegister,
+    ListenerUnregister,
+)
+from maasserver.listener import (
+    PostgresListenerRegistrationError,
+    PostgresListenerUnregistrationError,
 )
 from maasserver.models import timestampedmodel
 from maasserver.models.node import RegionController
@@ -31,12 +45,18 @@ from maasserver.models.service import Service
 from maasserver.models.timestampedmodel import now
 from maasserver.rpc.regionservice import RegionService
 from maasserver.testing.factory import factory
+from maasserver.testing.listener import FakePostgresListenerService
 from maasserver.testing.orm import reload_objects
 from maasserver.testing.testcase import MAASTransactionServerTestCase
 from maasserver.utils.orm import reload_object
 from maasserver.utils.threads import deferToDatabase
 from maastesting.fixtures import TempDirectory
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCalledWith,
+    MockCallsMatch,
+    MockNotCalled,
+)
 from maastesting.runtest import MAASCrochetRunTest
 from maastesting.testcase import MAASTestCase
 from provisioningserver.utils.twisted import (
@@ -455,3 +475,195 @@ class TestIPCCommunication(MAASTransactionServerTestCase):
         self.assertItemsEqual(rpc_connections, [])
 
         yield master.stopService()
+
+
+class TestIPCMasterServiceListener(MAASTestCase):
+    """Tests for the forwarding of notifications by `IPCMasterService`."""
+
+    def make_IPCMasterService(self):
+        listener = FakePostgresListenerService()
+        ipc_path = os.path.join(self.make_dir(), 'maas-regiond.sock')
+        master = IPCMasterService(
+            reactor, socket_path=ipc_path, postgresListener=listener)
+        return master, listener
+
+    def test_registers_channel_once_for_all_workers(self):
+        master, listener = self.make_IPCMasterService()
+        master.registerWorkerChannel(sentinel.conn1, "node")
+        master.registerWorkerChannel(sentinel.conn2, "node")
+        self.assertEqual(1, len(listener.listeners["node"]))
+        self.assertEqual(
+            {sentinel.conn1, sentinel.conn2}, master.channels["node"])
+
+    def test_unregisters_channel_when_last_worker_unregisters(self):
+        master, listener = self.make_IPCMasterService()
+        master.registerWorkerChannel(sentinel.conn1, "node")
+        master.registerWorkerChannel(sentinel.conn2, "node")
+        master.unregisterWorkerChannel(sentinel.conn1, "node")
+        self.assertEqual(1, len(listener.listeners["node"]))
+        master.unregisterWorkerChannel(sentinel.conn2, "node")
+        self.assertEqual([], listener.listeners["node"])
+        self.assertNotIn("node", master.channels)
+
+    @wait_for_reactor
+    def test_unregisterWorker_unregisters_channels(self):
+        master, listener = self.make_IPCMasterService()
+        master.registerWorkerChannel(sentinel.conn, "node")
+        master.registerWorkerChannel(sentinel.conn, "sys_dhcp_1")
+        master.unregisterWorker(sentinel.conn, None)
+        self.assertEqual({}, master.channels)
+
+    def test_forwards_notifications_to_registered_workers(self):
+        master, listener = self.make_IPCMasterService()
+        conn1, conn2, conn3 = MagicMock(), MagicMock(), MagicMock()
+        master.registerWorkerChannel(conn1, "node")
+        master.registerWorkerChannel(conn2, "node")
+        master.registerWorkerChannel(conn3, "machine")
+        [forwarder] = listener.listeners["node"]
+        forwarder("update", "abcdef")
+        for conn in (conn1, conn2):
+            self.assertThat(conn.callRemote, MockCalledOnceWith(
+                ListenerNotify, channel="node", action="update",
+                payload="abcdef"))
+        self.assertThat(conn3.callRemote, MockNotCalled())
+
+    def test_forwards_system_notifications_without_action(self):
+        master, listener = self.make_IPCMasterService()
+        conn = MagicMock()
+        master.registerWorkerChannel(conn, "sys_dhcp_1")
+        [forwarder] = listener.listeners["sys_dhcp_1"]
+        forwarder("sys_dhcp_1", "payload")
+        self.assertThat(conn.callRemote, MockCalledOnceWith(
+            ListenerNotify, channel="sys_dhcp_1", action=None,
+            payload="payload"))
+
+    def test_forwards_listener_events_to_workers(self):
+        master, listener = self.make_IPCMasterService()
+        conn1, conn2 = MagicMock(), MagicMock()
+        master.connections = {
+            1: {'connection': conn1},
+            2: {'connection': conn2},
+        }
+        master._forwardDisconnected(sentinel.reason)
+        master._forwardConnected()
+        for conn in (conn1, conn2):
+            self.assertThat(conn.callRemote, MockCallsMatch(
+                call(ListenerEvent, event="disconnected"),
+                call(ListenerEvent, event="connected")))
+
+
+class TestIPCWorkerListenerService(MAASTestCase):
+    """Tests for `IPCWorkerListenerService`."""
+
+    def make_service(self):
+        protocol = MagicMock()
+        protocol.callRemote.return_value = succeed({})
+        ipcWorker = MagicMock()
+        ipcWorker.protocol = DeferredValue()
+        ipcWorker.protocol.set(protocol)
+        service = IPCWorkerListenerService(ipcWorker)
+        return service, protocol
+
+    @wait_for_reactor
+    def test_startService_registers_channels(self):
+        service, protocol = self.make_service()
+        service.register("node", sentinel.handler)
+        self.assertThat(protocol.callRemote, MockNotCalled())
+        service.startService()
+        self.assertIs(service, service.ipcWorker.listener)
+        self.assertThat(protocol.callRemote, MockCalledOnceWith(
+            ListenerRegister, channel="node"))
+
+    @wait_for_reactor
+    def test_startService_fires_connected(self):
+        service, protocol = self.make_service()
+        connected = MagicMock()
+        service.events.connected.registerHandler(connected)
+        service.startService()
+        self.assertThat(connected, MockCalledOnceWith())
+
+    @wait_for_reactor
+    def test_register_registers_channel_once(self):
+        service, protocol = self.make_service()
+        service.startService()
+        service.register("node", sentinel.handler1)
+        service.register("node", sentinel.handler2)
+        self.assertThat(protocol.callRemote, MockCalledOnceWith(
+            ListenerRegister, channel="node"))
+
+    @wait_for_reactor
+    def test_register_system_channel_only_once(self):
+        service, protocol = self.make_service()
+        service.register("sys_test", sentinel.handler1)
+        self.assertRaises(
+            PostgresListenerRegistrationError,
+            service.register, "sys_test", sentinel.handler2)
+
+    @wait_for_reactor
+    def test_unregister_unregisters_channel_with_last_handler(self):
+        service, protocol = self.make_service()
+        service.startService()
+        service.register("node", sentinel.handler1)
+        service.register("node", sentinel.handler2)
+        service.unregister("node", sentinel.handler1)
+        self.assertThat(protocol.callRemote, MockCalledOnceWith(
+            ListenerRegister, channel="node"))
+        service.unregister("node", sentinel.handler2)
+        self.assertThat(
+            protocol.callRemote,
+            MockCalledWith(ListenerUnregister, channel="node"))
+
+    @wait_for_reactor
+    def test_unregister_raises_for_unknown_channel_or_handler(self):
+        service, protocol = self.make_service()
+        self.assertRaises(
+            PostgresListenerUnregistrationError,
+            service.unregister, "node", sentinel.handler)
+        service.register("node", sentinel.handler)
+        self.assertRaises(
+            PostgresListenerUnregistrationError,
+            service.unregister, "node", sentinel.other)
+
+    @wait_for_reactor
+    def test_notify_calls_handlers_with_action(self):
+        service, protocol = self.make_service()
+        handler1, handler2 = MagicMock(), MagicMock()
+        service.register("node", handler1)
+        service.register("node", handler2)
+        service.notify("node", "update", "abcdef")
+        self.assertThat(handler1, MockCalledOnceWith("update", "abcdef"))
+        self.assertThat(handler2, MockCalledOnceWith("update", "abcdef"))
+
+    @wait_for_reactor
+    def test_notify_calls_system_handler_with_channel(self):
+        service, protocol = self.make_service()
+        handler = MagicMock()
+        service.register("sys_test", handler)
+        service.notify("sys_test", None, "payload")
+        self.assertThat(handler, MockCalledOnceWith("sys_test", "payload"))
+
+    @wait_for_reactor
+    def test_listenerEvent_fires_events(self):
+        service, protocol = self.make_service()
+        connected, disconnected = MagicMock(), MagicMock()
+        service.events.connected.registerHandler(connected)
+        service.events.disconnected.registerHandler(disconnected)
+        service.listenerEvent("disconnected")
+        self.assertThat(connected, MockNotCalled())
+        self.assertThat(disconnected, MockCalledOnceWith(None))
+        service.listenerEvent("connected")
+        self.assertThat(connected, MockCalledOnceWith())
+
+    def test_worker_passes_listener_event_to_listener(self):
+        worker = IPCWorker()
+        worker.service = MagicMock()
+        worker.listener_event("connected")
+        self.assertThat(
+            worker.service.listener.listenerEvent,
+            MockCalledOnceWith("connected"))
+
+    @wait_for_reactor
+    def test_notify_ignores_unknown_channel(self):
+        service, protocol = self.make_service()
+        service.notify("node", "update", "abcdef")
+        self.assertNotIn("node", service.listeners)
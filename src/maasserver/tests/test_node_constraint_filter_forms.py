@@ -5,6 +5,7 @@
 
 __all__ = []
 
+from operator import attrgetter
 from random import randint
 
 from django import forms
@@ -1830,3 +1831,32 @@ class TestReadNodesForm(MAASServerTestCase, FilterConstraintsMixin):
         node3 = factory.make_Node(status=NODE_STATUS.NEW)
         self.assertConstrainedNodes([node1, node3], {'status': 'new'})
         self.assertConstrainedNodes([node2], {'status': 'deploying'})
+
+    def test_after_id(self):
+        nodes = sorted(
+            (factory.make_Node() for _ in range(3)),
+            key=attrgetter('system_id'))
+        self.assertConstrainedNodes(
+            nodes[1:], {'after_id': nodes[0].system_id})
+
+    def test_after_id_of_deleted_node(self):
+        nodes = sorted(
+            (factory.make_Node() for _ in range(3)),
+            key=attrgetter('system_id'))
+        after_id = nodes[1].system_id
+        nodes[1].delete()
+        self.assertConstrainedNodes(nodes[2:], {'after_id': after_id})
+
+    def test_is_paged(self):
+        for data, expected in [
+                ({}, False),
+                ({'limit': 10}, True),
+                ({'after_id': 'xyz'}, True)]:
+            form = ReadNodesForm(data=data)
+            self.assertTrue(form.is_valid(), form.errors)
+            self.assertEqual(expected, form.is_paged, data)
+
+    def test_fields_does_not_filter(self):
+        node = factory.make_Node()
+        self.assertConstrainedNodes(
+            [node], {'fields': ['hostname', 'system_id']})
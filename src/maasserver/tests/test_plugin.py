@@ -236,6 +236,7 @@ class TestRegionMasterServiceMaker(TestServiceMaker):
             "region-controller",
             "nonce-cleanup",
             "dns-publication-cleanup",
+            "event-retention",
             "service-monitor",
             "status-monitor",
             "stats",
@@ -354,6 +355,7 @@ class TestRegionAllInOneServiceMaker(TestServiceMaker):
             "region-controller",
             "nonce-cleanup",
             "dns-publication-cleanup",
+            "event-retention",
             "status-monitor",
             "stats",
             "prometheus",
@@ -36,6 +36,7 @@ from twisted.internet.defer import (
     inlineCallbacks,
     succeed,
 )
+from twisted.protocols.amp import UnhandledCommand
 
 
 wait_for_reactor = wait_for(30)  # 30 seconds.
@@ -53,6 +54,7 @@ class TestRackControllerService(MAASTransactionServerTestCase):
                 starting=None,
                 watching=set(),
                 needsDHCPUpdate=set(),
+                needsExternalServicesUpdate=set(),
                 ipcWorker=sentinel.ipcWorker,
                 postgresListener=sentinel.listener))
 
@@ -78,9 +80,9 @@ class TestRackControllerService(MAASTransactionServerTestCase):
         yield service.startService()
         self.assertThat(
             listener.register,
-            MockCalledOnceWith(
-                "sys_core_%d" % regionProcessId,
-                service.coreHandler))
+            MockCallsMatch(
+                call("sys_core_%d" % regionProcessId, service.coreHandler),
+                call("config", service.configHandler)))
         self.assertEqual(regionProcessId, service.processId)
 
     @wait_for_reactor
@@ -149,8 +151,9 @@ class TestRackControllerService(MAASTransactionServerTestCase):
         yield service.stopService()
         self.assertThat(
             listener.unregister,
-            MockCalledOnceWith(
-                "sys_core_%d" % service.processId, service.coreHandler))
+            MockCallsMatch(
+                call("sys_core_%d" % service.processId, service.coreHandler),
+                call("config", service.configHandler)))
         self.assertIsNone(service.starting)
 
     @wait_for_reactor
@@ -164,8 +167,9 @@ class TestRackControllerService(MAASTransactionServerTestCase):
         yield service.stopService()
         self.assertThat(
             listener.unregister,
-            MockCalledOnceWith(
-                "sys_core_%d" % processId, service.coreHandler))
+            MockCallsMatch(
+                call("sys_core_%d" % processId, service.coreHandler),
+                call("config", service.configHandler)))
 
     @wait_for_reactor
     @inlineCallbacks
@@ -280,6 +284,34 @@ class TestRackControllerService(MAASTransactionServerTestCase):
         self.assertEquals(set(), service.needsDHCPUpdate)
         self.assertThat(mock_startProcessing, MockNotCalled())
 
+    def test_configHandler_adds_watching_to_needsExternalServicesUpdate(self):
+        rack_ids = {random.randint(0, 100) for _ in range(3)}
+        service = RackControllerService(
+            sentinel.ipcWorker, sentinel.listener)
+        service.watching = set(rack_ids)
+        mock_startProcessing = self.patch(service, "startProcessing")
+        service.configHandler("update", random.randint(0, 100))
+        self.assertEquals(rack_ids, service.needsExternalServicesUpdate)
+        self.assertThat(mock_startProcessing, MockCalledOnceWith())
+
+    def test_configHandler_does_nothing_when_not_watching(self):
+        service = RackControllerService(
+            sentinel.ipcWorker, sentinel.listener)
+        mock_startProcessing = self.patch(service, "startProcessing")
+        service.configHandler("update", random.randint(0, 100))
+        self.assertEquals(set(), service.needsExternalServicesUpdate)
+        self.assertThat(mock_startProcessing, MockNotCalled())
+
+    def test_coreHandler_unwatch_discards_needsExternalServicesUpdate(self):
+        processId = random.randint(0, 100)
+        rack_id = random.randint(0, 100)
+        service = RackControllerService(sentinel.ipcWorker, Mock())
+        service.processId = processId
+        service.watching = {rack_id}
+        service.needsExternalServicesUpdate = {rack_id}
+        service.coreHandler("sys_core_%d" % processId, "unwatch_%d" % rack_id)
+        self.assertEquals(set(), service.needsExternalServicesUpdate)
+
     def test_startProcessing_doesnt_call_start_when_looping_call_running(self):
         service = RackControllerService(
             sentinel.ipcWorker, sentinel.listener)
@@ -391,3 +423,54 @@ class TestRackControllerService(MAASTransactionServerTestCase):
         yield service.processDHCP(rack.id)
         self.assertThat(
             mock_configure_dhcp, MockCalledOnceWith(rack))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_process_calls_processExternalServices_after_DHCP(self):
+        rack_id = random.randint(0, 100)
+        service = RackControllerService(
+            sentinel.ipcWorker, sentinel.listener)
+        service.watching = set([rack_id])
+        service.needsDHCPUpdate = set([rack_id])
+        service.needsExternalServicesUpdate = set([rack_id])
+        service.running = True
+        calls = []
+        self.patch(service, "processDHCP").side_effect = (
+            lambda rack_id: calls.append(("dhcp", rack_id)))
+        self.patch(service, "processExternalServices").side_effect = (
+            lambda rack_id: calls.append(("external", rack_id)))
+        service.startProcessing()
+        yield service.processingDone
+        self.assertEquals(
+            [("dhcp", rack_id), ("external", rack_id)], calls)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_processExternalServices_calls_RefreshExternalServices(self):
+        rack = yield deferToDatabase(
+            transactional(factory.make_RackController))
+        service = RackControllerService(
+            sentinel.ipcWorker, sentinel.listener)
+        client = Mock(return_value=succeed({}))
+        mock_getClientFor = self.patch(rack_controller, "getClientFor")
+        mock_getClientFor.return_value = succeed(client)
+        yield service.processExternalServices(rack.id)
+        self.assertThat(
+            mock_getClientFor, MockCalledOnceWith(rack.system_id))
+        self.assertThat(
+            client, MockCalledOnceWith(
+                rack_controller.RefreshExternalServices))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_processExternalServices_ignores_UnhandledCommand(self):
+        rack = yield deferToDatabase(
+            transactional(factory.make_RackController))
+        service = RackControllerService(
+            sentinel.ipcWorker, sentinel.listener)
+        client = Mock(return_value=fail(UnhandledCommand()))
+        self.patch(rack_controller, "getClientFor").return_value = (
+            succeed(client))
+        yield service.processExternalServices(rack.id)
+        self.assertThat(client, MockCalledOnceWith(
+            rack_controller.RefreshExternalServices))
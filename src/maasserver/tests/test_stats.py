@@ -35,14 +35,20 @@ from maasserver.testing.testcase import (
     MAASServerTestCase,
     MAASTransactionServerTestCase,
 )
+from maastesting.djangotestcase import count_queries
 from maastesting.matchers import (
     MockCalledOnce,
     MockNotCalled,
 )
 from maastesting.testcase import MAASTestCase
 from maastesting.twisted import extract_result
+from provisioningserver.utils.network import IPRangeStatistics
 from provisioningserver.utils.twisted import asynchronous
 import requests as requests_module
+from testtools.matchers import (
+    ContainsDict,
+    Equals,
+)
 from twisted.application.internet import TimerService
 from twisted.internet.defer import fail
 
@@ -257,6 +263,10 @@ class TestMAASStats(MAASServerTestCase):
 
 class TestGetSubnetsUtilisationStats(MAASServerTestCase):
 
+    def setUp(self):
+        super().setUp()
+        self.patch(stats, '_subnets_utilisation_stats', (None, None))
+
     def test_stats_totals(self):
         factory.make_Subnet(
             cidr='1.2.0.0/16', gateway_ip='1.2.0.254')
@@ -377,6 +387,78 @@ class TestGetSubnetsUtilisationStats(MAASServerTestCase):
                 'static': 3,
                 'unavailable': 34}})
 
+    def test_stats_ipv6(self):
+        subnet = factory.make_Subnet(cidr='2001:db8::/64', gateway_ip='')
+        factory.make_IPRange(
+            subnet=subnet, start_ip='2001:db8::1:0:0',
+            end_ip='2001:db8::1:0:ff', alloc_type=IPRANGE_TYPE.DYNAMIC)
+        self.assertEqual(
+            stats.get_subnets_utilisation_stats(),
+            {'2001:db8::/64': {
+                'available': 2 ** 64 - 2 ** 32 - 256,
+                'dynamic_available': 256,
+                'dynamic_used': 0,
+                'reserved_available': 2 ** 32 - 1,
+                'reserved_used': 0,
+                'static': 0,
+                'unavailable': 2 ** 32 + 256}})
+
+    def test_stats_dns_servers_and_static_routes(self):
+        subnet = factory.make_Subnet(
+            cidr='1.2.0.0/16', gateway_ip='1.2.0.254',
+            dns_servers=['1.2.0.253', '8.8.8.8'])
+        factory.make_StaticRoute(source=subnet, gateway_ip='1.2.0.252')
+        self.assertEqual(
+            stats.get_subnets_utilisation_stats(),
+            {'1.2.0.0/16': {
+                'available': 2 ** 16 - 5,
+                'dynamic_available': 0,
+                'dynamic_used': 0,
+                'reserved_available': 0,
+                'reserved_used': 0,
+                'static': 0,
+                'unavailable': 3}})
+
+    def test_stats_match_subnet_iprange_usage(self):
+        subnets = [factory.make_ipv4_Subnet_with_IPRanges() for _ in range(3)]
+        for subnet in subnets:
+            for _ in range(3):
+                factory.make_StaticIPAddress(
+                    subnet=subnet, alloc_type=IPADDRESS_TYPE.STICKY)
+        utilisation = stats.get_subnets_utilisation_stats()
+        for subnet in subnets:
+            range_stats = IPRangeStatistics(subnet.get_iprange_usage())
+            self.assertThat(utilisation[subnet.cidr], ContainsDict({
+                'available': Equals(range_stats.num_available),
+                'unavailable': Equals(range_stats.num_unavailable),
+            }))
+
+    def test_stats_number_of_queries_is_constant(self):
+        factory.make_ipv4_Subnet_with_IPRanges()
+        queries_one, _ = count_queries(stats.get_subnets_utilisation_stats)
+        for _ in range(3):
+            subnet = factory.make_ipv4_Subnet_with_IPRanges()
+            factory.make_StaticRoute(source=subnet)
+            factory.make_StaticIPAddress(subnet=subnet)
+        queries_many, _ = count_queries(stats.get_subnets_utilisation_stats)
+        self.assertEqual(queries_one, queries_many)
+
+    def test_reuses_stats_younger_than_max_age(self):
+        factory.make_Subnet(cidr='1.2.0.0/16')
+        first = stats.get_subnets_utilisation_stats(max_age=60)
+        factory.make_Subnet(cidr='1.3.0.0/16')
+        self.assertIs(first, stats.get_subnets_utilisation_stats(max_age=60))
+
+    def test_computes_stats_again_when_older_than_max_age(self):
+        factory.make_Subnet(cidr='1.2.0.0/16')
+        stats.get_subnets_utilisation_stats(max_age=60)
+        computed, first = stats._subnets_utilisation_stats
+        stats._subnets_utilisation_stats = computed - 61, first
+        factory.make_Subnet(cidr='1.3.0.0/16')
+        self.assertItemsEqual(
+            ['1.2.0.0/16', '1.3.0.0/16'],
+            stats.get_subnets_utilisation_stats(max_age=60))
+
 
 class TestStatsService(MAASTestCase):
     """Tests for `ImportStatsService`."""
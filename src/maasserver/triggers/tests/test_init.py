@@ -120,6 +120,15 @@ class TestTriggersUsed(MAASServerTestCase):
         "blockdevice_nd_blockdevice_link_notify",
         "blockdevice_nd_blockdevice_unlink_notify",
         "blockdevice_nd_blockdevice_update_notify",
+        "bootresource_bootresource_create_notify",
+        "bootresource_bootresource_delete_notify",
+        "bootresource_bootresource_update_notify",
+        "bootresourcefile_bootresourcefile_create_notify",
+        "bootresourcefile_bootresourcefile_delete_notify",
+        "bootresourcefile_bootresourcefile_update_notify",
+        "bootresourceset_bootresourceset_create_notify",
+        "bootresourceset_bootresourceset_delete_notify",
+        "bootresourceset_bootresourceset_update_notify",
         "bmc_pod_insert_notify",
         "bmc_pod_update_notify",
         "bmc_pod_delete_notify",
@@ -174,6 +183,7 @@ class TestTriggersUsed(MAASServerTestCase):
         "iprange_iprange_subnet_insert_notify",
         "iprange_iprange_subnet_update_notify",
         "iprange_iprange_update_notify",
+        "largefile_largefile_update_notify",
         "metadataserver_script_script_create_notify",
         "metadataserver_script_script_delete_notify",
         "metadataserver_script_script_update_notify",
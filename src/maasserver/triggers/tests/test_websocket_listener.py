@@ -4467,3 +4467,65 @@ class TestScriptListener(
             self.assertEqual(('delete', '%s' % script.id), dv.value)
         finally:
             yield listener.stopService()
+
+
+class TestBootResourceListener(
+        MAASTransactionServerTestCase, TransactionalHelpersMixin):
+    """End-to-end test of both the listeners code and the boot resource
+    triggers code."""
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__calls_handler_on_create_notification(self):
+        yield deferToDatabase(register_websocket_triggers)
+        listener = self.make_listener_without_delay()
+        dv = DeferredValue()
+        listener.register("bootresource", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                transactional(factory.make_usable_boot_resource))
+            yield dv.get(timeout=2)
+            self.assertEqual(('update', ''), dv.value)
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__calls_handler_on_delete_notification(self):
+        yield deferToDatabase(register_websocket_triggers)
+        listener = self.make_listener_without_delay()
+        dv = DeferredValue()
+        listener.register("bootresource", lambda *args: dv.set(args))
+        resource = yield deferToDatabase(
+            transactional(factory.make_BootResource))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(transactional(resource.delete))
+            yield dv.get(timeout=2)
+            self.assertEqual(('update', ''), dv.value)
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__calls_handler_on_largefile_size_notification(self):
+        yield deferToDatabase(register_websocket_triggers)
+        listener = self.make_listener_without_delay()
+        dv = DeferredValue()
+        listener.register("bootresource", lambda *args: dv.set(args))
+        largefile = yield deferToDatabase(
+            transactional(factory.make_LargeFile), content=b'', size=512)
+
+        @transactional
+        def update_size(largefile):
+            largefile.size = 256
+            largefile.save()
+
+        yield listener.startService()
+        try:
+            yield deferToDatabase(update_size, largefile)
+            yield dv.get(timeout=2)
+            self.assertEqual(('update', ''), dv.value)
+        finally:
+            yield listener.stopService()
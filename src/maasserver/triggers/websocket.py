@@ -2129,3 +2129,25 @@ def register_websocket_triggers():
         render_notification_procedure(
             'script_delete_notify', 'script_delete', 'OLD.id'))
     register_triggers('metadataserver_script', 'script')
+
+    # Boot resource tables. Every change notifies the same channel with the
+    # same (empty) payload, so that the many changes made by an import are
+    # merged by the listener and the status is pushed once per batch.
+    for table, prefix in [
+            ("maasserver_bootresource", "bootresource"),
+            ("maasserver_bootresourceset", "bootresourceset"),
+            ("maasserver_bootresourcefile", "bootresourcefile")]:
+        for event in ("create", "update", "delete"):
+            register_procedure(
+                render_notification_procedure(
+                    '%s_%s_notify' % (prefix, event), 'bootresource_update',
+                    "''"))
+        register_triggers(table, prefix)
+
+    # LargeFile table, as the size is updated while it is downloaded.
+    register_procedure(
+        render_notification_procedure(
+            'largefile_update_notify', 'bootresource_update', "''"))
+    register_trigger(
+        "maasserver_largefile", "largefile_update_notify", "update",
+        fields=("size", "total_size"))
@@ -9,10 +9,17 @@ __all__ = [
 
 from collections import defaultdict
 import json
+import time
 
 from distro_info import UbuntuDistroInfo
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db import connection
+from django.db.models import (
+    Count,
+    Prefetch,
+    Q,
+    Sum,
+)
 from maasserver.bootresources import (
     import_resources,
     is_import_resources_running,
@@ -32,6 +39,8 @@ from maasserver.enum import (
 )
 from maasserver.models import (
     BootResource,
+    BootResourceFile,
+    BootResourceSet,
     BootSource,
     BootSourceCache,
     BootSourceSelection,
@@ -71,6 +80,23 @@ from twisted.internet.defer import Deferred
 log = LegacyLogger()
 
 
+# A fingerprint of the tables that the status of the boot resources is
+# computed from. Inserting, updating, or deleting rows in any of them, or
+# saving more of a large file, changes it.
+STATUS_FINGERPRINT_SQL = """\
+SELECT
+  (SELECT (count(*), max(updated))::text FROM maasserver_bootresource),
+  (SELECT (count(*), max(updated))::text FROM maasserver_bootresourceset),
+  (SELECT (count(*), max(updated))::text FROM maasserver_bootresourcefile),
+  (SELECT (count(*), sum(size), max(updated))::text
+   FROM maasserver_largefile),
+  (SELECT (count(*), max(updated))::text FROM maasserver_bootsource),
+  (SELECT (count(*), max(updated))::text FROM maasserver_bootsourcecache),
+  (SELECT (count(*), max(updated))::text
+   FROM maasserver_bootsourceselection)
+"""
+
+
 def get_distro_series_info_row(series):
     """Returns the distro series row information from python-distro-info.
     """
@@ -106,6 +132,33 @@ class BootResourceHandler(Handler):
             'fetch',
             'delete_image',
         ]
+        listen_channels = [
+            'bootresource',
+        ]
+
+    # How long the images on the rack controllers are remembered for, in
+    # seconds. Asking every rack controller is the slowest part of working
+    # out the status, and the region is not notified when it changes.
+    RACK_IMAGES_TTL = 10
+
+    # The most recently computed status and the key it was computed from;
+    # see `get_status_key`. This is shared by all connections to this
+    # process, so the status is computed once per change however many
+    # clients are viewing it.
+    _cached_status = None, None
+
+    # When the images on the rack controllers were last fetched, and the
+    # result of `get_rack_images` at that time.
+    _cached_rack_images = None, None
+
+    # How long the status pushed for a notification is reused for, in
+    # seconds. Every connection receives each notification, so this is
+    # long enough for them all to share the status worked out by the first.
+    NOTIFY_STATUS_TTL = 1
+
+    # When the status was last worked out for a notification, and that
+    # status; see `on_listen`.
+    _notified_status = None, None
 
     def format_ubuntu_sources(self):
         """Return formatted Ubuntu sources."""
@@ -225,57 +278,9 @@ class BootResourceHandler(Handler):
 
     def get_other_synced_resources(self):
         """Return all synced resources that are not Ubuntu."""
-        resources = list(BootResource.objects.filter(
+        return list(BootResource.objects.filter(
             rtype=BOOT_RESOURCE_TYPE.SYNCED).exclude(
             name__startswith='ubuntu/').order_by('-name', 'architecture'))
-        for resource in resources:
-            self.add_resource_template_attributes(resource)
-        return resources
-
-    def add_resource_template_attributes(self, resource):
-        """Adds helper attributes to the resource."""
-        resource.title = self.get_resource_title(resource)
-        resource.arch, resource.subarch = resource.split_arch()
-        resource.number_of_nodes = self.get_number_of_nodes_deployed_for(
-            resource)
-        resource_set = resource.get_latest_set()
-        if resource_set is None:
-            resource.size = human_readable_bytes(0)
-            resource.last_update = resource.updated
-            resource.complete = False
-            resource.status = "Queued for download"
-            resource.downloading = False
-        else:
-            resource.size = human_readable_bytes(resource_set.total_size)
-            resource.last_update = resource_set.updated
-            resource.complete = resource_set.complete
-            if not resource.complete:
-                progress = resource_set.progress
-                if progress > 0:
-                    resource.status = "Downloading %3.0f%%" % progress
-                    resource.downloading = True
-                    resource.icon = 'in-progress'
-                else:
-                    resource.status = "Queued for download"
-                    resource.downloading = False
-                    resource.icon = 'queued'
-            else:
-                # See if the resource also exists on all the clusters.
-                if resource in self.rack_resources:
-                    resource.status = "Synced"
-                    resource.downloading = False
-                    resource.icon = 'succeeded'
-                else:
-                    resource.complete = False
-                    if self.racks_syncing:
-                        resource.status = "Syncing to rack controller(s)"
-                        resource.downloading = True
-                        resource.icon = 'in-progress'
-                    else:
-                        resource.status = (
-                            "Waiting for rack controller(s) to sync")
-                        resource.downloading = False
-                        resource.icon = 'waiting'
 
     def format_ubuntu_core_images(self):
         """Return formatted other images for selection."""
@@ -324,10 +329,14 @@ class BootResourceHandler(Handler):
             })
         return images
 
-    def node_has_architecture_for_resource(self, node, resource):
-        """Return True if node is the same architecture as resource."""
+    def architecture_matches_resource(self, architecture, resource):
+        """Return True if a node's `architecture` is the same architecture
+        as resource."""
         arch, _ = resource.split_arch()
-        node_arch, node_subarch = node.split_arch()
+        if not architecture:
+            node_arch, node_subarch = "", ""
+        else:
+            node_arch, node_subarch = architecture.split('/')
         return arch == node_arch and resource.supports_subarch(node_subarch)
 
     def get_number_of_nodes_deployed_for(self, resource):
@@ -339,21 +348,24 @@ class BootResourceHandler(Handler):
         else:
             osystem, distro_series = resource.name.split('/')
 
-        # Count the number of nodes with same os/release and architecture.
-        count = 0
-        for node in self.nodes.filter(
-                osystem=osystem, distro_series=distro_series):
-            if self.node_has_architecture_for_resource(node, resource):
-                count += 1
-
         # Any node that is deployed without osystem and distro_series,
         # will be using the defaults.
-        if (self.default_osystem == osystem and
-                self.default_distro_series == distro_series):
-            for node in self.nodes.filter(
-                    osystem="", distro_series=""):
-                if self.node_has_architecture_for_resource(node, resource):
-                    count += 1
+        uses_defaults = (
+            self.default_osystem == osystem and
+            self.default_distro_series == distro_series)
+
+        # Count the number of nodes with same os/release and architecture.
+        count = 0
+        for node_osystem, node_series, architecture, nodes in (
+                self.node_counts):
+            if node_osystem == osystem and node_series == distro_series:
+                pass
+            elif node_osystem == "" and node_series == "" and uses_defaults:
+                pass
+            else:
+                continue
+            if self.architecture_matches_resource(architecture, resource):
+                count += nodes
         return count
 
     def pick_latest_datetime(self, time, other_time):
@@ -380,13 +392,22 @@ class BootResourceHandler(Handler):
                     shas.add(largefile.sha256)
         return size
 
+    def is_resource_set_complete(self, resource_set):
+        """Return True if all files in the set are complete.
+
+        The set must come from `load_resources`.
+        """
+        return (
+            resource_set.files_count > 0 and
+            resource_set.files_size == resource_set.files_total_size)
+
     def are_all_resources_complete(self, resources):
         """Return the complete status for all the given resources."""
         for resource in resources:
             resource_set = resource.get_latest_set()
             if resource_set is None:
                 return False
-            if not resource_set.complete:
+            if not self.is_resource_set_complete(resource_set):
                 return False
         return True
 
@@ -415,8 +436,8 @@ class BootResourceHandler(Handler):
         for resource in resources:
             resource_set = resource.get_latest_set()
             if resource_set is not None:
-                size += resource_set.size
-                total_size += resource_set.total_size
+                size += resource_set.files_size or 0
+                total_size += resource_set.files_total_size or 0
         if size <= 0:
             # Handle division by zero
             return 0
@@ -509,13 +530,100 @@ class BootResourceHandler(Handler):
             for _, group in resource_group.items()
             ]
 
+    def load_resources(self, **filters):
+        """Return the resources matching `filters`, with their sets and files.
+
+        The sets are annotated with the count and sizes of their files, and
+        everything is loaded in three queries however many resources there
+        are.
+        """
+        return BootResource.objects.filter(**filters).prefetch_related(
+            Prefetch('sets', queryset=BootResourceSet.objects.annotate(
+                files_count=Count('files__id'),
+                files_size=Sum('files__largefile__size'),
+                files_total_size=Sum('files__largefile__total_size'))),
+            Prefetch('sets__files', queryset=(
+                BootResourceFile.objects.select_related('largefile'))))
+
+    def get_rack_images(self):
+        """Return the images that exist on all rack controllers, and whether
+        any rack controller is importing images.
+
+        This is remembered for `RACK_IMAGES_TTL` seconds.
+        """
+        fetched, rack_images = self._cached_rack_images
+        now = time.monotonic()
+        if fetched is None or now - fetched > self.RACK_IMAGES_TTL:
+            rack_images = (
+                get_common_available_boot_images(),
+                is_import_boot_images_running())
+            BootResourceHandler._cached_rack_images = now, rack_images
+        return rack_images
+
+    def get_status_key(self):
+        """Return the key identifying the current status.
+
+        This loads what the status depends on that cannot be read from the
+        fingerprint of the boot resource tables: the number of deployed
+        nodes, the default and commissioning releases, and the images on the
+        rack controllers.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(STATUS_FINGERPRINT_SQL)
+            fingerprint = cursor.fetchone()
+        self.node_counts = list(Node.objects.filter(
+            status__in=[NODE_STATUS.DEPLOYED, NODE_STATUS.DEPLOYING]).order_by(
+                'osystem', 'distro_series', 'architecture').values_list(
+                'osystem', 'distro_series', 'architecture').annotate(
+                count=Count('id')))
+        configs = Config.objects.get_configs([
+            'default_osystem', 'default_distro_series',
+            'commissioning_distro_series'])
+        self.default_osystem = configs['default_osystem']
+        self.default_distro_series = configs['default_distro_series']
+        self.commissioning_series = configs['commissioning_distro_series']
+        self.rack_images, self.racks_syncing = self.get_rack_images()
+        self.region_import_running = is_import_resources_running()
+        return (
+            fingerprint, self.node_counts, configs, self.rack_images,
+            self.racks_syncing, self.region_import_running)
+
     def poll(self, params):
         """Polling method that the websocket client calls.
 
-        Since boot resource information is split between the region and the
-        rack controllers the websocket uses a polling method to get the
-        updated information. Pushing the information at the moment is not
-        possible as no rack information is cached on the region side.
+        The status is also pushed to clients when the boot resources change.
+        Polling picks up changes to the images on the rack controllers, as
+        the region is not notified of those.
+
+        Computing the status is expensive, so it is only done when the key
+        from `get_status_key` changes.
+        """
+        key = self.get_status_key()
+        cached_key, status = self._cached_status
+        if status is None or cached_key != key:
+            status = self.get_status()
+            BootResourceHandler._cached_status = key, status
+        return status
+
+    def on_listen(self, channel, action, pk):
+        """Push the status to the client when the boot resources change.
+
+        Any change is sent as an update of the whole status, the same as the
+        result of `poll`. The status is worked out once and shared by every
+        connection for `NOTIFY_STATUS_TTL` seconds; a change within that time
+        is picked up by the next `poll`.
+        """
+        notified, status = self._notified_status
+        now = time.monotonic()
+        if notified is None or now - notified > self.NOTIFY_STATUS_TTL:
+            status = self.poll({})
+            BootResourceHandler._notified_status = now, status
+        return (self._meta.handler_name, "update", status)
+
+    def get_status(self):
+        """Return the status of the boot resources, as JSON.
+
+        `get_status_key` must be called first.
         """
         try:
             sources, releases, arches = get_os_info_from_boot_sources('ubuntu')
@@ -529,33 +637,14 @@ class BootResourceHandler(Handler):
             self.ubuntu_releases = set()
             self.ubuntu_arches = set()
 
-        # Load all the nodes, so its not done on every call
-        # to the method get_number_of_nodes_deployed_for.
-        # XXX Danilo 2017-06-29: this used to also do
-        #   .only('osystem', 'distro_series')
-        # but that caused "RecursionError: maximum recursion depth exceeded
-        # while calling a Python object" errors with Django 1.11 in
-        #   maasserver.websockets.handlers.tests.test_bootresource
-        # tests.  Since we are filtering on status field which is not in
-        # "only" anyway, I don't think we ever had the benefit of prefetching
-        # only those two fields.
-        self.nodes = Node.objects.filter(
-            status__in=[NODE_STATUS.DEPLOYED, NODE_STATUS.DEPLOYING])
-        self.default_osystem = Config.objects.get_config(
-            'default_osystem')
-        self.default_distro_series = Config.objects.get_config(
-            'default_distro_series')
-
         # Load list of boot resources that currently exist on all racks.
-        rack_images = get_common_available_boot_images()
-        self.racks_syncing = is_import_boot_images_running()
         self.rack_resources = (
             BootResource.objects.get_resources_matching_boot_images(
-                rack_images))
+                self.rack_images))
 
         # Load all the resources and generate the JSON result.
-        resources = self.combine_resources(BootResource.objects.filter(
-            bootloader_type=None))
+        resources = self.combine_resources(
+            self.load_resources(bootloader_type=None))
         json_resources = [
             dict(
                 id=resource.id,
@@ -569,17 +658,15 @@ class BootResourceHandler(Handler):
             )
             for resource in resources
             ]
-        commissioning_series = Config.objects.get_config(
-            name='commissioning_distro_series')
         json_ubuntu = dict(
             sources=self.format_ubuntu_sources(),
             releases=self.format_ubuntu_releases(),
             arches=self.format_ubuntu_arches(),
-            commissioning_series=commissioning_series,
+            commissioning_series=self.commissioning_series,
         )
         data = dict(
             connection_error=self.connection_error,
-            region_import_running=is_import_resources_running(),
+            region_import_running=self.region_import_running,
             rack_import_running=self.racks_syncing,
             resources=json_resources,
             ubuntu=json_ubuntu,
@@ -8,7 +8,10 @@ __all__ = []
 import datetime
 import json
 import random
-from unittest.mock import ANY
+from unittest.mock import (
+    ANY,
+    sentinel,
+)
 
 from maasserver.enum import (
     BOOT_RESOURCE_TYPE,
@@ -83,6 +86,10 @@ class TestBootResourcePoll(MAASServerTestCase, PatchOSInfoMixin):
         # Disable boot source cache signals.
         self.addCleanup(bootsources.signals.enable)
         bootsources.signals.disable()
+        # Start without a cached status.
+        self.patch(BootResourceHandler, '_cached_status', (None, None))
+        self.patch(BootResourceHandler, '_cached_rack_images', (None, None))
+        self.patch(BootResourceHandler, '_notified_status', (None, None))
 
     def make_other_resource(
             self, os=None, arch=None, subarch=None, release=None, extra=None):
@@ -712,9 +719,109 @@ class TestBootResourcePoll(MAASServerTestCase, PatchOSInfoMixin):
         json_obj = json.loads(response)
         self.assertEquals(title, json_obj['resources'][0]['title'])
 
+    def test_reuses_status_when_nothing_changed(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {}, None)
+        self.make_other_resource()
+        get_status = self.patch(handler, 'get_status')
+        get_status.return_value = factory.make_name('status')
+        first = handler.poll({})
+        second = BootResourceHandler(owner, {}, None).poll({})
+        self.assertEquals(first, second)
+        self.assertThat(get_status, MockCalledOnce())
+
+    def test_recomputes_status_when_resources_change(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {}, None)
+        handler.poll({})
+        self.make_other_resource()
+        json_obj = json.loads(handler.poll({}))
+        self.assertThat(json_obj['resources'], HasLength(1))
+
+    def test_recomputes_status_when_nodes_deployed(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {}, None)
+        resource = self.make_other_resource()
+        handler.poll({})
+        os_name, series = resource.name.split('/')
+        factory.make_Node(
+            status=NODE_STATUS.DEPLOYED, osystem=os_name,
+            distro_series=series, architecture=resource.architecture)
+        json_obj = json.loads(handler.poll({}))
+        self.assertEquals(1, json_obj['resources'][0]['numberOfNodes'])
+
+    def test_remembers_rack_images(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {}, None)
+        mock_running = self.patch(
+            bootresource, 'is_import_boot_images_running')
+        mock_running.return_value = False
+        handler.poll({})
+        handler.poll({})
+        self.assertThat(mock_running, MockCalledOnce())
+
+    def test_fetches_rack_images_again_after_ttl(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {}, None)
+        mock_running = self.patch(
+            bootresource, 'is_import_boot_images_running')
+        mock_running.return_value = False
+        handler.poll({})
+        fetched, rack_images = BootResourceHandler._cached_rack_images
+        BootResourceHandler._cached_rack_images = (
+            fetched - handler.RACK_IMAGES_TTL - 1, rack_images)
+        mock_running.return_value = True
+        json_obj = json.loads(handler.poll({}))
+        self.assertTrue(json_obj['rack_import_running'])
+
+    def test_on_listen_pushes_status(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {}, None)
+        self.make_other_resource()
+        self.assertEquals(
+            ('bootresource', 'update', handler.poll({})),
+            handler.on_listen('bootresource', 'update', ''))
+
+    def test_on_listen_shares_status_between_handlers(self):
+        owner = factory.make_admin()
+        handler1 = BootResourceHandler(owner, {}, None)
+        handler2 = BootResourceHandler(owner, {}, None)
+        self.make_other_resource()
+        mock_get_status_key = self.patch(
+            BootResourceHandler, 'get_status_key')
+        mock_get_status_key.return_value = sentinel.key
+        self.patch(
+            BootResourceHandler, 'get_status').return_value = sentinel.status
+        self.assertEquals(
+            ('bootresource', 'update', sentinel.status),
+            handler1.on_listen('bootresource', 'update', ''))
+        self.assertEquals(
+            ('bootresource', 'update', sentinel.status),
+            handler2.on_listen('bootresource', 'update', ''))
+        self.assertThat(mock_get_status_key, MockCalledOnce())
+
+    def test_on_listen_works_out_status_again_after_ttl(self):
+        owner = factory.make_admin()
+        handler = BootResourceHandler(owner, {}, None)
+        handler.on_listen('bootresource', 'update', '')
+        notified, status = BootResourceHandler._notified_status
+        BootResourceHandler._notified_status = (
+            notified - handler.NOTIFY_STATUS_TTL - 1, status)
+        self.make_other_resource()
+        json_obj = json.loads(
+            handler.on_listen('bootresource', 'update', '')[2])
+        self.assertThat(json_obj['resources'], HasLength(1))
+
 
 class TestBootResourceStopImport(MAASTransactionServerTestCase):
 
+    def setUp(self):
+        super().setUp()
+        # Start without a cached status.
+        self.patch(BootResourceHandler, '_cached_status', (None, None))
+        self.patch(BootResourceHandler, '_cached_rack_images', (None, None))
+        self.patch(BootResourceHandler, '_notified_status', (None, None))
+
     def patch_stop_import_resources(self):
         mock_import = self.patch(bootresource, 'stop_import_resources')
         mock_import.return_value = succeed(None)
@@ -737,6 +844,10 @@ class TestBootResourceSaveUbuntu(
         # Disable boot source cache signals.
         self.addCleanup(bootsources.signals.enable)
         bootsources.signals.disable()
+        # Start without a cached status.
+        self.patch(BootResourceHandler, '_cached_status', (None, None))
+        self.patch(BootResourceHandler, '_cached_rack_images', (None, None))
+        self.patch(BootResourceHandler, '_notified_status', (None, None))
 
     def patch_stop_import_resources(self):
         mock_import = self.patch(bootresource, 'stop_import_resources')
@@ -845,6 +956,10 @@ class TestBootResourceSaveUbuntuCore(MAASTransactionServerTestCase):
         # Disable boot source cache signals.
         self.addCleanup(bootsources.signals.enable)
         bootsources.signals.disable()
+        # Start without a cached status.
+        self.patch(BootResourceHandler, '_cached_status', (None, None))
+        self.patch(BootResourceHandler, '_cached_rack_images', (None, None))
+        self.patch(BootResourceHandler, '_notified_status', (None, None))
 
     def make_resource(self, arch='amd64'):
         if arch is None:
@@ -924,6 +1039,10 @@ class TestBootResourceSaveOther(MAASTransactionServerTestCase):
         # Disable boot source cache signals.
         self.addCleanup(bootsources.signals.enable)
         bootsources.signals.disable()
+        # Start without a cached status.
+        self.patch(BootResourceHandler, '_cached_status', (None, None))
+        self.patch(BootResourceHandler, '_cached_rack_images', (None, None))
+        self.patch(BootResourceHandler, '_notified_status', (None, None))
 
     def make_other_resource(self, os=None, arch=None, subarch=None,
                             release=None):
@@ -1228,6 +1347,13 @@ class TestBootResourceFetch(MAASServerTestCase):
 
 class TestBootResourceDeleteImage(MAASServerTestCase):
 
+    def setUp(self):
+        super().setUp()
+        # Start without a cached status.
+        self.patch(BootResourceHandler, '_cached_status', (None, None))
+        self.patch(BootResourceHandler, '_cached_rack_images', (None, None))
+        self.patch(BootResourceHandler, '_notified_status', (None, None))
+
     def test_asserts_is_admin(self):
         owner = factory.make_User()
         handler = BootResourceHandler(owner, {}, None)
@@ -18,6 +18,7 @@ __all__ = [
 import base64
 from datetime import datetime
 from functools import partial
+import hashlib
 import http.client
 from io import BytesIO
 from itertools import chain
@@ -25,12 +26,12 @@ import json
 from operator import itemgetter
 import os
 import tarfile
-import time
 
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from formencode.validators import (
     Int,
     String,
@@ -951,31 +952,57 @@ class CurtinUserDataHandler(MetadataViewHandler):
             content_type='application/octet-stream')
 
 
+# Modification time given to every file in the script archives. A fixed
+# time, rather than the time of the request, means the same scripts always
+# produce a byte-identical archive which can be cached and given a stable
+# ETag. The Epoch is avoided as it elicits annoying warnings when
+# decompressing.
+ARCHIVE_MTIME = 1546300800  # 2019-01-01 00:00:00 UTC.
+
+
 def add_file_to_tar(tar, path, content, mtime, permission=0o755):
     """Add a script to a tar."""
     assert isinstance(content, bytes), "Script content must be binary."
     tarinfo = tarfile.TarInfo(name=path)
     tarinfo.size = len(content)
     tarinfo.mode = permission
-    # Modification time defaults to Epoch, which elicits annoying
-    # warnings when decompressing.
     tarinfo.mtime = mtime
     tar.addfile(tarinfo, BytesIO(content))
 
 
+def make_archive_response(request, archive, content_type):
+    """Return a response for the tar `archive`.
+
+    The archive is content-addressed: its ETag is a hash of its bytes. When
+    the client already holds the same archive, as given in If-None-Match, a
+    304 Not Modified is returned instead of the archive.
+    """
+    etag = '"%s"' % hashlib.sha256(archive).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(archive, content_type=content_type)
+    response['ETag'] = etag
+    return response
+
+
 class CommissioningScriptsHandler(MetadataViewHandler):
     """Return a tar archive containing the commissioning scripts.
 
     This endpoint is deprecated in favor of MAASScriptsHandler below.
     """
 
+    # The most recently built archive and the key it was built from; see
+    # `_get_archive_key`.
+    _cached_archive = None, None
+
     def _iter_builtin_scripts(self):
         for script in NODE_INFO_SCRIPTS.values():
             yield script['name'], script['content']
 
     def _iter_user_scripts(self):
         for script in Script.objects.filter(
-                script_type=SCRIPT_TYPE.COMMISSIONING):
+                script_type=SCRIPT_TYPE.COMMISSIONING).select_related(
+                    'script'):
             try:
                 # Check if the script is a base64 encoded binary.
                 content = base64.b64decode(script.script.data)
@@ -990,24 +1017,42 @@ class CommissioningScriptsHandler(MetadataViewHandler):
             self._iter_user_scripts(),
         )
 
+    def _get_archive_key(self):
+        """Return the key identifying the current commissioning scripts.
+
+        Each change to a user script creates a new version of its text, so
+        the names and versions of the user scripts identify the archive.
+        Builtin scripts only change when MAAS itself is upgraded.
+        """
+        return tuple(Script.objects.filter(
+            script_type=SCRIPT_TYPE.COMMISSIONING).order_by(
+                'name', 'script_id').values_list('name', 'script_id'))
+
     def _get_archive(self):
         """Produce a tar archive of all commissionig scripts.
 
-        Each of the scripts will be in the `ARCHIVE_PREFIX` directory.
+        Each of the scripts will be in the `ARCHIVE_PREFIX` directory. The
+        archive is only rebuilt when the user scripts have changed.
         """
+        key = self._get_archive_key()
+        cached_key, archive = CommissioningScriptsHandler._cached_archive
+        if archive is not None and cached_key == key:
+            return archive
         binary = BytesIO()
         scripts = sorted(self._iter_scripts())
         with tarfile.open(mode='w', fileobj=binary) as tarball:
             add_script = partial(
-                add_file_to_tar, tarball, mtime=time.time())
+                add_file_to_tar, tarball, mtime=ARCHIVE_MTIME)
             for name, content in scripts:
                 add_script(os.path.join("commissioning.d", name), content)
-        return binary.getvalue()
+        archive = binary.getvalue()
+        CommissioningScriptsHandler._cached_archive = key, archive
+        return archive
 
     def read(self, request, version, mac=None):
         check_version(version)
-        return HttpResponse(
-            self._get_archive(), content_type='application/tar')
+        return make_archive_response(
+            request, self._get_archive(), 'application/tar')
 
 
 class MAASScriptsHandler(OperationsHandler):
@@ -1116,11 +1161,12 @@ class MAASScriptsHandler(OperationsHandler):
         uncompressed as all API requests are already gziped. This may change
         so auto-decompress is suggested. If the node returns a script status
         and calls this request again only the scripts which havn't been run
-        will be returned.
+        will be returned. The tar is identified by an ETag of its contents;
+        a client which already has it gets a 304 Not Modified.
         """
         node = get_queried_node(request)
         binary = BytesIO()
-        mtime = time.time()
+        mtime = ARCHIVE_MTIME
         tar_meta_data = {}
         # Responses are currently gzip compressed using
         # django.middleware.gzip.GZipMiddleware.
@@ -1174,8 +1220,8 @@ class MAASScriptsHandler(OperationsHandler):
                 tar, 'index.json', json.dumps({'1.0': tar_meta_data}).encode(),
                 mtime, 0o644)
 
-        return HttpResponse(
-            binary.getvalue(), content_type='application/x-tar')
+        return make_archive_response(
+            request, binary.getvalue(), 'application/x-tar')
 
 
 class EnlistMetaDataHandler(OperationsHandler):
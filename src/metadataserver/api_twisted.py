@@ -23,6 +23,7 @@ from maasserver.models import (
 from maasserver.preseed import CURTIN_INSTALL_LOG
 from maasserver.utils.orm import (
     in_transaction,
+    is_retryable_failure,
     transactional,
     TransactionManagementError,
 )
@@ -36,9 +37,18 @@ from metadataserver.enum import SCRIPT_STATUS
 from metadataserver.models import NodeKey
 from provisioningserver.events import EVENT_STATUS_MESSAGES
 from provisioningserver.logger import LegacyLogger
-from provisioningserver.utils.twisted import deferred
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
+from provisioningserver.utils.twisted import (
+    callOut,
+    deferred,
+)
 from twisted.application.internet import TimerService
 from twisted.internet import reactor
+from twisted.internet.defer import (
+    DeferredList,
+    DeferredSemaphore,
+    maybeDeferred,
+)
 from twisted.web.resource import Resource
 from twisted.web.server import NOT_DONE_YET
 
@@ -232,47 +242,104 @@ def _create_pod_for_deployment(node):
 
 
 class StatusWorkerService(TimerService, object):
-    """Service to update nodes from recieved status messages."""
+    """Service to update nodes from recieved status messages.
+
+    Messages that don't need to be processed straight away are queued for
+    each node, then flushed every `check_interval` seconds, or as soon as
+    `max_queue_size` messages are waiting. All the messages flushed for a
+    node are processed together in a single transaction. At most
+    `max_concurrency` nodes are processed at the same time, and a node's
+    messages are not flushed while its previous batch is still being
+    processed, so they are always processed in the order they arrived.
+    """
+
+    check_interval = 1  # Every second.
 
-    check_interval = 60  # Every second.
+    # Flush the queue early once this many messages are waiting.
+    max_queue_size = 100
 
-    def __init__(self, dbtasks, clock=reactor):
+    # Maximum number of nodes to process messages for at the same time.
+    max_concurrency = 4
+
+    def __init__(self, clock=reactor):
         # Call self._tryUpdateNodes() every self.check_interval.
         super(StatusWorkerService, self).__init__(
             self.check_interval, self._tryUpdateNodes)
-        self.dbtasks = dbtasks
         self.clock = clock
         self.queue = defaultdict(list)
+        self.queueSize = 0
+        self.queuedAt = {}
+        self.processing = set()
+        self.tasks = {}
+        self.semaphore = DeferredSemaphore(self.max_concurrency)
+
+    def stopService(self):
+        """Stop the service, waiting for messages being processed."""
+        d = maybeDeferred(super(StatusWorkerService, self).stopService)
+        d.addCallback(lambda _: DeferredList(list(self.tasks.values())))
+        return d
+
+    def _updateQueueSize(self, change):
+        self.queueSize += change
+        PROMETHEUS_METRICS.update(
+            'maas_status_worker_queue_depth', 'set', value=self.queueSize)
 
     def _tryUpdateNodes(self):
-        if len(self.queue) != 0:
-            queue, self.queue = self.queue, defaultdict(list)
+        keys = [key for key in self.queue if key not in self.processing]
+        if len(keys) != 0:
+            queue = {
+                key: (self.queue.pop(key), self.queuedAt.pop(key))
+                for key in keys
+            }
+            self.processing.update(keys)
+            self._updateQueueSize(
+                -sum(len(messages) for messages, _ in queue.values()))
             d = deferToDatabase(self._preProcessQueue, queue)
             d.addCallback(self._processMessagesLater)
             d.addErrback(log.err, "Failed to process node status messages.")
+            d.addBoth(callOut, self._releaseKeys, keys)
             return d
 
+    def _releaseKeys(self, keys):
+        # Allow messages to be flushed again for nodes that are not being
+        # processed, e.g. because their authorisation was not found.
+        self.processing.difference_update(
+            key for key in keys if key not in self.tasks)
+
     @transactional
     def _preProcessQueue(self, queue):
         """Check authorizations.
 
-        Return a list of (node, messages) tuples, where each node is found
-        from its authorisation.
+        Return a list of (key, node, messages, queued) tuples, where each
+        node is found from its authorisation.
         """
         keys = NodeKey.objects.filter(
             key__in=list(queue.keys())).select_related('node')
         return [
-            (key.node, queue[key.key])
+            (key.key, key.node) + queue[key.key]
             for key in keys
         ]
 
     def _processMessagesLater(self, tasks):
-        # Move all messages on the queue off onto the database tasks queue.
-        # We're not going to wait for them to be processed because we can't /
-        # don't apply back-pressure to those systems that are producing these
-        # messages anyway.
-        for node, messages in tasks:
-            self.dbtasks.addTask(self._processMessages, node, messages)
+        # Process each node's messages in a database thread, a limited number
+        # of nodes at a time. We're not going to wait for them to be processed
+        # because we can't / don't apply back-pressure to those systems that
+        # are producing these messages anyway.
+        for key, node, messages, queued in tasks:
+            d = self.semaphore.run(
+                deferToDatabase, self._processMessages, node, messages)
+            d.addErrback(
+                log.err, "Failed to process status messages for node: %s" % (
+                    node.hostname))
+            d.addBoth(callOut, self._messagesProcessed, key, queued)
+            self.tasks[key] = d
+
+    def _messagesProcessed(self, key, queued):
+        del self.tasks[key]
+        self.processing.discard(key)
+        PROMETHEUS_METRICS.update(
+            'maas_status_worker_message_latency', 'observe',
+            value=self.clock.seconds() - queued)
 
     def _processMessages(self, node, messages):
         # Push the messages into the database, recording them for this node.
@@ -284,18 +351,33 @@ class StatusWorkerService(TimerService, object):
                 "outside of a transaction.")
         else:
             # Here we're in a database thread, with a database connection.
-            for idx, message in enumerate(messages):
-                try:
-                    exists = self._processMessage(node, message)
-                    if not exists:
-                        # Node has been deleted no reason to continue saving
-                        # the events for this node.
-                        break
-                except Exception:
-                    log.err(
-                        None,
-                        "Failed to process message "
-                        "for node: %s" % node.hostname)
+            self._processMessageBatch(node, messages)
+
+    @transactional
+    def _processMessageBatch(self, node, messages):
+        # Process all the messages in one transaction, fetching the node only
+        # once. Each message is processed in its own savepoint so that one
+        # bad message doesn't prevent the others from being recorded.
+        try:
+            node = Node.objects.get(id=node.id)
+        except Node.DoesNotExist:
+            # Node has been deleted no reason to continue saving the events
+            # for this node.
+            return
+        for message in messages:
+            try:
+                self._processMessageForNode(node, message)
+            except Exception as error:
+                if is_retryable_failure(error):
+                    # Retry the whole transaction.
+                    raise
+                log.err(
+                    None,
+                    "Failed to process message "
+                    "for node: %s" % node.hostname)
+                # Changes made to the node by this message have been rolled
+                # back in the database, so discard them here too.
+                node = Node.objects.get(id=node.id)
 
     @transactional
     def _processMessage(self, node, message):
@@ -304,7 +386,12 @@ class StatusWorkerService(TimerService, object):
             node = Node.objects.get(id=node.id)
         except Node.DoesNotExist:
             return False
+        else:
+            self._processMessageForNode(node, message)
+            return True
 
+    @transactional
+    def _processMessageForNode(self, node, message):
         event_type = message['event_type']
         origin = message['origin']
         activity_name = message['name']
@@ -433,7 +520,6 @@ class StatusWorkerService(TimerService, object):
 
         if save_node:
             node.save()
-        return True
 
     def _retrieve_content(self, compression, encoding, content):
         """Extract the content of the sent file."""
@@ -518,3 +604,13 @@ class StatusWorkerService(TimerService, object):
             return d
         else:
             self.queue[authorization].append(message)
+            self.queuedAt.setdefault(authorization, self.clock.seconds())
+            self._updateQueueSize(1)
+            # Messages for nodes that are still being processed can't be
+            # flushed, so don't count them towards flushing early.
+            if self.queueSize >= self.max_queue_size:
+                waiting = sum(
+                    len(messages) for key, messages in self.queue.items()
+                    if key not in self.processing)
+                if waiting >= self.max_queue_size:
+                    self._tryUpdateNodes()
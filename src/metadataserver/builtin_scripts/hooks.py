@@ -10,6 +10,7 @@ __all__ = [
     ]
 
 import fnmatch
+import hashlib
 import json
 import logging
 import re
@@ -30,8 +31,10 @@ from maasserver.models.nodemetadata import NodeMetadata
 from maasserver.models.physicalblockdevice import PhysicalBlockDevice
 from maasserver.models.switch import Switch
 from maasserver.models.tag import Tag
+from maasserver.models.timestampedmodel import now
 from maasserver.utils.orm import get_one
 from metadataserver.enum import SCRIPT_STATUS
+from netaddr import EUI
 from provisioningserver.refresh.node_info_scripts import (
     GET_FRUID_DATA_OUTPUT_NAME,
     IPADDR_OUTPUT_NAME,
@@ -77,6 +80,10 @@ SWITCH_HARDWARE = [
 ]
 SWITCH_OPENBMC_MAC = "02:00:00:00:00:02"
 
+# The NodeMetadata key under which the fingerprint of a node's hardware is
+# recorded after its network and storage information has been updated.
+HARDWARE_FINGERPRINT_KEY = "hardware_fingerprint"
+
 
 def _create_default_physical_interface(
         node, ifname, mac, link_connected, interface_speed,
@@ -192,17 +199,25 @@ def _parse_interfaces(node, data):
     return interfaces
 
 
-def update_node_network_information(node, data, numa_nodes):
-    # Skip network configuration if set by the user.
-    if node.skip_networking:
-        # Turn off skip_networking now that the hook has been called.
-        node.skip_networking = False
-        node.save(update_fields=['skip_networking'])
-        return
+def _update_node_physical_interfaces(node, data, numa_nodes):
+    """Create, update, or move the physical interfaces found in `data`.
+
+    The existing interfaces with the MAC addresses found in `data` are
+    loaded at once, and only those that have changed are saved.
 
+    :return: The set of physical interfaces now on `node`.
+    """
     interfaces = _parse_interfaces(node, data)
     current_interfaces = set()
     extended_nic_info = parse_lshw_nic_info(node)
+    existing_interfaces = {
+        EUI(str(interface.mac_address)): interface
+        for interface in PhysicalInterface.objects.filter(
+            mac_address__in=[
+                iface['mac'] for iface in interfaces
+                if iface.get('mac') is not None
+            ]).select_related('node')
+    }
 
     for iface in interfaces:
         mac = iface.get('mac')
@@ -220,39 +235,37 @@ def update_node_network_information(node, data, numa_nodes):
             link_speed = iface.get('link_speed')
             numa_index = iface.get('numa_node')
             extra_info = extended_nic_info.get(mac, {})
-            try:
-                interface = PhysicalInterface.objects.get(
-                    mac_address=mac)
-                update_fields = []
-                if interface.node is not None and interface.node != node:
-                    logger.warning(
-                        "Interface with MAC %s moved from node %s to %s. "
-                        "(The existing interface will be deleted.)" %
-                        (interface.mac_address, interface.node.fqdn,
-                         node.fqdn))
-                    interface.delete()
-                    interface = _create_default_physical_interface(
-                        node, ifname, mac, link_connected, interface_speed,
-                        link_speed, numa_nodes[numa_index], **extra_info)
-                else:
-                    # Interface already exists on this Node, so just update
-                    # the name and NIC info.
-                    update_fields = []
-                    if interface.name != ifname:
-                        interface.name = ifname
-                        update_fields.append('name')
-                    for k, v in extra_info.items():
-                        if getattr(interface, k, v) != v:
-                            setattr(interface, k, v)
-                            update_fields.append(k)
-                    if update_fields:
-                        interface.save(
-                            update_fields=['updated', *update_fields])
-            except PhysicalInterface.DoesNotExist:
+            interface = existing_interfaces.get(EUI(mac))
+            if interface is None:
                 interface = _create_default_physical_interface(
                     node, ifname, mac, link_connected, interface_speed,
                     link_speed, numa_nodes[numa_index], **extra_info)
-
+            elif interface.node is not None and interface.node != node:
+                logger.warning(
+                    "Interface with MAC %s moved from node %s to %s. "
+                    "(The existing interface will be deleted.)" %
+                    (interface.mac_address, interface.node.fqdn,
+                     node.fqdn))
+                interface.delete()
+                interface = _create_default_physical_interface(
+                    node, ifname, mac, link_connected, interface_speed,
+                    link_speed, numa_nodes[numa_index], **extra_info)
+            else:
+                # Interface already exists on this Node, so just update
+                # the name and NIC info.
+                update_fields = []
+                if interface.name != ifname:
+                    interface.name = ifname
+                    update_fields.append('name')
+                for k, v in extra_info.items():
+                    if getattr(interface, k, v) != v:
+                        setattr(interface, k, v)
+                        update_fields.append(k)
+                if update_fields:
+                    interface.save(
+                        update_fields=['updated', *update_fields])
+
+            existing_interfaces[EUI(mac)] = interface
             current_interfaces.add(interface)
             interface.update_ip_addresses(iface.get('ips'))
 
@@ -262,6 +275,48 @@ def update_node_network_information(node, data, numa_nodes):
                     interface.vlan = None
                     interface.save(update_fields=['vlan', 'updated'])
 
+    return current_interfaces
+
+
+def _update_node_physical_interface_ip_addresses(node, data):
+    """Update the IP addresses of the physical interfaces found in `data`.
+
+    :return: The set of physical interfaces now on `node`.
+    """
+    current_interfaces = {
+        EUI(str(interface.mac_address)): interface
+        for interface in PhysicalInterface.objects.filter(node=node)
+    }
+    for iface in _parse_interfaces(node, data):
+        mac = iface.get('mac')
+        if mac is None or mac == SWITCH_OPENBMC_MAC:
+            continue
+        interface = current_interfaces.get(EUI(mac))
+        if interface is not None:
+            interface.update_ip_addresses(iface.get('ips'))
+    return set(current_interfaces.values())
+
+
+def update_node_network_information(node, data, numa_nodes, reconcile=True):
+    """Update the network interfaces of `node` from the LXD output.
+
+    :param reconcile: If False, the physical interfaces of `node` are known
+        to match `data` already, so only their IP addresses are updated.
+    """
+    # Skip network configuration if set by the user.
+    if node.skip_networking:
+        # Turn off skip_networking now that the hook has been called.
+        node.skip_networking = False
+        node.save(update_fields=['skip_networking'])
+        return
+
+    if reconcile:
+        current_interfaces = _update_node_physical_interfaces(
+            node, data, numa_nodes)
+    else:
+        current_interfaces = _update_node_physical_interface_ip_addresses(
+            node, data)
+
     # If a machine boots by UUID before commissioning(s390x) no boot_interface
     # will be set as interfaces existed during boot. Set it using the
     # boot_cluster_ip now that the interfaces have been created.
@@ -391,11 +446,106 @@ def update_hardware_details(node, output, exit_status):
                     defaults={'value': value})
 
 
+def _update_node_numa_nodes(node, numa_nodes):
+    """Create or update the NUMA nodes of `node`.
+
+    The existing NUMA nodes are loaded at once, only those that have changed
+    are saved, and new NUMA nodes are created together.
+
+    :return: A list of the NUMA nodes, in the order of `numa_nodes`.
+    """
+    existing = {
+        numa_node.index: numa_node
+        for numa_node in NUMANode.objects.filter(node=node)
+    }
+    created = now()
+    result, new = [], []
+    for numa_index, numa_data in numa_nodes.items():
+        numa_node = existing.get(numa_index)
+        if numa_node is None:
+            numa_node = NUMANode(
+                created=created, updated=created, node=node,
+                index=numa_index, memory=numa_data['memory'],
+                cores=numa_data['cores'])
+            new.append(numa_node)
+        elif (numa_node.memory != numa_data['memory'] or
+                numa_node.cores != numa_data['cores']):
+            numa_node.memory = numa_data['memory']
+            numa_node.cores = numa_data['cores']
+            numa_node.save(update_fields=['memory', 'cores', 'updated'])
+        result.append(numa_node)
+    if len(new) != 0:
+        NUMANode.objects.bulk_create(new)
+    return result
+
+
+def _hash_hardware_info(node, data, numa_nodes):
+    """Hash the information that the hardware is reconciled with.
+
+    This is what is parsed from the LXD output in `data`, and from the
+    `IPADDR_OUTPUT_NAME` and `LSHW_OUTPUT_NAME` results, rather than the
+    output itself. The output also holds values that change every time it
+    is gathered, such as the current CPU frequency, the memory in use, and
+    the lifetimes of IP addresses. The IP addresses are left out too, as
+    they are updated whether or not the hardware is reconciled.
+    """
+    interfaces = [
+        {key: value for key, value in interface.items() if key != 'ips'}
+        for interface in _parse_interfaces(node, data)
+    ]
+    block_devices = [
+        (block_info['read_only'], block_info.get('numa_node'),
+         _parse_block_device(block_info))
+        for block_info in data.get('storage', {}).get('disks', [])
+    ]
+    info = {
+        'interfaces': interfaces,
+        'nics': parse_lshw_nic_info(node),
+        'block_devices': block_devices,
+        'numa_nodes': [
+            (index, numa_node['cores'], numa_node.get('memory'))
+            for index, numa_node in numa_nodes.items()
+        ],
+    }
+    return hashlib.sha256(json.dumps(info, sort_keys=True).encode('utf-8'))
+
+
+# The fields of each kind of device that reconciling with the output sets,
+# and that can also be changed by other means between commissionings.
+HARDWARE_FINGERPRINT_FIELDS = (
+    (PhysicalInterface, ('id', 'name', 'vlan_id')),
+    (PhysicalBlockDevice, ('id', 'name', 'tags')),
+)
+
+
+def _get_hardware_fingerprint(node, output_digest):
+    """Return a fingerprint of the hardware of `node`.
+
+    This covers the commissioning output, hashed by `_hash_hardware_info`,
+    and the physical interfaces and block devices that `node` has right
+    now. It therefore changes when the hardware in the output changes, and
+    also when devices have been added, removed, renamed, or retagged by
+    other means since the last commissioning, so that reconciling puts them
+    back as the output says.
+    """
+    digest = output_digest.copy()
+    for model, fields in HARDWARE_FINGERPRINT_FIELDS:
+        rows = model.objects.filter(node=node).order_by('id').values_list(
+            *fields)
+        digest.update(("%s:%r;" % (model.__name__, list(rows))).encode())
+    return digest.hexdigest()
+
+
 def process_lxd_results(node, output, exit_status):
     """Process the results of `LXD_SCRIPT`.
 
     If `exit_status` is non-zero, this function returns without doing
     anything.
+
+    The physical interfaces and block devices are only reconciled with the
+    output when the fingerprint of the hardware differs from the one
+    recorded the last time they were. The IP addresses of the interfaces
+    are updated either way.
     """
     if exit_status != 0:
         logger.error(
@@ -414,18 +564,35 @@ def process_lxd_results(node, output, exit_status):
     # Update memory.
     node.memory, numa_nodes = _parse_memory(data, numa_nodes)
 
+    # Hardware that the user asked to keep is not reconciled, so it cannot
+    # be relied upon to match the output afterwards.
+    if node.skip_networking or node.skip_storage:
+        output_digest = None
+        reconcile = True
+    else:
+        output_digest = _hash_hardware_info(node, data, numa_nodes)
+        reconcile = _get_hardware_fingerprint(node, output_digest) != (
+            NodeMetadata.objects.filter(
+                node=node, key=HARDWARE_FINGERPRINT_KEY).values_list(
+                    'value', flat=True).first())
+
     # Create or update NUMA nodes.
-    numa_nodes = [
-        NUMANode.objects.update_or_create(
-            node=node, index=numa_index, defaults={
-                'memory': numa_data['memory'],
-                'cores': numa_data['cores']}
-        )[0] for numa_index, numa_data in numa_nodes.items()]
+    numa_nodes = _update_node_numa_nodes(node, numa_nodes)
 
     # Network interfaces.
-    update_node_network_information(node, data, numa_nodes)
+    update_node_network_information(
+        node, data, numa_nodes, reconcile=reconcile)
     # Storage.
-    update_node_physical_block_devices(node, data, numa_nodes)
+    update_node_physical_block_devices(
+        node, data, numa_nodes, reconcile=reconcile)
+
+    if output_digest is None:
+        NodeMetadata.objects.filter(
+            node=node, key=HARDWARE_FINGERPRINT_KEY).delete()
+    elif reconcile:
+        NodeMetadata.objects.update_or_create(
+            node=node, key=HARDWARE_FINGERPRINT_KEY, defaults={
+                'value': _get_hardware_fingerprint(node, output_digest)})
 
     if cpu_model:
         NodeMetadata.objects.update_or_create(
@@ -584,67 +751,59 @@ def get_matching_block_device(block_devices, serial=None, id_path=None):
     return None
 
 
-def update_node_physical_block_devices(node, data, numa_nodes):
-    # Skip storage configuration if set by the user.
-    if node.skip_storage:
-        # Turn off skip_storage now that the hook has been called.
-        node.skip_storage = False
-        node.save(update_fields=['skip_storage'])
-        return
+def _parse_block_device(block_info):
+    """Return the fields of a `PhysicalBlockDevice` for `block_info`."""
+    serial = block_info.get('serial', '')
+    id_path = block_info.get('device_path', '')
+    if not id_path or not serial:
+        # Fallback to the dev path if device_path missing or there is
+        # no serial number. (No serial number is a strong indicator that
+        # this is a virtual disk, so it's unlikely that the device_path
+        # would work.)
+        id_path = '/dev/' + block_info.get('id')
+    return {
+        'name': block_info['id'],
+        'model': block_info.get('model', ''),
+        'serial': serial,
+        'id_path': id_path,
+        'size': block_info.get('size', 0),
+        'block_size': block_info.get('block_size', 0),
+        'firmware_version': block_info.get('firmware_version'),
+        'tags': get_tags_from_block_info(block_info),
+    }
+
 
+def _update_node_physical_block_devices(node, data, numa_nodes):
+    """Create or update the physical block devices found in `data`.
+
+    The existing block devices of `node` are loaded at once and matched to
+    those in `data` in memory. Only the devices that have changed are saved,
+    and only those holding a name that another device needs are renamed out
+    of the way first.
+
+    :return: The previous block devices that are no longer present.
+    """
     blockdevs = data.get('storage', {}).get('disks', [])
     previous_block_devices = list(
         PhysicalBlockDevice.objects.filter(node=node).all())
+    updated, created = [], []
     for block_info in blockdevs:
         # Skip the read-only devices. We keep them in the output for
         # the user to view but they do not get an entry in the database.
         if block_info['read_only']:
             continue
-        name = block_info['id']
-        model = block_info.get('model', '')
-        serial = block_info.get('serial', '')
-        id_path = block_info.get('device_path', '')
-        if not id_path or not serial:
-            # Fallback to the dev path if device_path missing or there is
-            # no serial number. (No serial number is a strong indicator that
-            # this is a virtual disk, so it's unlikely that the device_path
-            # would work.)
-            id_path = '/dev/' + block_info.get('id')
-        size = block_info.get('size', 0)
-        block_size = block_info.get('block_size', 0)
-        firmware_version = block_info.get('firmware_version')
-        numa_index = block_info.get('numa_node')
-        tags = get_tags_from_block_info(block_info)
-
-        # First check if there is an existing device with the same name.
-        # If so, we need to rename it. Its name will be changed back later,
-        # when we loop around to it.
-        existing = PhysicalBlockDevice.objects.filter(
-            node=node, name=name).all()
-        for device in existing:
-            # Use the device ID to ensure a unique temporary name.
-            device.name = "%s.%d" % (device.name, device.id)
-            device.save(update_fields=['name'])
+        fields = _parse_block_device(block_info)
+        serial, id_path, size = (
+            fields['serial'], fields['id_path'], fields['size'])
 
         block_device = get_matching_block_device(
             previous_block_devices, serial, id_path)
         if block_device is not None:
-            # Refresh, since it might have been temporarily renamed
-            # above.
-            block_device.refresh_from_db()
             # Already exists for the node. Keep the original object so the
             # ID doesn't change and if its set to the boot_disk that FK will
             # not need to be updated.
             previous_block_devices.remove(block_device)
-            block_device.name = name
-            block_device.model = model
-            block_device.serial = serial
-            block_device.id_path = id_path
-            block_device.size = size
-            block_device.block_size = block_size
-            block_device.firmware_version = firmware_version
-            block_device.tags = tags
-            block_device.save()
+            updated.append((block_device, fields))
         else:
             # MAAS doesn't allow disks smaller than 4MiB so skip them
             if size <= MIN_BLOCK_DEVICE_SIZE:
@@ -652,19 +811,53 @@ def update_node_physical_block_devices(node, data, numa_nodes):
             # Skip loopback devices as they won't be available on next boot
             if id_path.startswith('/dev/loop'):
                 continue
+            created.append((block_info.get('numa_node'), fields))
+
+    # Any existing device holding a name that another device needs must be
+    # renamed first. Its name will be changed back, or it will be deleted.
+    names = {fields['name'] for _, fields in updated + created}
+    for block_device in [
+            block_device for block_device, fields in updated
+            if block_device.name != fields['name']] + previous_block_devices:
+        if block_device.name in names:
+            # Use the device ID to ensure a unique temporary name.
+            block_device.name = "%s.%d" % (
+                block_device.name, block_device.id)
+            block_device.save(update_fields=['name'])
+
+    for block_device, fields in updated:
+        for field, value in fields.items():
+            setattr(block_device, field, value)
+        # Only the fields that have changed are saved, if any.
+        block_device.save()
+
+    for numa_index, fields in created:
+        # New block device. Create it on the node.
+        PhysicalBlockDevice.objects.create(
+            numa_node=numa_nodes[numa_index], **fields)
+
+    return previous_block_devices
 
-            # New block device. Create it on the node.
-            PhysicalBlockDevice.objects.create(
-                numa_node=numa_nodes[numa_index],
-                name=name,
-                id_path=id_path,
-                size=size,
-                block_size=block_size,
-                tags=tags,
-                model=model,
-                serial=serial,
-                firmware_version=firmware_version,
-                )
+
+def update_node_physical_block_devices(
+        node, data, numa_nodes, reconcile=True):
+    """Update the physical block devices of `node` from the LXD output.
+
+    :param reconcile: If False, the physical block devices of `node` are
+        known to match `data` already so they are left as they are.
+    """
+    # Skip storage configuration if set by the user.
+    if node.skip_storage:
+        # Turn off skip_storage now that the hook has been called.
+        node.skip_storage = False
+        node.save(update_fields=['skip_storage'])
+        return
+
+    if reconcile:
+        previous_block_devices = _update_node_physical_block_devices(
+            node, data, numa_nodes)
+    else:
+        previous_block_devices = []
 
     # Clear boot_disk if it is being removed.
     boot_disk = node.boot_disk
@@ -21,7 +21,10 @@ from maasserver.enum import (
 from maasserver.fields import MAC
 from maasserver.models.blockdevice import MIN_BLOCK_DEVICE_SIZE
 from maasserver.models.config import Config
-from maasserver.models.interface import Interface
+from maasserver.models.interface import (
+    Interface,
+    PhysicalInterface,
+)
 from maasserver.models.nodemetadata import NodeMetadata
 from maasserver.models.numa import NUMANode
 from maasserver.models.physicalblockdevice import PhysicalBlockDevice
@@ -32,6 +35,7 @@ from maasserver.storage_layouts import get_applied_storage_layout_for_node
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils.orm import reload_object
+from maastesting.matchers import MockNotCalled
 from maastesting.testcase import MAASTestCase
 from metadataserver.builtin_scripts.hooks import (
     add_switch,
@@ -1382,6 +1386,139 @@ class TestProcessLXDResults(MAASServerTestCase):
         self.assertEqual(node_interfaces[0].numa_node, numa_nodes[0])
         self.assertEqual(node_interfaces[1].numa_node, numa_nodes[1])
 
+    def test__updates_existing_numa_nodes_in_place(self):
+        node = factory.make_Node()
+        self.patch(hooks_module, 'update_node_network_information')
+        numa_node = NUMANode.objects.get(node=node, index=0)
+
+        process_lxd_results(
+            node, json.dumps(SAMPLE_LXD_JSON).encode('utf-8'), 0)
+        self.assertEqual(
+            [numa_node.id, 0, 1],
+            [NUMANode.objects.get(node=node, index=0).id] + [
+                numa.index for numa in NUMANode.objects.filter(
+                    node=node).order_by('index')])
+
+    def test__records_hardware_fingerprint(self):
+        node = factory.make_Node()
+        create_IPADDR_OUTPUT_NAME_script(node, IP_ADDR_OUTPUT)
+
+        process_lxd_results(
+            node, json.dumps(SAMPLE_LXD_JSON).encode('utf-8'), 0)
+        self.assertTrue(
+            NodeMetadata.objects.filter(
+                node=node, key=hooks_module.HARDWARE_FINGERPRINT_KEY).exists())
+
+    def test__skips_reconciling_unchanged_hardware(self):
+        node = factory.make_Node()
+        create_IPADDR_OUTPUT_NAME_script(node, IP_ADDR_OUTPUT)
+        output = json.dumps(SAMPLE_LXD_JSON).encode('utf-8')
+        process_lxd_results(node, output, 0)
+        update_interfaces = self.patch(
+            hooks_module, '_update_node_physical_interfaces')
+        update_block_devices = self.patch(
+            hooks_module, '_update_node_physical_block_devices')
+
+        process_lxd_results(node, output, 0)
+        self.assertThat(update_interfaces, MockNotCalled())
+        self.assertThat(update_block_devices, MockNotCalled())
+        self.assertEqual(
+            3, PhysicalInterface.objects.filter(node=node).count())
+        self.assertEqual(
+            2, PhysicalBlockDevice.objects.filter(node=node).count())
+
+    def test__skips_reconciling_when_only_volatile_output_changes(self):
+        node = factory.make_Node()
+        create_IPADDR_OUTPUT_NAME_script(node, IP_ADDR_OUTPUT)
+        process_lxd_results(
+            node, json.dumps(SAMPLE_LXD_JSON).encode('utf-8'), 0)
+        update_interfaces = self.patch(
+            hooks_module, '_update_node_physical_interfaces')
+        update_block_devices = self.patch(
+            hooks_module, '_update_node_physical_block_devices')
+
+        # The current CPU frequency, the memory in use, and the lifetimes
+        # of IP addresses differ every time the output is gathered.
+        VOLATILE = deepcopy(SAMPLE_LXD_JSON)
+        for socket in VOLATILE['cpu']['sockets']:
+            socket['frequency'] += 100
+            for core in socket['cores']:
+                core['frequency'] += 100
+        VOLATILE['memory']['used'] += 4096
+        for memory_node in VOLATILE['memory']['nodes']:
+            memory_node['used'] += 2048
+        create_IPADDR_OUTPUT_NAME_script(
+            node, IP_ADDR_OUTPUT.replace(
+                b"valid_lft forever preferred_lft forever",
+                b"valid_lft 3599sec preferred_lft 3599sec"))
+
+        process_lxd_results(node, json.dumps(VOLATILE).encode('utf-8'), 0)
+        self.assertThat(update_interfaces, MockNotCalled())
+        self.assertThat(update_block_devices, MockNotCalled())
+
+    def test__updates_ip_addresses_of_unchanged_hardware(self):
+        node = factory.make_Node()
+        create_IPADDR_OUTPUT_NAME_script(node, IP_ADDR_OUTPUT)
+        output = json.dumps(SAMPLE_LXD_JSON).encode('utf-8')
+        process_lxd_results(node, output, 0)
+        update_interfaces = self.patch(
+            hooks_module, '_update_node_physical_interfaces')
+        update_ip_addresses = self.patch(
+            PhysicalInterface, 'update_ip_addresses')
+
+        process_lxd_results(node, output, 0)
+        self.assertThat(update_interfaces, MockNotCalled())
+        self.assertEqual(
+            PhysicalInterface.objects.filter(node=node).count(),
+            update_ip_addresses.call_count)
+
+    def test__resets_renamed_devices_of_unchanged_hardware(self):
+        node = factory.make_Node()
+        create_IPADDR_OUTPUT_NAME_script(node, IP_ADDR_OUTPUT)
+        output = json.dumps(SAMPLE_LXD_JSON).encode('utf-8')
+        process_lxd_results(node, output, 0)
+        interface = PhysicalInterface.objects.filter(node=node).first()
+        interface_name = interface.name
+        interface.name = factory.make_name('eth')
+        interface.save()
+        block_device = PhysicalBlockDevice.objects.filter(node=node).first()
+        block_device_name, block_device_tags = (
+            block_device.name, block_device.tags)
+        block_device.name = factory.make_name('sd')
+        block_device.tags = [factory.make_name('tag')]
+        block_device.save()
+
+        process_lxd_results(node, output, 0)
+        self.assertEqual(interface_name, reload_object(interface).name)
+        block_device = reload_object(block_device)
+        self.assertEqual(block_device_name, block_device.name)
+        self.assertEqual(block_device_tags, block_device.tags)
+
+    def test__reconciles_changed_output(self):
+        node = factory.make_Node()
+        create_IPADDR_OUTPUT_NAME_script(node, IP_ADDR_OUTPUT)
+        process_lxd_results(
+            node, json.dumps(SAMPLE_LXD_JSON).encode('utf-8'), 0)
+
+        NEW_NAMES = deepcopy(SAMPLE_LXD_JSON)
+        NEW_NAMES['storage']['disks'][0]['id'] = 'sdy'
+        process_lxd_results(
+            node, json.dumps(NEW_NAMES).encode('utf-8'), 0)
+        self.assertTrue(
+            PhysicalBlockDevice.objects.filter(
+                node=node, name='sdy').exists())
+
+    def test__reconciles_hardware_removed_since_last_time(self):
+        node = factory.make_Node()
+        create_IPADDR_OUTPUT_NAME_script(node, IP_ADDR_OUTPUT)
+        output = json.dumps(SAMPLE_LXD_JSON).encode('utf-8')
+        process_lxd_results(node, output, 0)
+        PhysicalBlockDevice.objects.filter(node=node).first().delete()
+
+        process_lxd_results(node, output, 0)
+        self.assertEqual(
+            2, PhysicalBlockDevice.objects.filter(node=node).count())
+
     def test__ipaddr_script_before(self):
         self.assertLess(
             IPADDR_OUTPUT_NAME, LXD_OUTPUT_NAME,
@@ -1493,6 +1630,24 @@ class TestUpdateNodePhysicalBlockDevices(MAASServerTestCase):
              ('sdz', NEW_NAMES['storage']['disks'][2]['serial'])],
             device_names)
 
+    def test__handles_swapped_block_device_names(self):
+        node = factory.make_Node()
+        update_node_physical_block_devices(
+            node, SAMPLE_LXD_JSON, create_numa_nodes(node))
+        ids_by_serial = {
+            device.serial: device.id
+            for device in PhysicalBlockDevice.objects.filter(node=node)
+        }
+        SWAPPED = deepcopy(SAMPLE_LXD_JSON)
+        disks = SWAPPED['storage']['disks']
+        disks[0]['id'], disks[1]['id'] = disks[1]['id'], disks[0]['id']
+        update_node_physical_block_devices(
+            node, SWAPPED, create_numa_nodes(node))
+        self.assertItemsEqual(
+            [(ids_by_serial[disk['serial']], disk['id']) for disk in disks],
+            PhysicalBlockDevice.objects.filter(node=node).values_list(
+                'id', 'name'))
+
     def test__only_updates_physical_block_devices(self):
         node = factory.make_Node()
         update_node_physical_block_devices(
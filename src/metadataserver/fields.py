@@ -5,12 +5,14 @@
 
 __all__ = [
     'BinaryField',
+    'CompressedBinaryField',
     ]
 
 from base64 import (
     b64decode,
     b64encode,
 )
+import zlib
 
 from django.db import connection
 from maasserver.fields import Field
@@ -143,3 +145,31 @@ class BinaryField(Field):
         """Override Django's crack-smoking ``Field.get_default``."""
         default = self._get_default()
         return None if default is None else Bin(default)
+
+
+class CompressedBinaryField(BinaryField):
+    """A `BinaryField` that stores its data compressed.
+
+    Values are zlib-compressed before being base64-encoded, and marked with
+    a prefix that cannot occur in base64 output. Values stored uncompressed
+    by a plain `BinaryField`, or that don't get any smaller when compressed,
+    are read and written as before.
+    """
+
+    prefix = 'zlib:'
+
+    def to_python(self, value):
+        """Django overridable: convert database value to python-side value."""
+        if isinstance(value, str) and value.startswith(self.prefix):
+            return Bin(zlib.decompress(b64decode(value[len(self.prefix):])))
+        else:
+            return super(CompressedBinaryField, self).to_python(value)
+
+    def get_db_prep_value(self, value, connection=None, prepared=False):
+        """Django overridable: convert python-side value to database value."""
+        if isinstance(value, Bin) and len(value) > 0:
+            compressed = zlib.compress(value)
+            if len(compressed) < len(value):
+                return self.prefix + b64encode(compressed).decode('ascii')
+        return super(CompressedBinaryField, self).get_db_prep_value(
+            value, connection=connection, prepared=prepared)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import (
+    migrations,
+    transaction,
+)
+import metadataserver.fields
+
+# Number of script results to rewrite in each transaction.
+BATCH_SIZE = 500
+
+OUTPUT_FIELDS = ('output', 'stdout', 'stderr', 'result')
+
+
+def recode_script_results(schema_editor, from_field, to_field):
+    """Rewrite the output of every script result, a batch at a time.
+
+    Each value is read with `from_field` and written back with `to_field`.
+    Batches are committed separately so rewriting a large table neither
+    holds one long transaction open nor loads every row into memory.
+    """
+    connection = schema_editor.connection
+    select = """
+        SELECT id, %s FROM metadataserver_scriptresult
+        WHERE id > %%s ORDER BY id LIMIT %%s
+        """ % ', '.join(OUTPUT_FIELDS)
+    update = """
+        UPDATE metadataserver_scriptresult SET %s WHERE id = %%s
+        """ % ', '.join('%s = %%s' % field for field in OUTPUT_FIELDS)
+    last_id = 0
+    while True:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(select, [last_id, BATCH_SIZE])
+                rows = cursor.fetchall()
+                for row in rows:
+                    values = [
+                        to_field.get_db_prep_value(from_field.to_python(value))
+                        for value in row[1:]
+                    ]
+                    if values != list(row[1:]):
+                        cursor.execute(update, values + [row[0]])
+        if len(rows) < BATCH_SIZE:
+            break
+        last_id = rows[-1][0]
+
+
+def compress_script_results(apps, schema_editor):
+    recode_script_results(
+        schema_editor, metadataserver.fields.CompressedBinaryField(),
+        metadataserver.fields.CompressedBinaryField())
+
+
+def decompress_script_results(apps, schema_editor):
+    recode_script_results(
+        schema_editor, metadataserver.fields.CompressedBinaryField(),
+        metadataserver.fields.BinaryField())
+
+
+class Migration(migrations.Migration):
+
+    # Each batch of script results is committed in its own transaction.
+    atomic = False
+
+    dependencies = [
+        ('metadataserver', '0023_reorder_network_scripts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scriptresult',
+            name='output',
+            field=metadataserver.fields.CompressedBinaryField(blank=True, default=b'', max_length=1048576),
+        ),
+        migrations.AlterField(
+            model_name='scriptresult',
+            name='result',
+            field=metadataserver.fields.CompressedBinaryField(blank=True, default=b'', max_length=1048576),
+        ),
+        migrations.AlterField(
+            model_name='scriptresult',
+            name='stderr',
+            field=metadataserver.fields.CompressedBinaryField(blank=True, default=b'', max_length=1048576),
+        ),
+        migrations.AlterField(
+            model_name='scriptresult',
+            name='stdout',
+            field=metadataserver.fields.CompressedBinaryField(blank=True, default=b'', max_length=1048576),
+        ),
+        migrations.RunPython(
+            compress_script_results, decompress_script_results),
+    ]
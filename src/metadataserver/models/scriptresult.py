@@ -45,7 +45,7 @@ from metadataserver.enum import (
 )
 from metadataserver.fields import (
     Bin,
-    BinaryField,
+    CompressedBinaryField,
 )
 from metadataserver.models.script import Script
 from metadataserver.models.scriptset import ScriptSet
@@ -93,13 +93,17 @@ class ScriptResult(CleanSave, TimestampedModel):
     script_name = CharField(
         max_length=255, unique=False, editable=False, null=True)
 
-    output = BinaryField(max_length=1024 * 1024, blank=True, default=b'')
+    output = CompressedBinaryField(
+        max_length=1024 * 1024, blank=True, default=b'')
 
-    stdout = BinaryField(max_length=1024 * 1024, blank=True, default=b'')
+    stdout = CompressedBinaryField(
+        max_length=1024 * 1024, blank=True, default=b'')
 
-    stderr = BinaryField(max_length=1024 * 1024, blank=True, default=b'')
+    stderr = CompressedBinaryField(
+        max_length=1024 * 1024, blank=True, default=b'')
 
-    result = BinaryField(max_length=1024 * 1024, blank=True, default=b'')
+    result = CompressedBinaryField(
+        max_length=1024 * 1024, blank=True, default=b'')
 
     # When the script started to run
     started = DateTimeField(editable=False, null=True, blank=True)
@@ -76,7 +76,9 @@ from maastesting.utils import sample_binary_data
 from metadataserver import api
 from metadataserver.api import (
     add_event_to_node_event_log,
+    ARCHIVE_MTIME,
     check_version,
+    CommissioningScriptsHandler,
     get_node_for_mac,
     NETPLAN_TAR_PATH,
     get_node_for_request,
@@ -1212,16 +1214,13 @@ class TestInstallingAPI(MAASServerTestCase):
 
 class TestMAASScripts(MAASServerTestCase):
 
-    def extract_and_validate_file(
-            self, tar, path, start_time, end_time, content, mode=0o755):
+    def extract_and_validate_file(self, tar, path, content, mode=0o755):
         member = tar.getmember(path)
-        self.assertGreaterEqual(member.mtime, start_time)
-        self.assertLessEqual(member.mtime, end_time)
+        self.assertEqual(ARCHIVE_MTIME, member.mtime)
         self.assertEqual(mode, member.mode)
         self.assertEqual(content, tar.extractfile(path).read())
 
-    def validate_scripts(
-            self, script_set, path_name, tar, start_time, end_time):
+    def validate_scripts(self, script_set, path_name, tar):
         meta_data = []
         contains_network_config = False
         for script_result in script_set:
@@ -1263,22 +1262,18 @@ class TestMAASScripts(MAASServerTestCase):
                 out_path = os.path.join('out', '%s.%s' % (
                     script_result.name, script_result.id))
                 self.extract_and_validate_file(
-                    tar, out_path, start_time, end_time, script_result.output)
+                    tar, out_path, script_result.output)
                 self.extract_and_validate_file(
-                    tar, '%s.out' % out_path, start_time, end_time,
-                    script_result.stdout)
+                    tar, '%s.out' % out_path, script_result.stdout)
                 self.extract_and_validate_file(
-                    tar, '%s.err' % out_path, start_time, end_time,
-                    script_result.stderr)
+                    tar, '%s.err' % out_path, script_result.stderr)
                 self.extract_and_validate_file(
-                    tar, '%s.yaml' % out_path, start_time, end_time,
-                    script_result.result)
+                    tar, '%s.yaml' % out_path, script_result.result)
 
             if md_item['apply_configured_networking']:
                 contains_network_config = True
 
-            self.extract_and_validate_file(
-                tar, script_path, start_time, end_time, content)
+            self.extract_and_validate_file(tar, script_path, content)
             meta_data.append(md_item)
 
         if contains_network_config:
@@ -1296,14 +1291,13 @@ class TestMAASScripts(MAASServerTestCase):
             network_config_yaml = yaml.safe_dump(
                 network_config.config, default_flow_style=False)
             self.extract_and_validate_file(
-                tar, NETPLAN_TAR_PATH, start_time, end_time,
+                tar, NETPLAN_TAR_PATH,
                 network_config_yaml.encode(), 0o644)
         else:
             self.assertNotIn(NETPLAN_TAR_PATH, tar.getnames())
         return meta_data
 
     def test__returns_all_scripts_when_commissioning(self):
-        start_time = floor(time.time())
         node = factory.make_Node(
             status=NODE_STATUS.COMMISSIONING, with_empty_script_sets=True)
         response = make_node_client(node=node).get(
@@ -1314,7 +1308,6 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # The + 1 is for the index.json file.
         self.assertEquals(
             node.current_commissioning_script_set.scriptresult_set.count() +
@@ -1322,11 +1315,9 @@ class TestMAASScripts(MAASServerTestCase):
             len(tar.getmembers()))
 
         commissioning_meta_data = self.validate_scripts(
-            node.current_commissioning_script_set, 'commissioning',
-            tar, start_time, end_time)
+            node.current_commissioning_script_set, 'commissioning', tar)
         testing_meta_data = self.validate_scripts(
-            node.current_testing_script_set, 'testing',
-            tar, start_time, end_time)
+            node.current_testing_script_set, 'testing', tar)
 
         meta_data = json.loads(
             tar.extractfile('index.json').read().decode('utf-8'))
@@ -1377,7 +1368,6 @@ class TestMAASScripts(MAASServerTestCase):
                 script=for_hardware_script).script)
 
     def test__returns_testing_scripts_when_testing(self):
-        start_time = floor(time.time())
         node = factory.make_Node(
             status=NODE_STATUS.TESTING, with_empty_script_sets=True)
 
@@ -1389,15 +1379,13 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # The + 1 is for the index.json file.
         self.assertEquals(
             node.current_testing_script_set.scriptresult_set.count() + 1,
             len(tar.getmembers()))
 
         testing_meta_data = self.validate_scripts(
-            node.current_testing_script_set, 'testing',
-            tar, start_time, end_time)
+            node.current_testing_script_set, 'testing', tar)
 
         meta_data = json.loads(
             tar.extractfile('index.json').read().decode('utf-8'))
@@ -1409,7 +1397,6 @@ class TestMAASScripts(MAASServerTestCase):
             }}, meta_data)
 
     def test__returns_commissioning_scripts_when_entering_rescue_mode(self):
-        start_time = floor(time.time())
         node = factory.make_Node(
             status=NODE_STATUS.ENTERING_RESCUE_MODE,
             with_empty_script_sets=True)
@@ -1421,7 +1408,6 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # The + 1 is for the index.json file.
         self.assertEquals(
             node.current_commissioning_script_set.scriptresult_set.count() +
@@ -1429,11 +1415,9 @@ class TestMAASScripts(MAASServerTestCase):
             len(tar.getmembers()))
 
         commissioning_meta_data = self.validate_scripts(
-            node.current_commissioning_script_set, 'commissioning',
-            tar, start_time, end_time)
+            node.current_commissioning_script_set, 'commissioning', tar)
         testing_meta_data = self.validate_scripts(
-            node.current_testing_script_set, 'testing',
-            tar, start_time, end_time)
+            node.current_testing_script_set, 'testing', tar)
 
         meta_data = json.loads(
             tar.extractfile('index.json').read().decode('utf-8'))
@@ -1448,7 +1432,6 @@ class TestMAASScripts(MAASServerTestCase):
             }}, meta_data)
 
     def test__returns_commissioning_scripts_when_in_rescue_mode(self):
-        start_time = floor(time.time())
         node = factory.make_Node(
             status=NODE_STATUS.RESCUE_MODE, with_empty_script_sets=True)
         response = make_node_client(node=node).get(
@@ -1459,7 +1442,6 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # The + 1 is for the index.json file.
         self.assertEquals(
             node.current_commissioning_script_set.scriptresult_set.count() +
@@ -1467,11 +1449,9 @@ class TestMAASScripts(MAASServerTestCase):
             len(tar.getmembers()))
 
         commissioning_meta_data = self.validate_scripts(
-            node.current_commissioning_script_set, 'commissioning',
-            tar, start_time, end_time)
+            node.current_commissioning_script_set, 'commissioning', tar)
         testing_meta_data = self.validate_scripts(
-            node.current_testing_script_set, 'testing',
-            tar, start_time, end_time)
+            node.current_testing_script_set, 'testing', tar)
 
         meta_data = json.loads(
             tar.extractfile('index.json').read().decode('utf-8'))
@@ -1529,7 +1509,6 @@ class TestMAASScripts(MAASServerTestCase):
                 }]}}, meta_data)
 
     def test__only_returns_scripts_which_havnt_been_run(self):
-        start_time = floor(time.time())
         node = factory.make_Node(
             status=NODE_STATUS.COMMISSIONING, with_empty_script_sets=True)
 
@@ -1550,7 +1529,6 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # We have two scripts which have been run but the tar always includes
         # an index.json file so subtract one.
         self.assertEquals(
@@ -1563,13 +1541,13 @@ class TestMAASScripts(MAASServerTestCase):
                 script_result
                 for script_result in node.current_commissioning_script_set
                 if script_result.id != already_run_commissioning_script.id
-            ], 'commissioning', tar, start_time, end_time)
+            ], 'commissioning', tar)
         testing_meta_data = self.validate_scripts(
             [
                 script_result
                 for script_result in node.current_testing_script_set
                 if script_result.id != already_run_testing_script.id
-            ], 'testing', tar, start_time, end_time)
+            ], 'testing', tar)
 
         meta_data = json.loads(
             tar.extractfile('index.json').read().decode('utf-8'))
@@ -1584,7 +1562,6 @@ class TestMAASScripts(MAASServerTestCase):
             }}, meta_data)
 
     def test__returns_output_when_has_started(self):
-        start_time = floor(time.time())
         node = factory.make_Node(status=NODE_STATUS.TESTING)
         script_set = factory.make_ScriptSet(result_type=RESULT_TYPE.TESTING)
         node.current_testing_script_set = script_set
@@ -1600,14 +1577,12 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # index.json + one script + combined, stdout, stderr, and result
         # output.
         self.assertEquals(6, len(tar.getmembers()))
 
         testing_meta_data = self.validate_scripts(
-            node.current_testing_script_set, 'testing',
-            tar, start_time, end_time)
+            node.current_testing_script_set, 'testing', tar)
 
         meta_data = json.loads(
             tar.extractfile('index.json').read().decode('utf-8'))
@@ -1619,7 +1594,6 @@ class TestMAASScripts(MAASServerTestCase):
             }}, meta_data)
 
     def test__contains_netplan_yaml_with_apply_config_networking(self):
-        start_time = floor(time.time())
         node = factory.make_Node(
             status=NODE_STATUS.TESTING, osystem=factory.make_name('osystem'),
             distro_series=factory.make_name('distro_series'))
@@ -1638,13 +1612,11 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # index.json + one script + netplan.yaml
         self.assertEquals(3, len(tar.getmembers()))
 
         testing_meta_data = self.validate_scripts(
-            node.current_testing_script_set, 'testing',
-            tar, start_time, end_time)
+            node.current_testing_script_set, 'testing', tar)
 
         meta_data = json.loads(
             tar.extractfile('index.json').read().decode('utf-8'))
@@ -1664,6 +1636,37 @@ class TestMAASScripts(MAASServerTestCase):
             "Unexpected response %d: %s"
             % (response.status_code, response.content))
 
+    def test__returns_same_archive_and_etag_for_same_scripts(self):
+        node = factory.make_Node(
+            status=NODE_STATUS.TESTING, with_empty_script_sets=True)
+        client = make_node_client(node=node)
+        url = reverse('maas-scripts', args=['latest'])
+        first = client.get(url)
+        second = client.get(url)
+        self.assertEqual(http.client.OK, second.status_code)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test__returns_not_modified_when_etag_matches(self):
+        node = factory.make_Node(
+            status=NODE_STATUS.TESTING, with_empty_script_sets=True)
+        client = make_node_client(node=node)
+        url = reverse('maas-scripts', args=['latest'])
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.NOT_MODIFIED, response.status_code)
+        self.assertEqual(etag, response['ETag'])
+        self.assertEqual(b'', response.content)
+
+    def test__returns_archive_when_etag_does_not_match(self):
+        node = factory.make_Node(
+            status=NODE_STATUS.TESTING, with_empty_script_sets=True)
+        response = make_node_client(node=node).get(
+            reverse('maas-scripts', args=['latest']),
+            HTTP_IF_NONE_MATCH='"%s"' % factory.make_name('etag'))
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEquals('application/x-tar', response['Content-Type'])
+
 
 class TestCommissioningAPI(MAASServerTestCase):
 
@@ -1672,7 +1675,6 @@ class TestCommissioningAPI(MAASServerTestCase):
         self.useFixture(SignalsDisabled("power"))
 
     def test_commissioning_scripts(self):
-        start_time = floor(time.time())
         # Create custom commissioing scripts
         binary_script = factory.make_Script(
             script_type=SCRIPT_TYPE.COMMISSIONING,
@@ -1699,14 +1701,12 @@ class TestCommissioningAPI(MAASServerTestCase):
                 'application/x-tgz',
             })
         archive = tarfile.open(fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
 
         # Validate all builtin scripts are included
         for script in NODE_INFO_SCRIPTS.values():
             path = os.path.join('commissioning.d', script['name'])
             member = archive.getmember(path)
-            self.assertGreaterEqual(member.mtime, start_time)
-            self.assertLessEqual(member.mtime, end_time)
+            self.assertEqual(ARCHIVE_MTIME, member.mtime)
             self.assertEqual(0o755, member.mode)
             self.assertEqual(
                 script['content'], archive.extractfile(path).read())
@@ -1714,21 +1714,58 @@ class TestCommissioningAPI(MAASServerTestCase):
         # Validate custom binary commissioning script
         path = os.path.join('commissioning.d', binary_script.name)
         member = archive.getmember(path)
-        self.assertGreaterEqual(member.mtime, start_time)
-        self.assertLessEqual(member.mtime, end_time)
+        self.assertEqual(ARCHIVE_MTIME, member.mtime)
         self.assertEqual(0o755, member.mode)
         self.assertEqual(sample_binary_data, archive.extractfile(path).read())
 
         # Validate custom text commissioning script
         path = os.path.join('commissioning.d', text_script.name)
         member = archive.getmember(path)
-        self.assertGreaterEqual(member.mtime, start_time)
-        self.assertLessEqual(member.mtime, end_time)
+        self.assertEqual(ARCHIVE_MTIME, member.mtime)
         self.assertEqual(0o755, member.mode)
         self.assertEqual(
             text_script.script.data,
             archive.extractfile(path).read().decode('utf-8'))
 
+    def test_commissioning_scripts_returns_not_modified_when_etag_matches(
+            self):
+        client = make_node_client()
+        url = reverse('commissioning-scripts', args=['latest'])
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.NOT_MODIFIED, response.status_code)
+        self.assertEqual(b'', response.content)
+
+    def test_commissioning_scripts_caches_archive(self):
+        self.patch(
+            CommissioningScriptsHandler, '_cached_archive', (None, None))
+        factory.make_Script(script_type=SCRIPT_TYPE.COMMISSIONING)
+        client = make_node_client()
+        url = reverse('commissioning-scripts', args=['latest'])
+        first = client.get(url)
+        iter_scripts = self.patch(CommissioningScriptsHandler, '_iter_scripts')
+        second = client.get(url)
+        self.assertThat(iter_scripts, MockNotCalled())
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_commissioning_scripts_rebuilds_archive_when_script_changes(self):
+        self.patch(
+            CommissioningScriptsHandler, '_cached_archive', (None, None))
+        script = factory.make_Script(script_type=SCRIPT_TYPE.COMMISSIONING)
+        client = make_node_client()
+        url = reverse('commissioning-scripts', args=['latest'])
+        first = client.get(url)
+        new_data = factory.make_string()
+        script.script = script.script.update(new_data)
+        script.save()
+        second = client.get(url)
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        archive = tarfile.open(fileobj=BytesIO(second.content))
+        path = os.path.join('commissioning.d', script.name)
+        self.assertEqual(
+            new_data, archive.extractfile(path).read().decode('utf-8'))
+
     def test_other_user_than_node_cannot_signal_commissioning_result(self):
         node = factory.make_Node(status=NODE_STATUS.COMMISSIONING)
         client = MAASSensibleOAuthClient(factory.make_User())
@@ -50,6 +50,7 @@ from maastesting.matchers import (
     MockNotCalled,
 )
 from maastesting.testcase import MAASTestCase
+from maastesting.twisted import TwistedLoggerFixture
 from metadataserver import (
     api,
     api_twisted as api_twisted_module,
@@ -74,6 +75,7 @@ from testtools.matchers import (
     MatchesSetwise,
 )
 from twisted.internet.defer import (
+    DeferredList,
     inlineCallbacks,
     succeed,
 )
@@ -202,20 +204,23 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
             'timestamp': datetime.utcnow().timestamp(),
         }
 
+    @transactional
+    def make_node(self):
+        return factory.make_Node()
+
     def test__init__(self):
-        worker = StatusWorkerService(sentinel.dbtasks, clock=sentinel.reactor)
-        self.assertEqual(sentinel.dbtasks, worker.dbtasks)
+        worker = StatusWorkerService(clock=sentinel.reactor)
         self.assertEqual(sentinel.reactor, worker.clock)
-        self.assertEqual(60, worker.step)
+        self.assertEqual(1, worker.step)
         self.assertEqual((worker._tryUpdateNodes, tuple(), {}), worker.call)
 
     def test__tryUpdateNodes_returns_None_when_empty_queue(self):
-        worker = StatusWorkerService(sentinel.dbtasks)
+        worker = StatusWorkerService()
         self.assertIsNone(worker._tryUpdateNodes())
 
     @wait_for_reactor
     @inlineCallbacks
-    def test__tryUpdateNodes_sends_work_to_dbtasks(self):
+    def test__tryUpdateNodes_processes_messages_for_each_node(self):
         nodes_with_tokens = yield deferToDatabase(self.make_nodes_with_tokens)
         node_messages = {
             node: [
@@ -224,26 +229,84 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
             ]
             for node, _ in nodes_with_tokens
         }
-        dbtasks = Mock()
-        dbtasks.addTask = Mock()
-        worker = StatusWorkerService(dbtasks)
+        worker = StatusWorkerService()
+        mock_processMessages = self.patch(worker, "_processMessages")
         for node, token in nodes_with_tokens:
             for message in node_messages[node]:
                 worker.queueMessage(token.key, message)
+        self.assertEqual(9, worker.queueSize)
         yield worker._tryUpdateNodes()
+        self.assertEqual(0, worker.queueSize)
+        yield DeferredList(list(worker.tasks.values()))
         call_args = [
-            (call_arg[0][1], call_arg[0][2])
-            for call_arg in dbtasks.addTask.call_args_list
+            (call_arg[0][0], call_arg[0][1])
+            for call_arg in mock_processMessages.call_args_list
         ]
         self.assertThat(call_args, MatchesSetwise(*[
             MatchesListwise([Equals(node), Equals(messages)])
             for node, messages in node_messages.items()
         ]))
+        self.assertEqual(set(), worker.processing)
+        self.assertEqual({}, worker.tasks)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__tryUpdateNodes_skips_nodes_being_processed(self):
+        nodes_with_tokens = yield deferToDatabase(self.make_nodes_with_tokens)
+        node, token = nodes_with_tokens[0]
+        worker = StatusWorkerService()
+        mock_processMessages = self.patch(worker, "_processMessages")
+        message = self.make_message()
+        worker.queueMessage(token.key, message)
+        worker.processing.add(token.key)
+        self.assertIsNone(worker._tryUpdateNodes())
+        self.assertEqual([message], worker.queue[token.key])
+        worker.processing.discard(token.key)
+        yield worker._tryUpdateNodes()
+        yield DeferredList(list(worker.tasks.values()))
+        self.assertThat(
+            mock_processMessages, MockCalledOnceWith(node, [message]))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__tryUpdateNodes_releases_unknown_authorizations(self):
+        worker = StatusWorkerService()
+        mock_processMessages = self.patch(worker, "_processMessages")
+        key = factory.make_name('key')
+        worker.queueMessage(key, self.make_message())
+        yield worker._tryUpdateNodes()
+        self.assertThat(mock_processMessages, MockNotCalled())
+        self.assertEqual(set(), worker.processing)
+
+    def test_queueMessage_flushes_when_queue_is_full(self):
+        worker = StatusWorkerService()
+        worker.max_queue_size = 3
+        mock_tryUpdateNodes = self.patch(worker, "_tryUpdateNodes")
+        for _ in range(2):
+            worker.queueMessage(
+                factory.make_name('key'), self.make_message())
+        self.assertThat(mock_tryUpdateNodes, MockNotCalled())
+        worker.queueMessage(factory.make_name('key'), self.make_message())
+        self.assertThat(mock_tryUpdateNodes, MockCalledOnceWith())
+
+    def test_queueMessage_does_not_flush_messages_being_processed(self):
+        worker = StatusWorkerService()
+        worker.max_queue_size = 3
+        mock_tryUpdateNodes = self.patch(worker, "_tryUpdateNodes")
+        key = factory.make_name('key')
+        worker.processing.add(key)
+        for _ in range(5):
+            worker.queueMessage(key, self.make_message())
+        self.assertThat(mock_tryUpdateNodes, MockNotCalled())
+        # Messages for other nodes are flushed once there are enough of them.
+        for _ in range(3):
+            worker.queueMessage(factory.make_name('key'), self.make_message())
+        self.assertThat(mock_tryUpdateNodes, MockCalledOnceWith())
 
     @wait_for_reactor
     @inlineCallbacks
     def test__processMessages_fails_when_in_transaction(self):
-        worker = StatusWorkerService(sentinel.dbtasks)
+        worker = StatusWorkerService()
         with ExpectedException(TransactionManagementError):
             yield deferToDatabase(
                 transactional(worker._processMessages),
@@ -252,7 +315,7 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
     @wait_for_reactor
     @inlineCallbacks
     def test__processMessageNow_fails_when_in_transaction(self):
-        worker = StatusWorkerService(sentinel.dbtasks)
+        worker = StatusWorkerService()
         with ExpectedException(TransactionManagementError):
             yield deferToDatabase(
                 transactional(worker._processMessageNow),
@@ -261,34 +324,51 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
     @wait_for_reactor
     @inlineCallbacks
     def test__processMessages_doesnt_call_when_node_deleted(self):
-        worker = StatusWorkerService(sentinel.dbtasks)
-        mock_processMessage = self.patch(worker, "_processMessage")
-        mock_processMessage.return_value = False
+        worker = StatusWorkerService()
+        mock_processMessage = self.patch(worker, "_processMessageForNode")
+        node = yield deferToDatabase(self.make_node)
+        yield deferToDatabase(transactional(node.delete))
         yield deferToDatabase(
-            worker._processMessages, sentinel.node,
+            worker._processMessages, node,
             [sentinel.message1, sentinel.message2])
-        self.assertThat(
-            mock_processMessage,
-            MockCalledOnceWith(sentinel.node, sentinel.message1))
+        self.assertThat(mock_processMessage, MockNotCalled())
 
     @wait_for_reactor
     @inlineCallbacks
-    def test__processMessages_calls_processMessage(self):
-        worker = StatusWorkerService(sentinel.dbtasks)
-        mock_processMessage = self.patch(worker, "_processMessage")
+    def test__processMessages_calls_processMessageForNode(self):
+        worker = StatusWorkerService()
+        mock_processMessage = self.patch(worker, "_processMessageForNode")
+        node = yield deferToDatabase(self.make_node)
         yield deferToDatabase(
-            worker._processMessages, sentinel.node,
+            worker._processMessages, node,
             [sentinel.message1, sentinel.message2])
         self.assertThat(
             mock_processMessage,
             MockCallsMatch(
-                call(sentinel.node, sentinel.message1),
-                call(sentinel.node, sentinel.message2)))
+                call(node, sentinel.message1),
+                call(node, sentinel.message2)))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__processMessages_continues_after_failed_message(self):
+        worker = StatusWorkerService()
+        mock_processMessage = self.patch(worker, "_processMessageForNode")
+        mock_processMessage.side_effect = [factory.make_exception(), None]
+        node = yield deferToDatabase(self.make_node)
+        with TwistedLoggerFixture():
+            yield deferToDatabase(
+                worker._processMessages, node,
+                [sentinel.message1, sentinel.message2])
+        self.assertThat(
+            mock_processMessage,
+            MockCallsMatch(
+                call(node, sentinel.message1),
+                call(node, sentinel.message2)))
 
     @wait_for_reactor
     @inlineCallbacks
     def test_queueMessages_processes_top_level_message_instantly(self):
-        worker = StatusWorkerService(sentinel.dbtasks)
+        worker = StatusWorkerService()
         mock_processMessage = self.patch(worker, "_processMessage")
         message = self.make_message()
         message['event_type'] = 'finish'
@@ -303,7 +383,7 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
     @inlineCallbacks
     def test_queueMessages_processes_top_level_status_messages_instantly(self):
         for name in EVENT_STATUS_MESSAGES.keys():
-            worker = StatusWorkerService(sentinel.dbtasks)
+            worker = StatusWorkerService()
             mock_processMessage = self.patch(worker, "_processMessage")
             message = self.make_message()
             message['event_type'] = 'start'
@@ -319,7 +399,7 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
     @wait_for_reactor
     @inlineCallbacks
     def test_queueMessages_processes_files_message_instantly(self):
-        worker = StatusWorkerService(sentinel.dbtasks)
+        worker = StatusWorkerService()
         mock_processMessage = self.patch(worker, "_processMessage")
         contents = b'These are the contents of the file.'
         encoded_content = encode_as_base64(bz2.compress(contents))
@@ -342,7 +422,7 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
     @wait_for_reactor
     @inlineCallbacks
     def test_queueMessages_handled_invalid_nodekey_with_instant_msg(self):
-        worker = StatusWorkerService(sentinel.dbtasks)
+        worker = StatusWorkerService()
         mock_processMessage = self.patch(worker, "_processMessage")
         contents = b'These are the contents of the file.'
         encoded_content = encode_as_base64(bz2.compress(contents))
@@ -374,7 +454,7 @@ class TestStatusWorkerService(MAASServerTestCase):
         self.useFixture(SignalsDisabled("power"))
 
     def processMessage(self, node, payload):
-        worker = StatusWorkerService(sentinel.dbtasks)
+        worker = StatusWorkerService()
         return worker._processMessage(node, payload)
 
     def test_process_message_logs_event_for_start_event_type(self):
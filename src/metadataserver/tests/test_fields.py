@@ -12,9 +12,11 @@ from maasserver.testing.testcase import (
     MAASServerTestCase,
 )
 from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
 from metadataserver.fields import (
     Bin,
     BinaryField,
+    CompressedBinaryField,
 )
 from metadataserver.tests.models import BinaryFieldModel
 
@@ -104,3 +106,41 @@ class TestBinaryField(MAASLegacyTransactionServerTestCase):
         field = BinaryField(null=True)
         self.patch(field, "default", b"wotcha")
         self.assertEqual(Bin(b"wotcha"), field.get_default())
+
+
+class TestCompressedBinaryField(MAASTestCase):
+    """Test CompressedBinaryField."""
+
+    def test_compresses_data(self):
+        field = CompressedBinaryField()
+        data = Bin(b"<node>%s</node>" % (b"lshw " * 1000))
+        db_value = field.get_db_prep_value(data)
+        self.assertTrue(db_value.startswith(CompressedBinaryField.prefix))
+        self.assertLess(len(db_value), len(data))
+        self.assertEqual(data, field.to_python(db_value))
+
+    def test_returns_bin(self):
+        field = CompressedBinaryField()
+        data = Bin(b"data" * 100)
+        self.assertIsInstance(
+            field.to_python(field.get_db_prep_value(data)), Bin)
+
+    def test_stores_incompressible_data_uncompressed(self):
+        field = CompressedBinaryField()
+        data = Bin(factory.make_bytes(32))
+        db_value = field.get_db_prep_value(data)
+        self.assertEqual(b64encode(data).decode('ascii'), db_value)
+        self.assertEqual(data, field.to_python(db_value))
+
+    def test_stores_empty_data_and_None(self):
+        field = CompressedBinaryField()
+        self.assertEqual('', field.get_db_prep_value(Bin(b'')))
+        self.assertIsNone(field.get_db_prep_value(None))
+        self.assertEqual(b'', field.to_python(''))
+        self.assertIsNone(field.to_python(None))
+
+    def test_reads_uncompressed_data(self):
+        field = CompressedBinaryField()
+        data = factory.make_bytes()
+        self.assertEqual(
+            data, field.to_python(b64encode(data).decode('ascii')))
@@ -128,6 +128,127 @@ def gen_template_filenames(purpose, arch, subarch):
     yield "config.template"
 
 
+class BootTemplate(tempita.Template):
+    """A Tempita template that compiles each of its expressions only once.
+
+    Tempita keeps the parsed template, but passes the source of each
+    expression to `eval` every time it is rendered, so it is compiled again
+    for each boot config served. Boot templates are cached by
+    `BootMethod.get_template` and rendered for every machine that boots,
+    so this keeps the compiled code with the template instead.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(BootTemplate, self).__init__(*args, **kwargs)
+        self._compiled = {}
+
+    def _eval(self, code, ns, pos):
+        compiled = self._compiled.get(code)
+        if compiled is None:
+            try:
+                # `eval` ignores leading whitespace in a string, which
+                # appears around the filters in `{{value | filter}}`.
+                compiled = compile(
+                    code.lstrip(" \t"), self.name or "<string>", "eval")
+            except SyntaxError:
+                # Let Tempita report the error with the template position.
+                return super(BootTemplate, self)._eval(code, ns, pos)
+            self._compiled[code] = compiled
+        return super(BootTemplate, self)._eval(compiled, ns, pos)
+
+
+def substitute_twice(template, namespace):
+    """Substitute `namespace` into `template`, and then into the result.
+
+    There may be things like kernel params which include variables that can
+    only be populated at run time and thus contain variables themselves. For
+    example, an OS may need a kernel parameter that points back to fs_host
+    and the kernel parameter comes through as part of the simplestream.
+
+    The output of the first pass rarely contains any template syntax, in
+    which case it is returned as-is rather than being parsed again.
+
+    :param template: A `tempita.Template`.
+    :return: The rendered template, as a string.
+    """
+    step1 = template.substitute(namespace)
+    if "{{" not in step1 and "}}" not in step1:
+        return step1
+    return tempita.Template(step1).substitute(namespace)
+
+
+DTB_SUBARCHS = frozenset(['xgene-uboot-mustang'])
+
+
+def fs_host(params):
+    return 'http://%s:5248/images/' % (
+        convert_host_to_uri_str(params.fs_host))
+
+
+def fs_efihost(params):
+    return '(http,%s:5248)/images/' % (
+        convert_host_to_uri_str(params.fs_host))
+
+
+def image_dir(params):
+    return compose_image_path(
+        params.osystem, params.arch, params.subarch,
+        params.release, params.label)
+
+
+def initrd_path(params):
+    # Normally the initrd filename is the SimpleStream filetype. If
+    # no filetype is given try the filetype.
+    if params.initrd is not None:
+        initrd = params.initrd
+    else:
+        initrd = 'boot-initrd'
+    return "%s/%s" % (image_dir(params), initrd)
+
+
+def kernel_name(params):
+    if params.kernel is not None:
+        return params.kernel
+    else:
+        return 'boot-kernel'
+
+
+def kernel_path(params):
+    # Normally the kernel filename is the SimpleStream filetype. If
+    # no filetype is given try the filetype.
+    return "%s/%s" % (image_dir(params), kernel_name(params))
+
+
+def dtb_path(params):
+    if params.subarch in DTB_SUBARCHS:
+        # Normally the dtb filename is the SimpleStream filetype. If
+        # no filetype is given try the filetype.
+        if params.boot_dtb is not None:
+            boot_dtb = params.boot_dtb
+        else:
+            boot_dtb = 'boot-dtb'
+        return "%s/%s" % (image_dir(params), boot_dtb)
+    else:
+        return None
+
+
+def kernel_command(params):
+    return compose_kernel_command_line(params)
+
+
+# The functions available to every boot method template; see
+# `BootMethod.compose_template_namespace`.
+TEMPLATE_HELPERS = {
+    "fs_host": fs_host,
+    "fs_efihost": fs_efihost,
+    "initrd_path": initrd_path,
+    "kernel_command": kernel_command,
+    "kernel_path": kernel_path,
+    "kernel_name": kernel_name,
+    "dtb_path": dtb_path,
+    }
+
+
 def get_remote_mac():
     """Gets the requestors MAC address from arp cache.
 
@@ -329,13 +450,13 @@ class BootMethod(metaclass=ABCMeta):
         :param purpose: The boot purpose, e.g. "local".
         :param arch: Main machine architecture.
         :param subarch: Sub-architecture, or "generic" if there is none.
-        :return: `tempita.Template`
+        :return: `BootTemplate`
         """
         pxe_templates_dir = self.get_template_dir()
         for filename in gen_template_filenames(purpose, arch, subarch):
             template_name = os.path.join(pxe_templates_dir, filename)
             try:
-                return tempita.Template.from_filename(
+                return BootTemplate.from_filename(
                     template_name, encoding="UTF-8")
             except IOError as error:
                 if error.errno != ENOENT:
@@ -355,72 +476,12 @@ class BootMethod(metaclass=ABCMeta):
     def compose_template_namespace(self, kernel_params):
         """Composes the namespace variables that are used by a boot
         method template.
-        """
-        dtb_subarchs = ['xgene-uboot-mustang']
-
-        def fs_host(params):
-            return 'http://%s:5248/images/' % (
-                convert_host_to_uri_str(params.fs_host))
-
-        def fs_efihost(params):
-            return '(http,%s:5248)/images/' % (
-                convert_host_to_uri_str(params.fs_host))
-
-        def image_dir(params):
-            return compose_image_path(
-                params.osystem, params.arch, params.subarch,
-                params.release, params.label)
-
-        def initrd_path(params):
-            # Normally the initrd filename is the SimpleStream filetype. If
-            # no filetype is given try the filetype.
-            if params.initrd is not None:
-                initrd = params.initrd
-            else:
-                initrd = 'boot-initrd'
-            return "%s/%s" % (image_dir(params), initrd)
-
-        def kernel_name(params):
-            if params.kernel is not None:
-                return params.kernel
-            else:
-                return 'boot-kernel'
-
-        def kernel_path(params):
-            # Normally the kernel filename is the SimpleStream filetype. If
-            # no filetype is given try the filetype.
-            if params.kernel is not None:
-                kernel = params.kernel
-            else:
-                kernel = 'boot-kernel'
-            return "%s/%s" % (image_dir(params), kernel)
-
-        def dtb_path(params):
-            if params.subarch in dtb_subarchs:
-                # Normally the dtb filename is the SimpleStream filetype. If
-                # no filetype is given try the filetype.
-                if params.boot_dtb is not None:
-                    boot_dtb = params.boot_dtb
-                else:
-                    boot_dtb = 'boot-dtb'
-                return "%s/%s" % (image_dir(params), boot_dtb)
-            else:
-                return None
-
-        def kernel_command(params):
-            return compose_kernel_command_line(params)
-
-        namespace = {
-            "fs_host": fs_host,
-            "fs_efihost": fs_efihost,
-            "initrd_path": initrd_path,
-            "kernel_command": kernel_command,
-            "kernel_params": kernel_params,
-            "kernel_path": kernel_path,
-            "kernel_name": kernel_name,
-            "dtb_path": dtb_path,
-            }
 
+        The helper functions are shared by all requests; only the kernel
+        parameters differ, so this is cheap to call for every request.
+        """
+        namespace = dict(TEMPLATE_HELPERS)
+        namespace["kernel_params"] = kernel_params
         return namespace
 
 
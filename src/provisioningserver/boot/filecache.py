@@ -0,0 +1,138 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Cache of small, frequently requested boot files."""
+
+__all__ = [
+    "boot_file_cache",
+    "BootFileCache",
+    "CachedFileReader",
+    ]
+
+from collections import OrderedDict
+import os
+import stat
+from threading import Lock
+
+from provisioningserver.boot import BytesReader
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
+
+
+class CachedFileReader(BytesReader):
+    """Read the cached contents of a file.
+
+    :ivar file_path: The `FilePath` of the file, as for
+        `tftp.backend.FilesystemReader`.
+    """
+
+    def __init__(self, file_path, data):
+        super(CachedFileReader, self).__init__(data)
+        self.file_path = file_path
+
+
+class BootFileCache:
+    """A bounded, least-recently-used cache of the contents of boot files.
+
+    Bootloaders are requested by every machine that boots, so keeping them
+    in memory saves opening and reading them again for each transfer. An
+    entry is only used while the file's inode, size and modification time
+    are unchanged, so a file that is replaced or rewritten is read again.
+
+    Only files of up to `max_file_size` bytes are cached, and the least
+    recently used entries are dropped to keep the total under `max_size`.
+
+    The cache is used from the reactor and is cleared from a thread when
+    boot images are reloaded, so changes to the entries are made while
+    holding a lock.
+    """
+
+    max_size = 64 * 1024 * 1024
+    max_file_size = 4 * 1024 * 1024
+
+    def __init__(self, prometheus_metrics=PROMETHEUS_METRICS):
+        self.prometheus_metrics = prometheus_metrics
+        self.size = 0
+        # Maps path -> (signature, data), least recently used first.
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _signature(stat_result):
+        return (
+            stat_result.st_dev, stat_result.st_ino, stat_result.st_size,
+            stat_result.st_mtime_ns)
+
+    def get_reader(self, file_path):
+        """Return a reader for the cached contents of `file_path`.
+
+        :param file_path: A `FilePath`.
+        :return: A `CachedFileReader`, or `None` if the file cannot be
+            cached, for example because it is too large or does not exist.
+        """
+        path = file_path.path
+        try:
+            signature = self._signature(os.stat(path))
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+            else:
+                entry = None
+        if entry is not None:
+            self._count("hit")
+            return CachedFileReader(file_path, entry[1])
+        data = self._load(path)
+        if data is None:
+            return None
+        self._count("miss")
+        return CachedFileReader(file_path, data)
+
+    def _load(self, path):
+        """Read `path` into the cache and return its contents."""
+        with self._lock:
+            self._discard(path)
+        try:
+            with open(path, "rb") as fd:
+                stat_result = os.fstat(fd.fileno())
+                if not stat.S_ISREG(stat_result.st_mode):
+                    return None
+                if stat_result.st_size > self.max_file_size:
+                    return None
+                data = fd.read(self.max_file_size + 1)
+        except OSError:
+            return None
+        if len(data) != stat_result.st_size:
+            # The file changed while being read.
+            return None
+        with self._lock:
+            # Another reader may have loaded the same file meanwhile.
+            self._discard(path)
+            self._entries[path] = self._signature(stat_result), data
+            self.size += len(data)
+            while self.size > self.max_size:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return data
+
+    def _discard(self, path):
+        """Drop the entry for `path`; the lock must be held."""
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def _count(self, result):
+        self.prometheus_metrics.update(
+            'maas_boot_file_cache_requests', 'inc',
+            labels={'result': result})
+
+    def clear(self):
+        """Drop all cached files."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+# The cache used by the TFTP and HTTP boot services.
+boot_file_cache = BootFileCache()
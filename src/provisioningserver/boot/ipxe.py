@@ -16,9 +16,9 @@ from provisioningserver.boot import (
     BootMethod,
     BytesReader,
     get_parameters,
+    substitute_twice,
 )
 from provisioningserver.utils import typed
-import tempita
 
 
 CONFIG_FILE = dedent("""\
@@ -107,16 +107,8 @@ class IPXEBootMethod(BootMethod):
             kernel_params.subarch)
         kernel_params.mac = extra.get('mac', '')
         namespace = self.compose_template_namespace(kernel_params)
-
-        # We are going to do 2 passes of tempita substitution because there
-        # may be things like kernel params which include variables that can
-        # only be populated at run time and thus contain variables themselves.
-        # For example, an OS may need a kernel parameter that points back to
-        # fs_host and the kernel parameter comes through as part of
-        # the simplestream.
-        step1 = template.substitute(namespace)
         return BytesReader(
-            tempita.Template(step1).substitute(namespace).encode("utf-8"))
+            substitute_twice(template, namespace).encode("utf-8"))
 
     @typed
     def link_bootloader(self, destination: str):
@@ -16,6 +16,7 @@ from provisioningserver.boot import (
     BootMethod,
     BytesReader,
     get_parameters,
+    substitute_twice,
 )
 from provisioningserver.events import (
     EVENT_TYPES,
@@ -26,7 +27,6 @@ from provisioningserver.utils.fs import (
     atomic_copy,
     atomic_symlink,
 )
-import tempita
 
 
 maaslog = get_maas_logger('pxe')
@@ -126,16 +126,8 @@ class PXEBootMethod(BootMethod):
             kernel_params.subarch)
         kernel_params.mac = extra.get('mac', '')
         namespace = self.compose_template_namespace(kernel_params)
-
-        # We are going to do 2 passes of tempita substitution because there
-        # may be things like kernel params which include variables that can
-        # only be populated at run time and thus contain variables themselves.
-        # For example, an OS may need a kernel parameter that points back to
-        # fs_host and the kernel parameter comes through as part of the simple
-        # stream.
-        step1 = template.substitute(namespace)
-        return BytesReader(tempita.Template(step1).substitute(namespace)
-                           .encode("utf-8"))
+        return BytesReader(
+            substitute_twice(template, namespace).encode("utf-8"))
 
     def link_bootloader(self, destination: str):
         """Installs the required files for this boot method into the
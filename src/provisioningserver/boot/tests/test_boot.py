@@ -14,6 +14,7 @@ from maastesting.factory import factory
 from maastesting.matchers import (
     MockCalledOnce,
     MockCalledOnceWith,
+    MockNotCalled,
 )
 from maastesting.testcase import (
     MAASTestCase,
@@ -22,12 +23,14 @@ from maastesting.testcase import (
 from provisioningserver import boot
 from provisioningserver.boot import (
     BootMethod,
+    BootTemplate,
     BytesReader,
     gen_template_filenames,
     get_main_archive_url,
     get_ports_archive_url,
     get_remote_mac,
     maaslog,
+    substitute_twice,
 )
 from provisioningserver.boot.tftppath import compose_image_path
 from provisioningserver.kernel_opts import compose_kernel_command_line
@@ -105,15 +108,15 @@ class TestBootMethod(MAASTestCase):
         # Set up the mocks that we've patched in.
         gen_filenames = self.patch(boot, "gen_template_filenames")
         gen_filenames.return_value = [filename]
-        from_filename = self.patch(tempita.Template, "from_filename")
+        from_filename = self.patch(BootTemplate, "from_filename")
         from_filename.return_value = mock.sentinel.template
         # The template returned matches the return value above.
         template = method.get_template(purpose, arch, subarch)
         self.assertEqual(mock.sentinel.template, template)
         # gen_pxe_template_filenames is called to obtain filenames.
         gen_filenames.assert_called_once_with(purpose, arch, subarch)
-        # Tempita.from_filename is called with an absolute path derived from
-        # the filename returned from gen_pxe_template_filenames.
+        # BootTemplate.from_filename is called with an absolute path derived
+        # from the filename returned from gen_pxe_template_filenames.
         from_filename.assert_called_once_with(
             os.path.join(method.get_template_dir(), filename),
             encoding="UTF-8")
@@ -132,6 +135,16 @@ class TestBootMethod(MAASTestCase):
             generic_template,
             method.get_template(purpose, arch, subarch).name)
 
+    def test_get_template_returns_boot_template(self):
+        templates_dir = self.make_dir()
+        method = FakeBootMethod()
+        method.get_template_dir = lambda: templates_dir
+        factory.make_file(templates_dir, 'config.template')
+        self.assertIsInstance(
+            method.get_template(
+                *factory.make_names("purpose", "arch", "subarch")),
+            BootTemplate)
+
     def test_get_template_not_found(self):
         mock_try_send_rack_event = self.patch(boot, 'try_send_rack_event')
         # It is a critical and unrecoverable error if the default template
@@ -148,7 +161,7 @@ class TestBootMethod(MAASTestCase):
         # The IOError arising from trying to load a template that doesn't
         # exist is suppressed, but other errors are not.
         method = FakeBootMethod()
-        from_filename = self.patch(tempita.Template, "from_filename")
+        from_filename = self.patch(BootTemplate, "from_filename")
         from_filename.side_effect = IOError()
         from_filename.side_effect.errno = errno.EACCES
         self.assertRaises(
@@ -346,3 +359,63 @@ class TestGetArchiveUrl(MAASTestCase):
         value = yield get_ports_archive_url()
         expected_url = mirrors['ports'].geturl()
         self.assertEqual(expected_url, value)
+
+
+class TestBootTemplate(MAASTestCase):
+    """Tests for `BootTemplate`."""
+
+    def test_renders_like_tempita(self):
+        content = (
+            "{{py: x = 1}}{{for item in items}}{{item | upper}},{{endfor}}"
+            "{{if x == 1}}{{name}}{{else}}no{{endif}} {{ value }}")
+        namespace = {
+            "items": ["a", "b"], "upper": str.upper,
+            "name": factory.make_name("name"), "value": 42,
+            }
+        self.assertEqual(
+            tempita.Template(content).substitute(dict(namespace)),
+            BootTemplate(content).substitute(dict(namespace)))
+
+    def test_compiles_each_expression_once(self):
+        template = BootTemplate("{{name}} {{name}}")
+        compile_code = self.patch(boot, "compile", mock.Mock(wraps=compile))
+        self.assertEqual("a a", template.substitute({"name": "a"}))
+        self.assertEqual("b b", template.substitute({"name": "b"}))
+        self.assertThat(
+            compile_code, MockCalledOnceWith("name", "<string>", "eval"))
+
+    def test_reports_syntax_errors_like_tempita(self):
+        content = "\n{{name name}}"
+        expected = self.assertRaises(
+            SyntaxError, tempita.Template(content).substitute, {"name": "a"})
+        error = self.assertRaises(
+            SyntaxError, BootTemplate(content).substitute, {"name": "a"})
+        self.assertEqual(str(expected), str(error))
+
+
+class TestSubstituteTwice(MAASTestCase):
+    """Tests for `substitute_twice`."""
+
+    def test_substitutes_into_output_of_first_pass(self):
+        template = BootTemplate("append {{params}}")
+        namespace = {
+            "params": "url={{host}}/path",
+            "host": factory.make_name("host"),
+            }
+        self.assertEqual(
+            "append url=%s/path" % namespace["host"],
+            substitute_twice(template, namespace))
+
+    def test_does_not_parse_output_without_template_syntax(self):
+        template = BootTemplate("append {{params}}")
+        Template = self.patch(tempita, "Template")
+        self.assertEqual(
+            "append quiet", substitute_twice(template, {"params": "quiet"}))
+        self.assertThat(Template, MockNotCalled())
+
+    def test_parses_output_with_stray_delimiters(self):
+        # Tempita rejects the output, as it always did.
+        template = BootTemplate("append {{params}}")
+        self.assertRaises(
+            tempita.TemplateError, substitute_twice,
+            template, {"params": "cc:}}end_cc"})
@@ -0,0 +1,161 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.boot.filecache`."""
+
+__all__ = []
+
+import os
+from threading import Thread
+
+from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
+import prometheus_client
+from provisioningserver.boot import filecache as filecache_module
+from provisioningserver.boot.filecache import (
+    BootFileCache,
+    CachedFileReader,
+)
+from provisioningserver.prometheus.metrics import METRICS_DEFINITIONS
+from provisioningserver.prometheus.utils import create_metrics
+from twisted.python.filepath import FilePath
+
+
+class TestBootFileCache(MAASTestCase):
+    """Tests for `BootFileCache`."""
+
+    def setUp(self):
+        super(TestBootFileCache, self).setUp()
+        self.prometheus_metrics = create_metrics(
+            METRICS_DEFINITIONS,
+            registry=prometheus_client.CollectorRegistry())
+        self.cache = BootFileCache(prometheus_metrics=self.prometheus_metrics)
+
+    def make_boot_file(self, contents=None):
+        if contents is None:
+            contents = factory.make_bytes(100)
+        return FilePath(self.make_file()), contents
+
+    def write(self, file_path, contents):
+        file_path.setContent(contents)
+        # Make sure the modification time changes, whatever the resolution
+        # of the filesystem's timestamps.
+        stat = os.stat(file_path.path)
+        os.utime(
+            file_path.path,
+            ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+    def get_count(self, result):
+        metrics = self.prometheus_metrics.generate_latest().decode("ascii")
+        for line in metrics.splitlines():
+            if line.startswith(
+                    'maas_boot_file_cache_requests_total{result="%s"}'
+                    % result):
+                return float(line.split()[-1])
+        return 0
+
+    def test_reads_file(self):
+        file_path, contents = self.make_boot_file()
+        self.write(file_path, contents)
+        reader = self.cache.get_reader(file_path)
+        self.assertIsInstance(reader, CachedFileReader)
+        self.assertEqual(file_path, reader.file_path)
+        self.assertEqual(contents, reader.read(1000))
+        self.assertEqual(len(contents), reader.size)
+        self.assertEqual(len(contents), self.cache.size)
+
+    def test_serves_from_memory_until_file_changes(self):
+        file_path, contents = self.make_boot_file()
+        self.write(file_path, contents)
+        self.cache.get_reader(file_path)
+        self.assertEqual(
+            contents, self.cache.get_reader(file_path).read(1000))
+        new_contents = factory.make_bytes(100)
+        self.write(file_path, new_contents)
+        self.assertEqual(
+            new_contents, self.cache.get_reader(file_path).read(1000))
+        self.assertEqual(len(new_contents), self.cache.size)
+        self.assertEqual(1, self.get_count("hit"))
+        self.assertEqual(2, self.get_count("miss"))
+
+    def test_rereads_replaced_file(self):
+        file_path, contents = self.make_boot_file()
+        self.write(file_path, contents)
+        self.cache.get_reader(file_path)
+        other_path, new_contents = self.make_boot_file()
+        self.write(other_path, new_contents)
+        os.utime(other_path.path, ns=(0, os.stat(file_path.path).st_mtime_ns))
+        os.rename(other_path.path, file_path.path)
+        self.assertEqual(
+            new_contents, self.cache.get_reader(file_path).read(1000))
+
+    def test_returns_None_for_missing_file(self):
+        file_path = FilePath(self.make_dir()).child("missing")
+        self.assertIsNone(self.cache.get_reader(file_path))
+
+    def test_returns_None_for_directory(self):
+        self.assertIsNone(self.cache.get_reader(FilePath(self.make_dir())))
+
+    def test_returns_None_for_large_file(self):
+        self.cache.max_file_size = 10
+        file_path, contents = self.make_boot_file(factory.make_bytes(11))
+        self.write(file_path, contents)
+        self.assertIsNone(self.cache.get_reader(file_path))
+        self.assertEqual(0, self.cache.size)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.max_size = 250
+        files = [self.make_boot_file() for _ in range(3)]
+        for file_path, contents in files:
+            self.write(file_path, contents)
+        self.cache.get_reader(files[0][0])
+        self.cache.get_reader(files[1][0])
+        self.cache.get_reader(files[0][0])
+        self.cache.get_reader(files[2][0])
+        self.assertEqual(200, self.cache.size)
+        self.assertItemsEqual(
+            [files[0][0].path, files[2][0].path], list(self.cache._entries))
+
+    def test_clear(self):
+        file_path, contents = self.make_boot_file()
+        self.write(file_path, contents)
+        self.cache.get_reader(file_path)
+        self.cache.clear()
+        self.assertEqual(0, self.cache.size)
+        self.cache.get_reader(file_path)
+        self.assertEqual(0, self.get_count("hit"))
+        self.assertEqual(2, self.get_count("miss"))
+
+    def test_clear_waits_for_lock(self):
+        file_path, contents = self.make_boot_file()
+        self.write(file_path, contents)
+        self.cache.get_reader(file_path)
+        thread = Thread(target=self.cache.clear)
+        with self.cache._lock:
+            thread.start()
+            thread.join(0.1)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(100, self.cache.size)
+        thread.join()
+        self.assertEqual(0, self.cache.size)
+
+    def test_size_is_correct_when_loads_overlap(self):
+        file_path, contents = self.make_boot_file()
+        self.write(file_path, contents)
+        fstat = os.fstat
+        loads = []
+
+        def fstat_and_load_again(fd):
+            # Another load of the same file, and a clear, happen while
+            # this one is reading.
+            if not loads:
+                loads.append(fd)
+                self.cache._load(file_path.path)
+                self.cache.clear()
+                self.cache._load(file_path.path)
+            return fstat(fd)
+
+        self.patch(filecache_module.os, "fstat", fstat_and_load_again)
+        self.cache.get_reader(file_path)
+        self.assertEqual(100, self.cache.size)
+        self.assertEqual([file_path.path], list(self.cache._entries))
@@ -34,6 +34,7 @@ from provisioningserver.rpc.region import (
     SendEvent,
     SendEventIPAddress,
     SendEventMACAddress,
+    SendEvents,
 )
 from provisioningserver.utils.env import get_maas_id
 from provisioningserver.utils.twisted import (
@@ -43,10 +44,16 @@ from provisioningserver.utils.twisted import (
     FOREVER,
     suppress,
 )
+from twisted.internet import reactor
 from twisted.internet.defer import (
+    Deferred,
+    DeferredList,
+    inlineCallbacks,
     maybeDeferred,
     succeed,
 )
+from twisted.protocols.amp import UnhandledCommand
+from twisted.python.failure import Failure
 
 
 maaslog = get_maas_logger("events")
@@ -561,12 +568,24 @@ class NodeEventHub:
 
     This automatically ensures that the event type is registered before
     sending logs to the region.
+
+    Events are buffered and sent to the region in batches with `SendEvents`:
+    a batch is sent once it holds `batchSize` events, or `batchDelay` seconds
+    after its first event was logged. Events logged with `immediate` set are
+    sent straight away, together with any already waiting, for callers that
+    wait for their events to be sent.
     """
 
-    def __init__(self):
+    batchSize = 100
+    batchDelay = 0.25
+
+    def __init__(self, clock=reactor):
         super(NodeEventHub, self).__init__()
+        self.clock = clock
         self._types_registering = dict()
         self._types_registered = set()
+        self._batch = []
+        self._batchCall = None
 
     @asynchronous
     def registerEventType(self, event_type):
@@ -639,8 +658,112 @@ class NodeEventHub:
             self._types_registered.discard(event_type)
         return failure
 
+    def _queueEvent(self, event, immediate=False):
+        """Add `event` to the batch being built, sending it when it's full.
+
+        :param immediate: Send the batch now rather than waiting for more
+            events to join it.
+        :return: :class:`Deferred` that fires when the event has been sent.
+        """
+        done = Deferred()
+        self._batch.append((event, done))
+        if immediate or len(self._batch) >= self.batchSize:
+            self.flush()
+        elif self._batchCall is None:
+            self._batchCall = self.clock.callLater(
+                self.batchDelay, self.flush)
+        return done
+
+    def flush(self):
+        """Send the events logged so far to the region now.
+
+        :return: :class:`Deferred` that fires when they have been sent.
+        """
+        if self._batchCall is not None:
+            if self._batchCall.active():
+                self._batchCall.cancel()
+            self._batchCall = None
+        batch, self._batch = self._batch, []
+        if len(batch) == 0:
+            return succeed(None)
+        d = self._sendBatch(batch)
+        d.addErrback(log.err, "Failure sending events to region.")
+        return d
+
+    @inlineCallbacks
+    def _sendBatch(self, batch, retry=True):
+        """Send `batch`, a list of ``(event, done)`` tuples, to the region.
+
+        Each `done` is fired with the outcome of sending its own event.
+
+        :param retry: If the region reports `NoSuchEventType`, register the
+            event types in `batch` again and send it once more.
+        """
+        type_names = list({event["type_name"] for event, _ in batch})
+        registrations = yield DeferredList([
+            self.ensureEventTypeRegistered(type_name)
+            for type_name in type_names
+        ], consumeErrors=True)
+        failures = {
+            type_name: result for type_name, (success, result) in zip(
+                type_names, registrations) if not success
+        }
+        ready = []
+        for event, done in batch:
+            if event["type_name"] in failures:
+                done.errback(failures[event["type_name"]])
+            else:
+                ready.append((event, done))
+        if len(ready) == 0:
+            return
+
+        try:
+            client = getRegionClient()
+            yield client(SendEvents, events=[event for event, _ in ready])
+        except UnhandledCommand:
+            # The region predates `SendEvents`; send one event at a time.
+            for event, done in ready:
+                self._sendEvent(client, event).chainDeferred(done)
+        except NoSuchEventType:
+            # The region does not know an event type that was registered
+            # earlier; see `_checkEventTypeRegistered`.
+            failure = Failure()
+            for event, _ in ready:
+                self._types_registered.discard(event["type_name"])
+            if retry:
+                yield self._sendBatch(ready, retry=False)
+            else:
+                for _, done in ready:
+                    done.errback(failure)
+        except Exception:
+            failure = Failure()
+            for _, done in ready:
+                done.errback(failure)
+        else:
+            for _, done in ready:
+                done.callback(None)
+
+    def _sendEvent(self, client, event):
+        """Send `event` on its own, as regions before MAAS 2.7 expect."""
+        event = dict(event)
+        event_type = event["type_name"]
+        if "system_id" in event:
+            d = client(SendEvent, **event)
+        elif "mac_address" in event:
+            d = client(SendEventMACAddress, **event)
+        else:
+            d = client(SendEventIPAddress, **event)
+        d.addErrback(self._checkEventTypeRegistered, event_type)
+        if "system_id" not in event:
+            # Suppress NoSuchNode. This happens during enlistment because the
+            # region does not yet know of the node; it's quite normal.
+            # Logging tracebacks telling us about it is not useful.
+            d.addErrback(suppress, NoSuchNode)
+        return d
+
     @asynchronous
-    def logByID(self, event_type, system_id, description=""):
+    def logByID(
+            self, event_type, system_id, description="", immediate=False):
         """Send the given node event to the region.
 
         The node is specified by its ID.
@@ -651,19 +774,16 @@ class NodeEventHub:
         :type system_id: unicode
         :param description: An optional description of the event.
         :type description: unicode
+        :param immediate: Send the event now, without waiting for others to
+            send with it.
         """
-        def send(_):
-            client = getRegionClient()
-            return client(
-                SendEvent, system_id=system_id, type_name=event_type,
-                description=description)
-
-        d = self.ensureEventTypeRegistered(event_type).addCallback(send)
-        d.addErrback(self._checkEventTypeRegistered, event_type)
-        return d
+        return self._queueEvent({
+            "system_id": system_id, "type_name": event_type,
+            "description": description}, immediate)
 
     @asynchronous
-    def logByMAC(self, event_type, mac_address, description=""):
+    def logByMAC(
+            self, event_type, mac_address, description="", immediate=False):
         """Send the given node event to the region.
 
         The node is specified by its MAC address.
@@ -674,30 +794,19 @@ class NodeEventHub:
         :type mac_address: unicode
         :param description: An optional description of the event.
         :type description: unicode
+        :param immediate: Send the event now, without waiting for others to
+            send with it.
         """
-        def send(_):
-            client = getRegionClient()
-            return client(
-                SendEventMACAddress, mac_address=mac_address,
-                type_name=event_type, description=description)
-
-        d = self.ensureEventTypeRegistered(event_type).addCallback(send)
-        d.addErrback(self._checkEventTypeRegistered, event_type)
-
-        # Suppress NoSuchNode. This happens during enlistment because the
-        # region does not yet know of the node; it's quite normal. Logging
-        # tracebacks telling us about it is not useful. Perhaps the region
-        # should store these logs anyway. Then, if and when the node is
-        # enlisted, logs prior to enlistment can be seen.
-        d.addErrback(suppress, NoSuchNode)
-
-        return d
+        return self._queueEvent({
+            "mac_address": mac_address, "type_name": event_type,
+            "description": description}, immediate)
 
     @asynchronous
-    def logByIP(self, event_type, ip_address, description=""):
+    def logByIP(
+            self, event_type, ip_address, description="", immediate=False):
         """Send the given node event to the region.
 
-        The node is specified by its MAC address.
+        The node is specified by its IP address.
 
         :param event_type: The type of the event.
         :type event_type: unicode
@@ -705,24 +814,12 @@ class NodeEventHub:
         :type ip_address: unicode
         :param description: An optional description of the event.
         :type description: unicode
+        :param immediate: Send the event now, without waiting for others to
+            send with it.
         """
-        def send(_):
-            client = getRegionClient()
-            return client(
-                SendEventIPAddress, ip_address=ip_address,
-                type_name=event_type, description=description)
-
-        d = self.ensureEventTypeRegistered(event_type).addCallback(send)
-        d.addErrback(self._checkEventTypeRegistered, event_type)
-
-        # Suppress NoSuchNode. This happens during enlistment because the
-        # region does not yet know of the node; it's quite normal. Logging
-        # tracebacks telling us about it is not useful. Perhaps the region
-        # should store these logs anyway. Then, if and when the node is
-        # enlisted, logs prior to enlistment can be seen.
-        d.addErrback(suppress, NoSuchNode)
-
-        return d
+        return self._queueEvent({
+            "ip_address": ip_address, "type_name": event_type,
+            "description": description}, immediate)
 
 
 # Singleton.
@@ -741,7 +838,8 @@ def send_node_event(event_type, system_id, hostname, description=''):
     :param description: An optional description of the event.
     :type description: unicode
     """
-    return nodeEventHub.logByID(event_type, system_id, description)
+    return nodeEventHub.logByID(
+        event_type, system_id, description, immediate=True)
 
 
 @asynchronous
@@ -781,7 +879,8 @@ def send_rack_event(event_type, description=''):
     :param description: An optional description of the event.
     :type description: unicode
     """
-    return nodeEventHub.logByID(event_type, get_maas_id(), description)
+    return nodeEventHub.logByID(
+        event_type, get_maas_id(), description, immediate=True)
 
 
 @asynchronous(timeout=FOREVER)
@@ -135,6 +135,13 @@ def parse_sources(sources_yaml):
     return BootSources.parse(StringIO(sources_yaml))
 
 
+def report_download_progress(name, finished, total):
+    """Tell the region that a boot resource file has been downloaded."""
+    try_send_rack_event(
+        EVENT_TYPES.RACK_IMPORT_INFO,
+        "Downloaded %s (%d of %d)" % (name, finished, total))
+
+
 def import_images(sources):
     """Import images.  Callable from the command line.
 
@@ -194,7 +201,8 @@ def import_images(sources):
 
         try:
             snapshot_path = download_all_boot_resources(
-                sources, storage, product_mapping)
+                sources, storage, product_mapping,
+                progress=report_download_progress)
         except Exception as e:
             try_send_rack_event(
                 EVENT_TYPES.RACK_IMPORT_ERROR,
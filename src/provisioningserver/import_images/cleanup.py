@@ -10,6 +10,8 @@ __all__ = [
 import os
 import shutil
 
+from provisioningserver.import_images.helpers import CACHE_MANIFEST_FILENAME
+
 
 def list_old_snapshots(storage):
     """List of snapshot directories that are no longer in use."""
@@ -39,7 +41,8 @@ def list_unused_cache_files(storage):
         cache_files = [
             os.path.join(cache_dir, filename)
             for filename in os.listdir(cache_dir)
-            if os.path.isfile(os.path.join(cache_dir, filename))
+            if os.path.isfile(os.path.join(cache_dir, filename)) and
+            filename != CACHE_MANIFEST_FILENAME
             ]
     else:
         cache_files = []
@@ -7,16 +7,23 @@ __all__ = [
     'download_all_boot_resources',
     ]
 
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import json
 import os.path
+import re
 import tarfile
+import threading
 
 from provisioningserver.import_images.helpers import (
+    CACHE_MANIFEST_FILENAME,
     get_os_from_product,
     get_signing_policy,
     maaslog,
 )
 from provisioningserver.logger import LegacyLogger
+from provisioningserver.utils.fs import atomic_write
 from simplestreams.mirrors import (
     BasicMirrorWriter,
     UrlMirrorReader,
@@ -34,6 +41,100 @@ log = LegacyLogger()
 
 DEFAULT_KEYRING_PATH = "/usr/share/keyrings"
 
+# Maximum number of boot resource files to download at the same time.
+DEFAULT_MAX_DOWNLOADS = 4
+
+# Files extracted from an archive are stored in the cache as
+# "<filename>-<tag>", where the tag is the archive's SHA256.
+EXTRACTED_FILE_RE = re.compile(r'^(?P<filename>.+)-(?P<tag>[0-9a-f]{64})$')
+
+
+class CacheManifest:
+    """Record of the files extracted from each archive in the cache.
+
+    This maps archive tags to the list of `(path, logical name)` tuples
+    extracted from them, and is persisted in the cache directory. It lets
+    `extract_archive_tar` tell whether an archive has already been extracted
+    without walking the whole cache directory for every item.
+
+    It is safe to use from multiple threads.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, CACHE_MANIFEST_FILENAME)
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Load the manifest, dropping entries with missing files.
+
+        If there is no manifest yet (or it cannot be read) it's rebuilt
+        from a single walk of the cache directory.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fd:
+                entries = json.load(fd)
+        except FileNotFoundError:
+            entries = self._scan()
+        except (OSError, ValueError):
+            log.msg("Rebuilding corrupt boot resources cache manifest.")
+            entries = self._scan()
+        return {
+            tag: [tuple(extracted_file) for extracted_file in files]
+            for tag, files in entries.items()
+            if all(os.path.isfile(path) for path, _ in files)
+        }
+
+    def _scan(self):
+        """Build the manifest from the files in the cache directory."""
+        entries = defaultdict(list)
+        for root, dirs, files in os.walk(self.cache_dir):
+            for f in files:
+                match = EXTRACTED_FILE_RE.match(f)
+                if match is None:
+                    continue
+                filename = match.group('filename')
+                if root != self.cache_dir:
+                    filename = os.path.join(
+                        os.path.relpath(root, self.cache_dir), filename)
+                entries[match.group('tag')].append(
+                    (os.path.join(root, f), filename))
+        return entries
+
+    def _save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        content = json.dumps(self._entries, sort_keys=True)
+        atomic_write(content.encode('utf-8'), self.path)
+
+    def get(self, tag):
+        """Return the files extracted from the archive `tag`.
+
+        :return: A list of `(path, logical name)` tuples, or `None` if the
+            archive has not been extracted or some of its files have since
+            been removed from the cache.
+        """
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            extracted_files = self._entries.get(tag)
+            if extracted_files is None:
+                return None
+            elif all(os.path.isfile(path) for path, _ in extracted_files):
+                return list(extracted_files)
+            else:
+                del self._entries[tag]
+                self._save()
+                return None
+
+    def set(self, tag, extracted_files):
+        """Record the files extracted from the archive `tag`."""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            self._entries[tag] = list(extracted_files)
+            self._save()
+
 
 def insert_file(store, name, tag, checksums, size, content_source):
     """Insert a file into `store`.
@@ -63,7 +164,8 @@ def insert_file(store, name, tag, checksums, size, content_source):
     return [(store._fullpath(tag), name)]
 
 
-def extract_archive_tar(store, name, tag, checksums, size, content_source):
+def extract_archive_tar(
+        store, name, tag, checksums, size, content_source, manifest=None):
     """Extract an archive.tar.xz into `store`.
 
     :param store: A simplestreams `ObjectStore`.
@@ -79,6 +181,8 @@ def extract_archive_tar(store, name, tag, checksums, size, content_source):
         to expect.
     :param content_source: A Simplestreams `ContentSource` for reading the
         file.
+    :param manifest: The `CacheManifest` for `store`. If not given, it is
+        loaded from the cache directory.
     :return: A list of inserted files (file and archive.tar.xz) described
         as tuples of (path, logical name).  The path lies in the directory
         managed by `store` and has a filename based on `tag`, not logical name.
@@ -86,28 +190,19 @@ def extract_archive_tar(store, name, tag, checksums, size, content_source):
     log.debug(
         "Inserting archive {name} (tag={tag}, size={size}).",
         name=name, tag=tag, size=size)
-    extracted_files = []
-    cache_dir = store._fullpath('')
-    # Check if the archive has already been extracted. This is done by scanning
-    # the cache directory for files containing the given tag. Since the tag is
-    # the SHA256 this will always be unique and if files are added/removed from
+    if manifest is None:
+        manifest = CacheManifest(store._fullpath(''))
+    # Check if the archive has already been extracted. Since the tag is the
+    # SHA256 this will always be unique and if files are added/removed from
     # the archive we'll get a new tag.
-    for root, dirs, files in os.walk(cache_dir):
-        for f in files:
-            if f.endswith(tag):
-                # Strip out the tag
-                filename = f[:-(len(tag) + 1)]
-                if root != cache_dir:
-                    filename = os.path.join(root[len(cache_dir):], filename)
-                # Give full path to cached file
-                filepath = os.path.join(root, f)
-                extracted_files.append((filepath, filename))
+    extracted_files = manifest.get(tag)
 
     # If no files with the given tag were found we need to extract them.
-    if extracted_files == []:
+    if extracted_files is None:
         log.debug(
             "Extracting archive {name} (tag={tag}, size={size}).",
             name=name, tag=tag, size=size)
+        extracted_files = []
         archive_path = store._fullpath(tag)
         store.insert(tag, content_source, checksums, mutable=False, size=size)
         with tarfile.open(archive_path, 'r|*') as tar:
@@ -119,6 +214,7 @@ def extract_archive_tar(store, name, tag, checksums, size, content_source):
                     store.insert(filepath, fo, mutable=False)
                     extracted_files.append((filepath, filename))
         store.remove(tag)
+        manifest.set(tag, extracted_files)
 
     # Return the list of sets containing the path to the cache file and the
     # real filename which should be used.
@@ -164,15 +260,12 @@ def link_resources(
             assert(len(subarches) == 1)
             directory = os.path.join(
                 snapshot_path, 'bootloader', bootloader_type, arch)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
+        os.makedirs(directory, exist_ok=True)
         for cached_file, logical_name in links:
             link_path = os.path.join(directory, logical_name)
             if os.path.isfile(link_path):
                 os.remove(link_path)
-            base_dir = os.path.dirname(link_path)
-            if not os.path.exists(base_dir):
-                os.makedirs(base_dir)
+            os.makedirs(os.path.dirname(link_path), exist_ok=True)
             os.link(cached_file, link_path)
 
 
@@ -184,18 +277,59 @@ class RepoWriter(BasicMirrorWriter):
         should be stored.
     :ivar product_mapping: A `ProductMapping` describing the desired boot
         resources.
+    :ivar max_downloads: Maximum number of items to download concurrently.
+    :ivar progress: Optional callable, called for each item that had to be
+        fetched, rather than found in the cache or already inserted for
+        another product, once it has been downloaded and linked. It is
+        called with the item's product/version path, the number of items
+        finished so far, and the number of items found so far.
     """
 
-    def __init__(self, root_path, store, product_mapping):
+    def __init__(
+            self, root_path, store, product_mapping,
+            max_downloads=DEFAULT_MAX_DOWNLOADS, progress=None):
         self.root_path = root_path
         self.store = store
         self.product_mapping = product_mapping
+        self.max_downloads = max_downloads
+        self.progress = progress
+        if store is None:
+            self.manifest = None
+        else:
+            self.manifest = CacheManifest(store._fullpath(''))
+        self._executor = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._tag_locks = defaultdict(threading.Lock)
+        self._inserted = {}
+        self._finished = 0
         super(RepoWriter, self).__init__(config={
             # Only download the latest version. Without this all versions
             # will be downloaded from simplestreams.
             'max_items': 1,
             })
 
+    def sync(self, reader, path):
+        """Overridable from `BasicMirrorWriter`.
+
+        Items are handed to a pool of at most `max_downloads` threads as the
+        Simplestreams index is walked. This waits for all of them to finish
+        and re-raises the first failure, if any.
+        """
+        self._pending = []
+        with ThreadPoolExecutor(self.max_downloads) as executor:
+            self._executor = executor
+            try:
+                super(RepoWriter, self).sync(reader, path)
+            except BaseException:
+                for future in self._pending:
+                    future.cancel()
+                raise
+            finally:
+                self._executor = None
+        for future in self._pending:
+            future.result()
+
     def load_products(self, path=None, content_id=None):
         """Overridable from `BasicMirrorWriter`."""
         # It looks as if this method only makes sense for MirrorReaders, not
@@ -208,19 +342,66 @@ class RepoWriter(BasicMirrorWriter):
         return self.product_mapping.contains(products_exdata(src, pedigree))
 
     def insert_item(self, data, src, target, pedigree, contentsource):
-        """Overridable from `BasicMirrorWriter`."""
+        """Overridable from `BasicMirrorWriter`.
+
+        When called from `sync` the item is downloaded in the background,
+        otherwise it is downloaded before returning.
+        """
+        if self._executor is None:
+            self._insert_item(data, src, target, pedigree, contentsource)
+        else:
+            future = self._executor.submit(
+                self._insert_item, data, src, target, pedigree,
+                contentsource)
+            with self._lock:
+                self._pending.append(future)
+
+    def _insert(self, tag, ftype, filename, checksums, size, contentsource):
+        """Insert a file or archive into the store, once per tag.
+
+        Several products can share the same file, e.g. a root image, so
+        concurrent inserts of the same tag are serialised and the result of
+        the first is reused.
+
+        :return: A tuple of the inserted files, as returned by `insert_file`
+            or `extract_archive_tar`, and whether the file was fetched.
+        """
+        with self._lock:
+            tag_lock = self._tag_locks[tag]
+        with tag_lock:
+            if tag in self._inserted:
+                return self._inserted[tag], False
+            fetched = not self._is_cached(tag, ftype)
+            if ftype == 'archive.tar.xz':
+                links = extract_archive_tar(
+                    self.store, filename, tag, checksums, size,
+                    contentsource, manifest=self.manifest)
+            else:
+                links = insert_file(
+                    self.store, filename, tag, checksums, size,
+                    contentsource)
+            self._inserted[tag] = links
+            return links, fetched
+
+    def _is_cached(self, tag, ftype):
+        """Return True if the file `tag` is already in the store."""
+        if self.store is None:
+            return False
+        elif ftype == 'archive.tar.xz':
+            return self.manifest.get(tag) is not None
+        else:
+            # The store does not fetch immutable files that it already has.
+            return os.path.isfile(self.store._fullpath(tag))
+
+    def _insert_item(self, data, src, target, pedigree, contentsource):
         item = products_exdata(src, pedigree)
         checksums = item_checksums(data)
         tag = checksums['sha256']
         size = data['size']
         ftype = item['ftype']
         filename = os.path.basename(item['path'])
-        if ftype == 'archive.tar.xz':
-            links = extract_archive_tar(
-                self.store, filename, tag, checksums, size, contentsource)
-        else:
-            links = insert_file(
-                self.store, filename, tag, checksums, size, contentsource)
+        links, fetched = self._insert(
+            tag, ftype, filename, checksums, size, contentsource)
 
         osystem = get_os_from_product(item)
 
@@ -260,9 +441,17 @@ class RepoWriter(BasicMirrorWriter):
             label=item['label'], subarches=subarches,
             bootloader_type=item.get('bootloader-type'))
 
+        with self._lock:
+            self._finished += 1
+            finished, total = self._finished, len(self._pending)
+        if fetched and self.progress is not None:
+            name = "%s/%s/%s" % (
+                item['product_name'], item['version_name'], filename)
+            self.progress(name, finished, max(finished, total))
+
 
 def download_boot_resources(path, store, snapshot_path, product_mapping,
-                            keyring_file=None):
+                            keyring_file=None, progress=None):
     """Download boot resources for one simplestreams source.
 
     :param path: The Simplestreams URL for this source.
@@ -274,9 +463,12 @@ def download_boot_resources(path, store, snapshot_path, product_mapping,
         downloaded.
     :param keyring_file: Optional path to a keyring file for verifying
         signatures.
+    :param progress: Optional callable to report the progress of each
+        downloaded item; see `RepoWriter`.
     """
     maaslog.info("Downloading boot resources from %s", path)
-    writer = RepoWriter(snapshot_path, store, product_mapping)
+    writer = RepoWriter(
+        snapshot_path, store, product_mapping, progress=progress)
     (mirror, rpath) = path_from_mirror_url(path, None)
     policy = get_signing_policy(rpath, keyring_file)
     reader = UrlMirrorReader(mirror, policy=policy)
@@ -299,7 +491,7 @@ def compose_snapshot_path(storage_path):
 
 
 def download_all_boot_resources(
-        sources, storage_path, product_mapping, store=None):
+        sources, storage_path, product_mapping, store=None, progress=None):
     """Download the actual boot resources.
 
     Local copies of boot resources are downloaded into a "cache" directory.
@@ -319,6 +511,8 @@ def download_all_boot_resources(
     :param product_mapping: A `ProductMapping` describing the resources to be
         downloaded.
     :param store: A `FileStore` instance. Used only for testing.
+    :param progress: Optional callable to report the progress of each
+        downloaded item; see `RepoWriter`.
     :return: Path to the snapshot directory.
     """
     storage_path = os.path.abspath(storage_path)
@@ -328,12 +522,10 @@ def download_all_boot_resources(
     if store is None:
         cache_path = os.path.join(storage_path, 'cache')
         store = FileStore(cache_path)
-    # XXX jtv 2014-04-11: FileStore now also takes an argument called
-    # complete_callback, which can be used for progress reporting.
 
     for source in sources:
         download_boot_resources(
             source['url'], store, snapshot_path, product_mapping,
-            keyring_file=source.get('keyring')),
+            keyring_file=source.get('keyring'), progress=progress)
 
     return snapshot_path
@@ -4,6 +4,7 @@
 """Miscellaneous small definitions in support of boot-resource import."""
 
 __all__ = [
+    'CACHE_MANIFEST_FILENAME',
     'get_os_from_product',
     'get_signing_policy',
     'ImageSpec',
@@ -16,6 +17,10 @@ import functools
 from provisioningserver.logger import get_maas_logger
 from simplestreams.util import policy_read_signed
 
+# Name of the file in the cache directory that records which files have been
+# extracted from each archive, keyed by the archive's tag.
+CACHE_MANIFEST_FILENAME = '.manifest.json'
+
 # A tuple of the items that together select a boot image.
 ImageSpec = namedtuple('ImageSpec', [
     'os',
@@ -12,6 +12,7 @@ from maastesting.factory import factory
 from maastesting.matchers import MockCalledOnceWith
 from maastesting.testcase import MAASTestCase
 from provisioningserver.import_images import cleanup
+from provisioningserver.import_images.helpers import CACHE_MANIFEST_FILENAME
 
 
 class TestCleanup(MAASTestCase):
@@ -80,6 +81,14 @@ class TestCleanup(MAASTestCase):
         self.assertItemsEqual(
             cache_nlink_1, cleanup.list_unused_cache_files(storage))
 
+    def test_list_unused_cache_files_ignores_manifest(self):
+        storage = self.make_dir()
+        cache_nlink_1 = [self.make_cache_file(storage) for _ in range(3)]
+        factory.make_file(
+            os.path.join(storage, 'cache'), CACHE_MANIFEST_FILENAME)
+        self.assertItemsEqual(
+            cache_nlink_1, cleanup.list_unused_cache_files(storage))
+
     def test_cleanup_cache_removes_all_files_nlink_equal_one(self):
         storage = self.make_dir()
         for _ in range(3):
@@ -21,10 +21,12 @@ from maastesting.matchers import (
 from maastesting.testcase import MAASTestCase
 from provisioningserver.config import DEFAULT_IMAGES_URL
 from provisioningserver.import_images import download_resources
+from provisioningserver.import_images.helpers import CACHE_MANIFEST_FILENAME
 from provisioningserver.import_images.product_mapping import ProductMapping
 from provisioningserver.utils.fs import tempdir
 from simplestreams.contentsource import ChecksummingContentSource
 from simplestreams.objectstores import FileStore
+from testtools.matchers import FileExists
 
 
 class MockDateTime(mock.MagicMock):
@@ -72,7 +74,7 @@ class TestDownloadAllBootResources(MAASTestCase):
             fake,
             MockCalledWith(
                 source['url'], file_store, snapshot_path, product_mapping,
-                keyring_file=source['keyring']))
+                keyring_file=source['keyring'], progress=None))
 
 
 class TestDownloadBootResources(MAASTestCase):
@@ -178,6 +180,79 @@ class TestExtractArchiveTar(MAASTestCase):
                     expected_cached_file = (cached_file, f)
                     self.assertIn(expected_cached_file, cached_files)
 
+    def test_records_extracted_files_in_manifest(self):
+        with tempdir() as cache_dir:
+            store = FileStore(cache_dir)
+            tar_xz, files = self.make_tar_xz(cache_dir)
+            sha256, size = self.get_file_info(tar_xz)
+            checksums = {'sha256': sha256}
+            with open(tar_xz, 'rb') as f:
+                content_source = ChecksummingContentSource(f, checksums, size)
+                cached_files = download_resources.extract_archive_tar(
+                    store, os.path.basename(tar_xz), sha256, checksums, size,
+                    content_source)
+            manifest = download_resources.CacheManifest(cache_dir)
+            self.assertItemsEqual(cached_files, manifest.get(sha256))
+
+
+class TestCacheManifest(MAASTestCase):
+    """Tests for `CacheManifest`."""
+
+    def make_cached_files(self, cache_dir, tag):
+        extracted_files = []
+        for filename in [
+                factory.make_name('file'),
+                os.path.join('subdir', factory.make_name('file'))]:
+            path = os.path.join(cache_dir, '%s-%s' % (filename, tag))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            factory.make_file(os.path.dirname(path), os.path.basename(path))
+            extracted_files.append((path, filename))
+        return extracted_files
+
+    def test_get_returns_none_for_unknown_tag(self):
+        manifest = download_resources.CacheManifest(self.make_dir())
+        self.assertIsNone(manifest.get(factory.make_name('tag')))
+
+    def test_set_persists_extracted_files(self):
+        cache_dir = self.make_dir()
+        tag = hashlib.sha256(factory.make_bytes()).hexdigest()
+        extracted_files = self.make_cached_files(cache_dir, tag)
+        download_resources.CacheManifest(cache_dir).set(tag, extracted_files)
+        self.assertThat(
+            os.path.join(cache_dir, CACHE_MANIFEST_FILENAME), FileExists())
+        self.assertEqual(
+            extracted_files,
+            download_resources.CacheManifest(cache_dir).get(tag))
+
+    def test_get_forgets_tag_when_files_are_missing(self):
+        cache_dir = self.make_dir()
+        tag = hashlib.sha256(factory.make_bytes()).hexdigest()
+        extracted_files = self.make_cached_files(cache_dir, tag)
+        manifest = download_resources.CacheManifest(cache_dir)
+        manifest.set(tag, extracted_files)
+        os.remove(extracted_files[0][0])
+        self.assertIsNone(manifest.get(tag))
+        self.assertIsNone(
+            download_resources.CacheManifest(cache_dir).get(tag))
+
+    def test_builds_manifest_from_existing_cache(self):
+        cache_dir = self.make_dir()
+        tag = hashlib.sha256(factory.make_bytes()).hexdigest()
+        extracted_files = self.make_cached_files(cache_dir, tag)
+        # Files inserted as-is are stored under their tag; they are not
+        # part of any archive.
+        factory.make_file(cache_dir, tag)
+        manifest = download_resources.CacheManifest(cache_dir)
+        self.assertItemsEqual(extracted_files, manifest.get(tag))
+
+    def test_rebuilds_corrupt_manifest(self):
+        cache_dir = self.make_dir()
+        tag = hashlib.sha256(factory.make_bytes()).hexdigest()
+        extracted_files = self.make_cached_files(cache_dir, tag)
+        factory.make_file(cache_dir, CACHE_MANIFEST_FILENAME, b'{')
+        manifest = download_resources.CacheManifest(cache_dir)
+        self.assertItemsEqual(extracted_files, manifest.get(tag))
+
 
 class TestRepoWriter(MAASTestCase):
     """Tests for `RepoWriter`."""
@@ -220,7 +295,8 @@ class TestRepoWriter(MAASTestCase):
             mock_extract_archive_tar,
             MockCalledOnceWith(
                 None, os.path.basename(product['path']), product['sha256'],
-                {'sha256': product['sha256']}, product['size'], None))
+                {'sha256': product['sha256']}, product['size'], None,
+                manifest=None))
         # links are mocked out by the mock_insert_file above.
         self.assertThat(
             mock_link_resources,
@@ -422,6 +498,104 @@ class TestRepoWriter(MAASTestCase):
                 label=product['label'], subarches={'hwe-p', 'generic'},
                 bootloader_type=None))
 
+    def patch_sync(self, products):
+        # Make sync() insert each of the products, using the product itself
+        # as its pedigree so products_exdata() can find it again.
+        def fake_sync(writer, reader, path):
+            for product in products:
+                writer.insert_item(product, None, None, product, None)
+        self.patch(download_resources.BasicMirrorWriter, 'sync', fake_sync)
+        self.patch(
+            download_resources, 'products_exdata',
+            lambda src, pedigree: pedigree)
+
+    def test_sync_inserts_and_links_all_items(self):
+        products = [
+            self.make_product(subarch=factory.make_name('subarch'))
+            for _ in range(5)
+        ]
+        self.patch_sync(products)
+        mock_insert_file = self.patch(download_resources, 'insert_file')
+        mock_link_resources = self.patch(download_resources, 'link_resources')
+        progress = mock.MagicMock()
+        repo_writer = download_resources.RepoWriter(
+            None, None, ProductMapping(), max_downloads=2, progress=progress)
+        repo_writer.sync(None, None)
+        self.assertItemsEqual(
+            [product['sha256'] for product in products],
+            [call[0][2] for call in mock_insert_file.call_args_list])
+        self.assertEqual(len(products), mock_link_resources.call_count)
+        # Progress is reported as (name, finished, total) for each item;
+        # the total grows as items are found.
+        self.assertItemsEqual(
+            [
+                "%s/%s/%s" % (
+                    product['product_name'], product['version_name'],
+                    os.path.basename(product['path']))
+                for product in products
+            ],
+            [call[0][0] for call in progress.call_args_list])
+        reported = [call[0][1:] for call in progress.call_args_list]
+        self.assertItemsEqual(
+            range(1, len(products) + 1),
+            [finished for finished, _ in reported])
+        self.assertIn((len(products), len(products)), reported)
+
+    def test_sync_reports_progress_only_for_fetched_items(self):
+        shared = factory.make_name('sha256')
+        products = [
+            self.make_product(subarch=factory.make_name('subarch')),
+            self.make_product(sha256=shared, subarch='generic'),
+            self.make_product(sha256=shared, subarch='generic'),
+        ]
+        self.patch_sync(products)
+        self.patch(download_resources, 'insert_file')
+        self.patch(download_resources, 'link_resources')
+        progress = mock.MagicMock()
+        repo_writer = download_resources.RepoWriter(
+            None, None, ProductMapping(), max_downloads=1, progress=progress)
+        # The first item is already in the cache; the other two share a
+        # file, which is only fetched once.
+        self.patch(repo_writer, '_is_cached').side_effect = (
+            lambda tag, ftype: tag == products[0]['sha256'])
+        repo_writer.sync(None, None)
+        self.assertThat(progress, MockCalledOnceWith(
+            "%s/%s/%s" % (
+                products[1]['product_name'], products[1]['version_name'],
+                os.path.basename(products[1]['path'])),
+            2, 3))
+
+    def test_sync_inserts_shared_files_once(self):
+        sha256 = factory.make_name('sha256')
+        products = [
+            self.make_product(
+                sha256=sha256, subarch=factory.make_name('subarch'))
+            for _ in range(3)
+        ]
+        self.patch_sync(products)
+        mock_insert_file = self.patch(download_resources, 'insert_file')
+        mock_link_resources = self.patch(download_resources, 'link_resources')
+        repo_writer = download_resources.RepoWriter(
+            None, None, ProductMapping())
+        repo_writer.sync(None, None)
+        self.assertThat(mock_insert_file, MockCalledOnceWith(
+            None, mock.ANY, sha256, {'sha256': sha256}, mock.ANY, None))
+        self.assertEqual(len(products), mock_link_resources.call_count)
+
+    def test_sync_raises_download_failures(self):
+        products = [
+            self.make_product(subarch=factory.make_name('subarch'))
+            for _ in range(3)
+        ]
+        self.patch_sync(products)
+        exception_type = factory.make_exception_type()
+        self.patch(
+            download_resources, 'insert_file').side_effect = exception_type
+        self.patch(download_resources, 'link_resources')
+        repo_writer = download_resources.RepoWriter(
+            None, None, ProductMapping())
+        self.assertRaises(exception_type, repo_writer.sync, None, None)
+
 
 class TestLinkResources(MAASTestCase):
     """Tests for `LinkResources`()."""
@@ -110,11 +110,13 @@ def fix_tftp_requests():
             elif datagram.opcode == OP_RRQ:
                 if mode == b'netascii':
                     fs_interface = NetasciiSenderProxy(fs_interface)
-                session = RemoteOriginReadSession(
+                session = self.read_session_class(
                     addr, fs_interface, datagram.options, _clock=self._clock)
                 reactor.listenUDP(0, session, iface)
                 returnValue(session)
     tftp.protocol.TFTP._startSession = new_startSession
+    # Subclasses of TFTP can use a different class for read sessions.
+    tftp.protocol.TFTP.read_session_class = RemoteOriginReadSession
 
 
 def get_patched_URI():
@@ -115,6 +115,13 @@ class ProvisioningServiceMaker:
         image_download_service.setName("image_download")
         return image_download_service
 
+    def _makeImageReportService(self):
+        from provisioningserver.rackdservices.image_report_service import (
+            ImageReportService)
+        image_report_service = ImageReportService(reactor)
+        image_report_service.setName("image_report")
+        return image_report_service
+
     def _makeLeaseSocketService(self, rpc_service):
         from provisioningserver.rackdservices.lease_socket_service import (
             LeaseSocketService)
@@ -191,6 +198,7 @@ class ProvisioningServiceMaker:
         yield self._makeNodePowerMonitorService()
         yield self._makeServiceMonitorService(rpc_service)
         yield self._makeImageDownloadService(rpc_service, tftp_root)
+        yield self._makeImageReportService()
         yield self._makeRackHTTPService(tftp_root, rpc_service)
         yield self._makeExternalService(rpc_service)
         # The following are network-accessible services.
@@ -26,6 +26,26 @@ METRICS_DEFINITIONS = [
     MetricDefinition(
         'Histogram', 'maas_tftp_file_transfer_latency',
         'Latency of TFTP file downloads', ['filename']),
+    MetricDefinition(
+        'Histogram', 'maas_tftp_file_transfer_throughput',
+        'Throughput of TFTP file downloads in bytes per second',
+        ['filename'],
+        buckets=[
+            10000, 50000, 100000, 500000, 1000000, 5000000, 10000000,
+            50000000, 100000000]),
+    MetricDefinition(
+        'Counter', 'maas_boot_file_cache_requests',
+        'Boot file requests answered from the cache (hit) or the disk (miss)',
+        ['result']),
+    # Common to rackd and regiond
+    MetricDefinition(
+        'Gauge', 'maas_rpc_connection_in_flight_calls',
+        'Number of unanswered RPC calls on a connection',
+        ['peer', 'connection']),
+    MetricDefinition(
+        'Gauge', 'maas_rpc_connection_latency_ewma',
+        'Moving average of RPC call latency on a connection',
+        ['peer', 'connection']),
     # regiond metrics
     MetricDefinition(
         'Histogram', 'maas_http_request_latency', 'HTTP request latency',
@@ -54,6 +74,19 @@ METRICS_DEFINITIONS = [
     MetricDefinition(
         'Histogram', 'maas_websocket_call_query_latency',
         'HTTP request query latency', _WEBSOCKET_CALL_LABELS),
+    MetricDefinition(
+        'Gauge', 'maas_status_worker_queue_depth',
+        'Number of node status messages waiting to be processed'),
+    MetricDefinition(
+        'Histogram', 'maas_status_worker_message_latency',
+        'Time from queueing node status messages to processing them',
+        buckets=[0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]),
+    MetricDefinition(
+        'Counter', 'maas_neighbour_bindings',
+        'Neighbour bindings reported by controllers', ['action']),
+    MetricDefinition(
+        'Counter', 'maas_mdns_bindings',
+        'mDNS bindings reported by controllers', ['action']),
     # Common metrics
     *node_metrics_definitions()
 ]
@@ -73,6 +73,36 @@ class TestPrometheusMetrics(MAASTestCase):
             'a_gauge{bar="BAR",baz="BAZ",bza="BZA",foo="FOO"} 22.0',
             prometheus_metrics.generate_latest().decode('ascii'))
 
+    def test_remove(self):
+        definitions = [
+            MetricDefinition('Gauge', 'a_gauge', 'A Gauge', ['foo'])
+        ]
+        prometheus_metrics = PrometheusMetrics(
+            definitions=definitions,
+            extra_labels={'baz': 'BAZ'},
+            registry=prometheus_client.CollectorRegistry())
+        prometheus_metrics.update(
+            'a_gauge', 'set', value=22, labels={'foo': 'FOO'})
+        prometheus_metrics.update(
+            'a_gauge', 'set', value=33, labels={'foo': 'OOF'})
+        prometheus_metrics.remove('a_gauge', {'foo': 'FOO'})
+        output = prometheus_metrics.generate_latest().decode('ascii')
+        self.assertNotIn('foo="FOO"', output)
+        self.assertIn('a_gauge{baz="BAZ",foo="OOF"} 33.0', output)
+
+    def test_remove_unknown_labels(self):
+        definitions = [
+            MetricDefinition('Gauge', 'a_gauge', 'A Gauge', ['foo'])
+        ]
+        prometheus_metrics = PrometheusMetrics(
+            definitions=definitions,
+            registry=prometheus_client.CollectorRegistry())
+        prometheus_metrics.remove('a_gauge', {'foo': 'FOO'})
+
+    def test_remove_empty(self):
+        prometheus_metrics = PrometheusMetrics()
+        prometheus_metrics.remove('some_metric', {'foo': 'FOO'})
+
     def test_with_update_handlers(self):
         def update_gauge(metrics):
             metrics.update('a_gauge', 'set', value=33)
@@ -62,13 +62,7 @@ class PrometheusMetrics:
             return
 
         metric = self._metrics[metric_name]
-        all_labels = labels.copy() if labels else {}
-        if self._extra_labels:
-            extra_labels = {
-                key: value() if callable(value) else value
-                for key, value in self._extra_labels.items()
-            }
-            all_labels.update(extra_labels)
+        all_labels = self._get_labels(labels)
         if all_labels:
             metric = metric.labels(**all_labels)
         func = getattr(metric, action, None)
@@ -80,6 +74,29 @@ class PrometheusMetrics:
         else:
             func(value)
 
+    def remove(self, metric_name, labels):
+        """Remove the series of the specified metric with `labels`."""
+        if not self._metrics:
+            return
+
+        metric = self._metrics[metric_name]
+        all_labels = self._get_labels(labels)
+        try:
+            metric.remove(*(all_labels[name] for name in metric._labelnames))
+        except KeyError:
+            # The metric was never updated with these labels.
+            pass
+
+    def _get_labels(self, labels):
+        all_labels = labels.copy() if labels else {}
+        if self._extra_labels:
+            extra_labels = {
+                key: value() if callable(value) else value
+                for key, value in self._extra_labels.items()
+            }
+            all_labels.update(extra_labels)
+        return all_labels
+
     def generate_latest(self):
         """Generate a bytestring with metric values."""
         if self.registry is None:
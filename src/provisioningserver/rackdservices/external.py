@@ -32,6 +32,7 @@ from provisioningserver.rpc import exceptions
 from provisioningserver.rpc.region import (
     GetControllerType,
     GetDNSConfiguration,
+    GetExternalServicesConfiguration,
     GetProxyConfiguration,
     GetSyslogConfiguration,
     GetTimeConfiguration,
@@ -46,10 +47,12 @@ from provisioningserver.utils.twisted import (
 from twisted.application.internet import TimerService
 from twisted.internet.defer import (
     DeferredList,
+    DeferredLock,
     inlineCallbacks,
     maybeDeferred,
 )
 from twisted.internet.threads import deferToThread
+from twisted.protocols.amp import UnhandledCommand
 
 
 log = LegacyLogger()
@@ -397,10 +400,16 @@ class RackExternalService(TimerService):
     _rpc_service = None
     _services = None
 
+    # The version of the configuration last obtained from the region, and
+    # the sections of that configuration.
+    _version = None
+    _sections = None
+
     def __init__(self, rpc_service, reactor, services=None):
         super().__init__(self.INTERVAL_LOW, self._tryUpdate)
         self._rpc_service = rpc_service
         self.clock = reactor
+        self._lock = DeferredLock()
         self._services = services
         if self._services is None:
             self._services = [
@@ -420,6 +429,27 @@ class RackExternalService(TimerService):
     @inlineCallbacks
     def _getConfiguration(self):
         client = yield self._rpc_service.getClientNow()
+        try:
+            response = yield client(
+                GetExternalServicesConfiguration,
+                system_id=client.localIdent, version=self._version)
+        except UnhandledCommand:
+            # The region is older; ask for each section separately.
+            sections = yield self._getConfigurationSections(client)
+            self._version, self._sections = None, None
+        else:
+            sections = response.get("configuration")
+            if sections is None:
+                # Not modified since the version we already have.
+                sections = self._sections
+            else:
+                self._version = response["version"]
+                self._sections = sections
+        return _Configuration(
+            connections=self._rpc_service.connections, **sections)
+
+    @inlineCallbacks
+    def _getConfigurationSections(self, client):
         controller_type = yield client(
             GetControllerType, system_id=client.localIdent)
         time_configuration = yield client(
@@ -430,18 +460,33 @@ class RackExternalService(TimerService):
             GetProxyConfiguration, system_id=client.localIdent)
         syslog_configuration = yield client(
             GetSyslogConfiguration, system_id=client.localIdent)
-        return _Configuration(
-            controller_type=controller_type,
-            time_configuration=time_configuration,
-            dns_configuration=dns_configuration,
-            proxy_configuration=proxy_configuration,
-            syslog_configuration=syslog_configuration,
-            connections=self._rpc_service.connections
-        )
+        return {
+            "controller_type": controller_type,
+            "time_configuration": time_configuration,
+            "dns_configuration": dns_configuration,
+            "proxy_configuration": proxy_configuration,
+            "syslog_configuration": syslog_configuration,
+        }
+
+    def refresh(self):
+        """Update the external services now, rather than at the next interval.
+
+        The region calls this, via `RefreshExternalServices`, when the
+        configuration of the external services changes.
+        """
+        if self.running:
+            return self._tryUpdate()
 
-    @inlineCallbacks
     def _tryUpdate(self):
-        """Update the NTP server running on this host."""
+        """Update the external services running on this host.
+
+        Updates are serialised, so a refresh requested by the region does
+        not run alongside the periodic update.
+        """
+        return self._lock.run(self._update)
+
+    @inlineCallbacks
+    def _update(self):
         try:
             config = yield self._getConfiguration()
         except exceptions.NoSuchNode:
@@ -12,10 +12,12 @@ from collections import defaultdict
 from datetime import timedelta
 import os
 import sys
+from urllib.parse import quote
 
 import attr
 from netaddr import IPAddress
 from provisioningserver import services
+from provisioningserver.boot.filecache import CachedFileReader
 from provisioningserver.events import (
     EVENT_TYPES,
     send_node_event_ip_address,
@@ -31,6 +33,7 @@ from provisioningserver.utils import (
 )
 from provisioningserver.utils.fs import atomic_write
 from provisioningserver.utils.twisted import callOut
+from tftp.backend import FilesystemReader
 from tftp.errors import (
     AccessViolation,
     FileNotFound,
@@ -244,8 +247,38 @@ class HTTPLogResource(resource.Resource):
 
 
 class HTTPBootResource(resource.Resource):
+    """Serve boot files over HTTP, as the TFTP service would.
+
+    Static files under the TFTP root are not sent from here. Instead nginx
+    is told to serve them itself with an internal redirect to the location
+    `internalPrefix`, so that it can use sendfile and answer range requests
+    without keeping the reactor busy. Only generated configuration files
+    are sent by this resource.
+    """
+
     isLeaf = True
 
+    internalPrefix = '/boot-files/'
+
+    def getInternalRedirect(self, base, reader):
+        """Return the internal nginx location for `reader`, if it has one.
+
+        :param base: The root directory of the TFTP backend.
+        :param reader: The reader that the TFTP backend returned.
+        :return: The URI as bytes, or `None` if `reader` does not read a
+            file under `base`.
+        """
+        if not isinstance(reader, (FilesystemReader, CachedFileReader)):
+            return None
+        try:
+            segments = reader.file_path.asTextMode().segmentsFrom(
+                base.asTextMode())
+        except ValueError:
+            return None
+        else:
+            return quote(self.internalPrefix + '/'.join(segments)).encode(
+                'ascii')
+
     def render_GET(self, request):
         # Be sure that the TFTP endpoint is running.
         try:
@@ -288,6 +321,14 @@ class HTTPBootResource(resource.Resource):
             request.finish()
 
         def writeResponse(reader):
+            redirect = self.getInternalRedirect(tftp.backend.base, reader)
+            if redirect is not None:
+                # nginx serves the file from the internal location.
+                reader.finish()
+                request.setHeader(b'X-Accel-Redirect', redirect)
+                request.finish()
+                return
+
             # Some readers from `tftp` do not provide a way to get the size
             # of the generated content. Only set `Content-Length` when size
             # can be determined for the response.
@@ -310,7 +351,8 @@ class HTTPBootResource(resource.Resource):
                 "local": (localHost, localPort),
                 "remote": (remoteHost, remotePort),
             },
-            tftp.backend.get_reader, path, skip_logging=True)
+            tftp.backend.get_reader, path, skip_logging=True,
+            use_cache=False)
         d.addCallback(writeResponse)
         d.addErrback(handleFailure)
         d.addErrback(log.err, "Failed to handle boot HTTP request.")
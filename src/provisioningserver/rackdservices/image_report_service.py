@@ -0,0 +1,45 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Service to periodically report the boot images to the region."""
+
+__all__ = [
+    "ImageReportService",
+    ]
+
+
+from datetime import timedelta
+
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.rpc.boot_images import report_boot_images
+from provisioningserver.rpc.exceptions import NoConnectionsAvailable
+from twisted.application.internet import TimerService
+
+
+log = LegacyLogger()
+
+
+class ImageReportService(TimerService, object):
+    """Twisted service to periodically report the boot images.
+
+    Only the hash of the images is sent, unless the region does not already
+    have them. The images are also reported as soon as an import finishes;
+    this catches up when the region was unreachable at the time, or has
+    forgotten them.
+    """
+
+    check_interval = timedelta(minutes=1).total_seconds()
+
+    def __init__(self, reactor):
+        super(ImageReportService, self).__init__(
+            self.check_interval, self.try_report)
+        self.clock = reactor
+
+    def try_report(self):
+        """Report the boot images, logging any failure."""
+        def report_failure(failure):
+            # Not connected yet; try again on the next pass.
+            if not failure.check(NoConnectionsAvailable):
+                log.err(failure, "Reporting boot images failed.")
+
+        return report_boot_images().addErrback(report_failure)
@@ -6,7 +6,11 @@
 __all__ = []
 
 import random
-from unittest.mock import Mock
+from unittest.mock import (
+    ANY,
+    call,
+    Mock,
+)
 
 import attr
 from maastesting.factory import factory
@@ -14,6 +18,7 @@ from maastesting.fixtures import MAASRootFixture
 from maastesting.matchers import (
     DocTestMatches,
     MockCalledOnceWith,
+    MockCallsMatch,
     MockNotCalled,
 )
 from maastesting.testcase import (
@@ -41,7 +46,10 @@ from testtools.matchers import (
     MatchesStructure,
 )
 from twisted.internet import reactor
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import (
+    inlineCallbacks,
+    succeed,
+)
 
 
 def prepareRegion(
@@ -181,6 +189,101 @@ class TestRackExternalService(MAASTestCase):
         self.assertThat(logger.output, Equals(""))
         self.assertThat(ntp._tryUpdate, MockNotCalled())
 
+    def prepareCompositeRegion(self, *responses):
+        fixture = self.useFixture(MockLiveClusterToRegionRPCFixture())
+        protocol, connecting = fixture.makeEventLoop(
+            region.GetExternalServicesConfiguration)
+        protocol.RegisterRackController.side_effect = always_succeed_with(
+            {"system_id": factory.make_name("maas-id")})
+        protocol.GetExternalServicesConfiguration.side_effect = [
+            succeed(response) for response in responses]
+
+        def connected(teardown):
+            self.addCleanup(teardown)
+            return services.getServiceNamed("rpc"), protocol
+
+        return connecting.addCallback(connected)
+
+    def make_sections(self):
+        return {
+            "controller_type": {"is_region": False, "is_rack": True},
+            "time_configuration": {
+                "servers": [factory.make_ipv4_address()], "peers": []},
+            "dns_configuration": {"trusted_networks": []},
+            "proxy_configuration": {
+                "enabled": True, "port": 8000, "allowed_cidrs": [],
+                "prefer_v4_proxy": False},
+            "syslog_configuration": {"port": 5247},
+        }
+
+    @inlineCallbacks
+    def test__getConfiguration_uses_composite_configuration(self):
+        sections = self.make_sections()
+        version = factory.make_name("version")
+        rpc_service, protocol = yield self.prepareCompositeRegion(
+            {"version": version, "configuration": sections})
+        service = external.RackExternalService(rpc_service, reactor, [])
+
+        config = yield service._getConfiguration()
+
+        self.assertThat(config, MatchesStructure.byEquality(
+            connections=rpc_service.connections, **sections))
+        self.assertThat(service._version, Equals(version))
+        self.assertThat(
+            protocol.GetExternalServicesConfiguration, MockCalledOnceWith(
+                protocol, system_id=ANY, version=None))
+
+    @inlineCallbacks
+    def test__getConfiguration_reuses_configuration_when_not_modified(self):
+        sections = self.make_sections()
+        version = factory.make_name("version")
+        rpc_service, protocol = yield self.prepareCompositeRegion(
+            {"version": version, "configuration": sections},
+            {"version": version})
+        service = external.RackExternalService(rpc_service, reactor, [])
+
+        yield service._getConfiguration()
+        config = yield service._getConfiguration()
+
+        self.assertThat(config, MatchesStructure.byEquality(**sections))
+        self.assertThat(
+            protocol.GetExternalServicesConfiguration, MockCallsMatch(
+                call(protocol, system_id=ANY, version=None),
+                call(protocol, system_id=ANY, version=version)))
+
+    @inlineCallbacks
+    def test__getConfiguration_falls_back_to_separate_commands(self):
+        rpc_service, protocol = yield prepareRegion(self, syslog_port=5555)
+        service = external.RackExternalService(rpc_service, reactor, [])
+
+        config = yield service._getConfiguration()
+
+        self.assertThat(
+            config.syslog_configuration, Equals({"port": 5555}))
+        self.assertThat(service._version, Is(None))
+        self.assertThat(protocol.GetControllerType, MockCalledOnceWith(
+            protocol, system_id=ANY))
+
+    @inlineCallbacks
+    def test_refresh_updates_when_running(self):
+        service = make_startable_RackExternalService(
+            self, StubClusterClientService(), reactor, [])
+        yield service.startService()
+        self.addCleanup((yield service.stopService))
+        service._tryUpdate.reset_mock()
+
+        yield service.refresh()
+
+        self.assertThat(service._tryUpdate, MockCalledOnceWith())
+
+    def test_refresh_does_nothing_when_not_running(self):
+        service = make_startable_RackExternalService(
+            self, StubClusterClientService(), reactor, [])
+
+        service.refresh()
+
+        self.assertThat(service._tryUpdate, MockNotCalled())
+
 
 class TestRackNTP(MAASTestCase):
     """Tests for `RackNTP` in `RackExternalService`."""
@@ -28,6 +28,7 @@ from maastesting.twisted import (
 )
 from provisioningserver import services
 from provisioningserver.boot import BytesReader
+from provisioningserver.boot.filecache import CachedFileReader
 from provisioningserver.events import EVENT_TYPES
 from provisioningserver.rackdservices import http
 from provisioningserver.rpc import (
@@ -42,6 +43,7 @@ from testtools.matchers import (
     IsInstance,
     MatchesStructure,
 )
+from tftp.backend import FilesystemReader
 from tftp.errors import (
     AccessViolation,
     FileNotFound,
@@ -53,6 +55,7 @@ from twisted.internet.defer import (
     inlineCallbacks,
     succeed,
 )
+from twisted.python.filepath import FilePath
 from twisted.web.http_headers import Headers
 from twisted.web.server import (
     NOT_DONE_YET,
@@ -163,6 +166,9 @@ class TestRackHTTPService(MAASTestCase):
             FileContains(
                 matcher=Contains(
                     'proxy_pass http://maas-regions/MAAS/;')))
+        self.assertThat(
+            target_path,
+            FileContains(matcher=Contains('location /boot-files/ {')))
         self.assertThat(mock_reloadService, MockCalledOnceWith('http'))
 
         # If the configuration has not changed then a second call to
@@ -553,6 +559,63 @@ class TestHTTPBootResource(MAASTestCase):
         self.assertEquals(
             content, b''.join(request.written))
 
+    @inlineCallbacks
+    def test_render_GET_redirects_to_nginx_for_static_files(self):
+        base = FilePath(self.make_dir())
+        base.child('ubuntu').makedirs()
+        file_path = base.child('ubuntu').child('boot kernel')
+        file_path.setContent(factory.make_bytes())
+        ip = factory.make_ip_address()
+        request = DummyRequest([b'ubuntu', b'boot kernel'])
+        request.requestHeaders = Headers({
+            'X-Server-Addr': ['192.168.1.1'],
+            'X-Server-Port': ['5248'],
+            'X-Forwarded-For': [ip],
+            'X-Forwarded-Port': ['%s' % factory.pick_port()],
+        })
+
+        self.patch(http.log, 'info')
+        mock_deferLater = self.patch(http, 'deferLater')
+        mock_deferLater.side_effect = always_succeed_with(None)
+
+        self.tftp.backend.base = base
+        self.tftp.backend.get_reader.return_value = succeed(
+            FilesystemReader(file_path))
+
+        resource = http.HTTPBootResource()
+        yield self.render_GET(resource, request)
+
+        self.assertEquals(
+            [b'/boot-files/ubuntu/boot%20kernel'],
+            request.responseHeaders.getRawHeaders(b'X-Accel-Redirect'))
+        self.assertEquals(b'', b''.join(request.written))
+        # nginx serves the file, so it isn't read into the boot file cache.
+        self.assertThat(
+            self.tftp.backend.get_reader, MockCalledOnceWith(
+                b'ubuntu/boot kernel', skip_logging=True, use_cache=False))
+
+    def test_getInternalRedirect_ignores_files_outside_base(self):
+        base = FilePath(self.make_dir())
+        file_path = FilePath(self.make_file())
+        resource = http.HTTPBootResource()
+        self.assertIsNone(
+            resource.getInternalRedirect(base, FilesystemReader(file_path)))
+
+    def test_getInternalRedirect_redirects_cached_files(self):
+        base = FilePath(self.make_dir())
+        file_path = base.child('bootx64.efi')
+        resource = http.HTTPBootResource()
+        self.assertEqual(
+            b'/boot-files/bootx64.efi',
+            resource.getInternalRedirect(
+                base, CachedFileReader(file_path, b"")))
+
+    def test_getInternalRedirect_ignores_generated_files(self):
+        base = FilePath(self.make_dir())
+        resource = http.HTTPBootResource()
+        self.assertIsNone(
+            resource.getInternalRedirect(base, BytesReader(b"")))
+
     @inlineCallbacks
     def test_render_GET_logs_node_event_with_original_path_ip(self):
         path = factory.make_name('path')
@@ -0,0 +1,75 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for provisioningserver.rackdservices.image_report_service"""
+
+__all__ = []
+
+from unittest.mock import sentinel
+
+from maastesting.factory import factory
+from maastesting.matchers import (
+    DocTestMatches,
+    MockCalledOnceWith,
+)
+from maastesting.testcase import (
+    MAASTestCase,
+    MAASTwistedRunTest,
+)
+from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.rackdservices import image_report_service
+from provisioningserver.rackdservices.image_report_service import (
+    ImageReportService,
+)
+from provisioningserver.rpc.exceptions import NoConnectionsAvailable
+from twisted.application.internet import TimerService
+from twisted.internet.defer import (
+    fail,
+    succeed,
+)
+from twisted.internet.task import Clock
+
+
+class TestImageReportService(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test_init(self):
+        service = ImageReportService(sentinel.clock)
+        self.assertIsInstance(service, TimerService)
+        self.assertIs(service.clock, sentinel.clock)
+
+    def test_reports_every_interval(self):
+        report_boot_images = self.patch(
+            image_report_service, "report_boot_images")
+        report_boot_images.return_value = succeed(True)
+        clock = Clock()
+        service = ImageReportService(clock)
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.assertThat(report_boot_images, MockCalledOnceWith())
+        clock.advance(service.check_interval)
+        self.assertEqual(2, report_boot_images.call_count)
+
+    def test_ignores_missing_connection(self):
+        report_boot_images = self.patch(
+            image_report_service, "report_boot_images")
+        report_boot_images.return_value = fail(NoConnectionsAvailable())
+        service = ImageReportService(Clock())
+        with TwistedLoggerFixture() as logger:
+            service.try_report()
+        self.assertEqual("", logger.output)
+
+    def test_logs_other_failures(self):
+        report_boot_images = self.patch(
+            image_report_service, "report_boot_images")
+        report_boot_images.return_value = fail(factory.make_exception())
+        service = ImageReportService(Clock())
+        with TwistedLoggerFixture() as logger:
+            service.try_report()
+        self.assertThat(logger.output, DocTestMatches(
+            """\
+            Reporting boot images failed.
+            Traceback (most recent call last):...
+            Failure: maastesting.factory.TestException#...
+            """))
@@ -47,7 +47,7 @@ class TestRackNetworksMonitoringService(MAASTestCase):
         rpc_service = services.getServiceNamed('rpc')
         service = RackNetworksMonitoringService(
             rpc_service, Clock(), enable_monitoring=False,
-            enable_beaconing=False)
+            enable_beaconing=False, enable_netlink=False)
 
         yield maybeDeferred(service.startService)
         # By stopping the interface_monitor first, we assure that the loop
@@ -78,7 +78,7 @@ class TestRackNetworksMonitoringService(MAASTestCase):
         rpc_service = services.getServiceNamed('rpc')
         service = RackNetworksMonitoringService(
             rpc_service, Clock(), enable_monitoring=False,
-            enable_beaconing=False)
+            enable_beaconing=False, enable_netlink=False)
         service.getInterfaces = lambda: succeed(interfaces)
         # Put something in the cache. This tells recordInterfaces that refresh
         # has already run but the interfaces have changed thus they need to be
@@ -116,7 +116,7 @@ class TestRackNetworksMonitoringService(MAASTestCase):
         rpc_service = services.getServiceNamed('rpc')
         service = RackNetworksMonitoringService(
             rpc_service, Clock(), enable_monitoring=False,
-            enable_beaconing=True)
+            enable_beaconing=True, enable_netlink=False)
         service.getInterfaces = lambda: succeed(interfaces)
         # Put something in the cache. This tells recordInterfaces that refresh
         # has already run but the interfaces have changed thus they need to be
@@ -152,7 +152,7 @@ class TestRackNetworksMonitoringService(MAASTestCase):
         rpc_service = services.getServiceNamed('rpc')
         service = RackNetworksMonitoringService(
             rpc_service, Clock(), enable_monitoring=False,
-            enable_beaconing=False)
+            enable_beaconing=False, enable_netlink=False)
         neighbours = [{"ip": factory.make_ip_address()}]
         yield service.reportNeighbours(neighbours)
         self.assertThat(
@@ -169,7 +169,7 @@ class TestRackNetworksMonitoringService(MAASTestCase):
         rpc_service = services.getServiceNamed('rpc')
         service = RackNetworksMonitoringService(
             rpc_service, Clock(), enable_monitoring=False,
-            enable_beaconing=False)
+            enable_beaconing=False, enable_netlink=False)
         mdns = [
             {
                 'interface': 'eth0',
@@ -193,7 +193,7 @@ class TestRackNetworksMonitoringService(MAASTestCase):
         reactor = Clock()
         service = RackNetworksMonitoringService(
             rpc_service, reactor, enable_monitoring=False,
-            enable_beaconing=False)
+            enable_beaconing=False, enable_netlink=False)
         protocol.GetDiscoveryState.return_value = {'interfaces': {}}
         # Put something in the cache. This tells recordInterfaces that refresh
         # has already run but the interfaces have changed thus they need to be
@@ -216,7 +216,7 @@ class TestRackNetworksMonitoringService(MAASTestCase):
         reactor = Clock()
         service = RackNetworksMonitoringService(
             rpc_service, reactor, enable_monitoring=False,
-            enable_beaconing=True)
+            enable_beaconing=True, enable_netlink=False)
         service.beaconing_protocol = Mock()
         service.beaconing_protocol.queueMulticastBeaconing = Mock()
         service.getInterfaces = lambda: succeed({})
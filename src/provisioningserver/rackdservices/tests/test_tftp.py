@@ -39,6 +39,10 @@ from netaddr.ip import (
 import prometheus_client
 from provisioningserver import boot
 from provisioningserver.boot import BytesReader
+from provisioningserver.boot.filecache import (
+    BootFileCache,
+    CachedFileReader,
+)
 from provisioningserver.boot.pxe import PXEBootMethod
 from provisioningserver.boot.tests.test_pxe import compose_config_path
 from provisioningserver.events import EVENT_TYPES
@@ -52,8 +56,11 @@ from provisioningserver.rackdservices.tftp import (
     TFTPBackend,
     TFTPService,
     track_tftp_latency,
+    track_tftp_throughput,
     TransferTimeTrackingTFTP,
     UDPServer,
+    WindowedReadSession,
+    WindowedRemoteOriginReadSession,
 )
 from provisioningserver.rpc.exceptions import BootConfigNoResponse
 from provisioningserver.rpc.region import GetBootConfig
@@ -74,7 +81,13 @@ from testtools.matchers import (
     MatchesStructure,
 )
 from tftp.backend import IReader
-from tftp.datagram import RQDatagram
+from tftp.datagram import (
+    ACKDatagram,
+    DATADatagram,
+    ERR_NOT_DEFINED,
+    ERRORDatagram,
+    RQDatagram,
+)
 from tftp.errors import (
     BackendError,
     FileNotFound,
@@ -225,6 +238,7 @@ class TestTFTPBackend(MAASTestCase):
         self.useFixture(ClusterConfigurationFixture())
         self.patch(boot, "find_mac_via_arp")
         self.patch(tftp_module, 'log_request')
+        self.patch(tftp_module, 'boot_file_cache', BootFileCache())
 
     def test_init(self):
         temp_dir = self.make_dir()
@@ -234,16 +248,16 @@ class TestTFTPBackend(MAASTestCase):
         self.assertEqual(temp_dir, backend.base.path)
         self.assertEqual(client_service, backend.client_service)
 
-    def get_reader(self, data):
+    def get_reader(self, data, **kwargs):
         temp_file = self.make_file(name="example", contents=data)
         temp_dir = os.path.dirname(temp_file)
         backend = TFTPBackend(temp_dir, Mock())
-        return backend.get_reader(b"example")
+        return backend.get_reader(b"example", **kwargs)
 
     @inlineCallbacks
     def test_get_reader_regular_file(self):
-        # TFTPBackend.get_reader() returns a regular FilesystemReader for
-        # paths not matching re_config_file.
+        # TFTPBackend.get_reader() returns a reader for the file for paths
+        # not matching re_config_file.
         data = factory.make_string().encode("ascii")
         reader = yield self.get_reader(data)
         self.addCleanup(reader.finish)
@@ -251,6 +265,34 @@ class TestTFTPBackend(MAASTestCase):
         self.assertEqual(data, reader.read(len(data)))
         self.assertEqual(b"", reader.read(1))
 
+    @inlineCallbacks
+    def test_get_reader_reads_small_files_from_cache(self):
+        data = factory.make_bytes()
+        reader = yield self.get_reader(data)
+        self.assertIsInstance(reader, CachedFileReader)
+        self.assertEqual(data, reader.read(len(data)))
+        self.assertEqual(len(data), tftp_module.boot_file_cache.size)
+
+    @inlineCallbacks
+    def test_get_reader_reads_large_files_from_disk(self):
+        cache = tftp_module.boot_file_cache
+        cache.max_file_size = 10
+        data = factory.make_bytes(11)
+        reader = yield self.get_reader(data)
+        self.addCleanup(reader.finish)
+        self.assertNotIsInstance(reader, CachedFileReader)
+        self.assertEqual(data, reader.read(len(data)))
+        self.assertEqual(0, cache.size)
+
+    @inlineCallbacks
+    def test_get_reader_skips_cache_when_asked(self):
+        data = factory.make_bytes()
+        reader = yield self.get_reader(data, use_cache=False)
+        self.addCleanup(reader.finish)
+        self.assertNotIsInstance(reader, CachedFileReader)
+        self.assertEqual(data, reader.read(len(data)))
+        self.assertEqual(0, tftp_module.boot_file_cache.size)
+
     @inlineCallbacks
     def test_get_reader_handles_backslashes_in_path(self):
         data = factory.make_string().encode("ascii")
@@ -1120,6 +1162,219 @@ class TestTrackTFTPLatency(MAASTestCase):
             metrics)
 
 
+class TestTrackTFTPThroughput(MAASTestCase):
+
+    def test_track_tftp_throughput(self):
+        session = FakeStreamSession()
+        session.bytes_transferred = 5000
+        start_time = time.time()
+        prometheus_metrics = create_metrics(
+            METRICS_DEFINITIONS,
+            registry=prometheus_client.CollectorRegistry())
+        session.cancel = track_tftp_throughput(
+            session, start_time=start_time, filename='myfile.txt',
+            prometheus_metrics=prometheus_metrics)
+        time_mock = self.patch(tftp_module, 'time')
+        time_mock.return_value = start_time + 0.5
+        session.cancel()
+        self.assertTrue(session.cancelled)
+
+        metrics = prometheus_metrics.generate_latest().decode('ascii')
+        self.assertIn(
+            'maas_tftp_file_transfer_throughput_sum'
+            '{filename="myfile.txt"} 10000.0',
+            metrics)
+
+    def test_track_tftp_throughput_ignores_empty_transfers(self):
+        session = FakeStreamSession()
+        session.bytes_transferred = 0
+        prometheus_metrics = create_metrics(
+            METRICS_DEFINITIONS,
+            registry=prometheus_client.CollectorRegistry())
+        session.cancel = track_tftp_throughput(
+            session, start_time=time.time(), filename='myfile.txt',
+            prometheus_metrics=prometheus_metrics)
+        session.cancel()
+        self.assertTrue(session.cancelled)
+
+        metrics = prometheus_metrics.generate_latest().decode('ascii')
+        self.assertNotIn(
+            'maas_tftp_file_transfer_throughput_count{filename="myfile.txt"}',
+            metrics)
+
+
+class FakeUDPTransport:
+
+    def __init__(self):
+        self.written = []
+        self.listening = True
+
+    def write(self, datagram):
+        self.written.append(datagram)
+
+    def stopListening(self):
+        self.listening = False
+
+    def take_blocks(self):
+        """Return the block numbers of the DATA datagrams sent so far."""
+        blocks = [
+            DATADatagram.from_wire(datagram[2:]).blocknum
+            for datagram in self.written
+        ]
+        self.written = []
+        return blocks
+
+
+class TestWindowedReadSession(MAASTestCase):
+    """Tests for `WindowedReadSession`."""
+
+    def make_session(self, size, window_size=1, block_size=8):
+        data = factory.make_bytes(size)
+        reader = BytesReader(data)
+        session = WindowedReadSession(
+            reader, window_size=window_size, _clock=Clock())
+        session.block_size = block_size
+        session.transport = FakeUDPTransport()
+        session.startProtocol()
+        return session, data
+
+    def ack(self, session, blocknum):
+        session.datagramReceived(ACKDatagram(blocknum))
+
+    def test_sends_one_block_at_a_time_by_default(self):
+        session, _ = self.make_session(20)
+        session.nextBlock()
+        self.assertEqual([1], session.transport.take_blocks())
+        self.ack(session, 1)
+        self.assertEqual([2], session.transport.take_blocks())
+
+    def test_sends_a_window_of_blocks_at_once(self):
+        session, _ = self.make_session(40, window_size=3)
+        session.nextBlock()
+        self.assertEqual([1, 2, 3], session.transport.take_blocks())
+        self.ack(session, 3)
+        self.assertEqual([4, 5, 6], session.transport.take_blocks())
+
+    def test_sends_whole_file(self):
+        session, data = self.make_session(40, window_size=3)
+        session.nextBlock()
+        received = []
+        while session.transport.listening:
+            datagrams = [
+                DATADatagram.from_wire(datagram[2:])
+                for datagram in session.transport.written
+            ]
+            session.transport.written = []
+            received.extend(datagram.data for datagram in datagrams)
+            self.ack(session, datagrams[-1].blocknum)
+        # 40 bytes in 8 byte blocks ends with an empty block.
+        self.assertEqual(6, len(received))
+        self.assertEqual(data, b"".join(received))
+        self.assertEqual(40, session.bytes_transferred)
+
+    def test_resends_from_block_after_partial_ack(self):
+        session, _ = self.make_session(80, window_size=4)
+        session.nextBlock()
+        self.assertEqual([1, 2, 3, 4], session.transport.take_blocks())
+        # The client lost block 3, so it acknowledges block 2.
+        self.ack(session, 2)
+        self.assertEqual([3, 4, 5, 6], session.transport.take_blocks())
+
+    def test_ignores_duplicate_ack(self):
+        session, _ = self.make_session(80, window_size=2)
+        session.nextBlock()
+        self.ack(session, 2)
+        session.transport.take_blocks()
+        self.ack(session, 2)
+        self.assertEqual([], session.transport.take_blocks())
+
+    def test_resends_window_on_timeout(self):
+        session, _ = self.make_session(80, window_size=2)
+        session.nextBlock()
+        session.transport.take_blocks()
+        session._clock.advance(session.timeout[0])
+        self.assertEqual([1, 2], session.transport.take_blocks())
+        self.assertTrue(session.transport.listening)
+
+    def test_gives_up_after_timeouts(self):
+        session, _ = self.make_session(80, window_size=2)
+        session.nextBlock()
+        for timeout in session.timeout:
+            session._clock.advance(timeout)
+        self.assertFalse(session.transport.listening)
+
+    def test_block_numbers_wrap_around(self):
+        session, _ = self.make_session(80, window_size=4)
+        session.blocknum = 0xfffe
+        session.nextBlock()
+        self.assertEqual(
+            [0xffff, 0, 1, 2], session.transport.take_blocks())
+        self.ack(session, 1)
+        self.assertEqual(0x10001, session.blocknum)
+        self.assertEqual([2, 3, 4, 5], session.transport.take_blocks())
+
+    def test_cancels_on_error(self):
+        session, _ = self.make_session(80)
+        session.nextBlock()
+        session.datagramReceived(ERRORDatagram.from_code(ERR_NOT_DEFINED))
+        self.assertFalse(session.transport.listening)
+        self.assertIsNone(session.timeout_watchdog)
+
+    def test_sends_error_and_cancels_when_read_fails(self):
+        session, _ = self.make_session(80)
+        session.reader = Mock()
+        session.reader.read.side_effect = OSError("Disk on fire")
+        with TwistedLoggerFixture() as logger:
+            session.nextBlock()
+        [datagram] = session.transport.written
+        error = ERRORDatagram.from_wire(datagram[2:])
+        self.assertEqual(ERR_NOT_DEFINED, error.errorcode)
+        self.assertThat(session.reader.finish, MockCalledOnceWith())
+        self.assertFalse(session.transport.listening)
+        self.assertIsNone(session.timeout_watchdog)
+        self.assertDocTestMatches("""\
+            TFTP read failed.
+            Traceback (most recent call last):
+            ...
+            builtins.OSError: Disk on fire
+            """, logger.output)
+
+
+class TestWindowedRemoteOriginReadSession(MAASTestCase):
+    """Tests for `WindowedRemoteOriginReadSession`."""
+
+    def make_session(self, **options):
+        return WindowedRemoteOriginReadSession(
+            ("192.168.1.1", 1234), BytesReader(b""), {
+                name.encode("ascii"): value.encode("ascii")
+                for name, value in options.items()
+            }, _clock=Clock())
+
+    def test_defaults_to_window_of_one(self):
+        session = self.make_session()
+        self.assertIsInstance(session.session, WindowedReadSession)
+        self.assertEqual(1, session.session.window_size)
+
+    def test_accepts_windowsize(self):
+        session = self.make_session(windowsize="16")
+        self.assertEqual(b"16", session.options[b"windowsize"])
+        self.assertEqual(16, session.session.window_size)
+
+    def test_limits_windowsize(self):
+        session = self.make_session(windowsize="65535")
+        self.assertEqual(
+            session.max_window_size, session.session.window_size)
+
+    def test_limits_windowsize_by_bytes(self):
+        session = self.make_session(blksize="65464", windowsize="16")
+        self.assertEqual(b"2", session.options[b"windowsize"])
+
+    def test_rejects_invalid_windowsize(self):
+        session = self.make_session(windowsize="0")
+        self.assertNotIn(b"windowsize", session.options)
+        self.assertEqual(1, session.session.window_size)
+
+
 class DummyProtocol(Protocol):
     def doStop(self):
         pass
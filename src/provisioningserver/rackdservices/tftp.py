@@ -6,8 +6,11 @@
 __all__ = [
     "TFTPBackend",
     "TFTPService",
+    "WindowedReadSession",
+    "WindowedRemoteOriginReadSession",
     ]
 
+from collections import deque
 from functools import partial
 from socket import (
     AF_INET,
@@ -17,6 +20,7 @@ from time import time
 
 from netaddr import IPAddress
 from provisioningserver.boot import BootMethodRegistry
+from provisioningserver.boot.filecache import boot_file_cache
 from provisioningserver.drivers import ArchitectureRegistry
 from provisioningserver.drivers.osystem import OperatingSystemRegistry
 from provisioningserver.events import (
@@ -47,6 +51,14 @@ from provisioningserver.utils.twisted import (
     RPCFetcher,
 )
 from tftp.backend import FilesystemSynchronousBackend
+from tftp.bootstrap import RemoteOriginReadSession
+from tftp.datagram import (
+    DATADatagram,
+    ERR_NOT_DEFINED,
+    ERRORDatagram,
+    OP_ACK,
+    OP_ERROR,
+)
 from tftp.errors import (
     BackendError,
     FileNotFound,
@@ -69,8 +81,13 @@ from twisted.internet.defer import (
     returnValue,
     succeed,
 )
+from twisted.internet.protocol import DatagramProtocol
 from twisted.internet.task import deferLater
-from twisted.python.filepath import FilePath
+from twisted.python.filepath import (
+    FilePath,
+    InsecurePath,
+)
+from twisted.python.failure import Failure
 
 
 maaslog = get_maas_logger("tftp")
@@ -336,10 +353,11 @@ class TFTPBackend(FilesystemSynchronousBackend):
 
     @deferred
     @typed
-    def handle_boot_method(self, file_name: TFTPPath, result):
+    def handle_boot_method(
+            self, file_name: TFTPPath, result, use_cache: bool = True):
         boot_method, params = result
         if boot_method is None:
-            return super(TFTPBackend, self).get_reader(file_name)
+            return self.get_static_reader(file_name, use_cache)
 
         # Map pxe namespace architecture names to MAAS's.
         arch = params.get("arch")
@@ -356,6 +374,25 @@ class TFTPBackend(FilesystemSynchronousBackend):
         d = self.get_boot_method_reader(boot_method, params)
         return d
 
+    def get_static_reader(self, file_name, use_cache=True):
+        """Return an `IReader` for a file under the TFTP root.
+
+        Small files are read from `boot_file_cache`, if `use_cache` is set.
+        """
+        if not use_cache:
+            return super(TFTPBackend, self).get_reader(file_name)
+        try:
+            file_path = self.base.asBytesMode().descendant(
+                file_name.split(b"/"))
+        except InsecurePath:
+            # The filesystem backend will refuse this too.
+            pass
+        else:
+            reader = boot_file_cache.get_reader(file_path)
+            if reader is not None:
+                return reader
+        return super(TFTPBackend, self).get_reader(file_name)
+
     @staticmethod
     def all_is_lost_errback(failure):
         if failure.check(BackendError):
@@ -370,12 +407,18 @@ class TFTPBackend(FilesystemSynchronousBackend):
 
     @deferred
     @typed
-    def get_reader(self, file_name: TFTPPath, skip_logging: bool = False):
+    def get_reader(
+            self, file_name: TFTPPath, skip_logging: bool = False,
+            use_cache: bool = True):
         """See `IBackend.get_reader()`.
 
         If `file_name` matches a boot method then the response is obtained
         from that boot method. Otherwise the filesystem is used to service
         the response.
+
+        :param use_cache: Whether files may be read from `boot_file_cache`.
+            The HTTP boot service does not use it, as nginx serves the files
+            itself.
         """
         # It is possible for a client to request the file with '\' instead
         # of '/', example being 'bootx64.efi'. Convert all '\' to '/' to be
@@ -386,7 +429,8 @@ class TFTPBackend(FilesystemSynchronousBackend):
             # 2 log messages are not created.
             log_request(file_name)
         d = self.get_boot_method(file_name)
-        d.addCallback(partial(self.handle_boot_method, file_name))
+        d.addCallback(
+            partial(self.handle_boot_method, file_name, use_cache=use_cache))
         d.addErrback(self.no_response_errback, file_name)
         d.addErrback(self.all_is_lost_errback)
         return d
@@ -440,8 +484,224 @@ def track_tftp_latency(
     return wrapped
 
 
+def track_tftp_throughput(
+        session, start_time, filename, prometheus_metrics=PROMETHEUS_METRICS):
+    """Wraps a session's `cancel` and tracks TFTP transfer throughput."""
+    cancel = session.cancel
+
+    def wrapped():
+        result = cancel()
+        elapsed = time() - start_time
+        if session.bytes_transferred > 0 and elapsed > 0:
+            prometheus_metrics.update(
+                'maas_tftp_file_transfer_throughput', 'observe',
+                labels={'filename': filename},
+                value=session.bytes_transferred / elapsed)
+        return result
+
+    return wrapped
+
+
+class WindowedReadSession(DatagramProtocol):
+    """Send a file to a TFTP client, a window of blocks at a time.
+
+    This implements RFC 7440. The client acknowledges the last block of each
+    window, or the last block it received in order when one went missing,
+    and the next window starts from the block after that. All the blocks of
+    a window are read first and then written to the socket together. With a
+    window size of 1 this is the lock-step transfer of RFC 1350.
+
+    The interface is that of `tftp.session.ReadSession`.
+    """
+
+    block_size = 512
+    timeout = (1, 3, 7)
+
+    def __init__(self, reader, window_size=1, _clock=None):
+        self.reader = reader
+        self.window_size = window_size
+        self._clock = reactor if _clock is None else _clock
+        self.started = False
+        # Set once the last block of the file has been read.
+        self.completed = False
+        # DATA datagrams sent but not yet acknowledged, oldest first.
+        self.window = deque()
+        self.window_bytes = deque()
+        # The number of the last acknowledged block. This does not wrap
+        # around at 65535 like the block number on the wire does.
+        self.blocknum = 0
+        self.bytes_transferred = 0
+        self.retries = 0
+        self.filling = False
+        self.timeout_watchdog = None
+
+    def startProtocol(self):
+        self.started = True
+
+    def cancel(self):
+        if self.timeout_watchdog is not None:
+            if self.timeout_watchdog.active():
+                self.timeout_watchdog.cancel()
+            self.timeout_watchdog = None
+        self.reader.finish()
+        self.transport.stopListening()
+
+    def datagramReceived(self, datagram):
+        if datagram.opcode == OP_ACK:
+            return self.tftp_ACK(datagram)
+        elif datagram.opcode == OP_ERROR:
+            log.debug("TFTP client sent error: {error}", error=datagram)
+            self.cancel()
+
+    def tftp_ACK(self, datagram):
+        offset = (datagram.blocknum - self.blocknum) % 0x10000
+        if offset == 0 or offset > len(self.window):
+            # A duplicate or stray ACK. Sending data in response would risk
+            # duplicating every following block (the Sorcerer's Apprentice
+            # bug), so leave it to the timeout to resend.
+            return
+        self.blocknum += offset
+        for _ in range(offset):
+            self.window.popleft()
+            self.bytes_transferred += self.window_bytes.popleft()
+        self.retries = 0
+        if len(self.window) == 0 and self.completed:
+            self.cancel()
+        else:
+            # Any blocks left in the window went missing, so the client
+            # wants them again followed by the rest of the window.
+            resend = list(self.window)
+            return self.nextBlock(resend)
+
+    @inlineCallbacks
+    def nextBlock(self, resend=()):
+        """Fill the window with blocks from the reader, then send them.
+
+        :param resend: DATA datagrams that must be sent again before the
+            newly read blocks.
+        """
+        if self.filling:
+            # The window is already being filled and will be sent.
+            return
+        self.filling = True
+        try:
+            datagrams = list(resend)
+            while not self.completed and len(self.window) < self.window_size:
+                try:
+                    data = yield maybeDeferred(
+                        self.reader.read, self.block_size)
+                except Exception:
+                    self.readFailed(Failure())
+                    return
+                if len(data) < self.block_size:
+                    self.completed = True
+                blocknum = (self.blocknum + len(self.window) + 1) % 0x10000
+                datagram = DATADatagram(blocknum, data).to_wire()
+                self.window.append(datagram)
+                self.window_bytes.append(len(data))
+                datagrams.append(datagram)
+        finally:
+            self.filling = False
+        self.sendData(datagrams)
+        self._resetTimeout()
+
+    def readFailed(self, failure):
+        """Reading the file failed; tell the client and end the transfer."""
+        log.err(failure, "TFTP read failed.")
+        error = ERRORDatagram.from_code(ERR_NOT_DEFINED, b"Read failed")
+        self.sendData([error.to_wire()])
+        self.cancel()
+
+    def sendData(self, datagrams):
+        for datagram in datagrams:
+            try:
+                self.transport.write(datagram)
+            except OSError as error:
+                # Most likely the socket's send buffer is full. The rest of
+                # the window will be sent again when the ACK times out.
+                log.debug("TFTP send failed: {error}", error=error)
+                break
+
+    def _resetTimeout(self):
+        if self.timeout_watchdog is not None:
+            if self.timeout_watchdog.active():
+                self.timeout_watchdog.cancel()
+        self.timeout_watchdog = self._clock.callLater(
+            self.timeout[self.retries], self.timedOut)
+
+    def timedOut(self):
+        self.timeout_watchdog = None
+        self.retries += 1
+        if self.retries >= len(self.timeout):
+            log.debug("TFTP transfer timed out.")
+            self.cancel()
+        else:
+            self.sendData(self.window)
+            self._resetTimeout()
+
+
+class WindowedRemoteOriginReadSession(RemoteOriginReadSession):
+    """A `RemoteOriginReadSession` that negotiates a window size.
+
+    The window size option comes from RFC 7440. The window is limited so
+    that a whole window of blocks fits in the socket's send buffer.
+    """
+
+    max_window_size = 64
+    max_window_bytes = 128 * 1024
+
+    def __init__(self, remote, reader, options=None, _clock=None):
+        super(WindowedRemoteOriginReadSession, self).__init__(
+            remote, reader, options, _clock=_clock)
+        window_size = self.get_option(b'windowsize')
+        self.session = WindowedReadSession(
+            reader, 1 if window_size is None else int(window_size),
+            _clock=self._clock)
+
+    def get_option(self, name):
+        """Return the accepted value of option `name`, or `None`."""
+        for option, value in self.options.items():
+            if option.lower() == name:
+                return value
+        return None
+
+    def processOptions(self, options):
+        accepted = super(
+            WindowedRemoteOriginReadSession, self).processOptions(options)
+        for name, value in options.items():
+            if name.lower() == b'windowsize':
+                try:
+                    window_size = int(value)
+                except ValueError:
+                    break
+                if window_size < 1:
+                    break
+                blksize = WindowedReadSession.block_size
+                for option, option_value in accepted.items():
+                    if option.lower() == b'blksize':
+                        blksize = int(option_value)
+                window_size = min(
+                    window_size, self.max_window_size,
+                    max(1, self.max_window_bytes // blksize))
+                accepted[name] = str(window_size).encode("ascii")
+                break
+        return accepted
+
+    def _datagramReceived(self, datagram):
+        # Once the transfer is underway every datagram goes to the session,
+        # including an ACK for block 0 when the block number wraps around.
+        if self.session.started:
+            return self.session.datagramReceived(datagram)
+        else:
+            return super(
+                WindowedRemoteOriginReadSession, self)._datagramReceived(
+                    datagram)
+
+
 class TransferTimeTrackingTFTP(TFTP):
 
+    read_session_class = WindowedRemoteOriginReadSession
+
     @inlineCallbacks
     def _startSession(
             self, datagram, addr, mode, prometheus_metrics=PROMETHEUS_METRICS):
@@ -455,6 +715,10 @@ class TransferTimeTrackingTFTP(TFTP):
             stream_session.cancel = track_tftp_latency(
                 stream_session.cancel, start_time, filename,
                 prometheus_metrics=prometheus_metrics)
+            if hasattr(stream_session, 'bytes_transferred'):
+                stream_session.cancel = track_tftp_throughput(
+                    stream_session, start_time, filename,
+                    prometheus_metrics=prometheus_metrics)
         returnValue(session)
 
     def _clean_filename(self, datagram):
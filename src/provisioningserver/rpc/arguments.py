@@ -6,6 +6,7 @@
 __all__ = [
     "Bytes",
     "Choice",
+    "Chunked",
     "IPAddress",
     "IPNetwork",
     "ParsedURL",
@@ -39,6 +40,48 @@ class Bytes(amp.Argument):
         return inString
 
 
+def _chunkName(name, index):
+    """Return the key for chunk `index` of argument `name`."""
+    return b"%s.%d" % (name, index)
+
+
+class Chunked:
+    """Mix-in for an :py:class:`amp.Argument` whose value can be any length.
+
+    AMP limits each value in a box to
+    :py:data:`~twisted.protocols.amp.MAX_VALUE_LENGTH` bytes. An encoded value
+    longer than that is split across several keys in the same box -- `name`,
+    `name.2`, `name.3`, and so on -- and joined together again on the other
+    side. A value that fits is sent under `name` alone, exactly as it would be
+    without this mix-in, so it can still be exchanged with peers that do not
+    know about chunks. Peers that predate chunks cannot decode a longer value,
+    so commands that older peers still use must keep their values within the
+    limit; see `list_cluster_nodes_power_parameters` for an example.
+    """
+
+    def toBox(self, name, strings, objects, proto):
+        box = amp.AmpBox()
+        super(Chunked, self).toBox(name, box, objects, proto)
+        value = box.pop(name, None)
+        strings.update(box)
+        if value is not None:
+            size = amp.MAX_VALUE_LENGTH
+            strings[name] = value[:size]
+            starts = range(size, len(value), size)
+            for index, start in enumerate(starts, 2):
+                strings[_chunkName(name, index)] = value[start:start + size]
+
+    def fromBox(self, name, strings, objects, proto):
+        if name in strings:
+            chunks = [strings[name]]
+            chunk = strings.pop(_chunkName(name, 2), None)
+            while chunk is not None:
+                chunks.append(chunk)
+                chunk = strings.pop(_chunkName(name, len(chunks) + 1), None)
+            strings[name] = b"".join(chunks)
+        super(Chunked, self).fromBox(name, strings, objects, proto)
+
+
 class Choice(amp.Argument):
     """Encode a choice to a predefined bytestring on the wire."""
 
@@ -102,13 +145,12 @@ class ParsedURL(amp.Argument):
         return urllib.parse.urlparse(inString.decode("ascii"))
 
 
-class StructureAsJSON(amp.Argument):
+class StructureAsJSON(Chunked, amp.Argument):
     """Encode a structure on the wire as JSON, compressed with zlib.
 
-    The compressed size of the structure should not exceed
-    :py:data:`~twisted.protocols.amp.MAX_VALUE_LENGTH`, or ``0xffff`` bytes.
-    This is pretty hard to be sure of ahead of time, so only use this for
-    small structures that won't go near the limit.
+    If the compressed structure is larger than
+    :py:data:`~twisted.protocols.amp.MAX_VALUE_LENGTH` it is sent in chunks;
+    see :py:class:`Chunked`.
     """
 
     def toString(self, inObject):
@@ -129,12 +171,14 @@ def _toByteString(string):
         return string
 
 
-class AmpList(amp.AmpList):
+class AmpList(Chunked, amp.AmpList):
     """An :py:class:`amp.AmpList` that works with native string arguments.
 
     Argument names are serialised transparently to ASCII byte strings and back
     again. This means that arguments can only contain ASCII characters.
     Twisted's ``AmpList`` deals only with byte string argument names.
+
+    Long lists are sent in chunks; see :py:class:`Chunked`.
     """
 
     def __init__(self, subargs, optional=False):
@@ -4,21 +4,29 @@
 """RPC relating to boot images."""
 
 __all__ = [
+    "get_boot_images_hash",
     "import_boot_images",
     "list_boot_images",
     "is_import_boot_images_running",
+    "report_boot_images",
     ]
 
+from hashlib import sha256
+import json
 from urllib.parse import urlparse
 
 from provisioningserver import concurrency
 from provisioningserver.auth import get_maas_user_gpghome
 from provisioningserver.boot import tftppath
+from provisioningserver.boot.filecache import boot_file_cache
 from provisioningserver.config import ClusterConfiguration
 from provisioningserver.import_images import boot_resources
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc import getRegionClient
-from provisioningserver.rpc.region import UpdateLastImageSync
+from provisioningserver.rpc.region import (
+    ReportBootImagesV2,
+    UpdateLastImageSync,
+)
 from provisioningserver.utils.env import (
     environment_variables,
     get_maas_id,
@@ -27,8 +35,10 @@ from provisioningserver.utils.twisted import synchronous
 from twisted.internet.defer import (
     fail,
     inlineCallbacks,
+    returnValue,
 )
 from twisted.internet.threads import deferToThread
+from twisted.protocols.amp import UnhandledCommand
 
 
 log = LegacyLogger()
@@ -55,8 +65,12 @@ def list_boot_images():
 
 def reload_boot_images():
     """Update the cached boot images so `list_boot_images` returns the
-    most up-to-date boot images list."""
+    most up-to-date boot images list.
+
+    This also empties the cache of boot files, as the images have changed.
+    """
     global CACHED_BOOT_IMAGES
+    boot_file_cache.clear()
     with ClusterConfiguration.open() as config:
         tftp_root = config.tftp_root
     CACHED_BOOT_IMAGES = tftppath.list_boot_images(tftp_root)
@@ -158,6 +172,8 @@ def _import_boot_images(sources, maas_url, http_proxy=None, https_proxy=None):
     yield deferToThread(_run_import, sources, maas_url, **proxies)
     yield touch_last_image_sync_timestamp().addErrback(
         log.err, "Failure touching last image sync timestamp.")
+    yield report_boot_images(send_images=True).addErrback(
+        log.err, "Failure reporting boot images.")
 
 
 def is_import_boot_images_running():
@@ -177,3 +193,46 @@ def touch_last_image_sync_timestamp():
         return fail()
     else:
         return client(UpdateLastImageSync, system_id=get_maas_id())
+
+
+def get_boot_images_hash(images):
+    """Return a hash of `images`, as returned by `list_boot_images`.
+
+    The hash does not depend on the order of the images.
+    """
+    lines = sorted(json.dumps(image, sort_keys=True) for image in images)
+    return sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+@inlineCallbacks
+def report_boot_images(send_images=False):
+    """Report the boot images on this rack controller to the region.
+
+    Unless `send_images` is set, only the hash of the images is sent at
+    first, and the images themselves only if the region does not already
+    have them.
+
+    :return: :class:`Deferred` that fires with True when the region has the
+        images, or False when the region is too old to accept them. It can
+        fail with `NoConnectionsAvailable` or any exception arising from a
+        `ReportBootImagesV2` RPC.
+    """
+    client = getRegionClient()
+    images = yield deferToThread(list_boot_images)
+    images_hash = get_boot_images_hash(images)
+    system_id = get_maas_id()
+    try:
+        if not send_images:
+            response = yield client(
+                ReportBootImagesV2, system_id=system_id, hash=images_hash)
+            if response["known"]:
+                returnValue(True)
+        yield client(
+            ReportBootImagesV2, system_id=system_id, hash=images_hash,
+            images=images)
+    except UnhandledCommand:
+        # The region has not been upgraded; it will ask for the images
+        # with `ListBootImagesV2` instead.
+        returnValue(False)
+    else:
+        returnValue(True)
@@ -26,6 +26,7 @@ __all__ = [
     "PowerOff",
     "PowerOn",
     "PowerQuery",
+    "RefreshExternalServices",
     "ScanNetworks",
     "ValidateDHCPv4Config",
     "ValidateDHCPv4Config_V2",
@@ -791,3 +792,16 @@ class CheckIPs(amp.Command):
         ])),
     ]
     errors = {}
+
+
+class RefreshExternalServices(amp.Command):
+    """Update the external services on this rack controller now.
+
+    The region sends this when the configuration of the external services
+    changes, rather than waiting for the rack controller to next ask for it.
+
+    :since: 2.7
+    """
+    arguments = []
+    response = []
+    errors = {}
@@ -12,7 +12,6 @@ import json
 from operator import itemgetter
 import os
 from os import urandom
-import random
 from socket import (
     AF_INET,
     AF_INET6,
@@ -827,6 +826,26 @@ class Cluster(RPCProtocol):
         d.addErrback(log.err, 'Failed to perform IP address checking.')
         return d
 
+    @cluster.RefreshExternalServices.responder
+    def refresh_external_services(self):
+        """RefreshExternalServices()
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.cluster.RefreshExternalServices`.
+        """
+        from provisioningserver import services
+        try:
+            external = services.getServiceNamed("external")
+        except KeyError:
+            # External services are not managed by this process.
+            pass
+        else:
+            d = external.refresh()
+            if d is not None:
+                d.addErrback(
+                    log.err, "Failed to refresh external services.")
+        return {}
+
 
 @implementer(IConnectionToRegion)
 class ClusterClient(Cluster):
@@ -1086,7 +1105,7 @@ class ClusterClientService(TimerService, object):
     def getClient(self):
         """Returns a :class:`common.Client` connected to a region.
 
-        The client is chosen at random.
+        The least loaded connection is chosen; see `select_connection`.
 
         :raises: :py:class:`~.exceptions.NoConnectionsAvailable` when
             there are no open connections to a region controller.
@@ -1095,7 +1114,7 @@ class ClusterClientService(TimerService, object):
         if len(conns) == 0:
             raise exceptions.NoConnectionsAvailable()
         else:
-            return common.Client(random.choice(conns))
+            return common.Client(common.select_connection(conns))
 
     @deferred
     def getClientNow(self):
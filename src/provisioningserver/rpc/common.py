@@ -8,10 +8,13 @@ __all__ = [
     "Client",
     "Identify",
     "RPCProtocol",
+    "select_connection",
 ]
 
 from os import getpid
+import random
 from socket import gethostname
+from time import monotonic
 
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
@@ -230,6 +233,75 @@ def make_command_ref(box):
         box.get(amp.ASK, b"none").decode("ascii"))
 
 
+# Weight given to the most recent call when updating a connection's moving
+# average of call latency.
+LATENCY_EWMA_ALPHA = 0.2
+
+# Time, in seconds, for the difference between a connection's moving average
+# of latency and the default latency to halve while no call on it is
+# answered. Without this, a connection that answered one call slowly would
+# look slow for as long as it was passed over in favour of the others.
+LATENCY_HALF_LIFE = 30.0
+
+
+def get_connection_latency(connection, default_latency, now):
+    """Return the expected latency of a call made on `connection`.
+
+    This is the connection's moving average of call latency, decaying
+    towards `default_latency` the longer it goes without being updated.
+    Connections that have not yet completed a call are given
+    `default_latency`.
+
+    :param now: The current time, as returned by `monotonic`.
+    """
+    latency = getattr(connection, "latency", None)
+    if latency is None:
+        return default_latency
+    updated = getattr(connection, "latencyUpdated", None)
+    if updated is None:
+        return latency
+    decay = 0.5 ** (max(0.0, now - updated) / LATENCY_HALF_LIFE)
+    return default_latency + ((latency - default_latency) * decay)
+
+
+def get_connection_load(connection, default_latency, now):
+    """Return a score for how loaded `connection` is; lower is better.
+
+    This is the expected time for one more call to complete: the number of
+    calls in flight, plus this one, times the expected latency of a call as
+    given by `get_connection_latency`.
+    """
+    in_flight = getattr(connection, "inFlight", 0)
+    latency = get_connection_latency(connection, default_latency, now)
+    return (in_flight + 1) * latency
+
+
+def select_connection(connections):
+    """Return the least loaded of `connections`.
+
+    Load is judged by `get_connection_load`. Connections that have not yet
+    completed a call are assumed to be as fast as the fastest that has, so
+    that they are quickly brought into use. Ties are broken at random.
+    """
+    connections = list(connections)
+    latencies = [
+        getattr(connection, "latency", None)
+        for connection in connections
+    ]
+    latencies = [latency for latency in latencies if latency is not None]
+    default_latency = min(latencies) if len(latencies) > 0 else 1.0
+    now = monotonic()
+    loads = [
+        get_connection_load(connection, default_latency, now)
+        for connection in connections
+    ]
+    least = min(loads)
+    return random.choice([
+        connection for connection, load in zip(connections, loads)
+        if load == least
+    ])
+
+
 class RPCProtocol(amp.AMP, object):
     """A specialisation of `amp.AMP`.
 
@@ -242,12 +314,25 @@ class RPCProtocol(amp.AMP, object):
         been called, i.e. this protocol is now connected.
     :ivar onConnectionLost: A `Deferred` that fires when `connectionLost` has
         been called, i.e. this protocol is no longer connected.
+    :ivar inFlight: The number of calls made on this connection that have not
+        yet been answered.
+    :ivar latency: The exponentially-weighted moving average of the time, in
+        seconds, taken to answer calls made on this connection, or `None` if
+        no call has yet been answered.
+    :ivar latencyUpdated: When `latency` was last updated, as returned by
+        `monotonic`, or `None`.
     """
 
     def __init__(self):
         super(RPCProtocol, self).__init__()
         self.onConnectionMade = Deferred()
         self.onConnectionLost = Deferred()
+        self.inFlight = 0
+        self.latency = None
+        self.latencyUpdated = None
+        # The label sets this connection's metrics have been recorded with;
+        # the peer is only known once the connection has been identified.
+        self._metricLabels = set()
 
     def connectionMade(self):
         super(RPCProtocol, self).connectionMade()
@@ -255,14 +340,79 @@ class RPCProtocol(amp.AMP, object):
 
     def connectionLost(self, reason):
         super(RPCProtocol, self).connectionLost(reason)
+        self._removeMetrics()
         self.onConnectionLost.callback(None)
 
     def _sendBoxCommand(self, command, box, requiresAnswer=True):
         """Override `_sendBoxCommand` to log the sent RPC message."""
         box[amp.COMMAND] = command
         log.debug("[RPC -> sent] {box}", box=box)
-        return super(RPCProtocol, self)._sendBoxCommand(
+        d = super(RPCProtocol, self)._sendBoxCommand(
             command, box, requiresAnswer=requiresAnswer)
+        if d is not None:
+            self.inFlight += 1
+            self._updateMetrics()
+            d.addBoth(self._callFinished, monotonic())
+        return d
+
+    def _callFinished(self, result, started):
+        """Record that a call made at `started` has been answered.
+
+        This updates the connection's load, as used by `select_connection`,
+        and exports it as metrics.
+        """
+        self.inFlight -= 1
+        now = monotonic()
+        elapsed = now - started
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency = (
+                (LATENCY_EWMA_ALPHA * elapsed) +
+                ((1 - LATENCY_EWMA_ALPHA) * self.latency))
+        self.latencyUpdated = now
+        self._updateMetrics()
+        return result
+
+    def _getMetricLabels(self):
+        """Return the labels for this connection's metrics.
+
+        Each connection is labelled with the address of its peer as well as
+        the peer's identity, since there can be several connections to the
+        same peer.
+        """
+        if self.transport is None:
+            connection = "none"
+        else:
+            address = self.transport.getPeer()
+            connection = "%s:%s" % (
+                getattr(address, "host", address),
+                getattr(address, "port", ""))
+        return (
+            ('peer', str(getattr(self, 'ident', None))),
+            ('connection', connection),
+        )
+
+    def _updateMetrics(self):
+        """Export this connection's load as metrics."""
+        labels = self._getMetricLabels()
+        self._metricLabels.add(labels)
+        PROMETHEUS_METRICS.update(
+            'maas_rpc_connection_in_flight_calls', 'set',
+            value=self.inFlight, labels=dict(labels))
+        if self.latency is not None:
+            PROMETHEUS_METRICS.update(
+                'maas_rpc_connection_latency_ewma', 'set',
+                value=self.latency, labels=dict(labels))
+
+    def _removeMetrics(self):
+        """Remove this connection's metrics, now that it is closed."""
+        for labels in self._metricLabels:
+            PROMETHEUS_METRICS.remove(
+                'maas_rpc_connection_in_flight_calls', dict(labels))
+            PROMETHEUS_METRICS.remove(
+                'maas_rpc_connection_latency_ewma', dict(labels))
+        self._metricLabels.clear()
 
     def dispatchCommand(self, box):
         """Call up, but coerce errors into non-fatal failures.
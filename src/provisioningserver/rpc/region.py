@@ -17,6 +17,7 @@ __all__ = [
     "GetControllerType",
     "GetDiscoveryState",
     "GetDNSConfiguration",
+    "GetExternalServicesConfiguration",
     "GetProxies",
     "GetTimeConfiguration",
     "Identify",
@@ -25,12 +26,15 @@ __all__ = [
     "RegisterEventType",
     "RegisterRackController",
     "ReportBootImages",
+    "ReportBootImagesV2",
     "ReportForeignDHCPServer",
     "ReportMDNSEntries",
     "ReportNeighbours",
     "RequestNodeInfoByMACAddress",
     "SendEvent",
+    "SendEventIPAddress",
     "SendEventMACAddress",
+    "SendEvents",
     "UpdateInterfaces",
     "UpdateLastImageSync",
     "UpdateNodePowerState",
@@ -39,6 +43,7 @@ __all__ = [
 from provisioningserver.rpc.arguments import (
     AmpList,
     Bytes,
+    CompressedAmpList,
     ParsedURL,
     StructureAsJSON,
 )
@@ -109,6 +114,41 @@ class ReportBootImages(amp.Command):
     errors = []
 
 
+class ReportBootImagesV2(amp.Command):
+    """Report the boot images available on the invoking rack controller.
+
+    The rack controller sends `images` when its boot images change. At other
+    times it sends only `hash`, and the region says whether that is the hash
+    of the images it last received from the rack. If it is not, the rack
+    controller should report again with `images`.
+
+    :since: 2.7
+    """
+
+    arguments = [
+        # A rack controller's system_id.
+        (b"system_id", amp.Unicode()),
+        # A hash of the images, calculated by the rack controller.
+        (b"hash", amp.Unicode()),
+        (b"images", CompressedAmpList(
+            [(b"osystem", amp.Unicode()),
+             (b"architecture", amp.Unicode()),
+             (b"subarchitecture", amp.Unicode()),
+             (b"release", amp.Unicode()),
+             (b"label", amp.Unicode()),
+             (b"purpose", amp.Unicode()),
+             (b"xinstall_type", amp.Unicode()),
+             (b"xinstall_path", amp.Unicode())], optional=True)),
+    ]
+    response = [
+        # Whether the region has the images with this hash.
+        (b"known", amp.Boolean()),
+    ]
+    errors = {
+        NoSuchNode: b"NoSuchNode",
+    }
+
+
 class GetBootConfig(amp.Command):
     """Get the boot configuration for booting machine.
 
@@ -393,6 +433,30 @@ class SendEventIPAddress(amp.Command):
     }
 
 
+class SendEvents(amp.Command):
+    """Send a batch of events.
+
+    Each event identifies its node by exactly one of `system_id`,
+    `mac_address` or `ip_address`.
+
+    :since: 2.7
+    """
+
+    arguments = [
+        (b"events", AmpList([
+            (b"system_id", amp.Unicode(optional=True)),
+            (b"mac_address", amp.Unicode(optional=True)),
+            (b"ip_address", amp.Unicode(optional=True)),
+            (b"type_name", amp.Unicode()),
+            (b"description", amp.Unicode()),
+        ])),
+    ]
+    response = []
+    errors = {
+        NoSuchEventType: b"NoSuchEventType",
+    }
+
+
 class ReportForeignDHCPServer(amp.Command):
     """Report a foreign DHCP server on a rack controller's interface.
 
@@ -676,3 +740,32 @@ class GetSyslogConfiguration(amp.Command):
     errors = {
         NoSuchNode: b"NoSuchNode",
     }
+
+
+class GetExternalServicesConfiguration(amp.Command):
+    """Get settings to use for configuring all the external services run by
+    a given system identifier.
+
+    This returns, in one call, what `GetControllerType`,
+    `GetTimeConfiguration`, `GetDNSConfiguration`, `GetProxyConfiguration`,
+    and `GetSyslogConfiguration` return, keyed by ``controller_type``,
+    ``time_configuration``, ``dns_configuration``, ``proxy_configuration``,
+    and ``syslog_configuration`` respectively.
+
+    The configuration is identified by `version`. When the caller passes the
+    current version the configuration is not sent again.
+
+    :since: 2.7
+    """
+
+    arguments = [
+        (b"system_id", amp.Unicode()),
+        (b"version", amp.Unicode(optional=True)),
+    ]
+    response = [
+        (b"version", amp.Unicode()),
+        (b"configuration", StructureAsJSON(optional=True)),
+    ]
+    errors = {
+        NoSuchNode: b"NoSuchNode",
+    }
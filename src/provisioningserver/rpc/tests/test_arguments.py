@@ -24,6 +24,7 @@ from provisioningserver.drivers.pod import (
 from provisioningserver.rpc import arguments
 from testtools import ExpectedException
 from testtools.matchers import (
+    AllMatch,
     Equals,
     HasLength,
     IsInstance,
@@ -90,6 +91,54 @@ class TestStructureAsJSON(MAASTestCase):
         self.assertThat(decoded, Equals(self.example))
 
 
+class TestChunked(MAASTestCase):
+
+    class Command(amp.Command):
+        arguments = [
+            (b"structure", arguments.StructureAsJSON()),
+            (b"things", arguments.AmpList([(b"thing", amp.Unicode())])),
+        ]
+
+    def make_structure(self, size):
+        # Random characters do not compress well, so this stays large.
+        return {"data": factory.make_string(size)}
+
+    def round_trip(self, objects):
+        box = self.Command.makeArguments(objects, proto=None)
+        [received] = amp.parseString(box.serialize())
+        return box, self.Command.parseArguments(received, protocol=None)
+
+    def test_small_value_is_sent_as_one_value(self):
+        structure = self.make_structure(100)
+        box, decoded = self.round_trip({"structure": structure, "things": []})
+        self.assertEqual(
+            arguments.StructureAsJSON().toString(structure),
+            box[b"structure"])
+        self.assertNotIn(b"structure.2", box)
+        self.assertEqual(structure, decoded["structure"])
+
+    def test_large_value_is_sent_in_chunks(self):
+        structure = self.make_structure(3 * amp.MAX_VALUE_LENGTH)
+        box, decoded = self.round_trip({"structure": structure, "things": []})
+        self.assertIn(b"structure.2", box)
+        self.assertThat(
+            [len(value) for value in box.values()],
+            AllMatch(LessThan(amp.MAX_VALUE_LENGTH + 1)))
+        self.assertEqual(structure, decoded["structure"])
+
+    def test_long_list_is_sent_in_chunks(self):
+        things = [
+            {"thing": factory.make_name("thing")}
+            for _ in range(10000)
+        ]
+        structure = self.make_structure(100)
+        box, decoded = self.round_trip(
+            {"structure": structure, "things": things})
+        self.assertIn(b"things.2", box)
+        self.assertEqual(things, decoded["things"])
+        self.assertEqual(structure, decoded["structure"])
+
+
 class TestParsedURL(MAASTestCase):
 
     def test_round_trip(self):
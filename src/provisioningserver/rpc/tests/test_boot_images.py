@@ -9,6 +9,7 @@ import os
 from random import randint
 from unittest.mock import (
     ANY,
+    call,
     sentinel,
 )
 from urllib.parse import urlparse
@@ -16,6 +17,7 @@ from urllib.parse import urlparse
 from maastesting.factory import factory
 from maastesting.matchers import (
     MockCalledOnceWith,
+    MockCallsMatch,
     MockNotCalled,
 )
 from maastesting.testcase import (
@@ -32,14 +34,20 @@ from provisioningserver.rpc import (
 from provisioningserver.rpc.boot_images import (
     _run_import,
     fix_sources_for_cluster,
+    get_boot_images_hash,
     get_hosts_from_sources,
     import_boot_images,
     is_import_boot_images_running,
     list_boot_images,
     reload_boot_images,
+    report_boot_images,
+)
+from provisioningserver.rpc.region import (
+    ReportBootImagesV2,
+    UpdateLastImageSync,
 )
-from provisioningserver.rpc.region import UpdateLastImageSync
 from provisioningserver.rpc.testing import MockLiveClusterToRegionRPCFixture
+from provisioningserver.testing.boot_images import make_boot_image_params
 from provisioningserver.testing.config import (
     BootSourcesFixture,
     ClusterConfigurationFixture,
@@ -55,6 +63,7 @@ from twisted.internet.defer import (
     succeed,
 )
 from twisted.internet.task import Clock
+from twisted.protocols.amp import UnhandledCommand
 
 
 def make_sources():
@@ -118,6 +127,12 @@ class TestReloadBootImages(MAASTestCase):
         self.assertEqual(
             boot_images.CACHED_BOOT_IMAGES, fake_boot_images)
 
+    def test__clears_boot_file_cache(self):
+        self.patch(tftppath, 'list_boot_images').return_value = []
+        clear = self.patch(boot_images.boot_file_cache, 'clear')
+        reload_boot_images()
+        self.assertThat(clear, MockCalledOnceWith())
+
 
 class TestGetHostsFromSources(MAASTestCase):
 
@@ -334,6 +349,8 @@ class TestImportBootImages(MAASTestCase):
         get_maas_id = self.patch(boot_images, "get_maas_id")
         get_maas_id.return_value = factory.make_string()
         getRegionClient = self.patch(boot_images, "getRegionClient")
+        self.patch(boot_images, "report_boot_images").return_value = (
+            succeed(True))
         _run_import = self.patch_autospec(boot_images, '_run_import')
         _run_import.return_value = True
         maas_url = factory.make_simple_http_url()
@@ -354,6 +371,8 @@ class TestImportBootImages(MAASTestCase):
         get_maas_id = self.patch(boot_images, "get_maas_id")
         get_maas_id.return_value = factory.make_string()
         getRegionClient = self.patch(boot_images, "getRegionClient")
+        self.patch(boot_images, "report_boot_images").return_value = (
+            succeed(True))
         _run_import = self.patch_autospec(boot_images, '_run_import')
         _run_import.return_value = False
         maas_url = factory.make_simple_http_url()
@@ -409,6 +428,84 @@ class TestImportBootImages(MAASTestCase):
             protocol.UpdateLastImageSync,
             MockNotCalled())
 
+    @inlineCallbacks
+    def test_reports_boot_images(self):
+        self.patch(boot_images, "touch_last_image_sync_timestamp")
+        boot_images.touch_last_image_sync_timestamp.return_value = (
+            succeed(None))
+        report_boot_images = self.patch(boot_images, "report_boot_images")
+        report_boot_images.return_value = succeed(True)
+        self.patch_autospec(boot_images, '_run_import')
+        yield boot_images._import_boot_images(
+            sentinel.sources, factory.make_simple_http_url())
+        self.assertThat(
+            report_boot_images, MockCalledOnceWith(send_images=True))
+
+
+class TestGetBootImagesHash(MAASTestCase):
+
+    def test__does_not_depend_on_order(self):
+        images = [make_boot_image_params() for _ in range(3)]
+        self.assertEqual(
+            get_boot_images_hash(images),
+            get_boot_images_hash(list(reversed(images))))
+
+    def test__changes_with_images(self):
+        images = [make_boot_image_params() for _ in range(3)]
+        self.assertNotEqual(
+            get_boot_images_hash(images), get_boot_images_hash(images[1:]))
+
+
+class TestReportBootImages(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestReportBootImages, self).setUp()
+        self.system_id = factory.make_name("system_id")
+        self.patch(boot_images, "get_maas_id").return_value = self.system_id
+        self.images = [make_boot_image_params() for _ in range(3)]
+        self.patch(boot_images, "list_boot_images").return_value = (
+            self.images)
+        self.client = self.patch(boot_images, "getRegionClient").return_value
+
+    @inlineCallbacks
+    def test__sends_only_hash_when_region_knows_it(self):
+        self.client.return_value = succeed({"known": True})
+        reported = yield report_boot_images()
+        self.assertTrue(reported)
+        self.assertThat(self.client, MockCalledOnceWith(
+            ReportBootImagesV2, system_id=self.system_id,
+            hash=get_boot_images_hash(self.images)))
+
+    @inlineCallbacks
+    def test__sends_images_when_region_does_not_know_hash(self):
+        self.client.return_value = succeed({"known": False})
+        reported = yield report_boot_images()
+        self.assertTrue(reported)
+        images_hash = get_boot_images_hash(self.images)
+        self.assertThat(self.client, MockCallsMatch(
+            call(
+                ReportBootImagesV2, system_id=self.system_id,
+                hash=images_hash),
+            call(
+                ReportBootImagesV2, system_id=self.system_id,
+                hash=images_hash, images=self.images)))
+
+    @inlineCallbacks
+    def test__sends_images_straight_away_with_send_images(self):
+        self.client.return_value = succeed({"known": True})
+        yield report_boot_images(send_images=True)
+        self.assertThat(self.client, MockCalledOnceWith(
+            ReportBootImagesV2, system_id=self.system_id,
+            hash=get_boot_images_hash(self.images), images=self.images))
+
+    @inlineCallbacks
+    def test__returns_False_when_region_is_too_old(self):
+        self.client.return_value = defer.fail(UnhandledCommand())
+        reported = yield report_boot_images()
+        self.assertFalse(reported)
+
 
 class TestIsImportBootImagesRunning(MAASTestCase):
 
@@ -45,7 +45,10 @@ from maastesting.twisted import (
     TwistedLoggerFixture,
 )
 from netaddr import IPNetwork
-from provisioningserver import concurrency
+from provisioningserver import (
+    concurrency,
+    services,
+)
 from provisioningserver.boot import tftppath
 from provisioningserver.boot.tests.test_tftppath import make_osystem
 from provisioningserver.dhcp.testing.config import (
@@ -1148,6 +1151,17 @@ class TestClusterClientService(MAASTestCase):
                 for conn in service.connections.values()
             })
 
+    def test_getClient_returns_least_loaded_connection(self):
+        busy, idle = DummyConnection(), DummyConnection()
+        busy.inFlight, busy.latency = 5, 0.1
+        idle.inFlight, idle.latency = 0, 0.1
+        service = ClusterClientService(Clock())
+        service.connections = {
+            sentinel.eventloop01: busy,
+            sentinel.eventloop02: idle,
+        }
+        self.assertEqual(common.Client(idle), service.getClient())
+
     def test_getClient_when_there_are_no_connections(self):
         service = ClusterClientService(Clock())
         service.connections = {}
@@ -3627,6 +3641,35 @@ class TestClusterProtocol_DisableAndShutoffRackd(MAASTestCase):
         self.assertEquals(1, mock_call_and_check.call_count)
 
 
+class TestClusterProtocol_RefreshExternalServices(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test__is_registered(self):
+        protocol = Cluster()
+        responder = protocol.locateResponder(
+            cluster.RefreshExternalServices.commandName)
+        self.assertIsNotNone(responder)
+
+    def test_refreshes_external_service(self):
+        external = Mock()
+        external.refresh.return_value = None
+        getServiceNamed = self.patch(services, "getServiceNamed")
+        getServiceNamed.return_value = external
+        response = call_responder(
+            Cluster(), cluster.RefreshExternalServices, {})
+        self.assertEquals({}, response.result)
+        self.assertThat(getServiceNamed, MockCalledOnceWith("external"))
+        self.assertThat(external.refresh, MockCalledOnceWith())
+
+    def test_does_nothing_without_external_service(self):
+        getServiceNamed = self.patch(services, "getServiceNamed")
+        getServiceNamed.side_effect = KeyError("external")
+        response = call_responder(
+            Cluster(), cluster.RefreshExternalServices, {})
+        self.assertEquals({}, response.result)
+
+
 class TestClusterProtocol_CheckIPs(
         MAASTestCaseThatWaitsForDeferredThreads):
 
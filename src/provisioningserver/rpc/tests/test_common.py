@@ -9,6 +9,7 @@ import random
 import re
 from unittest.mock import (
     ANY,
+    call,
     sentinel,
 )
 
@@ -38,6 +39,7 @@ from testtools.matchers import (
     IsInstance,
     Not,
 )
+from twisted.internet.address import IPv4Address
 from twisted.internet.defer import Deferred
 from twisted.internet.protocol import connectionDone
 from twisted.protocols import amp
@@ -218,6 +220,175 @@ class TestRPCProtocol(MAASTestCase):
         self.assertThat(protocol.onConnectionLost, IsFiredDeferred())
 
 
+class TestRPCProtocolLoad(MAASTestCase):
+    """Tests for the load tracking in `RPCProtocol`."""
+
+    def make_protocol(self):
+        protocol = common.RPCProtocol()
+        protocol.makeConnection(StringTransport())
+        self.patch(common.log, 'debug')
+        return protocol
+
+    def test_init(self):
+        protocol = common.RPCProtocol()
+        self.assertEqual(0, protocol.inFlight)
+        self.assertIsNone(protocol.latency)
+
+    def test_counts_calls_in_flight(self):
+        protocol = self.make_protocol()
+        protocol.callRemote(common.Identify)
+        protocol.callRemote(common.Identify)
+        self.assertEqual(2, protocol.inFlight)
+
+    def test_records_latency_when_answered(self):
+        protocol = self.make_protocol()
+        monotonic = self.patch(common, "monotonic")
+        monotonic.return_value = 10.0
+        d = protocol.callRemote(common.Identify)
+        monotonic.return_value = 12.0
+        [seq] = protocol._outstandingRequests
+        protocol.ampBoxReceived(amp.AmpBox(_answer=seq, ident=b"id"))
+        self.assertEqual({"ident": "id"}, extract_result(d))
+        self.assertEqual(0, protocol.inFlight)
+        self.assertEqual(2.0, protocol.latency)
+
+    def test_latency_is_a_moving_average(self):
+        protocol = self.make_protocol()
+        protocol.latency = 1.0
+        protocol.inFlight = 1
+        self.patch(common, "monotonic").return_value = 3.0
+        protocol._callFinished(sentinel.result, 1.0)
+        self.assertAlmostEqual(
+            common.LATENCY_EWMA_ALPHA * 2.0 +
+            (1 - common.LATENCY_EWMA_ALPHA) * 1.0, protocol.latency)
+
+    def test_passes_through_result(self):
+        protocol = self.make_protocol()
+        protocol.inFlight = 1
+        self.assertIs(
+            sentinel.result,
+            protocol._callFinished(sentinel.result, common.monotonic()))
+
+    def test_records_when_latency_updated(self):
+        protocol = self.make_protocol()
+        protocol.inFlight = 1
+        self.patch(common, "monotonic").return_value = 3.0
+        protocol._callFinished(sentinel.result, 1.0)
+        self.assertEqual(3.0, protocol.latencyUpdated)
+
+    def test_records_metrics(self):
+        protocol = self.make_protocol()
+        protocol.ident = factory.make_name("ident")
+        protocol.inFlight = 1
+        update = self.patch(PROMETHEUS_METRICS, "update")
+        protocol._callFinished(None, common.monotonic())
+        labels = {"peer": protocol.ident, "connection": "192.168.1.1:54321"}
+        self.assertThat(update.call_args_list, Equals([
+            call(
+                "maas_rpc_connection_in_flight_calls", "set",
+                value=0, labels=labels),
+            call(
+                "maas_rpc_connection_latency_ewma", "set",
+                value=protocol.latency, labels=labels),
+        ]))
+
+    def test_records_calls_in_flight_when_call_made(self):
+        protocol = self.make_protocol()
+        protocol.ident = factory.make_name("ident")
+        update = self.patch(PROMETHEUS_METRICS, "update")
+        protocol.callRemote(common.Identify)
+        labels = {"peer": protocol.ident, "connection": "192.168.1.1:54321"}
+        self.assertThat(update.call_args_list, Equals([
+            call(
+                "maas_rpc_connection_in_flight_calls", "set",
+                value=1, labels=labels),
+        ]))
+
+    def test_labels_metrics_by_connection(self):
+        protocols = [common.RPCProtocol() for _ in range(2)]
+        for port, protocol in enumerate(protocols, 1000):
+            transport = StringTransport(
+                peerAddress=IPv4Address("TCP", "10.0.0.1", port))
+            protocol.makeConnection(transport)
+            protocol.ident = "region"
+        self.assertNotEqual(
+            protocols[0]._getMetricLabels(), protocols[1]._getMetricLabels())
+
+    def test_removes_metrics_when_connection_lost(self):
+        protocol = self.make_protocol()
+        protocol.callRemote(common.Identify)
+        labels_before = dict(protocol._getMetricLabels())
+        protocol.ident = factory.make_name("ident")
+        protocol.callRemote(common.Identify)
+        labels_after = dict(protocol._getMetricLabels())
+        remove = self.patch(PROMETHEUS_METRICS, "remove")
+        protocol.connectionLost(connectionDone)
+        self.assertItemsEqual([
+            call("maas_rpc_connection_in_flight_calls", labels_before),
+            call("maas_rpc_connection_latency_ewma", labels_before),
+            call("maas_rpc_connection_in_flight_calls", labels_after),
+            call("maas_rpc_connection_latency_ewma", labels_after),
+        ], remove.call_args_list)
+
+
+class TestSelectConnection(MAASTestCase):
+    """Tests for `select_connection`."""
+
+    def make_connection(self, inFlight=0, latency=None):
+        connection = DummyConnection()
+        connection.inFlight = inFlight
+        connection.latency = latency
+        return connection
+
+    def test_prefers_fewer_calls_in_flight(self):
+        busy = self.make_connection(inFlight=4, latency=0.5)
+        idle = self.make_connection(inFlight=0, latency=0.5)
+        self.assertIs(idle, common.select_connection([busy, idle]))
+
+    def test_prefers_lower_latency(self):
+        slow = self.make_connection(inFlight=1, latency=3.0)
+        fast = self.make_connection(inFlight=1, latency=0.1)
+        self.assertIs(fast, common.select_connection([slow, fast]))
+
+    def test_weighs_latency_by_calls_in_flight(self):
+        slow = self.make_connection(inFlight=0, latency=1.0)
+        fast = self.make_connection(inFlight=9, latency=0.2)
+        self.assertIs(slow, common.select_connection([slow, fast]))
+
+    def test_new_connections_are_as_fast_as_the_fastest(self):
+        old = self.make_connection(inFlight=1, latency=0.1)
+        new = self.make_connection(inFlight=0)
+        self.assertIs(new, common.select_connection([old, new]))
+
+    def test_latency_decays_while_not_updated(self):
+        self.patch(common, "monotonic").return_value = 100.0
+        slow = self.make_connection(inFlight=0, latency=3.0)
+        slow.latencyUpdated = 100.0 - (common.LATENCY_HALF_LIFE * 10)
+        fast = self.make_connection(inFlight=1, latency=0.1)
+        fast.latencyUpdated = 100.0
+        self.assertIs(slow, common.select_connection([slow, fast]))
+
+    def test_get_connection_latency_decays_towards_default(self):
+        connection = self.make_connection(latency=3.0)
+        connection.latencyUpdated = 10.0
+        self.assertEqual(
+            3.0, common.get_connection_latency(connection, 1.0, 10.0))
+        self.assertEqual(
+            2.0, common.get_connection_latency(
+                connection, 1.0, 10.0 + common.LATENCY_HALF_LIFE))
+
+    def test_copes_with_connections_without_load(self):
+        connections = [DummyConnection(), DummyConnection()]
+        self.assertIn(common.select_connection(connections), connections)
+
+    def test_breaks_ties_at_random(self):
+        connections = [self.make_connection() for _ in range(3)]
+        choice = self.patch(common.random, "choice")
+        choice.return_value = sentinel.chosen
+        self.assertIs(sentinel.chosen, common.select_connection(connections))
+        self.assertThat(choice, MockCalledOnceWith(connections))
+
+
 class TestRPCProtocol_UnhandledErrorsWhenHandlingResponses(MAASTestCase):
 
     answer_seq = b"%d" % random.randrange(0, 2 ** 32)
@@ -22,6 +22,7 @@ from maastesting.testcase import (
     MAASTestCase,
     MAASTwistedRunTest,
 )
+from provisioningserver import events as events_module
 from provisioningserver.events import (
     EVENT_DETAILS,
     EVENT_TYPES,
@@ -35,6 +36,7 @@ from provisioningserver.events import (
 )
 from provisioningserver.rpc import region
 from provisioningserver.rpc.exceptions import (
+    NoConnectionsAvailable,
     NoSuchEventType,
     NoSuchNode,
 )
@@ -50,6 +52,7 @@ from testtools.matchers import (
     IsInstance,
 )
 from twisted.internet.defer import (
+    DeferredList,
     fail,
     inlineCallbacks,
     succeed,
@@ -75,7 +78,8 @@ class TestSendEventNode(MAASTestCase):
             sentinel.description)
         self.assertThat(result, Is(sentinel.d))
         self.assertThat(nodeEventHub.logByID, MockCalledOnceWith(
-            sentinel.event_type, sentinel.system_id, sentinel.description))
+            sentinel.event_type, sentinel.system_id, sentinel.description,
+            immediate=True))
 
 
 class TestSendEventNodeMACAddress(MAASTestCase):
@@ -112,7 +116,8 @@ class TestSendRackEvent(MAASTestCase):
         result = send_rack_event(sentinel.event_type, sentinel.description)
         self.assertThat(result, Is(sentinel.d))
         self.assertThat(nodeEventHub.logByID, MockCalledOnceWith(
-            sentinel.event_type, rack_system_id, sentinel.description))
+            sentinel.event_type, rack_system_id, sentinel.description,
+            immediate=True))
 
 
 class TestNodeEventHubLogByID(MAASTestCase):
@@ -388,3 +393,149 @@ class TestSendEventIPAddress(MAASTestCase):
             yield event_hub.logByIP(event_name, ip_address, description)
         # The event has been removed from the cache.
         self.assertThat(event_hub._types_registered, HasLength(0))
+
+
+class TestNodeEventHubBatching(MAASTestCase):
+    """Tests for sending batches of events with `SendEvents`."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def patch_rpc_methods(self, side_effect=None):
+        fixture = self.useFixture(MockLiveClusterToRegionRPCFixture())
+        protocol, connecting = fixture.makeEventLoop(
+            region.SendEvents, region.RegisterEventType)
+        protocol.SendEvents.return_value = {}
+        protocol.SendEvents.side_effect = side_effect
+        return protocol, connecting
+
+    def make_event_hub(self, **attrs):
+        event_hub = NodeEventHub()
+        # Don't wait for more events unless a test asks to.
+        event_hub.batchDelay = 0
+        for name, value in attrs.items():
+            setattr(event_hub, name, value)
+        return event_hub
+
+    @inlineCallbacks
+    def test__events_are_sent_together(self):
+        protocol, connecting = self.patch_rpc_methods()
+        self.addCleanup((yield connecting))
+
+        event_name = random.choice(list(map_enum(EVENT_TYPES)))
+        system_id = factory.make_name('system_id')
+        mac_address = factory.make_mac_address()
+        ip_address = factory.make_ip_address()
+        event_hub = self.make_event_hub()
+
+        yield DeferredList([
+            event_hub.logByID(event_name, system_id, "by id"),
+            event_hub.logByMAC(event_name, mac_address, "by mac"),
+            event_hub.logByIP(event_name, ip_address, "by ip"),
+        ], fireOnOneErrback=True)
+
+        self.assertThat(
+            protocol.RegisterEventType, MockCalledOnceWith(
+                ANY, name=event_name, level=ANY, description=ANY))
+        self.assertThat(
+            protocol.SendEvents, MockCalledOnceWith(ANY, events=[
+                {"system_id": system_id, "mac_address": None,
+                 "ip_address": None, "type_name": event_name,
+                 "description": "by id"},
+                {"system_id": None, "mac_address": mac_address,
+                 "ip_address": None, "type_name": event_name,
+                 "description": "by mac"},
+                {"system_id": None, "mac_address": None,
+                 "ip_address": ip_address, "type_name": event_name,
+                 "description": "by ip"},
+            ]))
+
+    @inlineCallbacks
+    def test__full_batch_is_sent_without_waiting(self):
+        protocol, connecting = self.patch_rpc_methods()
+        self.addCleanup((yield connecting))
+
+        event_name = random.choice(list(map_enum(EVENT_TYPES)))
+        event_hub = self.make_event_hub(batchSize=2, batchDelay=60)
+
+        yield DeferredList([
+            event_hub.logByID(event_name, factory.make_name('system_id'))
+            for _ in range(2)
+        ], fireOnOneErrback=True)
+
+        self.assertThat(protocol.SendEvents, MockCalledOnce())
+        self.assertThat(event_hub._batchCall, Is(None))
+
+    @inlineCallbacks
+    def test__immediate_event_is_sent_without_waiting(self):
+        protocol, connecting = self.patch_rpc_methods()
+        self.addCleanup((yield connecting))
+
+        event_name = random.choice(list(map_enum(EVENT_TYPES)))
+        event_hub = self.make_event_hub(batchDelay=60)
+
+        yield DeferredList([
+            event_hub.logByID(event_name, factory.make_name('system_id')),
+            event_hub.logByID(
+                event_name, factory.make_name('system_id'), immediate=True),
+        ], fireOnOneErrback=True)
+
+        # The event logged earlier is sent with the immediate one.
+        self.assertThat(protocol.SendEvents, MockCalledOnce())
+        _, kwargs = protocol.SendEvents.call_args
+        self.assertThat(kwargs["events"], HasLength(2))
+        self.assertThat(event_hub._batchCall, Is(None))
+
+    @inlineCallbacks
+    def test__registers_event_types_again_if_not_found(self):
+        protocol, connecting = self.patch_rpc_methods(
+            side_effect=[fail(NoSuchEventType()), succeed({})])
+        self.addCleanup((yield connecting))
+
+        event_name = random.choice(list(map_enum(EVENT_TYPES)))
+        event_hub = self.make_event_hub()
+        event_hub._types_registered.add(event_name)
+
+        yield event_hub.logByID(event_name, factory.make_name('system_id'))
+
+        self.assertThat(
+            protocol.RegisterEventType, MockCalledOnceWith(
+                ANY, name=event_name, level=ANY, description=ANY))
+        self.assertThat(protocol.SendEvents.call_count, Equals(2))
+        self.assertThat(event_hub._types_registered, Equals({event_name}))
+
+    @inlineCallbacks
+    def test__event_type_not_found_is_passed_on_after_retry(self):
+        protocol, connecting = self.patch_rpc_methods(
+            side_effect=NoSuchEventType)
+        self.addCleanup((yield connecting))
+
+        event_name = random.choice(list(map_enum(EVENT_TYPES)))
+        event_hub = self.make_event_hub()
+
+        with ExpectedException(NoSuchEventType):
+            yield event_hub.logByID(
+                event_name, factory.make_name('system_id'))
+
+        self.assertThat(protocol.RegisterEventType.call_count, Equals(2))
+        self.assertThat(protocol.SendEvents.call_count, Equals(2))
+        self.assertThat(event_hub._types_registered, HasLength(0))
+
+    @inlineCallbacks
+    def test__failure_is_passed_to_every_event_in_batch(self):
+        getRegionClient = self.patch(events_module, "getRegionClient")
+        getRegionClient.side_effect = NoConnectionsAvailable()
+
+        event_name = random.choice(list(map_enum(EVENT_TYPES)))
+        event_hub = self.make_event_hub()
+        event_hub._types_registered.add(event_name)
+
+        results = yield DeferredList([
+            event_hub.logByID(event_name, factory.make_name('system_id'))
+            for _ in range(2)
+        ], consumeErrors=True)
+
+        self.assertThat(getRegionClient, MockCalledOnce())
+        self.assertThat(
+            [failure.check(NoConnectionsAvailable)
+             for _, failure in results],
+            Equals([NoConnectionsAvailable, NoConnectionsAvailable]))
@@ -35,6 +35,9 @@ from provisioningserver.rackdservices.external import RackExternalService
 from provisioningserver.rackdservices.image_download_service import (
     ImageDownloadService,
 )
+from provisioningserver.rackdservices.image_report_service import (
+    ImageReportService,
+)
 from provisioningserver.rackdservices.lease_socket_service import (
     LeaseSocketService,
 )
@@ -117,7 +120,7 @@ class TestProvisioningServiceMaker(MAASTestCase):
         self.assertIsInstance(service, MultiService)
         expected_services = [
             "dhcp_probe", "networks_monitor", "image_download",
-            "lease_socket_service", "node_monitor", "external",
+            "image_report", "lease_socket_service", "node_monitor", "external",
             "rpc", "rpc-ping", "http", "http_service", "tftp",
             "service_monitor",
         ]
@@ -143,7 +146,7 @@ class TestProvisioningServiceMaker(MAASTestCase):
         self.assertIsInstance(service, MultiService)
         expected_services = [
             "dhcp_probe", "networks_monitor", "image_download",
-            "lease_socket_service", "node_monitor", "external",
+            "image_report", "lease_socket_service", "node_monitor", "external",
             "rpc", "rpc-ping", "http", "http_service", "tftp",
             "service_monitor",
         ]
@@ -203,6 +206,13 @@ class TestProvisioningServiceMaker(MAASTestCase):
         image_service = service.getServiceNamed("image_download")
         self.assertIsInstance(image_service, ImageDownloadService)
 
+    def test_image_report_service(self):
+        options = Options()
+        service_maker = ProvisioningServiceMaker("Harry", "Hill")
+        service = service_maker.makeService(options, clock=None)
+        image_service = service.getServiceNamed("image_report")
+        self.assertIsInstance(image_service, ImageReportService)
+
     def test_node_monitor_service(self):
         options = Options()
         service_maker = ProvisioningServiceMaker("Harry", "Hill")
@@ -6,6 +6,7 @@
 __all__ = [
     "ARP",
     "add_arguments",
+    "decode_arp_packet",
     "run"
 ]
 
@@ -277,18 +278,51 @@ def update_bindings_and_get_event(bindings, vid, ip, mac, time):
             event="NEW", vid=vid)
 
 
-def update_and_print_bindings(bindings, arp, out=sys.stdout):
+def get_binding_events(bindings, arp):
     """Update the specified bindings dictionary with the given ARP packet.
 
-    Output a JSON object on the specified stream (defaults to stdout) based on
-    the results of updating the binding.
+    Yields an event, as returned by `update_bindings_and_get_event`, for each
+    binding in the packet that resulted in an update to the bindings.
     """
     for ip, mac in arp.bindings():
         event = update_bindings_and_get_event(
             bindings, arp.vid, ip, mac, arp.time)
         if event is not None:
-            out.write("%s\n" % json.dumps(event))
-            out.flush()
+            yield event
+
+
+def update_and_print_bindings(bindings, arp, out=sys.stdout):
+    """Update the specified bindings dictionary with the given ARP packet.
+
+    Output a JSON object on the specified stream (defaults to stdout) based on
+    the results of updating the binding.
+    """
+    for event in get_binding_events(bindings, arp):
+        out.write("%s\n" % json.dumps(event))
+        out.flush()
+
+
+def decode_arp_packet(packet, time=None):
+    """Decode the specified Ethernet frame as an ARP packet.
+
+    :param packet: The bytes of the Ethernet frame.
+    :param time: Timestamp the frame was seen (seconds since epoch).
+    :return: An `ARP` object, or None if the frame does not hold a complete
+        ARP packet.
+    """
+    ethernet = Ethernet(packet, time=time)
+    if not ethernet.is_valid():
+        # Ignore packets with a truncated Ethernet header.
+        return None
+    if len(ethernet.payload) < SIZEOF_ARP_PACKET:
+        # Ignore truncated ARP packets.
+        return None
+    if ethernet.ethertype != ETHERTYPE.ARP:
+        # Ignore non-ARP packets.
+        return None
+    return ARP(
+        ethernet.payload, src_mac=ethernet.src_mac, dst_mac=ethernet.dst_mac,
+        vid=ethernet.vid, time=ethernet.time)
 
 
 def observe_arp_packets(
@@ -315,20 +349,9 @@ def observe_arp_packets(
             # assumptions about the link layer header won't be correct.
             return 4
         for header, packet in pcap:
-            ethernet = Ethernet(packet, time=header.timestamp_seconds)
-            if not ethernet.is_valid():
-                # Ignore packets with a truncated Ethernet header.
-                continue
-            if len(ethernet.payload) < SIZEOF_ARP_PACKET:
-                # Ignore truncated ARP packets.
-                continue
-            if ethernet.ethertype != ETHERTYPE.ARP:
-                # Ignore non-ARP packets.
+            arp = decode_arp_packet(packet, time=header.timestamp_seconds)
+            if arp is None:
                 continue
-            arp = ARP(
-                ethernet.payload, src_mac=ethernet.src_mac,
-                dst_mac=ethernet.dst_mac, vid=ethernet.vid,
-                time=ethernet.time)
             if bindings is not None:
                 update_and_print_bindings(bindings, arp, output)
             if verbose:
@@ -0,0 +1,340 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Utilities for capturing ARP and beacon packets with AF_PACKET sockets.
+
+This does in-process what the ``network-monitor`` and ``beacon-monitor``
+scripts do with `tcpdump`: a raw socket is bound to each monitored interface,
+and a BPF filter attached to it so that the kernel only queues the packets of
+interest. Waiting packets are read and decoded in batches by the reactor.
+
+Opening these sockets requires the ``CAP_NET_RAW`` capability; when the
+process does not have it the capture scripts are run with `sudo` instead.
+"""
+
+__all__ = [
+    "ARPCapture",
+    "BeaconCapture",
+    "PacketCapture",
+]
+
+import ctypes
+import errno
+import socket
+import struct
+import time
+
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.utils.arp import (
+    decode_arp_packet,
+    get_binding_events,
+)
+from provisioningserver.utils.beaconing import (
+    BEACON_PORT,
+    decode_beacon_packet,
+)
+from provisioningserver.utils.pcap import PCAPPacketHeader
+from provisioningserver.utils.tcpip import PacketProcessingError
+from twisted.internet import reactor
+from twisted.internet.interfaces import IReadDescriptor
+from zope.interface import implementer
+
+
+log = LegacyLogger()
+
+# Linux constants for packet sockets. See packet(7).
+ETH_P_ALL = 0x0003
+SOL_PACKET = 263
+PACKET_AUXDATA = 8
+PACKET_OUTGOING = 4
+SO_ATTACH_FILTER = 26
+
+# struct tpacket_auxdata, as received in a PACKET_AUXDATA control message.
+# When the NIC strips 802.1q tags the tag is only available from here.
+TPACKET_AUXDATA = '=IIIHHHH'
+TP_STATUS_VLAN_VALID = 0x10
+TP_STATUS_VLAN_TPID_VALID = 0x40
+AUXDATA_SPACE = socket.CMSG_SPACE(struct.calcsize(TPACKET_AUXDATA))
+
+
+class BPF:
+    """Enumeration of the classic BPF opcodes used by the capture filters."""
+    LDH_ABS = 0x28  # A <- P[k:2]
+    LDB_ABS = 0x30  # A <- P[k:1]
+    LDH_IND = 0x48  # A <- P[X+k:2]
+    LDXB_MSH = 0xb1  # X <- 4 * (P[k:1] & 0xf)
+    JEQ = 0x15  # pc += (A == k) ? jt : jf
+    JSET = 0x45  # pc += (A & k) ? jt : jf
+    RET = 0x06  # accept k bytes of the packet
+
+
+def assemble_bpf(program):
+    """Assemble a classic BPF program.
+
+    :param program: A list of labels and instructions. An instruction is a
+        tuple of (opcode, k, jt, jf) where jt and jf are the labels to jump
+        to when a conditional jump is (or is not) taken, or None.
+    :return: The `struct sock_filter` array for the program, as bytes.
+    """
+    labels, instructions = {}, []
+    for item in program:
+        if isinstance(item, str):
+            labels[item] = len(instructions)
+        else:
+            instructions.append(item)
+    assembled = []
+    for index, (code, k, jt, jf) in enumerate(instructions):
+        jt = 0 if jt is None else labels[jt] - index - 1
+        jf = 0 if jf is None else labels[jf] - index - 1
+        assembled.append(struct.pack('=HBBI', code, jt, jf, k))
+    return b''.join(assembled)
+
+
+def make_arp_filter(snaplen):
+    """Return a BPF program equivalent to ``arp or (vlan and arp)``."""
+    return assemble_bpf([
+        (BPF.LDH_ABS, 12, None, None),
+        (BPF.JEQ, 0x0806, 'accept', 'vlan'),
+        'vlan',
+        (BPF.JEQ, 0x8100, None, 'reject'),
+        (BPF.LDH_ABS, 16, None, None),
+        (BPF.JEQ, 0x0806, 'accept', 'reject'),
+        'accept',
+        (BPF.RET, snaplen, None, None),
+        'reject',
+        (BPF.RET, 0, None, None),
+    ])
+
+
+def _udp_port_filter(port, offset, accept, reject):
+    """Return BPF instructions matching UDP to `port`, over IPv4 or IPv6.
+
+    :param offset: Where the Ethertype is in the frame.
+    """
+    ipv4, ipv6 = 'ipv4+%d' % offset, 'ipv6+%d' % offset
+    return [
+        (BPF.LDH_ABS, offset, None, None),
+        (BPF.JEQ, 0x0800, ipv4, None),
+        (BPF.JEQ, 0x86dd, ipv6, reject),
+        ipv4,
+        (BPF.LDB_ABS, offset + 11, None, None),
+        (BPF.JEQ, 17, None, reject),
+        # Only the first fragment holds the UDP header.
+        (BPF.LDH_ABS, offset + 8, None, None),
+        (BPF.JSET, 0x1fff, reject, None),
+        (BPF.LDXB_MSH, offset + 2, None, None),
+        (BPF.LDH_IND, offset + 4, None, None),
+        (BPF.JEQ, port, accept, reject),
+        ipv6,
+        (BPF.LDB_ABS, offset + 8, None, None),
+        (BPF.JEQ, 17, None, reject),
+        (BPF.LDH_ABS, offset + 44, None, None),
+        (BPF.JEQ, port, accept, reject),
+    ]
+
+
+def make_udp_port_filter(port, snaplen):
+    """Return a BPF program equivalent to ``(udp dst port <port>) or
+    (vlan and udp dst port <port>)``."""
+    return assemble_bpf([
+        (BPF.LDH_ABS, 12, None, None),
+        (BPF.JEQ, 0x8100, 'vlan', None),
+        *_udp_port_filter(port, 12, 'accept', 'reject'),
+        'vlan',
+        *_udp_port_filter(port, 16, 'accept', 'reject'),
+        'accept',
+        (BPF.RET, snaplen, None, None),
+        'reject',
+        (BPF.RET, 0, None, None),
+    ])
+
+
+def attach_filter(sock, program):
+    """Attach the assembled BPF `program` to `sock`."""
+    buffer = ctypes.create_string_buffer(program, len(program))
+    fprog = struct.pack('HL', len(program) // 8, ctypes.addressof(buffer))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+def restore_vlan_tag(frame, ancdata):
+    """Put the 802.1q tag stripped by the NIC back into `frame`.
+
+    This is what libpcap does, so that frames are the same as those seen by
+    `tcpdump` on the interface.
+    """
+    for level, kind, data in ancdata:
+        if level == SOL_PACKET and kind == PACKET_AUXDATA:
+            status, _, _, _, _, tci, tpid = struct.unpack_from(
+                TPACKET_AUXDATA, data)
+            if tci != 0 or status & TP_STATUS_VLAN_VALID:
+                if not status & TP_STATUS_VLAN_TPID_VALID:
+                    tpid = 0x8100
+                return frame[:12] + struct.pack('!HH', tpid, tci) + frame[12:]
+    return frame
+
+
+@implementer(IReadDescriptor)
+class PacketCapture:
+    """Captures packets on one interface with an AF_PACKET socket.
+
+    The packets waiting on the socket are read in batches, and each packet
+    is decoded by `processPacket`. `callback` is then called once with a list
+    of everything decoded from the batch.
+
+    Subclasses MUST define `program` and `processPacket`.
+    """
+
+    # The assembled BPF program selecting the packets to capture.
+    program = None
+
+    # The number of bytes of each packet to capture.
+    snaplen = 65535
+
+    # Ignore packets sent from this host.
+    incoming_only = False
+
+    # The most packets to read before returning to the reactor.
+    batch_size = 256
+
+    # The size of the socket's receive buffer.
+    rcvbuf = 1024 * 1024
+
+    def __init__(self, ifname, callback):
+        self.ifname = ifname
+        self.callback = callback
+        self.socket = None
+
+    @property
+    def listening(self):
+        """True while the packet socket is open."""
+        return self.socket is not None
+
+    def startListening(self):
+        """Open the packet socket and start capturing.
+
+        :raises OSError: if the socket cannot be opened, e.g. when this
+            process does not have the ``CAP_NET_RAW`` capability.
+        """
+        if self.socket is not None:
+            return
+        # Open the socket without a protocol, so that it receives nothing
+        # until the filter is in place and it is bound.
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            attach_filter(sock, self.program)
+            sock.setsockopt(SOL_PACKET, PACKET_AUXDATA, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            sock.bind((self.ifname, ETH_P_ALL))
+            sock.setblocking(False)
+        except Exception:
+            sock.close()
+            raise
+        self.socket = sock
+        reactor.addReader(self)
+
+    def stopListening(self):
+        """Stop capturing and close the packet socket."""
+        if self.socket is not None:
+            reactor.removeReader(self)
+            self.socket.close()
+            self.socket = None
+
+    def fileno(self):
+        """Return the fileno of the packet socket."""
+        return -1 if self.socket is None else self.socket.fileno()
+
+    def logPrefix(self):
+        """Return nice name for twisted logging.
+
+        This is required to satisfy `IReadDescriptor`, which inherits from
+        `ILoggingContext`.
+        """
+        return "capture[%s]" % self.ifname
+
+    def connectionLost(self, reason):
+        """The reactor has stopped watching the packet socket."""
+        self.stopListening()
+
+    def doRead(self):
+        """Read and decode a batch of the packets waiting on the socket."""
+        now = int(time.time())
+        objects = []
+        for _ in range(self.batch_size):
+            if self.socket is None:
+                break
+            try:
+                frame, ancdata, _, address = self.socket.recvmsg(
+                    self.snaplen, AUXDATA_SPACE)
+            except OSError as error:
+                # Nothing more is waiting, or the read was interrupted. Other
+                # errors, such as ENETDOWN while the interface is bouncing,
+                # are reported once and the socket carries on capturing;
+                # letting them escape would make the reactor drop it.
+                if error.errno not in (errno.EAGAIN, errno.EINTR):
+                    log.msg("%s: error reading packets: %s" % (
+                        self.logPrefix(), error))
+                break
+            if self.incoming_only and address[2] == PACKET_OUTGOING:
+                continue
+            frame = restore_vlan_tag(frame, ancdata)
+            objects.extend(self.processPacket(frame, now))
+        if len(objects) != 0:
+            self.callback(objects)
+
+    def processPacket(self, frame, time):
+        """Decode the captured Ethernet `frame`.
+
+        This MUST be overridden in subclasses.
+
+        :param time: Timestamp the frame was seen (seconds since epoch).
+        :return: A list of objects to pass to the callback.
+        """
+        raise NotImplementedError()
+
+
+class ARPCapture(PacketCapture):
+    """Captures ARP packets, reporting new, refreshed and moved bindings.
+
+    The bindings are reported in the same form as ``maas-rack observe-arp``
+    reports them, with the interface name added.
+    """
+
+    snaplen = 64
+    program = make_arp_filter(snaplen)
+
+    def __init__(self, ifname, callback):
+        super().__init__(ifname, callback)
+        self.bindings = {}
+
+    def processPacket(self, frame, time):
+        arp = decode_arp_packet(frame, time=time)
+        if arp is None:
+            return []
+        events = list(get_binding_events(self.bindings, arp))
+        for event in events:
+            event['interface'] = self.ifname
+        return events
+
+
+class BeaconCapture(PacketCapture):
+    """Captures beacons received by this host.
+
+    The beacons are reported in the same form as ``maas-rack observe-beacons``
+    reports them, with the interface name added.
+    """
+
+    snaplen = 16384
+    program = make_udp_port_filter(BEACON_PORT, snaplen)
+    incoming_only = True
+
+    def processPacket(self, frame, time):
+        header = PCAPPacketHeader(time, 0, len(frame), len(frame))
+        try:
+            beacon = decode_beacon_packet(frame, header)
+        except PacketProcessingError as e:
+            log.msg("capture-beacons[%s]:" % self.ifname, e.error)
+            return []
+        if beacon is None:
+            return []
+        beacon['interface'] = self.ifname
+        return [beacon]
@@ -0,0 +1,245 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Utilities for watching network configuration changes with rtnetlink.
+
+The kernel multicasts a message over a netlink socket whenever a link, an
+address or a route changes. `NetlinkListener` subscribes to these messages,
+so that changes to the network configuration are noticed as soon as they
+happen without having to periodically run (and parse the output of) ``ip
+addr`` and ``ip route``. The messages only say that something changed; the
+configuration must still be read again to find out what it now is.
+"""
+
+__all__ = [
+    "NetlinkListener",
+    "parse_netlink_messages",
+]
+
+from collections import namedtuple
+import errno
+import socket
+import struct
+
+from provisioningserver.logger import LegacyLogger
+from twisted.internet import reactor
+from twisted.internet.interfaces import IReadDescriptor
+from zope.interface import implementer
+
+
+log = LegacyLogger()
+
+# Protocol number for rtnetlink sockets. See netlink(7).
+NETLINK_ROUTE = 0
+
+
+class RTM:
+    """Enumeration of rtnetlink message types. See rtnetlink(7)."""
+    NEWLINK = 16
+    DELLINK = 17
+    NEWADDR = 20
+    DELADDR = 21
+    NEWROUTE = 24
+    DELROUTE = 25
+
+
+class RTMGRP:
+    """Enumeration of rtnetlink multicast groups."""
+    LINK = 0x01
+    IPV4_IFADDR = 0x10
+    IPV4_ROUTE = 0x40
+    IPV6_IFADDR = 0x100
+    IPV6_ROUTE = 0x400
+
+
+class RTA:
+    """Enumeration of route attributes."""
+    DST = 1
+    OIF = 4
+    GATEWAY = 5
+    TABLE = 15
+
+
+# The main routing table; routes in the local and other tables are
+# maintained by the kernel and are of no interest to MAAS.
+RT_TABLE_MAIN = 254
+
+# Route flag set on routes that are clones held in the routing cache.
+RTM_F_CLONED = 0x200
+
+# Definitions for netlink structures used with `struct`. See netlink(7) and
+# rtnetlink(7) for more details.
+NLMSGHDR = '=LHHLL'
+NLMSGHDR_LENGTH = struct.calcsize(NLMSGHDR)
+RTATTR = '=HH'
+RTATTR_LENGTH = struct.calcsize(RTATTR)
+RTMSG = '=BBBBBBBBI'
+RTMSG_LENGTH = struct.calcsize(RTMSG)
+
+NetlinkMessage = namedtuple("NetlinkMessage", (
+    "type",
+    "flags",
+    "seq",
+    "pid",
+    "payload",
+))
+
+
+class NetlinkError(Exception):
+    """Raised when a netlink message cannot be interpreted."""
+
+
+def align(length):
+    """Round `length` up to the 4-byte alignment used by netlink."""
+    return (length + 3) & ~3
+
+
+def parse_netlink_messages(data: bytes):
+    """Split the datagram `data` into `NetlinkMessage`s."""
+    messages = []
+    offset = 0
+    while offset + NLMSGHDR_LENGTH <= len(data):
+        length, type, flags, seq, pid = struct.unpack_from(
+            NLMSGHDR, data, offset)
+        if length < NLMSGHDR_LENGTH or offset + length > len(data):
+            raise NetlinkError(
+                "Truncated netlink message; expected %d bytes, got %d." % (
+                    length, len(data) - offset))
+        payload = data[offset + NLMSGHDR_LENGTH:offset + length]
+        messages.append(NetlinkMessage(type, flags, seq, pid, payload))
+        offset += align(length)
+    return messages
+
+
+def parse_attributes(data: bytes):
+    """Return a dict mapping the type of each attribute in `data` to its value.
+    """
+    attributes = {}
+    offset = 0
+    while offset + RTATTR_LENGTH <= len(data):
+        length, type = struct.unpack_from(RTATTR, data, offset)
+        if length < RTATTR_LENGTH:
+            break
+        attributes[type] = data[offset + RTATTR_LENGTH:offset + length]
+        offset += align(length)
+    return attributes
+
+
+def is_main_route(payload: bytes) -> bool:
+    """Return True if a route message's `payload` is for the main table.
+
+    :param payload: The payload of an RTM_NEWROUTE or RTM_DELROUTE message.
+    """
+    if len(payload) < RTMSG_LENGTH:
+        raise NetlinkError("Truncated route message.")
+    _, _, _, _, table, _, _, _, flags = struct.unpack_from(RTMSG, payload)
+    attributes = parse_attributes(payload[RTMSG_LENGTH:])
+    if RTA.TABLE in attributes:
+        table = struct.unpack('=I', attributes[RTA.TABLE][:4])[0]
+    return table == RT_TABLE_MAIN and not flags & RTM_F_CLONED
+
+
+def is_change(message: NetlinkMessage) -> bool:
+    """Return True if `message` reports a change that matters to MAAS.
+
+    Every change to a link or an address matters. Changes to routes only
+    matter when they are to the main routing table.
+    """
+    if message.type in (RTM.NEWLINK, RTM.DELLINK, RTM.NEWADDR, RTM.DELADDR):
+        return True
+    elif message.type in (RTM.NEWROUTE, RTM.DELROUTE):
+        return is_main_route(message.payload)
+    else:
+        return False
+
+
+@implementer(IReadDescriptor)
+class NetlinkListener:
+    """Listens for rtnetlink messages about network configuration changes.
+
+    `callback` is called, with no arguments, after reading messages from the
+    kernel when at least one of them reports a change.
+    """
+
+    groups = (
+        RTMGRP.LINK |
+        RTMGRP.IPV4_IFADDR | RTMGRP.IPV6_IFADDR |
+        RTMGRP.IPV4_ROUTE | RTMGRP.IPV6_ROUTE
+    )
+
+    # The size of the socket's receive buffer. Creating or removing many
+    # interfaces at once can produce a lot of messages.
+    rcvbuf = 1024 * 1024
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.socket = None
+
+    @property
+    def listening(self):
+        """True while the netlink socket is open."""
+        return self.socket is not None
+
+    def startListening(self):
+        """Open the netlink socket and start watching for changes.
+
+        :raises OSError: if a netlink socket cannot be opened, e.g. when not
+            running on Linux.
+        """
+        sock = socket.socket(
+            socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            sock.bind((0, self.groups))
+            sock.setblocking(False)
+        except Exception:
+            sock.close()
+            raise
+        self.socket = sock
+        reactor.addReader(self)
+
+    def stopListening(self):
+        """Stop watching for changes and close the netlink socket."""
+        if self.socket is not None:
+            reactor.removeReader(self)
+            self.socket.close()
+            self.socket = None
+
+    def fileno(self):
+        """Return the fileno of the netlink socket."""
+        return -1 if self.socket is None else self.socket.fileno()
+
+    def logPrefix(self):
+        """Return nice name for twisted logging.
+
+        This is required to satisfy `IReadDescriptor`, which inherits from
+        `ILoggingContext`.
+        """
+        return "netlink"
+
+    def connectionLost(self, reason):
+        """The reactor has stopped watching the netlink socket."""
+        self.stopListening()
+
+    def doRead(self):
+        """Read every message waiting on the netlink socket."""
+        changed = False
+        while self.socket is not None:
+            try:
+                data = self.socket.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as error:
+                if error.errno != errno.ENOBUFS:
+                    raise
+                # The kernel dropped messages because the receive buffer
+                # filled up, so assume that one of them was a change.
+                log.msg("Netlink receive buffer overrun.")
+                changed = True
+                continue
+            if len(data) == 0:
+                break
+            messages = parse_netlink_messages(data)
+            changed |= any(is_change(message) for message in messages)
+        if changed:
+            self.callback()
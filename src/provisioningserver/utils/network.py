@@ -19,8 +19,10 @@ __all__ = [
     'ip_range_within_network',
 ]
 
+from bisect import bisect_right
 import codecs
 from collections import namedtuple
+import heapq
 from operator import attrgetter
 import random
 import re
@@ -405,12 +407,30 @@ class IPRangeStatistics:
 
 
 class MAASIPSet(set):
+    """A set of `MAASIPRange` objects.
+
+    The ranges are kept sorted and condensed in the `ranges` ivar, so they
+    never overlap. The first address of each range is also kept as an integer
+    in a parallel list, so that finding the range holding an address is a
+    bisection rather than a scan.
+    """
 
     def __init__(self, ranges, cidr=None):
+        super().__init__()
         self.cidr = cidr
         self.ranges = ranges
         self._condense()
-        super().__init__(set(self.ranges))
+
+    @classmethod
+    def from_sorted(cls, ranges, cidr=None) -> 'MAASIPSet':
+        """Return a `MAASIPSet` of `ranges`, which must be `MAASIPRange`
+        objects in sorted order.
+
+        This does not sort the ranges again, so it takes linear time.
+        """
+        ipset = cls([], cidr=cidr)
+        ipset._set_sorted_ranges(ranges)
+        return ipset
 
     def _condense(self):
         """Condenses the `ranges` ivar in this `MAASIPSet` by:
@@ -419,19 +439,45 @@ class MAASIPSet(set):
         (2) De-duplicate set by combining overlapping IP ranges.
         (3) Combining adjacent ranges with an identical purpose.
         """
-        self.ranges = _normalize_ipranges(self.ranges)
-        self.ranges = _combine_overlapping_maasipranges(self.ranges)
-        self.ranges = _coalesce_adjacent_purposes(self.ranges)
+        self._set_sorted_ranges(_normalize_ipranges(self.ranges))
+
+    def _set_sorted_ranges(self, ranges):
+        """Condense the sorted `ranges` and make them the contents of this
+        set, updating the index of first addresses."""
+        ranges = _combine_overlapping_maasipranges(ranges)
+        self.ranges = _coalesce_adjacent_purposes(ranges)
+        self._firsts = [item.first for item in self.ranges]
+        # Ranges sort by IP version before address, so a set with both IPv4
+        # and IPv6 ranges may not have its first addresses in order.
+        self._bisectable = all(
+            first <= next_first
+            for first, next_first in zip(self._firsts, self._firsts[1:]))
+        # Replace the underlying set with the new ranges.
+        super().clear()
+        super().update(self.ranges)
 
     def __ior__(self, other):
         """Return self |= other."""
-        self.ranges.extend(list(other.ranges))
-        self._condense()
-        # Replace the underlying set with the new ranges.
-        super().clear()
-        super().__ior__(set(self.ranges))
+        # Both lists of ranges are already sorted, so merge them.
+        self._set_sorted_ranges(heapq.merge(self.ranges, other.ranges))
         return self
 
+    def _find_value(self, first, last) -> Optional[MAASIPRange]:
+        """Return the range holding all addresses from `first` to `last`
+        (integers), or None."""
+        if self._bisectable:
+            index = bisect_right(self._firsts, first) - 1
+            if index >= 0:
+                item = self.ranges[index]
+                if first <= item.last and last <= item.last:
+                    return item
+            return None
+        for item in self.ranges:
+            if (item.first <= first <= item.last and
+                    item.first <= last <= item.last):
+                return item
+        return None
+
     def find(self, search) -> Optional[MAASIPRange]:
         """Searches the list of IPRange objects until it finds the specified
         search parameter, and returns the range it belongs to if found.
@@ -440,17 +486,10 @@ class MAASIPSet(set):
         within that range.)
         """
         if isinstance(search, IPRange):
-            for item in self.ranges:
-                if (item.first <= search.first <= item.last and
-                        item.first <= search.last <= item.last):
-                    return item
+            return self._find_value(search.first, search.last)
         else:
-            addr = IPAddress(search)
-            addr = int(addr)
-            for item in self.ranges:
-                if item.first <= addr <= item.last:
-                    return item
-        return None
+            addr = int(IPAddress(search))
+            return self._find_value(addr, addr)
 
     @property
     def first(self) -> Optional[MAASIPRange]:
@@ -578,8 +617,9 @@ class MAASIPSet(set):
             # candidate range, and the address just before the next used
             # range.
             if candidate_end - candidate_start >= 0:
-                unused_ranges.append(
-                    make_iprange(candidate_start, candidate_end, purpose))
+                unused_ranges.append(MAASIPRange(
+                    IPAddress(candidate_start), IPAddress(candidate_end),
+                    purpose=purpose))
             candidate_start = used_range.last + 1
         # Skip the broadcast address, if this is an IPv4 network
         if type(outer_range) == IPNetwork:
@@ -593,13 +633,16 @@ class MAASIPSet(set):
         # Check if there is a gap between the last used range and the end
         # of the range we're checking against.
         if candidate_end - candidate_start >= 0:
-            unused_ranges.append(
-                make_iprange(candidate_start, candidate_end, purpose))
-        return MAASIPSet(unused_ranges)
+            unused_ranges.append(MAASIPRange(
+                IPAddress(candidate_start), IPAddress(candidate_end),
+                purpose=purpose))
+        # The gaps between the ranges are found in order.
+        return MAASIPSet.from_sorted(unused_ranges)
 
     def get_full_range(self, outer_range):
         unused_ranges = self.get_unused_ranges(outer_range)
-        full_range = MAASIPSet(self | unused_ranges, cidr=outer_range)
+        full_range = MAASIPSet.from_sorted(
+            heapq.merge(self.ranges, unused_ranges.ranges), cidr=outer_range)
         # The full_range should always contain at least one IP address.
         # However, in bug #1570606 we observed a situation where there were
         # no resulting ranges. This assert is just in case the fix didn't cover
@@ -39,10 +39,15 @@ from provisioningserver.utils.beaconing import (
     ReceivedBeacon,
     TopologyHint,
 )
+from provisioningserver.utils.capture import (
+    ARPCapture,
+    BeaconCapture,
+)
 from provisioningserver.utils.fs import (
     get_maas_common_command,
     NamedLock,
 )
+from provisioningserver.utils.netlink import NetlinkListener
 from provisioningserver.utils.network import (
     enumerate_ipv4_addresses,
     get_all_interfaces_definition,
@@ -55,7 +60,11 @@ from provisioningserver.utils.twisted import (
     terminateProcess,
 )
 from twisted.application.internet import TimerService
-from twisted.application.service import MultiService
+from twisted.application.service import (
+    MultiService,
+    Service,
+)
+from twisted.internet import reactor
 from twisted.internet.defer import (
     Deferred,
     inlineCallbacks,
@@ -331,6 +340,30 @@ class BeaconingService(ProcessProtocolService):
             self.ifname, callback=self.callback)
 
 
+class PacketCaptureService(Service):
+    """Service to capture packets on an interface within this process.
+
+    This is used in place of `NeighbourDiscoveryService` and
+    `BeaconingService` when this process is able to capture packets itself.
+
+    :param capture: A `PacketCapture` instance.
+    """
+
+    def __init__(self, capture):
+        super().__init__()
+        self.capture = capture
+
+    def startService(self):
+        """Starts capturing packets."""
+        self.capture.startListening()
+        return super().startService()
+
+    def stopService(self):
+        """Stops capturing packets."""
+        self.capture.stopListening()
+        return super().stopService()
+
+
 class MDNSResolverService(ProcessProtocolService):
     """Service to spawn the per-interface device discovery subprocess."""
 
@@ -953,13 +986,32 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
     Parse ``/etc/network/interfaces`` and the output from ``ip addr show`` to
     update MAAS's records of network interfaces on this host.
 
+    When netlink is available it is used to watch for changes, so that an
+    update happens shortly after the network configuration changes, and the
+    interfaces need not be parsed again on every interval when it has not.
+
+    ARP and beacon packets are captured within this process when it is able
+    to open packet sockets. Otherwise a capture process is spawned for each
+    monitored interface.
+
     :param clock: An `IReactor` instance.
     """
 
     interval = timedelta(seconds=30).total_seconds()
 
+    # Seconds to wait after netlink reports a change before updating the
+    # interfaces. Changes often come in bursts, e.g. when many VLANs are
+    # created at once, and these are coalesced into one update.
+    netlink_delay = 2.0
+
+    # While netlink reports no changes the interfaces are still parsed once
+    # every this many intervals, to pick up changes that netlink cannot see,
+    # such as an address now being configured by DHCP.
+    full_refresh_intervals = 10
+
     def __init__(
-            self, clock=None, enable_monitoring=True, enable_beaconing=True):
+            self, clock=None, enable_monitoring=True, enable_beaconing=True,
+            enable_netlink=True, enable_capture=True):
         # Order is very important here. First we set the clock to the passed-in
         # reactor, so that unit tests can fake out the clock if necessary.
         # Then we call super(). The superclass will set up the structures
@@ -971,8 +1023,17 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         super().__init__()
         self.enable_monitoring = enable_monitoring
         self.enable_beaconing = enable_beaconing
+        self.enable_netlink = enable_netlink
+        self.enable_capture = enable_capture
         # The last successfully recorded interfaces.
         self._recorded = None
+        # Whether the interfaces may have changed since they were recorded,
+        # and how many updates have reused the recorded interfaces since.
+        self._interfaces_changed = True
+        self._skipped_refreshes = 0
+        self._updating = False
+        self._netlink_update = None
+        self.netlink = None
         self._monitored = frozenset()
         self._beaconing = frozenset()
         self._monitoring_state = {}
@@ -998,18 +1059,91 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         This can be overridden by subclasses to conditionally update based on
         some external configuration.
         """
+        if self._updating:
+            # Another update is in progress. Changes that it misses will be
+            # picked up by the next one.
+            return
         responsible = self._assumeSoleResponsibility()
         if responsible:
             interfaces = None
+            self._updating = True
             try:
-                interfaces = yield maybeDeferred(self.getInterfaces)
+                if self._shouldGetInterfaces():
+                    self._interfaces_changed = False
+                    self._skipped_refreshes = 0
+                    interfaces = yield maybeDeferred(self.getInterfaces)
+                else:
+                    self._skipped_refreshes += 1
+                    interfaces = self._recorded
                 yield self._updateInterfaces(interfaces)
             except BaseException as e:
+                # Make sure the interfaces are fetched again next time.
+                self._interfaces_changed = True
                 msg = (
                     "Failed to update and/or record network interface "
                     "configuration: %s; interfaces: %r" % (e, interfaces)
                 )
                 log.err(None, msg)
+            finally:
+                self._updating = False
+
+    def _shouldGetInterfaces(self):
+        """Return True if the interfaces must be fetched with `getInterfaces`.
+
+        Without netlink the interfaces are fetched on every update. With
+        netlink they are only fetched when it has reported a change, or when
+        `full_refresh_intervals` updates have passed without one.
+        """
+        return (
+            self.netlink is None or
+            not self.netlink.listening or
+            self._recorded is None or
+            self._interfaces_changed or
+            self._skipped_refreshes >= self.full_refresh_intervals - 1
+        )
+
+    def _netlinkChanged(self):
+        """Netlink reported a change to the network configuration."""
+        self._interfaces_changed = True
+        if self._netlink_update is None:
+            clock = reactor if self.clock is None else self.clock
+            self._netlink_update = clock.callLater(
+                self.netlink_delay, self._updateInterfacesAfterChange)
+
+    def _updateInterfacesAfterChange(self):
+        self._netlink_update = None
+        if self._updating:
+            # Wait for the update in progress to finish first.
+            self._netlinkChanged()
+        else:
+            return self.updateInterfaces()
+
+    def _startNetlink(self):
+        """Start watching for network configuration changes with netlink.
+
+        If netlink is unavailable the interfaces are fetched on every
+        update instead.
+        """
+        netlink = NetlinkListener(self._netlinkChanged)
+        try:
+            netlink.startListening()
+        except OSError as error:
+            maaslog.warning(
+                "Unable to watch for network changes with netlink: %s; "
+                "checking for changes every %d seconds instead." % (
+                    error, self.interval))
+        else:
+            self.netlink = netlink
+
+    def _stopNetlink(self):
+        """Stop watching for network configuration changes."""
+        if self._netlink_update is not None:
+            if self._netlink_update.active():
+                self._netlink_update.cancel()
+            self._netlink_update = None
+        if self.netlink is not None:
+            self.netlink.stopListening()
+            self.netlink = None
 
     def getInterfaces(self):
         """Get the current network interfaces configuration.
@@ -1051,11 +1185,21 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         for beacon in beacons:
             self.beaconing_protocol.beaconReceived(beacon)
 
+    def startService(self):
+        """Start the service.
+
+        Netlink starts watching for changes before the first update.
+        """
+        if self.enable_netlink:
+            self._startNetlink()
+        return super().startService()
+
     def stopService(self):
         """Stop the service.
 
         Ensures that sole responsibility for monitoring networks is released.
         """
+        self._stopNetlink()
         d = super().stopService()
         if self.beaconing_protocol is not None:
             self.beaconing_protocol.stopProtocol()
@@ -1164,17 +1308,48 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         }
         return monitored_interfaces
 
+    def _startPacketCapture(self, capture):
+        """Start capturing packets with `capture` within this process.
+
+        :return: A `PacketCaptureService`, or None if packets cannot be
+            captured by this process. When this is because the process lacks
+            the privileges to do so, in-process capture is disabled.
+        """
+        if not self.enable_capture:
+            return None
+        try:
+            capture.startListening()
+        except PermissionError as error:
+            maaslog.info(
+                "Unable to capture packets within this process: %s; "
+                "spawning a capture process for each interface instead." % (
+                    error))
+            self.enable_capture = False
+            return None
+        except OSError as error:
+            maaslog.warning(
+                "Unable to capture packets on %s: %s" % (
+                    capture.ifname, error))
+            return None
+        return PacketCaptureService(capture)
+
     def _startNeighbourDiscovery(self, ifname):
         """"Start neighbour discovery service on the specified interface."""
-        service = NeighbourDiscoveryService(ifname, self.reportNeighbours)
-        service.clock = self.clock
+        service = self._startPacketCapture(
+            ARPCapture(ifname, self.reportNeighbours))
+        if service is None:
+            service = NeighbourDiscoveryService(ifname, self.reportNeighbours)
+            service.clock = self.clock
         service.setName("neighbour_discovery:" + ifname)
         service.setServiceParent(self)
 
     def _startBeaconing(self, ifname):
         """"Start neighbour discovery service on the specified interface."""
-        service = BeaconingService(ifname, self.reportBeacons)
-        service.clock = self.clock
+        service = self._startPacketCapture(
+            BeaconCapture(ifname, self.reportBeacons))
+        if service is None:
+            service = BeaconingService(ifname, self.reportBeacons)
+            service.clock = self.clock
         service.setName("beaconing:" + ifname)
         service.setServiceParent(self)
 
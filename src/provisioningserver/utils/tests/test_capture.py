@@ -0,0 +1,261 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for ``provisioningserver.utils.capture``."""
+
+__all__ = []
+
+import errno
+import socket
+from unittest.mock import Mock
+import struct
+
+from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
+from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.utils.beaconing import (
+    BEACON_PORT,
+    create_beacon_payload,
+)
+from provisioningserver.utils.capture import (
+    ARPCapture,
+    assemble_bpf,
+    attach_filter,
+    BeaconCapture,
+    BPF,
+    make_arp_filter,
+    make_udp_port_filter,
+    PACKET_AUXDATA,
+    restore_vlan_tag,
+    SOL_PACKET,
+    TP_STATUS_VLAN_VALID,
+    TPACKET_AUXDATA,
+)
+from provisioningserver.utils.ethernet import ETHERTYPE
+from provisioningserver.utils.tests.test_arp import make_arp_packet
+from provisioningserver.utils.tests.test_ethernet import make_ethernet_packet
+from provisioningserver.utils.tests.test_tcpip import (
+    make_ipv4_packet,
+    make_ipv6_packet,
+)
+from testtools.matchers import (
+    Equals,
+    HasLength,
+    Is,
+    Not,
+)
+
+
+def make_udp_frame(port, payload=b'', vid=None, version=4):
+    udp = struct.pack('!HHHH', port, port, 8 + len(payload), 0) + payload
+    if version == 4:
+        ip, ethertype = make_ipv4_packet(payload=udp), ETHERTYPE.IPV4
+    else:
+        ip, ethertype = make_ipv6_packet(payload=udp), ETHERTYPE.IPV6
+    return make_ethernet_packet(ethertype=ethertype, vid=vid, payload=ip)
+
+
+def make_arp_frame(ip='192.168.0.1', mac='01:02:03:04:05:06', vid=None):
+    arp = make_arp_packet(ip, mac, '192.168.0.2')
+    return make_ethernet_packet(src_mac=mac, vid=vid, payload=arp)
+
+
+class TestAssembleBPF(MAASTestCase):
+
+    def test__resolves_jumps_to_labels(self):
+        program = assemble_bpf([
+            (BPF.LDH_ABS, 12, None, None),
+            (BPF.JEQ, 0x0806, 'accept', 'reject'),
+            'accept',
+            (BPF.RET, 64, None, None),
+            'reject',
+            (BPF.RET, 0, None, None),
+        ])
+        self.assertThat(
+            [struct.unpack_from('=HBBI', program, offset)
+             for offset in range(0, len(program), 8)],
+            Equals([
+                (BPF.LDH_ABS, 0, 0, 12),
+                (BPF.JEQ, 0, 1, 0x0806),
+                (BPF.RET, 0, 0, 64),
+                (BPF.RET, 0, 0, 0),
+            ]))
+
+
+class FilterTestCase(MAASTestCase):
+    """Runs BPF programs in the kernel, with a pair of datagram sockets."""
+
+    def filter(self, program, frames):
+        sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.addCleanup(sender.close)
+        self.addCleanup(receiver.close)
+        attach_filter(receiver, program)
+        receiver.setblocking(False)
+        for frame in frames:
+            sender.send(frame)
+        received = []
+        while True:
+            try:
+                received.append(receiver.recv(65536))
+            except BlockingIOError:
+                return received
+
+
+class TestARPFilter(FilterTestCase):
+
+    def test__accepts_arp(self):
+        frame = make_arp_frame()
+        self.assertThat(
+            self.filter(make_arp_filter(64), [frame]), Equals([frame[:64]]))
+
+    def test__accepts_arp_on_vlan(self):
+        frame = make_arp_frame(vid=42)
+        self.assertThat(
+            self.filter(make_arp_filter(64), [frame]), Equals([frame[:64]]))
+
+    def test__rejects_other_packets(self):
+        frames = [
+            make_udp_frame(BEACON_PORT),
+            make_udp_frame(BEACON_PORT, vid=42),
+            make_ethernet_packet(ethertype=ETHERTYPE.VLAN),
+        ]
+        self.assertThat(self.filter(make_arp_filter(64), frames), Equals([]))
+
+
+class TestUDPPortFilter(FilterTestCase):
+
+    def test__accepts_udp_to_port(self):
+        frames = [
+            make_udp_frame(BEACON_PORT, version=4),
+            make_udp_frame(BEACON_PORT, version=6),
+            make_udp_frame(BEACON_PORT, version=4, vid=42),
+            make_udp_frame(BEACON_PORT, version=6, vid=42),
+        ]
+        program = make_udp_port_filter(BEACON_PORT, 16384)
+        self.assertThat(self.filter(program, frames), Equals(frames))
+
+    def test__rejects_other_packets(self):
+        frames = [
+            make_udp_frame(BEACON_PORT + 1, version=4),
+            make_udp_frame(BEACON_PORT + 1, version=6, vid=42),
+            make_arp_frame(),
+            make_arp_frame(vid=42),
+        ]
+        program = make_udp_port_filter(BEACON_PORT, 16384)
+        self.assertThat(self.filter(program, frames), Equals([]))
+
+    def test__truncates_to_snaplen(self):
+        frame = make_udp_frame(BEACON_PORT, payload=b'x' * 200)
+        program = make_udp_port_filter(BEACON_PORT, 100)
+        self.assertThat(self.filter(program, [frame]), Equals([frame[:100]]))
+
+
+class TestRestoreVLANTag(MAASTestCase):
+
+    def make_auxdata(self, status=0, tci=0, tpid=0):
+        auxdata = struct.pack(TPACKET_AUXDATA, status, 0, 0, 0, 0, tci, tpid)
+        return [(SOL_PACKET, PACKET_AUXDATA, auxdata)]
+
+    def test__restores_stripped_tag(self):
+        ancdata = self.make_auxdata(status=TP_STATUS_VLAN_VALID, tci=42)
+        self.assertThat(
+            restore_vlan_tag(make_arp_frame(), ancdata),
+            Equals(make_arp_frame(vid=42)))
+
+    def test__leaves_untagged_frames(self):
+        frame = make_arp_frame()
+        self.assertThat(
+            restore_vlan_tag(frame, self.make_auxdata()), Equals(frame))
+        self.assertThat(restore_vlan_tag(frame, []), Equals(frame))
+
+
+class TestARPCapture(MAASTestCase):
+
+    def test__reports_new_bindings(self):
+        capture = ARPCapture('eth0', None)
+        [event] = capture.processPacket(
+            make_arp_frame('192.168.0.1', '01:02:03:04:05:06', vid=42), 1000)
+        self.assertThat(event, Equals({
+            'interface': 'eth0',
+            'ip': '192.168.0.1',
+            'mac': '01:02:03:04:05:06',
+            'time': 1000,
+            'event': 'NEW',
+            'vid': 42,
+        }))
+
+    def test__reports_each_binding_once(self):
+        capture = ARPCapture('eth0', None)
+        frame = make_arp_frame()
+        self.assertThat(capture.processPacket(frame, 1000), HasLength(1))
+        self.assertThat(capture.processPacket(frame, 1001), HasLength(0))
+
+    def test__ignores_other_packets(self):
+        capture = ARPCapture('eth0', None)
+        self.assertThat(
+            capture.processPacket(make_udp_frame(BEACON_PORT), 1000),
+            Equals([]))
+
+    def test__doRead_reports_batch(self):
+        callback = []
+        capture = ARPCapture('eth0', callback.append)
+        sender, capture.socket = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.addCleanup(sender.close)
+        self.addCleanup(capture.socket.close)
+        capture.socket.setblocking(False)
+        for _ in range(3):
+            sender.send(make_arp_frame(ip=factory.make_ipv4_address()))
+        capture.doRead()
+        [events] = callback
+        self.assertThat(events, HasLength(3))
+
+    def test__doRead_logs_and_survives_read_errors(self):
+        callback = []
+        capture = ARPCapture('eth0', callback.append)
+        capture.socket = Mock()
+        capture.socket.recvmsg.side_effect = [
+            (make_arp_frame(), [], 0, None),
+            OSError(errno.ENETDOWN, "Network is down"),
+        ]
+        with TwistedLoggerFixture() as logger:
+            capture.doRead()
+        [events] = callback
+        self.assertThat(events, HasLength(1))
+        self.assertThat(capture.socket.recvmsg.mock_calls, HasLength(2))
+        self.assertThat(capture.socket, Not(Is(None)))
+        self.assertIn(
+            "capture[eth0]: error reading packets: "
+            "[Errno %d] Network is down" % errno.ENETDOWN, logger.output)
+
+    def test__doRead_stops_quietly_when_interrupted(self):
+        capture = ARPCapture('eth0', None)
+        capture.socket = Mock()
+        capture.socket.recvmsg.side_effect = InterruptedError(
+            errno.EINTR, "Interrupted system call")
+        with TwistedLoggerFixture() as logger:
+            capture.doRead()
+        self.assertEqual("", logger.output)
+
+
+class TestBeaconCapture(MAASTestCase):
+
+    def test__reports_beacons(self):
+        capture = BeaconCapture('eth0', None)
+        beacon = create_beacon_payload('solicitation')
+        frame = make_udp_frame(BEACON_PORT, payload=beacon.bytes, vid=42)
+        [observed] = capture.processPacket(frame, 1000)
+        self.assertThat(observed['interface'], Equals('eth0'))
+        self.assertThat(observed['type'], Equals('solicitation'))
+        self.assertThat(observed['vid'], Equals(42))
+        self.assertThat(observed['time'], Equals(1000))
+
+    def test__ignores_invalid_beacons(self):
+        capture = BeaconCapture('eth0', None)
+        frame = make_udp_frame(BEACON_PORT, payload=b'not a beacon')
+        self.assertThat(capture.processPacket(frame, 1000), Equals([]))
+
+    def test__ignores_invalid_packets(self):
+        capture = BeaconCapture('eth0', None)
+        self.assertThat(
+            capture.processPacket(make_arp_frame(), 1000), Equals([]))
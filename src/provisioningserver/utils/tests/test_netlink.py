@@ -0,0 +1,217 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for ``provisioningserver.utils.netlink``."""
+
+__all__ = []
+
+import errno
+import socket
+import struct
+from unittest.mock import Mock
+
+from maastesting.factory import factory
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+from netaddr import IPAddress
+from provisioningserver.utils import netlink
+from provisioningserver.utils.netlink import (
+    align,
+    is_change,
+    NetlinkError,
+    NetlinkListener,
+    NetlinkMessage,
+    NLMSGHDR,
+    NLMSGHDR_LENGTH,
+    parse_netlink_messages,
+    RT_TABLE_MAIN,
+    RTA,
+    RTATTR,
+    RTATTR_LENGTH,
+    RTM,
+    RTMSG,
+)
+from testtools import ExpectedException
+from testtools.matchers import (
+    Equals,
+    Is,
+)
+from twisted.internet import reactor
+
+# Generic netlink message type that carries nothing.
+NLMSG_NOOP = 1
+
+
+def make_netlink_message(type, payload, flags=0, seq=0, pid=0):
+    """Return a netlink message of the given `type` containing `payload`."""
+    header = struct.pack(
+        NLMSGHDR, NLMSGHDR_LENGTH + len(payload), type, flags, seq, pid)
+    return header + payload + (b'\0' * (align(len(payload)) - len(payload)))
+
+
+def make_attribute(type, value):
+    """Return a netlink attribute of the given `type` containing `value`."""
+    header = struct.pack(RTATTR, RTATTR_LENGTH + len(value), type)
+    return header + value + (b'\0' * (align(len(value)) - len(value)))
+
+
+def make_link_message(index, type=RTM.NEWLINK):
+    """Construct a link message, as sent when a link changes."""
+    # struct ifinfomsg, without attributes.
+    payload = struct.pack("=BxHiII", socket.AF_UNSPEC, 1, index, 0, 0)
+    return make_netlink_message(type, payload)
+
+
+def make_address_message(index, address, prefixlen=24, type=RTM.NEWADDR):
+    """Construct an address message, as sent when an address changes."""
+    ip = IPAddress(address)
+    family = socket.AF_INET if ip.version == 4 else socket.AF_INET6
+    # struct ifaddrmsg, followed by an IFA_ADDRESS attribute.
+    payload = struct.pack("=BBBBI", family, prefixlen, 0, 0, index)
+    payload += make_attribute(1, ip.packed)
+    return make_netlink_message(type, payload)
+
+
+def make_route_message(
+        destination, prefixlen, index, gateway=None, table=RT_TABLE_MAIN,
+        flags=0, type=RTM.NEWROUTE):
+    """Construct a route message, as sent when a route changes."""
+    ip = IPAddress(destination)
+    family = socket.AF_INET if ip.version == 4 else socket.AF_INET6
+    payload = struct.pack(
+        RTMSG, family, prefixlen, 0, 0, table, 0, 0, 0, flags)
+    payload += make_attribute(RTA.DST, ip.packed)
+    payload += make_attribute(RTA.OIF, struct.pack("=I", index))
+    if gateway is not None:
+        payload += make_attribute(RTA.GATEWAY, IPAddress(gateway).packed)
+    return make_netlink_message(type, payload)
+
+
+def parse_message(data):
+    [message] = parse_netlink_messages(data)
+    return message
+
+
+class NetlinkReplay:
+    """Replays recorded netlink datagrams to a `NetlinkListener`.
+
+    The listener's socket is replaced with one end of a socket pair, so that
+    the listener reads the datagrams given to `replay` exactly as it would
+    read them from the kernel.
+    """
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.kernel, listener.socket = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_DGRAM)
+        listener.socket.setblocking(False)
+        self.kernel.setblocking(False)
+
+    def replay(self, *datagrams):
+        for datagram in datagrams:
+            self.kernel.send(datagram)
+        self.listener.doRead()
+
+    def close(self):
+        self.kernel.close()
+        if self.listener.socket is not None:
+            self.listener.socket.close()
+            self.listener.socket = None
+
+
+class TestParseNetlinkMessages(MAASTestCase):
+
+    def test__parses_multiple_messages(self):
+        payload1 = factory.make_bytes(5)
+        payload2 = factory.make_bytes(8)
+        data = (
+            make_netlink_message(RTM.NEWLINK, payload1, seq=1, pid=2) +
+            make_netlink_message(RTM.DELADDR, payload2, flags=2))
+        self.assertThat(parse_netlink_messages(data), Equals([
+            NetlinkMessage(RTM.NEWLINK, 0, 1, 2, payload1),
+            NetlinkMessage(RTM.DELADDR, 2, 0, 0, payload2),
+        ]))
+
+    def test__rejects_truncated_messages(self):
+        data = make_netlink_message(RTM.NEWLINK, factory.make_bytes(20))
+        with ExpectedException(NetlinkError, "Truncated netlink message.*"):
+            parse_netlink_messages(data[:-8])
+
+
+class TestIsChange(MAASTestCase):
+
+    def test__link_and_address_messages_are_changes(self):
+        for type in (RTM.NEWLINK, RTM.DELLINK, RTM.NEWADDR, RTM.DELADDR):
+            self.assertTrue(is_change(parse_message(
+                make_netlink_message(type, factory.make_bytes(16)))))
+
+    def test__routes_in_the_main_table_are_changes(self):
+        for type in (RTM.NEWROUTE, RTM.DELROUTE):
+            self.assertTrue(is_change(parse_message(make_route_message(
+                "10.0.0.0", 8, 2, gateway="192.168.1.1", type=type))))
+
+    def test__routes_outside_the_main_table_are_not_changes(self):
+        self.assertFalse(is_change(parse_message(
+            make_route_message("127.0.0.1", 32, 1, table=255))))
+
+    def test__cloned_routes_are_not_changes(self):
+        self.assertFalse(is_change(parse_message(make_route_message(
+            "10.0.0.1", 32, 2, flags=netlink.RTM_F_CLONED))))
+
+    def test__other_messages_are_not_changes(self):
+        self.assertFalse(is_change(NetlinkMessage(
+            NLMSG_NOOP, 0, 0, 0, b"")))
+
+
+class TestNetlinkListener(MAASTestCase):
+
+    def make_listener(self):
+        listener = NetlinkListener(Mock())
+        fixture = NetlinkReplay(listener)
+        self.addCleanup(fixture.close)
+        return listener, fixture
+
+    def test__calls_callback_on_change(self):
+        listener, fixture = self.make_listener()
+        fixture.replay(make_link_message(5))
+        self.assertThat(listener.callback, MockCalledOnceWith())
+
+    def test__calls_callback_once_for_many_changes(self):
+        listener, fixture = self.make_listener()
+        fixture.replay(
+            *(make_link_message(index) for index in range(10, 20)),
+            make_address_message(10, "192.168.1.10"))
+        self.assertThat(listener.callback, MockCalledOnceWith())
+
+    def test__does_not_call_callback_without_change(self):
+        listener, fixture = self.make_listener()
+        fixture.replay(make_route_message("127.0.0.1", 32, 1, table=255))
+        self.assertThat(listener.callback, MockNotCalled())
+
+    def test__calls_callback_after_overrun(self):
+        listener, fixture = self.make_listener()
+        listener.socket = Mock(fileno=listener.socket.fileno)
+        listener.socket.recv.side_effect = [
+            OSError(errno.ENOBUFS, "No buffer space available"),
+            BlockingIOError(),
+        ]
+        listener.doRead()
+        self.assertThat(listener.callback, MockCalledOnceWith())
+
+    def test__start_and_stop_listening(self):
+        addReader = self.patch(reactor, "addReader")
+        removeReader = self.patch(reactor, "removeReader")
+        listener = NetlinkListener(Mock())
+        try:
+            listener.startListening()
+        except OSError as error:
+            self.skipTest("Netlink is unavailable: %s" % error)
+        self.assertThat(addReader, MockCalledOnceWith(listener))
+        self.assertTrue(listener.listening)
+        listener.stopListening()
+        self.assertThat(removeReader, MockCalledOnceWith(listener))
+        self.assertFalse(listener.listening)
+        self.assertThat(listener.socket, Is(None))
@@ -884,6 +884,46 @@ class TestMAASIPSet(MAASTestCase):
         self.assertThat(str(IPAddress(s1.first)), Equals("10.0.0.1"))
         self.assertThat(str(IPAddress(s1.last)), Equals("10.0.0.8"))
 
+    def test__find_returns_range_holding_address(self):
+        s = MAASIPSet([
+            make_iprange('10.0.0.1', '10.0.0.100', purpose="foo"),
+            make_iprange('10.0.0.200', '10.0.0.254', purpose="bar"),
+        ])
+        self.assertThat(s.find('10.0.0.50').purpose, Equals({"foo"}))
+        self.assertThat(s.find('10.0.0.254').purpose, Equals({"bar"}))
+        self.assertIsNone(s.find('10.0.0.0'))
+        self.assertIsNone(s.find('10.0.0.150'))
+        self.assertIsNone(s.find(IPRange('10.0.0.100', '10.0.0.200')))
+
+    def test__find_with_ipv4_and_ipv6_ranges(self):
+        s = MAASIPSet([
+            make_iprange('10.0.0.1', '10.0.0.100'),
+            make_iprange('::1', '::ffff'),
+        ])
+        self.assertThat(s, Contains('10.0.0.1'))
+        self.assertThat(s, Contains('::2'))
+        self.assertThat(s, Not(Contains('10.0.0.101')))
+
+    def test__from_sorted_condenses_ranges(self):
+        s = MAASIPSet.from_sorted([
+            make_iprange('10.0.0.1', '10.0.0.10', purpose="foo"),
+            make_iprange('10.0.0.5', '10.0.0.20', purpose="bar"),
+            make_iprange('10.0.0.21', purpose="foo"),
+        ], cidr='10.0.0.0/24')
+        self.assertThat(s.cidr, Equals('10.0.0.0/24'))
+        self.assertThat(s.ranges, HasLength(2))
+        self.assertThat(s.ranges[0].purpose, Equals({"foo", "bar"}))
+        self.assertThat(s, HasLength(2))
+        self.assertThat(s, Contains('10.0.0.21'))
+
+    def test__ior_merges_index(self):
+        s1 = MAASIPSet(['10.0.0.2', '10.0.0.200'])
+        s2 = MAASIPSet([make_iprange('10.0.0.100', purpose="foo")])
+        s1 |= s2
+        self.assertThat(s1, Contains('10.0.0.100'))
+        self.assertThat(s1.find('10.0.0.100').purpose, Equals({"foo"}))
+        self.assertThat(s1, HasLength(3))
+
 
 class TestIPRangeStatistics(MAASTestCase):
 
@@ -36,6 +36,10 @@ from provisioningserver.utils.beaconing import (
     create_beacon_payload,
     TopologyHint,
 )
+from provisioningserver.utils.capture import (
+    ARPCapture,
+    BeaconCapture,
+)
 from provisioningserver.utils.services import (
     BeaconingService,
     BeaconingSocketProtocol,
@@ -44,6 +48,7 @@ from provisioningserver.utils.services import (
     NeighbourDiscoveryService,
     NetworksMonitoringLock,
     NetworksMonitoringService,
+    PacketCaptureService,
     ProcessProtocolService,
     ProtocolForObserveARP,
     ProtocolForObserveBeacons,
@@ -78,10 +83,11 @@ class StubNetworksMonitoringService(NetworksMonitoringService):
 
     def __init__(
             self, enable_monitoring=False, enable_beaconing=False,
-            *args, **kwargs):
+            enable_netlink=False, enable_capture=False, *args, **kwargs):
         super().__init__(
             *args, enable_monitoring=enable_monitoring,
-            enable_beaconing=enable_beaconing, **kwargs)
+            enable_beaconing=enable_beaconing, enable_netlink=enable_netlink,
+            enable_capture=enable_capture, **kwargs)
         self.iterations = DeferredQueue()
         self.interfaces = []
         self.update_interface__calls = 0
@@ -303,6 +309,154 @@ class TestNetworksMonitoringService(MAASTestCase):
         # ... interfaces ARE recorded.
         self.assertThat(service.interfaces, Not(Equals([])))
 
+    @inlineCallbacks
+    def test_starts_and_stops_netlink(self):
+        self.patch(services, "get_all_interfaces_definition").return_value = {}
+        NetlinkListener = self.patch(services, "NetlinkListener")
+        netlink = NetlinkListener.return_value
+        service = self.makeService(clock=Clock(), enable_netlink=True)
+        yield service.startService()
+        self.assertThat(
+            NetlinkListener, MockCalledOnceWith(service._netlinkChanged))
+        self.assertThat(netlink.startListening, MockCalledOnceWith())
+        self.assertThat(service.netlink, Is(netlink))
+        yield service.stopService()
+        self.assertThat(netlink.stopListening, MockCalledOnceWith())
+        self.assertThat(service.netlink, Is(None))
+
+    @inlineCallbacks
+    def test_polls_when_netlink_is_unavailable(self):
+        get_interfaces = self.patch(services, "get_all_interfaces_definition")
+        get_interfaces.return_value = {}
+        NetlinkListener = self.patch(services, "NetlinkListener")
+        NetlinkListener.return_value.startListening.side_effect = OSError()
+        service = self.makeService(clock=Clock(), enable_netlink=True)
+        yield service.startService()
+        yield service.iterations.get()
+        self.assertThat(service.netlink, Is(None))
+        yield service.updateInterfaces()
+        yield service.stopService()
+        self.assertThat(get_interfaces, MockCallsMatch(call(), call()))
+
+    @inlineCallbacks
+    def test_reuses_interfaces_while_netlink_reports_no_changes(self):
+        get_interfaces = self.patch(services, "get_all_interfaces_definition")
+        get_interfaces.return_value = {}
+        service = self.makeService()
+        service.netlink = Mock(listening=True)
+        yield service.updateInterfaces()
+        yield service.updateInterfaces()
+        yield service.updateInterfaces()
+        self.assertThat(get_interfaces, MockCalledOnceWith())
+        self.assertThat(service.interfaces, Equals([{}]))
+
+    @inlineCallbacks
+    def test_gets_interfaces_every_full_refresh_intervals(self):
+        get_interfaces = self.patch(services, "get_all_interfaces_definition")
+        get_interfaces.return_value = {}
+        service = self.makeService()
+        service.netlink = Mock(listening=True)
+        for _ in range(service.full_refresh_intervals + 1):
+            yield service.updateInterfaces()
+        self.assertThat(get_interfaces, MockCallsMatch(call(), call()))
+
+    @inlineCallbacks
+    def test_gets_interfaces_when_netlink_stopped_listening(self):
+        get_interfaces = self.patch(services, "get_all_interfaces_definition")
+        get_interfaces.return_value = {}
+        service = self.makeService()
+        service.netlink = Mock(listening=False)
+        yield service.updateInterfaces()
+        yield service.updateInterfaces()
+        self.assertThat(get_interfaces, MockCallsMatch(call(), call()))
+
+    @inlineCallbacks
+    def test_updates_interfaces_after_netlink_change(self):
+        get_interfaces = self.patch(services, "get_all_interfaces_definition")
+        get_interfaces.side_effect = [{}, {"eth0": {}}]
+        clock = Clock()
+        service = self.makeService(clock=clock)
+        service.netlink = Mock(listening=True)
+        yield service.updateInterfaces()
+        yield service.iterations.get()
+        # Changes reported in quick succession lead to one update.
+        service._netlinkChanged()
+        service._netlinkChanged()
+        clock.advance(service.netlink_delay / 2)
+        service._netlinkChanged()
+        self.assertThat(service.update_interface__calls, Equals(1))
+        clock.advance(service.netlink_delay / 2)
+        yield service.iterations.get()
+        self.assertThat(service.update_interface__calls, Equals(2))
+        self.assertThat(service.interfaces, Equals([{}, {"eth0": {}}]))
+
+    def test_netlink_change_waits_for_update_in_progress(self):
+        clock = Clock()
+        service = self.makeService(clock=clock)
+        updateInterfaces = self.patch(service, "updateInterfaces")
+        service._updating = True
+        service._netlinkChanged()
+        clock.advance(service.netlink_delay)
+        self.assertThat(updateInterfaces, MockNotCalled())
+        service._updating = False
+        clock.advance(service.netlink_delay)
+        self.assertThat(updateInterfaces, MockCalledOnceWith())
+
+    def test_captures_neighbours_in_process(self):
+        startListening = self.patch(ARPCapture, "startListening")
+        service = self.makeService(enable_capture=True)
+        service._startNeighbourDiscovery("eth0")
+        child = service.getServiceNamed("neighbour_discovery:eth0")
+        self.assertThat(child, IsInstance(PacketCaptureService))
+        self.assertThat(child.capture, IsInstance(ARPCapture))
+        self.assertThat(child.capture.ifname, Equals("eth0"))
+        self.assertThat(startListening, MockCalledOnceWith())
+
+    def test_captures_beacons_in_process(self):
+        self.patch(BeaconCapture, "startListening")
+        service = self.makeService(enable_capture=True)
+        service._startBeaconing("eth0")
+        child = service.getServiceNamed("beaconing:eth0")
+        self.assertThat(child, IsInstance(PacketCaptureService))
+        self.assertThat(child.capture, IsInstance(BeaconCapture))
+
+    def test_spawns_capture_processes_without_privileges(self):
+        startListening = self.patch(ARPCapture, "startListening")
+        startListening.side_effect = PermissionError()
+        service = self.makeService(enable_capture=True)
+        service._startNeighbourDiscovery("eth0")
+        service._startNeighbourDiscovery("eth1")
+        self.assertThat(
+            service.getServiceNamed("neighbour_discovery:eth0"),
+            IsInstance(NeighbourDiscoveryService))
+        self.assertThat(
+            service.getServiceNamed("neighbour_discovery:eth1"),
+            IsInstance(NeighbourDiscoveryService))
+        # In-process capture is not attempted again.
+        self.assertThat(startListening, MockCalledOnceWith())
+        self.assertFalse(service.enable_capture)
+
+    def test_spawns_capture_process_when_interface_cannot_be_captured(self):
+        self.patch(ARPCapture, "startListening").side_effect = OSError()
+        service = self.makeService(enable_capture=True)
+        service._startNeighbourDiscovery("eth0")
+        self.assertThat(
+            service.getServiceNamed("neighbour_discovery:eth0"),
+            IsInstance(NeighbourDiscoveryService))
+        self.assertTrue(service.enable_capture)
+
+
+class TestPacketCaptureService(MAASTestCase):
+    """Tests for `PacketCaptureService`."""
+
+    def test__starts_and_stops_capture(self):
+        capture = Mock()
+        service = PacketCaptureService(capture)
+        service.startService()
+        self.assertThat(capture.startListening, MockCalledOnceWith())
+        service.stopService()
+        self.assertThat(capture.stopListening, MockCalledOnceWith())
+
 
 class TestJSONPerLineProtocol(MAASTestCase):
     """Tests for `JSONPerLineProtocol`."""